@@ -3,16 +3,25 @@
 """
 自動バックアップスクリプト
 データベースと設定ファイルの自動バックアップ機能
+
+バックアップは backup/store/ の内容アドレス方式の置き場（modules.backup_store）に保存する。
+ファイルは固定長のチャンクに分けてSHA-256毎に1度だけ保存し、1回分のバックアップはマニフェストで表すため、
+前回から変わったチャンクだけが書き込まれる。以前の日付別ディレクトリ（backup/<名前>/）も復元できる。
 """
 
 import os
 import sys
 import shutil
-import json
+import tempfile
 from datetime import datetime
 from pathlib import Path
 from typing import List, Dict, Optional
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from modules.backup_store import BackupStore
+from modules.db_backup import backup_database as backup_sqlite
+
 class AutoBackupManager:
     """自動バックアップ管理クラス"""
     
@@ -21,6 +30,7 @@ class AutoBackupManager:
         self.backup_dir = self.project_root / "backup"
         self.data_dir = self.project_root / "data"
         self.resources_dir = self.project_root / "resources"
+        self.store = BackupStore(str(self.backup_dir / "store"))
         
         # バックアップ対象ファイル
         self.backup_targets = [
@@ -32,73 +42,35 @@ class AutoBackupManager:
         ]
         
         # バックアップ設定
-        self.max_backups = 10  # 最大バックアップ数
+        self.max_backups = 200  # 保持するバックアップ数（変更のないチャンクは共有されるため多くても容量は増えにくい）
         self.backup_interval_hours = 24  # バックアップ間隔（時間）
+        self.compact_database = False  # TrueならVACUUM INTOで空き領域を詰めてバックアップ
         
-    def create_backup_directory(self, backup_name: str) -> Path:
-        """バックアップディレクトリを作成"""
-        backup_path = self.backup_dir / backup_name
-        backup_path.mkdir(parents=True, exist_ok=True)
-        return backup_path
+    def target_key(self, target: Path) -> str:
+        """マニフェスト内のファイル名（プロジェクトルートからの相対パス）"""
+        return target.relative_to(self.project_root).as_posix()
         
-    def backup_file(self, source_path: Path, backup_path: Path) -> bool:
-        """ファイルをバックアップ"""
-        try:
-            if source_path.exists():
-                shutil.copy2(source_path, backup_path)
-                print(f"✅ {source_path.name} をバックアップしました")
-                return True
-            else:
-                print(f"⚠️  {source_path.name} が見つかりません")
-                return False
-        except Exception as e:
-            print(f"❌ {source_path.name} のバックアップに失敗: {e}")
-            return False
-            
-    def backup_database(self, backup_path: Path) -> bool:
-        """データベースをバックアップ"""
+    def backup_database(self, snapshot_path: Path) -> bool:
+        """データベースの整合したスナップショットを作成"""
         db_file = self.data_dir / "tags.db"
         if not db_file.exists():
             print("⚠️  データベースファイルが見つかりません")
             return False
             
         try:
-            # SQLiteデータベースの安全なバックアップ
-            import sqlite3
-            
-            # 元のDBに接続
-            conn = sqlite3.connect(db_file)
-            
-            # バックアップDBを作成
-            backup_db = backup_path / "tags.db"
-            backup_conn = sqlite3.connect(backup_db)
-            
-            # データをコピー
-            conn.backup(backup_conn)
-            
-            conn.close()
-            backup_conn.close()
-            
-            print("✅ データベースをバックアップしました")
+            # バックアップAPIで少しずつコピーする（アプリが書き込み中でも整合したスナップショットになる）
+            def on_progress(copied: int, total: int) -> None:
+                print(f"\r   データベース: {copied}/{total} ページ", end="", flush=True)
+
+            backup_sqlite(str(db_file), str(snapshot_path), progress=on_progress, vacuum=self.compact_database)
+            print()
+            print("✅ データベースのスナップショットを作成しました")
             return True
             
         except Exception as e:
             print(f"❌ データベースのバックアップに失敗: {e}")
             return False
             
-    def create_backup_metadata(self, backup_path: Path, backup_files: List[str]) -> None:
-        """バックアップメタデータを作成"""
-        metadata = {
-            "backup_date": datetime.now().isoformat(),
-            "backup_files": backup_files,
-            "project_version": self.get_project_version(),
-            "backup_type": "auto"
-        }
-        
-        metadata_file = backup_path / "backup_metadata.json"
-        with open(metadata_file, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, indent=2, ensure_ascii=False)
-            
     def get_project_version(self) -> str:
         """プロジェクトバージョンを取得"""
         try:
@@ -118,17 +90,14 @@ class AutoBackupManager:
         return "unknown"
         
     def cleanup_old_backups(self) -> None:
-        """古いバックアップを削除"""
+        """古いバックアップを削除し、どのバックアップからも参照されなくなったチャンクを削除"""
         try:
-            backup_dirs = [d for d in self.backup_dir.iterdir() if d.is_dir()]
-            backup_dirs.sort(key=lambda x: x.stat().st_mtime, reverse=True)
-            
-            # 最大バックアップ数を超えた分を削除
-            if len(backup_dirs) > self.max_backups:
-                for old_backup in backup_dirs[self.max_backups:]:
-                    shutil.rmtree(old_backup)
-                    print(f"🗑️  古いバックアップを削除: {old_backup.name}")
-                    
+            for name in self.store.prune(self.max_backups):
+                print(f"🗑️  古いバックアップを削除: {name}")
+            removed, freed = self.store.gc()
+            if removed:
+                print(f"🗑️  不要なチャンクを削除: {removed}個 ({freed / 1024:.1f} KB)")
+                
         except Exception as e:
             print(f"⚠️  古いバックアップの削除中にエラー: {e}")
             
@@ -136,12 +105,11 @@ class AutoBackupManager:
         """バックアップを作成すべきかチェック"""
         try:
             # 最新のバックアップを確認
-            backup_dirs = [d for d in self.backup_dir.iterdir() if d.is_dir()]
-            if not backup_dirs:
+            backups = self.store.list()
+            if not backups:
                 return True
                 
-            latest_backup = max(backup_dirs, key=lambda x: x.stat().st_mtime)
-            latest_time = datetime.fromtimestamp(latest_backup.stat().st_mtime)
+            latest_time = datetime.fromisoformat(backups[0]["created"])
             current_time = datetime.now()
             
             # バックアップ間隔をチェック
@@ -160,22 +128,28 @@ class AutoBackupManager:
         print(f"🚀 バックアップを作成中: {backup_name}")
         
         try:
-            # バックアップディレクトリを作成
-            backup_path = self.create_backup_directory(backup_name)
-            
-            # データベースをバックアップ
-            db_success = self.backup_database(backup_path)
-            
-            # その他のファイルをバックアップ
-            backup_files = []
-            for target in self.backup_targets:
-                if target.exists():
-                    backup_file = backup_path / target.name
-                    if self.backup_file(target, backup_file):
-                        backup_files.append(target.name)
+            with tempfile.TemporaryDirectory(dir=self.backup_dir if self.backup_dir.exists() else None) as work_dir:
+                files = {}
+                for target in self.backup_targets:
+                    if target == self.data_dir / "tags.db":
+                        # DBはファイルのまま読むと書き込み途中の状態を写すため、スナップショットから取り込む
+                        snapshot = Path(work_dir) / "tags.db"
+                        if self.backup_database(snapshot):
+                            files[self.target_key(target)] = str(snapshot)
+                    elif target.exists():
+                        files[self.target_key(target)] = str(target)
+                    else:
+                        print(f"⚠️  {target.name} が見つかりません")
                         
-            # メタデータを作成
-            self.create_backup_metadata(backup_path, backup_files)
+                metadata = {
+                    "project_version": self.get_project_version(),
+                    "backup_type": "auto"
+                }
+                manifest, stats = self.store.create(backup_name, files, metadata)
+                
+            for key in manifest["files"]:
+                print(f"✅ {key} をバックアップしました")
+            print(f"📦 チャンク {stats['chunks']}個中 {stats['new_chunks']}個を新たに保存 ({stats['written'] / 1024:.1f} KB)")
             
             # 古いバックアップを削除
             self.cleanup_old_backups()
@@ -189,29 +163,40 @@ class AutoBackupManager:
             
     def restore_backup(self, backup_name: str) -> bool:
         """バックアップを復元"""
-        backup_path = self.backup_dir / backup_name
-        if not backup_path.exists():
+        legacy_path = self.backup_dir / backup_name
+        if not any(b["name"] == backup_name for b in self.store.list()):
+            if legacy_path.is_dir() and legacy_path != self.backup_dir / "store":
+                return self.restore_legacy_backup(legacy_path)
             print(f"❌ バックアップ {backup_name} が見つかりません")
             return False
             
         print(f"🔄 バックアップを復元中: {backup_name}")
         
         try:
-            # データベースを復元
-            backup_db = backup_path / "tags.db"
-            if backup_db.exists():
-                target_db = self.data_dir / "tags.db"
-                shutil.copy2(backup_db, target_db)
-                print("✅ データベースを復元しました")
-                
-            # その他のファイルを復元
+            # マニフェストのチャンクを並べて各ファイルを組み立てる（チャンクはハッシュで検証される）
+            destinations = {self.target_key(target): str(target) for target in self.backup_targets}
+            for key in self.store.restore(backup_name, destinations):
+                print(f"✅ {key} を復元しました")
+                    
+            print(f"🎉 復元完了: {backup_name}")
+            return True
+            
+        except Exception as e:
+            print(f"❌ 復元中にエラー: {e}")
+            return False
+            
+    def restore_legacy_backup(self, backup_path: Path) -> bool:
+        """以前の形式（日付別ディレクトリへのコピー）のバックアップを復元"""
+        print(f"🔄 バックアップを復元中: {backup_path.name}")
+        
+        try:
             for target in self.backup_targets:
                 backup_file = backup_path / target.name
                 if backup_file.exists():
                     shutil.copy2(backup_file, target)
                     print(f"✅ {target.name} を復元しました")
                     
-            print(f"🎉 復元完了: {backup_name}")
+            print(f"🎉 復元完了: {backup_path.name}")
             return True
             
         except Exception as e:
@@ -223,26 +208,19 @@ class AutoBackupManager:
         backups = []
         
         try:
-            for backup_dir in self.backup_dir.iterdir():
-                if backup_dir.is_dir():
-                    metadata_file = backup_dir / "backup_metadata.json"
-                    metadata = {}
-                    
-                    if metadata_file.exists():
-                        with open(metadata_file, 'r', encoding='utf-8') as f:
-                            metadata = json.load(f)
-                            
-                    backup_info = {
-                        "name": backup_dir.name,
-                        "date": datetime.fromtimestamp(backup_dir.stat().st_mtime).isoformat(),
-                        "metadata": metadata
-                    }
-                    backups.append(backup_info)
+            for manifest in self.store.list():
+                backup_info = {
+                    "name": manifest["name"],
+                    "date": manifest["created"],
+                    "size": sum(entry["size"] for entry in manifest["files"].values()),
+                    "metadata": manifest.get("metadata", {})
+                }
+                backups.append(backup_info)
                     
         except Exception as e:
             print(f"⚠️  バックアップ一覧取得中にエラー: {e}")
             
-        return sorted(backups, key=lambda x: x["date"], reverse=True)
+        return backups
 
 def main():
     """メイン関数"""
@@ -254,6 +232,7 @@ def main():
         print("  python auto_backup.py restore <backup_name>  # バックアップ復元")
         print("  python auto_backup.py list                   # バックアップ一覧")
         print("  python auto_backup.py auto                   # 自動バックアップ")
+        print("  python auto_backup.py gc                     # 古いバックアップと不要なチャンクを削除")
         sys.exit(1)
         
     command = sys.argv[1]
@@ -276,7 +255,7 @@ def main():
             backups = backup_manager.list_backups()
             print("📋 バックアップ一覧:")
             for backup in backups:
-                print(f"  {backup['name']} - {backup['date']}")
+                print(f"  {backup['name']} - {backup['date']} ({backup['size'] / 1024:.1f} KB)")
                 
         elif command == "auto":
             if backup_manager.should_create_backup():
@@ -285,6 +264,9 @@ def main():
             else:
                 print("⏰ バックアップ間隔が経過していません")
                 
+        elif command == "gc":
+            backup_manager.cleanup_old_backups()
+                
         else:
             print(f"❌ 不明なコマンド: {command}")
             sys.exit(1)
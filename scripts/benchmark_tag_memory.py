@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+タグ一覧のメモリ使用量ベンチマーク（辞書のリスト vs TagCollection）
+- 一時SQLiteにN件のタグを作成し、get_all_tags()相当の辞書リストとTagCollectionを比較
+- tracemallocによる確保量、構築時間、検索（filter_tags）時間、保持中のgc.collect()時間を計測
+- 結果はJSONで標準出力に出す
+
+使い方: python scripts/benchmark_tag_memory.py --tags 200000
+"""
+import argparse
+import gc
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from modules.search_cache import filter_tags
+from modules.tag_collection import TagCollection
+
+CATEGORIES = ["髪型・髪色", "服装・ファッション", "表情・感情", "背景・環境", "ポーズ・動作", "品質・画質指定",
+              "照明・色調", "小物・アクセサリー", "構図・カメラ視点", "キャラクター設定", "未分類", ""]
+SELECT_ALL = "SELECT tag, jp, favorite, category, is_negative FROM tags"
+
+
+def create_database(path: str, count: int) -> None:
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE tags (id INTEGER PRIMARY KEY AUTOINCREMENT, tag TEXT UNIQUE NOT NULL, "
+                 "jp TEXT, favorite INTEGER DEFAULT 0, category TEXT, is_negative INTEGER DEFAULT 0)")
+    with conn:
+        conn.executemany("INSERT INTO tags (tag, jp, favorite, category, is_negative) VALUES (?, ?, ?, ?, ?)",
+                         ((f"sample tag {i} long hair", f"サンプルタグ{i}", int(i % 11 == 0),
+                           CATEGORIES[i % len(CATEGORIES)], int(i % 17 == 0)) for i in range(count)))
+    conn.close()
+
+
+def load_dicts(conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+    """TagManager.get_all_tags()と同じ形の辞書リスト"""
+    return [{"tag": row["tag"], "jp": row["jp"], "favorite": bool(row["favorite"]),
+             "category": row["category"] or "", "is_negative": bool(row["is_negative"])}
+            for row in conn.execute(SELECT_ALL)]
+
+
+def load_collection(conn: sqlite3.Connection) -> TagCollection:
+    return TagCollection.from_rows(conn.execute(SELECT_ALL))
+
+
+def measure(conn: sqlite3.Connection, loader: Callable[[sqlite3.Connection], Any]) -> Dict[str, Any]:
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    tags = loader(conn)
+    build_sec = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    found = len(filter_tags(tags, "tag 123", "全カテゴリ"))
+    filter_sec = time.perf_counter() - started
+
+    started = time.perf_counter()
+    gc.collect()
+    gc_sec = time.perf_counter() - started
+    return {"retained_mb": round(current / 1024 / 1024, 1), "peak_mb": round(peak / 1024 / 1024, 1),
+            "build_sec": round(build_sec, 3), "filter_sec": round(filter_sec, 3), "gc_collect_sec": round(gc_sec, 4),
+            "gc_tracked_objects": len(gc.get_objects()), "matches": found}
+
+
+def run(count: int) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "bench.db")
+        create_database(db_path, count)
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            dicts = measure(conn, load_dicts)
+            collection = measure(conn, load_collection)
+        finally:
+            conn.close()
+    return {"tags": count, "dict_list": dicts, "tag_collection": collection,
+            "memory_ratio": round(collection["retained_mb"] / dicts["retained_mb"], 3) if dicts["retained_mb"] else None}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="タグ一覧のメモリ使用量ベンチマーク")
+    parser.add_argument("--tags", type=int, default=200000, help="作成するタグ数")
+    args = parser.parse_args()
+    print(json.dumps(run(args.tags), ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -45,6 +45,9 @@ if __name__ == "__main__":
     sys.excepthook = global_exception_hook
     
     try:
+        from modules.config import ensure_data_directories, log_configured_paths
+        ensure_data_directories()
+        log_configured_paths()
         from modules.ui_main import TagManagerApp
         root = tb.Window()
         app = TagManagerApp(root)
@@ -4,19 +4,23 @@ AI予測機能（機械学習ベースの動的重み付けシステム）
 """
 import json
 import os
+import threading
 import time
 from typing import Dict, List, Optional, Tuple, Any
 from collections import defaultdict, Counter
 from modules.config import BACKUP_DIR
-from modules.category_manager import load_category_keywords, CATEGORY_PRIORITIES, calculate_keyword_score
-from modules.context_analyzer import analyze_tag_context, calculate_context_boost
+from modules.category_manager import load_category_keywords_cached, CATEGORY_PRIORITIES, calculate_keyword_score
+from modules.context_analyzer import analyze_tag_context, calculate_context_boosts
 from modules.common_words import COMMON_WORDS
-from modules.customization import get_customized_category_keywords, apply_custom_rules, customization_manager, get_custom_category
+from modules.customization import get_category_keyword_table, get_customization_manager, get_custom_category
 from modules.context_analyzer import get_synonyms
+from modules.usage_store import UsageStore, new_usage_entry
+from modules.context_index import ContextIndex
 # 遅延読み込みのため、グローバルインポートを削除
 # from .huggingface_manager import hf_manager
 # from .local_hf_manager import local_hf_manager
 import glob
+from dataclasses import dataclass, field
 
 # 学習データファイル
 LEARNING_DATA_FILE = os.path.join(BACKUP_DIR, "learning_data.json")
@@ -28,15 +32,24 @@ LEARNING_HISTORY_BONUS_MAX = 300  # 最大ボーナス
 class TagUsageTracker:
     """
     タグ使用パターンを追跡・学習するクラス
+
+    学習データはSQLite（usage / usage_category / usage_context テーブル）に保存する。
+    usage_dataは読み込み済みデータのメモリ上の写しで、参照系のメソッドは副作用を持たない。
+    記録はメモリに反映したうえで未保存イベントとして溜め、save_usage_data()でまとめて加算する
+    （アプリではPersistenceManagerのバックグラウンドスレッドが呼び出す）。
     """
-    def __init__(self, load_existing_data: bool = True, usage_file: str = None):
-        self.usage_data = defaultdict(lambda: {
-            "count": 0,
-            "categories": defaultdict(int),
-            "last_used": 0,
-            "context_tags": defaultdict(int)
-        })
+    def __init__(self, load_existing_data: bool = True, usage_file: str = None, db_file: str = None):
+        self.usage_data: Dict[str, Dict[str, Any]] = {}
+        # usage_fileは旧形式（JSON）のパス。初回読み込み時にSQLiteへ移行する
         self.usage_file = usage_file or TAG_USAGE_PATTERNS_FILE
+        self.db_file = db_file or os.path.splitext(self.usage_file)[0] + ".db"
+        self.store = UsageStore(self.db_file)
+        # _lockはメモリ上のデータ、_write_lockはストアへの書き込み順序を守る
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._pending: List[Tuple[str, str, float, List[str]]] = []
+        # コンテキスト類似度用にタグ毎のコンテキスト集合とMinHash署名を差分で保持する
+        self.context_index = ContextIndex()
         if load_existing_data:
             self.load_usage_data()
     
@@ -53,33 +66,51 @@ class TagUsageTracker:
         
         current_time = time.time()
         
-        # 使用回数を更新
-        self.usage_data[tag_lower]["count"] += 1
-        self.usage_data[tag_lower]["categories"][category] += 1
-        self.usage_data[tag_lower]["last_used"] = current_time
-        
-        # コンテキストタグを記録
-        if context_tags:
-            for context_tag in context_tags:
-                # コンテキストタグもテストタグでないことを確認
-                if not any(test_word in context_tag.lower() for test_word in ['test', 'テスト', 'サンプル', 'sample', 'デモ', 'demo', 'example', '例']):
-                    self.usage_data[tag_lower]["context_tags"][context_tag.lower()] += 1
-        
-        # 定期的にデータを保存
-        if self.usage_data[tag_lower]["count"] % 10 == 0:
-            self.save_usage_data()
+        # コンテキストタグもテストタグでないことを確認
+        contexts = [context_tag.lower() for context_tag in (context_tags or [])
+                    if not any(test_word in context_tag.lower() for test_word in ['test', 'テスト', 'サンプル', 'sample', 'デモ', 'demo', 'example', '例'])]
+        
+        with self._lock:
+            entry = self.usage_data.get(tag_lower)
+            if entry is None:
+                entry = self.usage_data[tag_lower] = new_usage_entry()
+            # 使用回数を更新
+            entry["count"] += 1
+            entry["categories"][category] = entry["categories"].get(category, 0) + 1
+            entry["last_used"] = current_time
+            
+            # コンテキストタグを記録
+            for context_tag in contexts:
+                entry["context_tags"][context_tag] = entry["context_tags"].get(context_tag, 0) + 1
+                self.context_index.add(tag_lower, context_tag)
+            
+            # 保存はsave_usage_data()でまとめて行う
+            self._pending.append((tag_lower, category, current_time, contexts))
+    
+    def is_dirty(self) -> bool:
+        """
+        未保存の記録があるかどうか
+        """
+        return bool(self._pending)
+    
+    def get_usage_counts(self) -> Dict[str, int]:
+        """タグ毎の使用回数"""
+        with self._lock:
+            return {tag: data.get("count", 0) for tag, data in self.usage_data.items()}
     
     def get_tag_frequency(self, tag: str) -> int:
         """
         タグの使用頻度を取得する
         """
-        return self.usage_data[tag.lower()]["count"]
+        entry = self.usage_data.get(tag.lower())
+        return entry["count"] if entry else 0
     
     def get_most_common_category(self, tag: str) -> Optional[str]:
         """
         タグの最も一般的なカテゴリを取得する
         """
-        categories = self.usage_data[tag.lower()]["categories"]
+        entry = self.usage_data.get(tag.lower())
+        categories = entry["categories"] if entry else None
         if categories:
             return max(categories.items(), key=lambda x: x[1])[0]
         return None
@@ -88,68 +119,112 @@ class TagUsageTracker:
         """
         2つのタグのコンテキスト類似度を計算する
         """
-        context1 = set(self.usage_data[tag1.lower()]["context_tags"].keys())
-        context2 = set(self.usage_data[tag2.lower()]["context_tags"].keys())
-        
-        if not context1 or not context2:
-            return 0.0
-        
-        intersection = len(context1.intersection(context2))
-        union = len(context1.union(context2))
-        
-        return intersection / union if union > 0 else 0.0
+        return self.context_index.similarity(tag1.lower(), tag2.lower())
     
     def cleanup_test_tags(self):
         """
         既存の学習履歴データからテストタグを削除する
         """
-        test_tags_to_remove = []
-        for tag in self.usage_data.keys():
-            if any(test_word in tag.lower() for test_word in ['test', 'テスト', 'サンプル', 'sample', 'デモ', 'demo', 'example', '例']):
-                test_tags_to_remove.append(tag)
-        
-        for tag in test_tags_to_remove:
-            del self.usage_data[tag]
+        with self._lock:
+            test_tags_to_remove = [tag for tag in self.usage_data.keys()
+                                   if any(test_word in tag.lower() for test_word in ['test', 'テスト', 'サンプル', 'sample', 'デモ', 'demo', 'example', '例'])]
+            for tag in test_tags_to_remove:
+                del self.usage_data[tag]
+                self.context_index.remove(tag)
         
         if test_tags_to_remove:
+            # 未保存の記録を先に書き込んでから削除する
             self.save_usage_data()
+            try:
+                self.store.delete_tags(test_tags_to_remove)
+            except Exception as e:
+                print(f"使用データの削除に失敗: {e}")
             print(f"テストタグ {len(test_tags_to_remove)} 個を学習履歴から削除しました")
         
         return len(test_tags_to_remove)
-
+    
+    def import_usage_data(self, data: Dict[str, Dict[str, Any]]):
+        """
+        エクスポートされた使用データを取り込む（同じタグのエントリは置き換える）
+        """
+        entries = {}
+        for tag, info in data.items():
+            entry = new_usage_entry()
+            entry["count"] = info.get("count", 0)
+            entry["last_used"] = info.get("last_used", 0)
+            entry["categories"] = dict(info.get("categories") or {})
+            entry["context_tags"] = dict(info.get("context_tags") or {})
+            entries[tag.lower()] = entry
+        with self._write_lock:
+            # 先に未保存の記録を書き込み、取り込んだエントリで上書きされるようにする
+            self._flush_pending()
+            with self._lock:
+                self.usage_data.update(entries)
+                for tag, entry in entries.items():
+                    self.context_index.set_contexts(tag, entry["context_tags"])
+            try:
+                self.store.replace_entries(entries)
+            except Exception as e:
+                print(f"使用データの取り込みに失敗: {e}")
+    
     def load_usage_data(self):
         """
-        使用データを読み込む
+        使用データを読み込む（旧形式のJSONしかない場合はSQLiteへ移行する）
         """
         try:
-            if os.path.exists(self.usage_file):
+            if not self.store.exists() and os.path.exists(self.usage_file):
                 with open(self.usage_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.usage_data = defaultdict(lambda: {
-                        "count": 0,
-                        "categories": defaultdict(int),
-                        "last_used": 0,
-                        "context_tags": defaultdict(int)
-                    })
-                    for tag, info in data.items():
-                        self.usage_data[tag] = defaultdict(int, info)
+                    legacy = json.load(f)
+                self.store.replace_entries(legacy)
+            if self.store.exists():
+                data = self.store.load_all()
+                with self._lock:
+                    self.usage_data = data
+                    self._pending = []
+                    self.context_index.rebuild(data)
         except Exception as e:
             print(f"使用データの読み込みに失敗: {e}")
     
-    def save_usage_data(self):
+    def save_usage_data(self) -> bool:
         """
-        使用データを保存する
+        未保存の記録をSQLiteにまとめて加算する（失敗時はFalseを返し、次回も保存対象のままにする）
         """
+        with self._write_lock:
+            return self._flush_pending()
+    
+    def _flush_pending(self) -> bool:
+        # 書き込み中も記録できるよう、未保存イベントを取り出してからロック外で書き込む
+        with self._lock:
+            events, self._pending = self._pending, []
+        if not events:
+            return True
         try:
-            os.makedirs(os.path.dirname(self.usage_file), exist_ok=True)
-            # defaultdictを通常のdictに変換
-            data = {}
-            for tag, info in self.usage_data.items():
-                data[tag] = dict(info)
-            with open(self.usage_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            self.store.apply_events(events)
+            return True
         except Exception as e:
+            with self._lock:
+                self._pending = events + self._pending
             print(f"使用データの保存に失敗: {e}")
+            return False
+    
+    def close(self):
+        """
+        未保存の記録を書き込み、データベース接続を閉じる
+        """
+        self.save_usage_data()
+        self.store.close()
+
+@dataclass
+class TagFeatures:
+    """
+    1回の予測で使うタグの特徴量（カテゴリに依存しない部分を1度だけ計算して使い回す）
+    """
+    frequency: int = 0
+    most_common_category: Optional[str] = None
+    avg_context_similarity: Optional[float] = None  # コンテキストタグがない場合はNone
+    rule_results: Dict[str, Any] = field(default_factory=dict)
+    context_boosts: Dict[str, int] = field(default_factory=dict)
+    synonyms: List[str] = field(default_factory=list)
 
 class DynamicWeightCalculator:
     """
@@ -158,44 +233,53 @@ class DynamicWeightCalculator:
     def __init__(self, usage_tracker: TagUsageTracker):
         self.usage_tracker = usage_tracker
     
-    def calculate_dynamic_weight(self, tag: str, category: str, context_tags: List[str] = None) -> float:
+    def extract_features(self, tag: str, context_tags: List[str] = None) -> TagFeatures:
         """
-        タグの動的重みを計算する
+        動的重みに必要な使用統計を取得する（カテゴリ毎に呼び直さないこと）
+        """
+        features = TagFeatures(
+            frequency=self.usage_tracker.get_tag_frequency(tag),
+            most_common_category=self.usage_tracker.get_most_common_category(tag),
+        )
+        if context_tags:
+            total_similarity = 0.0
+            for context_tag in context_tags:
+                total_similarity += self.usage_tracker.get_context_similarity(tag, context_tag)
+            features.avg_context_similarity = total_similarity / len(context_tags)
+        return features
+    
+    def weight_from_features(self, features: TagFeatures, category: str) -> float:
+        """
+        抽出済みの特徴量からカテゴリの動的重みを計算する
         """
         base_weight = 1.0
+        frequency = features.frequency
         
         # 学習履歴による重み調整
-        most_common_category = self.usage_tracker.get_most_common_category(tag)
-        if most_common_category == category:
-            frequency = self.usage_tracker.get_tag_frequency(tag)
-            if frequency > 0:
-                # 学習履歴によるボーナス（修正履歴1回ごとに50ポイント、最大300ポイント）
-                learning_bonus = min(LEARNING_HISTORY_BONUS_MAX, frequency * LEARNING_HISTORY_BONUS_BASE)
-                base_weight += learning_bonus
+        if features.most_common_category == category and frequency > 0:
+            # 学習履歴によるボーナス（修正履歴1回ごとに50ポイント、最大300ポイント）
+            learning_bonus = min(LEARNING_HISTORY_BONUS_MAX, frequency * LEARNING_HISTORY_BONUS_BASE)
+            base_weight += learning_bonus
         
         # 使用頻度による重み調整
-        frequency = self.usage_tracker.get_tag_frequency(tag)
         if frequency > 0:
             # 使用頻度が高いほど重みを下げる（多様性を促進）
             frequency_factor = max(0.5, 1.0 - (frequency * 0.01))
             base_weight *= frequency_factor
         
         # コンテキスト類似度による重み調整
-        if context_tags:
-            total_similarity = 0
-            count = 0
-            for context_tag in context_tags:
-                similarity = self.usage_tracker.get_context_similarity(tag, context_tag)
-                total_similarity += similarity
-                count += 1
-            
-            if count > 0:
-                avg_similarity = total_similarity / count
-                # 類似度が高いほど重みを上げる
-                context_factor = 1.0 + (avg_similarity * 0.5)
-                base_weight *= context_factor
+        if features.avg_context_similarity is not None:
+            # 類似度が高いほど重みを上げる
+            context_factor = 1.0 + (features.avg_context_similarity * 0.5)
+            base_weight *= context_factor
         
         return max(0.1, min(2.0, base_weight))
+    
+    def calculate_dynamic_weight(self, tag: str, category: str, context_tags: List[str] = None) -> float:
+        """
+        タグの動的重みを計算する
+        """
+        return self.weight_from_features(self.extract_features(tag, context_tags), category)
 
 class AIPredictor:
     """
@@ -210,9 +294,10 @@ class AIPredictor:
         self._local_hf_manager = None
         self._models_loaded = False
         
-        # 予測結果キャッシュを追加
+        # 予測結果キャッシュを追加（複数スレッドから予測されるため_cache_lockで保護する）
         self._prediction_cache = {}
         self._cache_max_size = 1000  # 最大キャッシュサイズ
+        self._cache_lock = threading.Lock()
         
         # 軽量な統計データのみ読み込み
         self._load_tag_freq_stats()
@@ -336,22 +421,26 @@ class AIPredictor:
         tag: str, 
         context_tags: List[str] = None,
         confidence_threshold: float = 0.5,
-        top_n: int = 3
+        top_n: int = 3,
+        include_details: bool = True
     ) -> Tuple[str, float, Dict[str, Any]]:
         """
         タグのカテゴリを予測（信頼度付き）
+        include_details=Falseの場合、従来手法の詳細情報（カテゴリ別スコア等）は作らず理由だけを返す
         """
         # キャッシュをチェック
         context_tags_tuple = tuple(context_tags) if context_tags else ()
-        cache_key = (tag, context_tags_tuple, confidence_threshold, top_n)
-        if cache_key in self._prediction_cache:
-            return self._prediction_cache[cache_key]
+        cache_key = (tag, context_tags_tuple, confidence_threshold, top_n, include_details)
+        with self._cache_lock:
+            cached = self._prediction_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
         # カスタムルールをチェック
         custom_category = get_custom_category(tag)
         if custom_category:
             result = custom_category, 1.0, {"reason": "カスタムルールにより割り当て"}
-            self._prediction_cache[cache_key] = result
+            self._cache_prediction(cache_key, result)
             return result
         
         # 外部データベースでの予測を試行
@@ -360,7 +449,7 @@ class AIPredictor:
             predicted_category, confidence, details = external_result
             if confidence >= confidence_threshold:
                 result = predicted_category, confidence, details
-                self._prediction_cache[cache_key] = result
+                self._cache_prediction(cache_key, result)
                 return result
         
         # Hugging Faceモデルでの予測を試行
@@ -369,21 +458,22 @@ class AIPredictor:
             predicted_category, confidence, details = hf_result
             if confidence >= confidence_threshold:
                 result = predicted_category, confidence, details
-                self._prediction_cache[cache_key] = result
+                self._cache_prediction(cache_key, result)
                 return result
         
         # 従来手法での予測
-        result = self._predict_with_traditional_method(tag, context_tags, confidence_threshold, top_n)
+        result = self._predict_with_traditional_method(tag, context_tags, confidence_threshold, top_n, include_details)
         
-        # キャッシュサイズを管理
-        if len(self._prediction_cache) >= self._cache_max_size:
-            # 最も古いエントリを削除
-            oldest_key = next(iter(self._prediction_cache))
-            del self._prediction_cache[oldest_key]
-        
-        self._prediction_cache[cache_key] = result
+        self._cache_prediction(cache_key, result)
         return result
     
+    def _cache_prediction(self, cache_key: Tuple[Any, ...], result: Tuple[str, float, Dict[str, Any]]) -> None:
+        """予測結果をキャッシュする（上限に達したら最も古いエントリを削除）"""
+        with self._cache_lock:
+            if cache_key not in self._prediction_cache and len(self._prediction_cache) >= self._cache_max_size:
+                del self._prediction_cache[next(iter(self._prediction_cache))]
+            self._prediction_cache[cache_key] = result
+    
     def _predict_with_external_data(self, tag: str, context_tags: List[str] = None) -> Optional[Tuple[str, float, Dict[str, Any]]]:
         """外部データベースでの予測"""
         # 実装は後で追加
@@ -413,7 +503,7 @@ class AIPredictor:
         try:
             # 既存タグとの類似度を計算
             all_tags = []
-            for category, keywords in load_category_keywords().items():
+            for category, keywords in load_category_keywords_cached().items():
                 all_tags.extend(keywords)
             
             # より低い閾値で類似タグを検索
@@ -423,7 +513,7 @@ class AIPredictor:
                 # 類似タグのカテゴリを分析
                 category_scores = defaultdict(float)
                 for similar_tag, similarity in similar_tags:
-                    for category, keywords in load_category_keywords().items():
+                    for category, keywords in load_category_keywords_cached().items():
                         if similar_tag in keywords:
                             category_scores[category] += similarity
                 
@@ -472,7 +562,7 @@ class AIPredictor:
         try:
             # 既存タグとの類似度を計算
             all_tags = []
-            for category, keywords in load_category_keywords().items():
+            for category, keywords in load_category_keywords_cached().items():
                 all_tags.extend(keywords)
             
             similar_tags = local_hf_manager.find_similar_tags(tag, all_tags, threshold=0.3, limit=10)
@@ -481,7 +571,7 @@ class AIPredictor:
                 # 類似タグのカテゴリを分析
                 category_scores = defaultdict(float)
                 for similar_tag, similarity in similar_tags:
-                    for category, keywords in load_category_keywords().items():
+                    for category, keywords in load_category_keywords_cached().items():
                         if similar_tag in keywords:
                             category_scores[category] += similarity
                 
@@ -497,12 +587,25 @@ class AIPredictor:
         
         return None
     
+    def _extract_tag_features(self, tag: str, context_tags: List[str] = None) -> TagFeatures:
+        """
+        カテゴリに依存しない特徴量（使用統計・ルール評価・コンテキスト・類義語）を1度だけ計算する
+        """
+        features = self.weight_calculator.extract_features(tag, context_tags)
+        features.rule_results = get_customization_manager().rule_manager.evaluate_custom_rules(tag, context_tags)
+        if context_tags:
+            features.context_boosts = calculate_context_boosts(tag, context_tags)
+        features.synonyms = get_synonyms(tag)
+        return features
+    
     def _predict_with_traditional_method(self, tag: str, context_tags: List[str] = None, 
-                                       confidence_threshold: float = 0.5, top_n: int = 3) -> Tuple[str, float, Dict[str, Any]]:
+                                       confidence_threshold: float = 0.5, top_n: int = 3,
+                                       include_details: bool = True) -> Tuple[str, float, Dict[str, Any]]:
         """従来手法での予測"""
-        # カスタマイズされたキーワードを取得
-        base_keywords = load_category_keywords()
-        customized_keywords = get_customized_category_keywords(base_keywords)
+        # カスタマイズされたキーワードを取得（キャッシュ済みの読み取り専用の表）
+        keyword_table = get_category_keyword_table()
+        customized_keywords = keyword_table.keywords
+        features = self._extract_tag_features(tag, context_tags)
         
         # キーワードマッチング
         best_category = None
@@ -514,16 +617,14 @@ class AIPredictor:
             score = max(calculate_keyword_score(tag, keyword) for keyword in keywords) if keywords else 0
             
             # コンテキスト分析による補正
-            if context_tags:
-                context_boost = calculate_context_boost(tag, context_tags, category)
-                score += context_boost
+            score += features.context_boosts.get(category, 0)
             
             # 動的重み計算
-            dynamic_weight = self.weight_calculator.calculate_dynamic_weight(tag, category, context_tags)
-            score *= dynamic_weight
+            score *= self.weight_calculator.weight_from_features(features, category)
             
             # カスタムルールの適用
-            score = apply_custom_rules(tag, category, score, context_tags)
+            if features.rule_results:
+                score = get_customization_manager().apply_rule_results_to_score(features.rule_results, score)
             
             category_scores[category] = score
             if score > best_score:
@@ -531,12 +632,13 @@ class AIPredictor:
                 best_category = category
         
         # 類義語チェック
-        synonyms = get_synonyms(tag)
+        synonyms = features.synonyms
         if synonyms:
+            keyword_sets = keyword_table.keyword_sets
             for synonym in synonyms:
                 for category, keywords in customized_keywords.items():
                     # 類義語がキーワードリスト内にあるかチェック
-                    if synonym in keywords:
+                    if synonym in keyword_sets[category]:
                         # 類義語自体のスコアを計算
                         synonym_score = max(calculate_keyword_score(synonym, keyword) for keyword in keywords) * 0.8  # 類義語は少し低い重み
                         if synonym_score > category_scores.get(category, 0):
@@ -549,22 +651,21 @@ class AIPredictor:
         total_score = sum(category_scores.values())
         confidence = best_score / total_score if total_score > 0 else 0.0
         
-        # 上位カテゴリの取得
-        sorted_categories = sorted(category_scores.items(), key=lambda x: x[1], reverse=True)
-        top_categories = sorted_categories[:top_n]
-        
-        # 学習履歴による修正があるかチェック
-        learning_bonus_applied = False
-        for category, score in category_scores.items():
-            if score > 100:  # 学習履歴ボーナスが適用されている場合
-                learning_bonus_applied = True
-                break
+        # 学習履歴による修正があるかチェック（スコア100超は学習履歴ボーナスが適用されている）
+        learning_bonus_applied = any(score > 100 for score in category_scores.values())
         
         # 結果の詳細情報
         reason = "キーワードマッチングとコンテキスト分析"
         if learning_bonus_applied:
             reason += "（修正履歴による補正あり）"
         
+        if not include_details:
+            return best_category or "未分類", confidence, {"reason": reason}
+        
+        # 上位カテゴリの取得
+        sorted_categories = sorted(category_scores.items(), key=lambda x: x[1], reverse=True)
+        top_categories = sorted_categories[:top_n]
+        
         details = {
             "reason": reason,
             "category_scores": dict(top_categories),
@@ -602,7 +703,7 @@ class AIPredictor:
                         return []
                 
                 all_tags = []
-                for category, keywords in load_category_keywords().items():
+                for category, keywords in load_category_keywords_cached().items():
                     all_tags.extend(keywords)
                 
                 similar_tags = hf_manager.find_similar_tags(tag, all_tags, threshold=0.3, limit=limit)
@@ -621,7 +722,7 @@ class AIPredictor:
     def get_tag_statistics(self, tag: str) -> Dict[str, Any]:
         """タグの統計情報を取得"""
         tag_lower = tag.lower()
-        usage_data = self.usage_tracker.usage_data[tag_lower]
+        usage_data = self.usage_tracker.usage_data.get(tag_lower, {})
         
         return {
             "frequency": self.get_tag_freq(tag),
@@ -646,14 +747,16 @@ class AIPredictor:
                 self._local_hf_manager.cleanup()
             
             # キャッシュをクリア
-            self._prediction_cache.clear()
+            with self._cache_lock:
+                self._prediction_cache.clear()
             
         except Exception as e:
             print(f"クリーンアップエラー: {e}")
     
     def clear_cache(self):
         """予測キャッシュをクリア"""
-        self._prediction_cache.clear()
+        with self._cache_lock:
+            self._prediction_cache.clear()
         print("AI予測キャッシュをクリアしました")
     
     def get_cache_stats(self) -> Dict[str, Any]:
@@ -697,19 +800,22 @@ class AIPredictor:
 
 # グローバルインスタンス（遅延読み込み対応）
 _ai_predictor_instance = None
+_ai_predictor_lock = threading.Lock()
 
 def get_ai_predictor():
-    """AI予測インスタンスを取得（遅延読み込み）"""
+    """AI予測インスタンスを取得（遅延読み込み。起動後のバックグラウンドスレッドからも呼ばれる）"""
     global _ai_predictor_instance
     if _ai_predictor_instance is None:
-        _ai_predictor_instance = AIPredictor()
+        with _ai_predictor_lock:
+            if _ai_predictor_instance is None:
+                _ai_predictor_instance = AIPredictor()
     return _ai_predictor_instance
 
 # 後方互換性のための関数
 def predict_category_ai(tag: str, context_tags: List[str] = None) -> Tuple[str, float]:
     """AI予測関数（後方互換性）"""
     predictor = get_ai_predictor()
-    category, confidence, _ = predictor.predict_category_with_confidence(tag, context_tags)
+    category, confidence, _ = predictor.predict_category_with_confidence(tag, context_tags, include_details=False)
     return category, confidence
 
 def suggest_similar_tags_ai(tag: str, limit: int = 5) -> List[Tuple[str, float]]:
@@ -717,5 +823,8 @@ def suggest_similar_tags_ai(tag: str, limit: int = 5) -> List[Tuple[str, float]]
     predictor = get_ai_predictor()
     return predictor.suggest_similar_tags(tag, limit)
 
-# 後方互換性のためのグローバルインスタンス
-ai_predictor = get_ai_predictor() 
\ No newline at end of file
+def __getattr__(name: str) -> Any:
+    # 後方互換: `from modules.ai_predictor import ai_predictor` は参照時に生成する
+    if name == "ai_predictor":
+        return get_ai_predictor()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,250 @@
+"""
+重複を保存しないバックアップ置き場（内容アドレス方式）
+
+ファイルを固定長のチャンクに分け、各チャンクをSHA-256の値を名前にして1度だけ保存する。
+バックアップ1回分はマニフェスト（ファイル毎のチャンクの並び）だけで表すため、前回から変わっていない
+チャンクは書き込まず、数百世代のバックアップでも全体の容量は1回分のコピーとほとんど変わらない。
+
+    <root>/chunks/ab/abcdef...   チャンク（zlib圧縮。名前は圧縮前の内容のSHA-256）
+    <root>/manifests/<名前>.json  バックアップ1回分のマニフェスト
+
+SQLiteのDBはページ単位で書き換わり、変更で後ろの内容がずれることはないため、
+ローリングハッシュではなくページ境界に揃う固定長（既定64KiB）で分割する。
+マニフェストはすべてのチャンクを書き終えてから書き出すので、途中で失敗したバックアップは一覧に現れない。
+不要になったチャンクはgc()で、どのマニフェストからも参照されていないものを削除する
+（gc()はバックアップの作成と同時に実行しないこと）。
+"""
+import datetime
+import hashlib
+import json
+import logging
+import os
+import re
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from modules.persistence import atomic_open, write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+COMPRESS_LEVEL = 6
+MANIFEST_VERSION = 1
+_NAME_PATTERN = re.compile(r"^[\w.\-]+$")
+
+
+class BackupStoreError(Exception):
+    """マニフェストやチャンクが見つからない・壊れている場合の例外"""
+
+
+class BackupStore:
+    """チャンクとマニフェストを保存するディレクトリ"""
+
+    def __init__(self, root: str, chunk_size: int = CHUNK_SIZE) -> None:
+        self.root = root
+        self.chunk_size = chunk_size
+        self.chunks_dir = os.path.join(root, "chunks")
+        self.manifests_dir = os.path.join(root, "manifests")
+
+    # --- チャンク ---
+    def _chunk_path(self, digest: str) -> str:
+        return os.path.join(self.chunks_dir, digest[:2], digest)
+
+    def has_chunk(self, digest: str) -> bool:
+        return os.path.exists(self._chunk_path(digest))
+
+    def _put_chunk(self, data: bytes) -> Tuple[str, int]:
+        """チャンクを保存して (SHA-256, 新たに書き込んだバイト数) を返す（既にあれば書かない）"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._chunk_path(digest)
+        if os.path.exists(path):
+            return digest, 0
+        compressed = zlib.compress(data, COMPRESS_LEVEL)
+        with atomic_open(path, 'wb', encoding=None) as f:
+            f.write(compressed)
+        return digest, len(compressed)
+
+    def read_chunk(self, digest: str) -> bytes:
+        try:
+            with open(self._chunk_path(digest), 'rb') as f:
+                data = zlib.decompress(f.read())
+        except (OSError, zlib.error) as e:
+            raise BackupStoreError(f"チャンク {digest} を読み込めません: {e}") from e
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise BackupStoreError(f"チャンク {digest} の内容が壊れています")
+        return data
+
+    def put_file(self, path: str) -> Tuple[Dict[str, Any], Dict[str, int]]:
+        """
+        ファイルをチャンクに分けて保存し、(マニフェストのファイル項目, 統計) を返す
+        統計は chunks（チャンク数）, new_chunks（新たに保存した数）, written（書き込んだバイト数）。
+        """
+        chunks: List[str] = []
+        stats = {"chunks": 0, "new_chunks": 0, "written": 0}
+        size = 0
+        with open(path, 'rb') as f:
+            while True:
+                data = f.read(self.chunk_size)
+                if not data:
+                    break
+                digest, written = self._put_chunk(data)
+                chunks.append(digest)
+                size += len(data)
+                stats["chunks"] += 1
+                if written:
+                    stats["new_chunks"] += 1
+                    stats["written"] += written
+        return {"size": size, "chunks": chunks}, stats
+
+    # --- マニフェスト ---
+    def _manifest_path(self, name: str) -> str:
+        if not _NAME_PATTERN.match(name):
+            raise ValueError(f"バックアップ名に使えない文字が含まれています: {name}")
+        return os.path.join(self.manifests_dir, f"{name}.json")
+
+    def create(self, name: str, files: Dict[str, str], metadata: Optional[Dict[str, Any]] = None
+               ) -> Tuple[Dict[str, Any], Dict[str, int]]:
+        """
+        バックアップを1つ作成する
+
+        filesは {マニフェスト内の名前: 読み込むファイルのパス}。存在しないファイルは含めない。
+        (マニフェスト, 統計) を返す。
+        """
+        path = self._manifest_path(name)
+        if os.path.exists(path):
+            raise BackupStoreError(f"バックアップ {name} は既に存在します")
+        entries: Dict[str, Any] = {}
+        totals = {"files": 0, "chunks": 0, "new_chunks": 0, "written": 0}
+        for file_name, source in files.items():
+            if not os.path.exists(source):
+                continue
+            entries[file_name], stats = self.put_file(source)
+            totals["files"] += 1
+            for key, value in stats.items():
+                totals[key] += value
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "name": name,
+            "created": datetime.datetime.now().isoformat(),
+            "chunk_size": self.chunk_size,
+            "files": entries,
+            "metadata": metadata or {},
+        }
+        write_json_atomic(path, manifest)
+        return manifest, totals
+
+    def load_manifest(self, name: str) -> Dict[str, Any]:
+        try:
+            with open(self._manifest_path(name), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise BackupStoreError(f"バックアップ {name} が見つかりません") from None
+        except (OSError, json.JSONDecodeError) as e:
+            raise BackupStoreError(f"バックアップ {name} のマニフェストを読み込めません: {e}") from e
+
+    def _manifest_names(self) -> List[str]:
+        if not os.path.isdir(self.manifests_dir):
+            return []
+        return [file_name[:-len(".json")] for file_name in os.listdir(self.manifests_dir)
+                if file_name.endswith(".json")]
+
+    def list(self) -> List[Dict[str, Any]]:
+        """マニフェストを作成日時の新しい順に返す（読めないものは除く）"""
+        manifests = []
+        for name in self._manifest_names():
+            try:
+                manifests.append(self.load_manifest(name))
+            except (BackupStoreError, ValueError) as e:
+                logger.warning(str(e))
+        return sorted(manifests, key=lambda m: m.get("created", ""), reverse=True)
+
+    def delete(self, name: str) -> None:
+        """マニフェストを削除する（チャンクはgc()で削除される）"""
+        try:
+            os.remove(self._manifest_path(name))
+        except FileNotFoundError:
+            raise BackupStoreError(f"バックアップ {name} が見つかりません") from None
+
+    def prune(self, keep: int) -> List[str]:
+        """新しい順にkeep個を残してマニフェストを削除し、削除した名前を返す"""
+        removed = []
+        for manifest in self.list()[keep:]:
+            self.delete(manifest["name"])
+            removed.append(manifest["name"])
+        return removed
+
+    # --- 復元 ---
+    def restore_file(self, name: str, file_name: str, destination: str,
+                     manifest: Optional[Dict[str, Any]] = None) -> None:
+        """バックアップ内の1ファイルをチャンクから組み立ててdestinationに書き出す（全チャンクを検証する）"""
+        manifest = manifest or self.load_manifest(name)
+        entry = manifest["files"].get(file_name)
+        if entry is None:
+            raise BackupStoreError(f"バックアップ {name} に {file_name} は含まれていません")
+        size = 0
+        with atomic_open(destination, 'wb', encoding=None) as f:
+            for digest in entry["chunks"]:
+                data = self.read_chunk(digest)
+                f.write(data)
+                size += len(data)
+            # withの中で送出し、書き出し先を置き換えずに一時ファイルを破棄させる
+            if size != entry["size"]:
+                raise BackupStoreError(f"{file_name} のサイズが一致しません（{size} != {entry['size']}）")
+
+    def restore(self, name: str, destinations: Dict[str, str]) -> List[str]:
+        """{マニフェスト内の名前: 書き出し先} のうちバックアップに含まれるファイルを復元し、その名前を返す"""
+        manifest = self.load_manifest(name)
+        restored = []
+        for file_name, destination in destinations.items():
+            if file_name in manifest["files"]:
+                self.restore_file(name, file_name, destination, manifest)
+                restored.append(file_name)
+        return restored
+
+    # --- ガベージコレクション ---
+    def referenced_chunks(self) -> Set[str]:
+        """
+        すべてのマニフェストが参照するチャンク
+        読めないマニフェストがあるとそのバックアップのチャンクが分からないため、BackupStoreErrorを送出する。
+        """
+        referenced: Set[str] = set()
+        for name in self._manifest_names():
+            try:
+                manifest = self.load_manifest(name)
+                for entry in manifest["files"].values():
+                    referenced.update(entry["chunks"])
+            except ValueError as e:
+                raise BackupStoreError(str(e)) from e
+            except (KeyError, TypeError, AttributeError) as e:
+                raise BackupStoreError(f"バックアップ {name} のマニフェストの形式が不正です: {e!r}") from e
+        return referenced
+
+    def _iter_chunk_files(self) -> Iterable[Tuple[str, str]]:
+        if not os.path.isdir(self.chunks_dir):
+            return
+        for prefix in os.listdir(self.chunks_dir):
+            directory = os.path.join(self.chunks_dir, prefix)
+            if os.path.isdir(directory):
+                for file_name in os.listdir(directory):
+                    yield file_name, os.path.join(directory, file_name)
+
+    def gc(self) -> Tuple[int, int]:
+        """
+        どのマニフェストからも参照されていないチャンクを削除し、(削除数, 解放バイト数) を返す
+        中断されたバックアップが残した書きかけの一時ファイル（*.tmp）も削除する。
+        読めないマニフェスト（壊れた・同期途中のもの）が1つでもあれば、何も削除せずBackupStoreErrorを送出する。
+        """
+        referenced = self.referenced_chunks()
+        removed = freed = 0
+        for file_name, path in list(self._iter_chunk_files()):
+            if file_name in referenced:
+                continue
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"チャンクを削除できません: {path}: {e}")
+                continue
+            removed += 1
+            freed += size
+        return removed, freed
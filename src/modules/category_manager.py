@@ -3,7 +3,9 @@
 """
 import json
 import os
-from typing import Dict, List, Optional, Tuple, Any
+import threading
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple, Any
 from modules.config import CATEGORY_KEYWORDS_FILE
 from modules.common_words import COMMON_WORDS
 
@@ -73,6 +75,34 @@ def load_category_keywords() -> Dict[str, List[str]]:
     
     return filtered_keywords
 
+# load_category_keywords_cached()のキャッシュ（ファイルの版が変わったら読み直す）
+_keywords_cache_lock = threading.Lock()
+_keywords_cache: Dict[str, Any] = {"version": None, "keywords": None, "generation": 0}
+
+def get_category_keywords_version() -> Tuple[Any, ...]:
+    """
+    カテゴリキーワード設定ファイルの版（パス・更新時刻・サイズ・保存回数）を返す
+    """
+    generation = _keywords_cache["generation"]
+    try:
+        stat = os.stat(CATEGORY_KEYWORDS_FILE)
+        return (CATEGORY_KEYWORDS_FILE, stat.st_mtime_ns, stat.st_size, generation)
+    except OSError:
+        return (CATEGORY_KEYWORDS_FILE, None, None, generation)
+
+def load_category_keywords_cached() -> Mapping[str, Tuple[str, ...]]:
+    """
+    load_category_keywords()の結果を読み取り専用で返す（ファイルが変わるまで読み直さない）
+    """
+    version = get_category_keywords_version()
+    with _keywords_cache_lock:
+        if _keywords_cache["version"] != version:
+            keywords = load_category_keywords()
+            _keywords_cache["keywords"] = MappingProxyType(
+                {category: tuple(words) for category, words in keywords.items()})
+            _keywords_cache["version"] = version
+        return _keywords_cache["keywords"]
+
 def save_category_keywords(category_keywords: Dict[str, List[str]]) -> bool:
     """
     カテゴリキーワード設定ファイルを保存する
@@ -85,6 +115,9 @@ def save_category_keywords(category_keywords: Dict[str, List[str]]) -> bool:
         os.makedirs(os.path.dirname(CATEGORY_KEYWORDS_FILE), exist_ok=True)
         with open(CATEGORY_KEYWORDS_FILE, 'w', encoding='utf-8') as f:
             json.dump(category_keywords, f, ensure_ascii=False, indent=2)
+        # 更新時刻の分解能内での書き換えも確実に反映させる
+        with _keywords_cache_lock:
+            _keywords_cache["generation"] += 1
         return True
     except Exception as e:
         print(f"カテゴリキーワードファイルの保存に失敗しました: {e}")
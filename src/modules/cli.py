@@ -0,0 +1,410 @@
+"""
+ヘッドレスのバッチ処理用コマンドライン
+
+GUI（Tk）を起動せずに、タグのインポート・カテゴリ自動付与・未翻訳タグの翻訳・エクスポート・統計を行う。
+    python -m modules.cli import tags.jsonl --chunk-size 5000
+    python -m modules.cli auto-assign --all --workers 4
+    python -m modules.cli translate-pending --workers 8
+    python -m modules.cli export out.csv
+    python -m modules.cli stats
+    python -m modules.cli sync /path/to/shared_folder
+
+入力は一定件数ごとのチャンクで処理し、DBへの書き込みはチャンク単位の一括操作で行う。
+進捗は標準エラーに出力し（--progress json でJSON Lines）、結果は標準出力にJSONで出力する。
+"""
+import argparse
+import contextlib
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, TextIO
+
+DEFAULT_CHUNK_SIZE = 1000
+TRANSLATION_FAILED = "翻訳失敗"
+EXPORT_FIELDS = ["tag", "jp", "category", "favorite", "is_negative"]
+
+
+class ProgressReporter:
+    """
+    進捗を出力するクラス
+
+    mode="json"は1行1イベントのJSON、"text"は人間向けの1行表示、"none"は出力しない。
+    """
+
+    def __init__(self, mode: str = "text", stream: Optional[TextIO] = None, interval: float = 0.5) -> None:
+        self.mode = mode
+        self.stream = stream if stream is not None else sys.stderr
+        self.interval = interval
+        self.command = ""
+        self.total: Optional[int] = None
+        self.done = 0
+        self._started = 0.0
+        self._last_report = 0.0
+
+    def start(self, command: str, total: Optional[int] = None) -> None:
+        self.command = command
+        self.total = total
+        self.done = 0
+        self._started = self._last_report = time.monotonic()
+        self._emit("start")
+
+    def advance(self, count: int) -> None:
+        self.done += count
+        now = time.monotonic()
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            self._emit("progress")
+
+    def finish(self) -> None:
+        self._emit("done")
+
+    def _emit(self, event: str) -> None:
+        if self.mode == "none":
+            return
+        elapsed = time.monotonic() - self._started
+        if self.mode == "json":
+            record = {"event": event, "command": self.command, "done": self.done,
+                      "total": self.total, "elapsed": round(elapsed, 3)}
+            self.stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+        else:
+            total = f"/{self.total}" if self.total is not None else ""
+            self.stream.write(f"[{self.command}] {event}: {self.done}{total} ({elapsed:.1f}s)\n")
+        self.stream.flush()
+
+
+def chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """イテラブルをsize件ずつのリストに分ける"""
+    chunk: List[Any] = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _to_bool(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes")
+    return bool(value)
+
+
+def _record(tag: Any, jp: Any = "", category: Any = "", favorite: Any = False,
+            is_negative: Any = False) -> Dict[str, Any]:
+    return {"tag": tag if isinstance(tag, str) else "", "jp": jp or "", "category": category or "",
+            "favorite": _to_bool(favorite), "is_negative": _to_bool(is_negative)}
+
+
+def iter_import_records(file_path: str, file_format: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    インポートファイルを1件ずつ読み出す
+
+    形式は拡張子から判定する（json / jsonl / csv / txt）。
+    jsonl・csv・txtは行単位で読むのでファイル全体をメモリに載せない。
+    jsonは標準ライブラリに逐次パーサーがないため一度に読み込む（大きなデータはjsonlを推奨）。
+    要素はタグ文字列か、tag/jp/category/favorite/is_negativeを持つ辞書。
+    """
+    file_format = (file_format or os.path.splitext(file_path)[1].lstrip(".")).lower()
+    with open(file_path, "r", encoding="utf-8", newline="" if file_format == "csv" else None) as f:
+        if file_format == "json":
+            data = json.load(f)
+            if not isinstance(data, list):
+                raise ValueError(f"JSON構造がリストではありません: {file_path}")
+            items: Iterable[Any] = data
+        elif file_format == "jsonl":
+            items = (json.loads(line) for line in f if line.strip())
+        elif file_format == "csv":
+            items = csv.DictReader(f)
+        elif file_format == "txt":
+            items = (part.strip() for line in f for part in line.split(",") if part.strip())
+        else:
+            raise ValueError(f"未対応の形式です: {file_format}")
+        for item in items:
+            if isinstance(item, str):
+                yield _record(item)
+            elif isinstance(item, dict):
+                yield _record(item.get("tag", ""), item.get("jp", ""), item.get("category", ""),
+                              item.get("favorite", False), item.get("is_negative", False))
+
+
+def _assign_chunk(tags: List[str]) -> List[str]:
+    """タグのカテゴリを判定する（ワーカープロセスでも実行できるようトップレベルに置く）"""
+    from modules.category_manager import load_category_keywords_cached
+    from modules.constants import CATEGORY_PRIORITIES, auto_assign_category_pure
+    keywords = dict(load_category_keywords_cached())
+    return [auto_assign_category_pure(tag, keywords, CATEGORY_PRIORITIES) for tag in tags]
+
+
+def assign_categories(tags: List[str], workers: int = 1) -> List[str]:
+    """タグのリストに対するカテゴリを返す（workers>1ならプロセスを分けて並列に判定する）"""
+    if workers <= 1 or len(tags) < 2 * workers:
+        return _assign_chunk(tags)
+    size = (len(tags) + workers - 1) // workers
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(_assign_chunk, [tags[i:i + size] for i in range(0, len(tags), size)])
+        return [category for chunk in results for category in chunk]
+
+
+def import_tags(tag_manager: Any, records: Iterable[Dict[str, Any]], chunk_size: int = DEFAULT_CHUNK_SIZE,
+                negative: bool = False, auto_category: bool = True, workers: int = 1,
+                progress: Optional[ProgressReporter] = None) -> Dict[str, int]:
+    """
+    レコードをチャンク毎にDBへ追加する（既存タグ・不正なタグはスキップ）
+    """
+    from modules.constants import TRANSLATING_PLACEHOLDER
+    from modules.tag_manager import is_valid_tag, normalize_tag
+    added = skipped = 0
+    for chunk in chunked(records, chunk_size):
+        rows: Dict[str, Dict[str, Any]] = {}
+        for record in chunk:
+            tag = normalize_tag(record["tag"])
+            if not is_valid_tag(tag) or tag in rows:
+                skipped += 1
+                continue
+            is_negative = negative or record["is_negative"] or record["category"] == "ネガティブ"
+            rows[tag] = {"tag": tag, "jp": record["jp"] or TRANSLATING_PLACEHOLDER,
+                         "favorite": record["favorite"],
+                         "category": "ネガティブ" if is_negative else record["category"],
+                         "is_negative": is_negative}
+        existing = tag_manager.existing_tags(rows)
+        new_rows = [row for tag, row in rows.items() if tag not in existing]
+        skipped += len(existing)
+        if auto_category:
+            unassigned = [row for row in new_rows if not row["category"]]
+            for row, category in zip(unassigned, assign_categories([row["tag"] for row in unassigned], workers)):
+                row["category"] = category
+        saved = tag_manager.save_tags(new_rows)
+        if saved is None:
+            raise RuntimeError("タグの保存に失敗しました")
+        added += saved
+        if progress:
+            progress.advance(len(chunk))
+    # 大量に追加した後はクエリプランナーの統計情報を更新しておく
+    tag_manager.analyze()
+    return {"added": added, "skipped": skipped}
+
+
+def auto_assign(tag_manager: Any, only_uncategorized: bool = True, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                workers: int = 1, dry_run: bool = False,
+                progress: Optional[ProgressReporter] = None) -> Dict[str, int]:
+    """
+    ポジティブタグのカテゴリを自動判定し直す（既定では未分類のタグだけ）
+    """
+    tags = [t for t in tag_manager.load_tags(is_negative=False)
+            if not only_uncategorized or t["category"] in ("", "未分類")]
+    if progress:
+        progress.total = len(tags)
+    changed = 0
+    for chunk in chunked(tags, chunk_size):
+        categories = assign_categories([t["tag"] for t in chunk], workers)
+        assignments = {t["tag"]: category for t, category in zip(chunk, categories)
+                       if category != t["category"]}
+        if assignments and not dry_run:
+            results = tag_manager.set_categories(assignments)
+            if results is None:
+                raise RuntimeError("カテゴリの保存に失敗しました")
+            changed += sum(results.values())
+        else:
+            changed += len(assignments)
+        if progress:
+            progress.advance(len(chunk))
+    return {"checked": len(tags), "changed": changed}
+
+
+def translate_pending(tag_manager: Any, translate: Optional[Callable[[str], str]] = None,
+                      workers: int = 4, chunk_size: int = 200, retry_failed: bool = False,
+                      limit: Optional[int] = None, progress: Optional[ProgressReporter] = None) -> Dict[str, int]:
+    """
+    日本語訳が未設定（翻訳中のまま）のタグを並列に翻訳する
+    """
+    from modules.constants import TRANSLATING_PLACEHOLDER
+    if translate is None:
+        from modules.tag_manager import google_translate_en_to_ja
+        translate = google_translate_en_to_ja
+    pending_values = {"", TRANSLATING_PLACEHOLDER}
+    if retry_failed:
+        pending_values.add(TRANSLATION_FAILED)
+    tags = tag_manager.get_tag_collection()
+    pending = [tag for tag, jp in zip(tags.tags, tags.jps) if (jp or "") in pending_values]
+    if limit is not None:
+        pending = pending[:limit]
+    if progress:
+        progress.total = len(pending)
+
+    def translate_one(tag: str) -> str:
+        try:
+            return translate(tag) or TRANSLATION_FAILED
+        except Exception:
+            return TRANSLATION_FAILED
+
+    translated = failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for chunk in chunked(pending, chunk_size):
+            translations = dict(zip(chunk, executor.map(translate_one, chunk)))
+            if tag_manager.set_translations(translations) is None:
+                raise RuntimeError("翻訳の保存に失敗しました")
+            chunk_failed = sum(1 for jp in translations.values() if jp == TRANSLATION_FAILED)
+            failed += chunk_failed
+            translated += len(translations) - chunk_failed
+            if progress:
+                progress.advance(len(chunk))
+    return {"translated": translated, "failed": failed}
+
+
+def export_tags(tag_manager: Any, file_path: str, file_format: Optional[str] = None,
+                category: Optional[str] = None, is_negative: Optional[bool] = None,
+                progress: Optional[ProgressReporter] = None) -> Dict[str, int]:
+    """
+    タグを1件ずつファイルへ書き出す（json / jsonl / csv）
+    """
+    file_format = (file_format or os.path.splitext(file_path)[1].lstrip(".")).lower()
+    if file_format not in ("json", "jsonl", "csv"):
+        raise ValueError(f"未対応の形式です: {file_format}")
+    count = 0
+    with open(file_path, "w", encoding="utf-8", newline="" if file_format == "csv" else None) as f:
+        writer = csv.DictWriter(f, fieldnames=EXPORT_FIELDS) if file_format == "csv" else None
+        if writer:
+            writer.writeheader()
+        elif file_format == "json":
+            f.write("[")
+        # キーセット方式で少しずつ読むので、タグ数が多くてもメモリ使用量は増えない
+        for tag in tag_manager.iter_tags(category=category or None, is_negative=is_negative):
+            if category is not None and tag["category"] != category:
+                continue
+            row = {field: tag[field] for field in EXPORT_FIELDS}
+            if writer:
+                writer.writerow(dict(row, favorite=int(row["favorite"]), is_negative=int(row["is_negative"])))
+            else:
+                if file_format == "json":
+                    f.write(",\n" if count else "\n")
+                f.write(json.dumps(row, ensure_ascii=False))
+                if file_format == "jsonl":
+                    f.write("\n")
+            count += 1
+            if progress and count % DEFAULT_CHUNK_SIZE == 0:
+                progress.advance(DEFAULT_CHUNK_SIZE)
+        if file_format == "json":
+            f.write("\n]\n")
+    if progress:
+        progress.advance(count % DEFAULT_CHUNK_SIZE)
+    return {"exported": count}
+
+
+def collect_stats(tag_manager: Any) -> Dict[str, Any]:
+    """タグ数・カテゴリ別件数・未翻訳件数などの統計"""
+    from modules.constants import TRANSLATING_PLACEHOLDER
+    stats: Dict[str, Any] = {"total": 0, "positive": 0, "negative": 0, "favorites": 0,
+                             "pending_translation": 0, "failed_translation": 0, "categories": {}}
+    categories: Dict[str, int] = stats["categories"]
+    for tag in tag_manager.iter_tags():
+        stats["total"] += 1
+        stats["negative" if tag["is_negative"] else "positive"] += 1
+        stats["favorites"] += int(tag["favorite"])
+        jp = tag["jp"] or ""
+        if jp in ("", TRANSLATING_PLACEHOLDER):
+            stats["pending_translation"] += 1
+        elif jp == TRANSLATION_FAILED:
+            stats["failed_translation"] += 1
+    # カテゴリ別の件数はDB側でcategory_id毎に数える
+    for category, count in tag_manager.count_tags_by_category().items():
+        category = category or "未分類"
+        categories[category] = categories.get(category, 0) + count
+    return stats
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m modules.cli", description="Tag Managerのバッチ処理")
+    parser.add_argument("--db", help="タグデータベースのパス（既定はアプリと同じ）")
+    parser.add_argument("--progress", choices=("text", "json", "none"), default="text",
+                        help="標準エラーへの進捗出力の形式")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    p = subparsers.add_parser("import", help="ファイルからタグを追加する")
+    p.add_argument("file")
+    p.add_argument("--format", choices=("json", "jsonl", "csv", "txt"))
+    p.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    p.add_argument("--negative", action="store_true", help="すべてネガティブタグとして追加する")
+    p.add_argument("--no-auto-category", action="store_true", help="カテゴリ未指定のタグを自動判定しない")
+    p.add_argument("--workers", type=int, default=1, help="カテゴリ判定の並列プロセス数")
+
+    p = subparsers.add_parser("auto-assign", help="カテゴリを自動判定し直す")
+    p.add_argument("--all", action="store_true", help="未分類以外のタグも判定し直す")
+    p.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    p.add_argument("--workers", type=int, default=1)
+    p.add_argument("--dry-run", action="store_true")
+
+    p = subparsers.add_parser("translate-pending", help="未翻訳のタグを翻訳する")
+    p.add_argument("--workers", type=int, default=4, help="翻訳の並列スレッド数")
+    p.add_argument("--chunk-size", type=int, default=200)
+    p.add_argument("--retry-failed", action="store_true", help="翻訳失敗のタグも再翻訳する")
+    p.add_argument("--limit", type=int)
+
+    p = subparsers.add_parser("export", help="タグをファイルへ書き出す")
+    p.add_argument("file")
+    p.add_argument("--format", choices=("json", "jsonl", "csv"))
+    p.add_argument("--category")
+    group = p.add_mutually_exclusive_group()
+    group.add_argument("--negative", dest="is_negative", action="store_const", const=True)
+    group.add_argument("--positive", dest="is_negative", action="store_const", const=False)
+
+    subparsers.add_parser("stats", help="統計を表示する")
+
+    p = subparsers.add_parser("sync", help="共有フォルダを介して他のDBと変更を同期する")
+    p.add_argument("folder")
+    p.add_argument("--new-origin", action="store_true", help="発生元IDを作り直す（DBファイルをコピーした場合）")
+    return parser
+
+
+def run(args: argparse.Namespace, progress: ProgressReporter) -> Dict[str, Any]:
+    from modules.tag_manager import TagManager
+    if args.db:
+        db_file = args.db
+    else:
+        from modules.constants import DB_FILE
+        db_file = DB_FILE
+    tag_manager = TagManager(db_file=db_file)
+    try:
+        progress.start(args.command)
+        if args.command == "import":
+            records = iter_import_records(args.file, args.format)
+            result = import_tags(tag_manager, records, args.chunk_size, args.negative,
+                                 not args.no_auto_category, args.workers, progress)
+        elif args.command == "auto-assign":
+            result = auto_assign(tag_manager, not args.all, args.chunk_size, args.workers,
+                                 args.dry_run, progress)
+        elif args.command == "translate-pending":
+            result = translate_pending(tag_manager, workers=args.workers, chunk_size=args.chunk_size,
+                                       retry_failed=args.retry_failed, limit=args.limit, progress=progress)
+        elif args.command == "export":
+            result = export_tags(tag_manager, args.file, args.format, args.category, args.is_negative, progress)
+        elif args.command == "sync":
+            result = tag_manager.sync(args.folder, args.new_origin)
+        else:
+            result = collect_stats(tag_manager)
+        progress.finish()
+        return result
+    finally:
+        tag_manager.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    out = sys.stdout
+    progress = ProgressReporter(args.progress)
+    # 標準出力は結果のJSON専用にし、各モジュールの表示は標準エラーへ回す
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            result = run(args, progress)
+        except Exception as e:
+            out.write(json.dumps({"command": args.command, "ok": False, "error": str(e)}, ensure_ascii=False) + "\n")
+            return 1
+    out.write(json.dumps(dict(result, command=args.command, ok=True), ensure_ascii=False) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,6 +10,9 @@
 import os
 import sys
 import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 # --- 基本設定 ---
 APP_NAME = "Tag Manager"
@@ -27,19 +30,15 @@ if getattr(sys, 'frozen', False):
     # .exe実行時のパス設定: .exeと同じディレクトリにデータを保存
     APP_DIR = os.path.dirname(sys.executable)
     RESOURCE_DIR = os.path.dirname(sys.executable)
-    print(f"[INFO] .exe実行モードを検出")
-    print(f"[INFO] データ保存先 (APP_DIR): {APP_DIR}")
-    print(f"[INFO] リソース読み込み元 (RESOURCE_DIR): {RESOURCE_DIR}")
 else:
     # スクリプト実行時のパス設定
     # プロジェクトルートを基準とする
     APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     RESOURCE_DIR = APP_DIR
-    print(f"[INFO] スクリプト実行モードを検出")
-    print(f"[INFO] データ/リソースの場所 (APP_DIR): {APP_DIR}")
 
 # --- 書き込み対象パス (APP_DIR基準) ---
 DB_FILE = os.path.join(APP_DIR, "data", "tags.db")
+TAG_SNAPSHOT_FILE = os.path.join(APP_DIR, "data", "tags.snapshot")
 THEME_FILE = os.path.join(APP_DIR, "data", "theme_settings.json")
 POSITIVE_PROMPT_FILE = os.path.join(APP_DIR, "data", "tags.json")
 NEGATIVE_PROMPT_FILE = os.path.join(APP_DIR, "data", "negative_tags.json")
@@ -68,8 +67,11 @@ def get_full_path(relative_path: str) -> str:
     return os.path.join(APP_DIR, relative_path)
 
 def ensure_data_directories():
-    """書き込みに必要なディレクトリと空のファイルを確実に作成する"""
-    print("--- [INFO] データディレクトリの確認/作成を開始 ---")
+    """
+    書き込みに必要なディレクトリと空のファイルを確実に作成する
+
+    インポート時には実行しない。アプリ起動時（main.py）に一度だけ呼び出す。
+    """
     # 作成が必要なディレクトリリスト
     dirs_to_create = [
         os.path.dirname(DB_FILE), # data
@@ -81,9 +83,9 @@ def ensure_data_directories():
         try:
             if not os.path.exists(d):
                 os.makedirs(d, exist_ok=True)
-                print(f"[SUCCESS] ディレクトリを作成しました: {d}")
+                logger.info(f"ディレクトリを作成しました: {d}")
         except OSError as e:
-            print(f"[ERROR] ディレクトリ作成に失敗: {d}, {e}", file=sys.stderr)
+            logger.error(f"ディレクトリ作成に失敗: {d}, {e}")
 
     # 作成が必要な空のファイルリスト (ファイルパス, デフォルトの内容)
     files_to_create = [
@@ -98,18 +100,15 @@ def ensure_data_directories():
             if not os.path.exists(file_path):
                 with open(file_path, 'w', encoding='utf-8') as f:
                     f.write(default_content)
-                print(f"[SUCCESS] デフォルトファイルを作成しました: {file_path}")
+                logger.info(f"デフォルトファイルを作成しました: {file_path}")
         except IOError as e:
-            print(f"[ERROR] デフォルトファイルの作成に失敗: {file_path}, {e}", file=sys.stderr)
-    print("--- [INFO] データディレクトリの確認/作成が完了 ---")
-
-# --- 起動時処理 ---
-ensure_data_directories()
+            logger.error(f"デフォルトファイルの作成に失敗: {file_path}, {e}")
 
-# --- デバッグ用: 全パスを出力 ---
-print("--- [Path Debug] --- Configured Paths ---")
-all_vars = {key: value for key, value in globals().items() if not key.startswith('__') and isinstance(value, str)}
-path_vars = {k: v for k, v in all_vars.items() if k.endswith(('_DIR', '_FILE'))}
-for name, path in sorted(path_vars.items()):
-    print(f"{name}: {path}")
-print("--- [Path Debug] --- End of Paths ---")
\ No newline at end of file
+def log_configured_paths() -> None:
+    """設定済みの全パスをデバッグログに出力する"""
+    mode = ".exe実行モード" if getattr(sys, 'frozen', False) else "スクリプト実行モード"
+    logger.debug(f"{mode}: APP_DIR={APP_DIR}, RESOURCE_DIR={RESOURCE_DIR}")
+    path_vars = {key: value for key, value in globals().items()
+                 if key.endswith(('_DIR', '_FILE')) and isinstance(value, str)}
+    for name, path in sorted(path_vars.items()):
+        logger.debug(f"{name}: {path}")
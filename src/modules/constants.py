@@ -27,15 +27,22 @@ from modules.context_analyzer import (
     get_context_rules_for_category
 )
 
-# AI予測機能（ai_predictor.pyからインポート）
-from modules.ai_predictor import (
-    predict_category_ai, suggest_similar_tags_ai, ai_predictor
-)
+# AI予測機能・ユーザーカスタマイズ機能は起動を軽くするため参照時に読み込む
+_LAZY_ATTRIBUTES = {
+    "predict_category_ai": "modules.ai_predictor",
+    "suggest_similar_tags_ai": "modules.ai_predictor",
+    "ai_predictor": "modules.ai_predictor",
+    "get_customized_category_keywords": "modules.customization",
+    "apply_custom_rules": "modules.customization",
+    "customization_manager": "modules.customization",
+}
 
-# ユーザーカスタマイズ機能（customization.pyからインポート）
-from modules.customization import (
-    get_customized_category_keywords, apply_custom_rules, customization_manager
-)
+def __getattr__(name: str) -> Any:
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+    return getattr(importlib.import_module(module_name), name)
 
 # 後方互換性のための関数
 def safe_load_json(filepath: str) -> Optional[Any]:
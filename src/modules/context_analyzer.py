@@ -158,6 +158,35 @@ def calculate_context_boost(tag: str, category: str, all_tags: List[str]) -> int
     
     return boost_score
 
+def calculate_context_boosts(tag: str, all_tags: List[str]) -> Dict[str, int]:
+    """
+    全カテゴリ分のコンテキストブーストを1回の走査で計算する純粋関数
+
+    calculate_context_boost(tag, category, all_tags)をカテゴリ毎に呼んだ結果と同じ値を返す
+    （ブーストが0のカテゴリは含めない）。
+    """
+    if tag.lower().strip() in COMMON_WORDS:
+        return {}
+    
+    boosts: Dict[str, int] = {}
+    tag_lower = tag.lower()
+    
+    for other_tag in all_tags:
+        if other_tag == tag:
+            continue
+        
+        other_tag_lower = other_tag.lower()
+        
+        for (cat1, cat2), rule in CONTEXT_BOOST_RULES.items():
+            for example_tag, example_context in rule.get("examples", []):
+                if (example_tag in tag_lower and example_context in other_tag_lower) or \
+                   (example_context in tag_lower and example_tag in other_tag_lower):
+                    for category in {cat1, cat2}:
+                        boosts[category] = boosts.get(category, 0) + rule.get("boost_score", 0)
+                    break
+    
+    return boosts
+
 def get_synonyms(word: str) -> List[str]:
     """
     指定された単語の同義語を取得する
@@ -0,0 +1,149 @@
+"""
+タグ毎のコンテキスト集合とMinHash署名
+
+get_context_similarityは予測のたびにカテゴリ数×コンテキストタグ数だけ呼ばれるため、
+タグ毎のコンテキスト集合を保持しておき、類似度計算で集合を作り直さないようにする。
+コンテキストが多いタグ同士はMinHash署名（固定長）で近似し、O(k)で求める。
+"""
+import hashlib
+import random
+import threading
+from typing import Dict, Iterable, List, Set
+
+MINHASH_PERMUTATIONS = 64   # 署名の長さk
+MINHASH_THRESHOLD = 128     # この数以上のコンテキストを持つタグに署名を付ける
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# 保存データと無関係に再現できるよう、固定シードで係数を決める
+_rng = random.Random(20240801)
+_COEFFICIENTS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+                 for _ in range(MINHASH_PERMUTATIONS)]
+
+
+def _base_hash(value: str) -> int:
+    # hash()はプロセス毎に変わるため、安定したハッシュを使う
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def minhash_values(value: str) -> List[int]:
+    """1要素分のk個のハッシュ値"""
+    base = _base_hash(value)
+    return [((a * base + b) % _MERSENNE_PRIME) & _MAX_HASH for a, b in _COEFFICIENTS]
+
+
+def minhash_signature(values: Iterable[str]) -> List[int]:
+    """集合のMinHash署名（空集合は全要素が最大値）"""
+    signature = [_MAX_HASH + 1] * MINHASH_PERMUTATIONS
+    for value in values:
+        update_signature(signature, value)
+    return signature
+
+
+def update_signature(signature: List[int], value: str) -> None:
+    """要素を1つ追加したときに署名をその場で更新する"""
+    for i, h in enumerate(minhash_values(value)):
+        if h < signature[i]:
+            signature[i] = h
+
+
+def estimate_jaccard(signature1: List[int], signature2: List[int]) -> float:
+    """2つの署名からJaccard係数を推定する"""
+    matches = 0
+    for h1, h2 in zip(signature1, signature2):
+        if h1 == h2:
+            matches += 1
+    return matches / MINHASH_PERMUTATIONS
+
+
+def exact_jaccard(context1: Set[str], context2: Set[str]) -> float:
+    """小さい方の集合だけを走査してJaccard係数を求める（新しい集合は作らない）"""
+    if not context1 or not context2:
+        return 0.0
+    if len(context1) > len(context2):
+        context1, context2 = context2, context1
+    intersection = 0
+    for value in context1:
+        if value in context2:
+            intersection += 1
+    return intersection / (len(context1) + len(context2) - intersection)
+
+
+class ContextIndex:
+    """
+    タグ → コンテキスト集合（および大きい集合のMinHash署名）の索引
+
+    record_tag_usageから差分で更新する。読み取りは副作用を持たない。
+    """
+
+    def __init__(self, threshold: int = MINHASH_THRESHOLD) -> None:
+        self.threshold = threshold
+        self._contexts: Dict[str, Set[str]] = {}
+        self._signatures: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._contexts)
+
+    def rebuild(self, usage_data: Dict[str, Dict]) -> None:
+        """usage_data全体から作り直す"""
+        contexts = {tag: set(info.get("context_tags") or {}) for tag, info in usage_data.items()}
+        contexts = {tag: values for tag, values in contexts.items() if values}
+        signatures = {tag: minhash_signature(values) for tag, values in contexts.items()
+                      if len(values) >= self.threshold}
+        with self._lock:
+            self._contexts = contexts
+            self._signatures = signatures
+
+    def add(self, tag: str, context_tag: str) -> None:
+        """コンテキストを1件追加する（既知のコンテキストなら何もしない）"""
+        with self._lock:
+            values = self._contexts.get(tag)
+            if values is None:
+                values = self._contexts[tag] = set()
+            elif context_tag in values:
+                return
+            values.add(context_tag)
+            signature = self._signatures.get(tag)
+            if signature is not None:
+                update_signature(signature, context_tag)
+            elif len(values) >= self.threshold:
+                self._signatures[tag] = minhash_signature(values)
+
+    def set_contexts(self, tag: str, context_tags: Iterable[str]) -> None:
+        """タグのコンテキストを置き換える（インポート用）"""
+        values = set(context_tags)
+        with self._lock:
+            self._signatures.pop(tag, None)
+            if not values:
+                self._contexts.pop(tag, None)
+                return
+            self._contexts[tag] = values
+            if len(values) >= self.threshold:
+                self._signatures[tag] = minhash_signature(values)
+
+    def remove(self, tag: str) -> None:
+        with self._lock:
+            self._contexts.pop(tag, None)
+            self._signatures.pop(tag, None)
+
+    def get_contexts(self, tag: str) -> Set[str]:
+        """タグのコンテキスト集合（共有されるため変更しないこと）"""
+        return self._contexts.get(tag, set())
+
+    def similarity(self, tag1: str, tag2: str) -> float:
+        """
+        コンテキストのJaccard類似度
+
+        両方に署名があればMinHashで推定（O(k)）、そうでなければ小さい方の集合を走査する。
+        """
+        signature1 = self._signatures.get(tag1)
+        if signature1 is not None:
+            signature2 = self._signatures.get(tag2)
+            if signature2 is not None:
+                return estimate_jaccard(signature1, signature2)
+        context1 = self._contexts.get(tag1)
+        context2 = self._contexts.get(tag2)
+        if not context1 or not context2:
+            return 0.0
+        return exact_jaccard(context1, context2)
@@ -1,18 +1,110 @@
 """
 ユーザーカスタマイズ機能
 """
+import abc
+import atexit
+import copy
 import json
+import logging
 import os
-from typing import Dict, List, Optional, Any
+import threading
+from contextlib import contextmanager
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Any, FrozenSet, Tuple
 from modules.config import BACKUP_DIR
+from modules.category_manager import load_category_keywords_cached, get_category_keywords_version
 from modules.common_words import COMMON_WORDS
+from modules.rule_engine import CompiledRules
+from modules.persistence import get_shared_persistence_manager, write_json_atomic
+
+logger = logging.getLogger(__name__)
 
 # ユーザー設定ファイル
 USER_SETTINGS_FILE = os.path.join(BACKUP_DIR, "user_settings.json")
 CUSTOM_KEYWORDS_FILE = os.path.join(BACKUP_DIR, "custom_keywords.json")
 CUSTOM_RULES_FILE = os.path.join(BACKUP_DIR, "custom_rules.json")
 
-class UserSettings:
+class DebouncedJsonFile(abc.ABC):
+    """
+    変更を遅延してまとめて保存するJSONファイルの共通処理
+
+    変更はメモリに即時反映し、ファイルへの書き込みはアプリ共通の保存マネージャーがデバウンスして行う。
+    書き込みは一時ファイルからの置き換えなので、途中で終了しても壊れたファイルは残らない。
+    batch()の中の変更は、最も外側のbatch()を抜けたときに1回の書き込みにまとめる。
+    """
+    def _init_json_file(self, file_path: str, name: str, error_message: str):
+        # テストでモジュールのパスを差し替えても、後から走る書き込みが元のパスに向かないよう生成時に固定する
+        self.file_path = file_path
+        self._error_message = error_message
+        self._lock = threading.RLock()
+        self._save_lock = threading.Lock()
+        self._batch_depth = 0
+        self._dirty = False
+        self._writer = get_shared_persistence_manager()
+        self._writer.register(name, self._write_if_idle, self.is_dirty)
+    
+    @abc.abstractmethod
+    def _snapshot(self) -> Any:
+        """ファイルに書き込む内容（ロックを取った状態で呼ばれる）"""
+    
+    @contextmanager
+    def batch(self):
+        """
+        複数の変更を1回の書き込みにまとめる（途中の状態はファイルに書き込まれない）
+        """
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                schedule = self._batch_depth == 0 and self._dirty
+            if schedule:
+                self._writer.request_save()
+    
+    def _mark_changed(self):
+        """変更を記録し、batch()の外なら書き込みを予約する"""
+        with self._lock:
+            self._dirty = True
+            if self._batch_depth:
+                return
+        self._writer.request_save()
+    
+    def is_dirty(self) -> bool:
+        """
+        ファイルに書き込まれていない変更があるかどうか
+        """
+        return self._dirty
+    
+    def flush(self) -> bool:
+        """
+        予約中の書き込みを今すぐ行う
+        """
+        if not self._dirty:
+            return True
+        return self._write_file()
+    
+    def _write_if_idle(self) -> bool:
+        # batch()の途中なら書き込まない（batch()を抜けたときに予約し直す）
+        if self._batch_depth:
+            return True
+        return self._write_file()
+    
+    def _write_file(self) -> bool:
+        with self._save_lock:
+            with self._lock:
+                data = copy.deepcopy(self._snapshot())
+                self._dirty = False
+            try:
+                write_json_atomic(self.file_path, data)
+                return True
+            except Exception as e:
+                self._dirty = True
+                logger.error(f"{self._error_message}: {e}")
+                return False
+
+class UserSettings(DebouncedJsonFile):
     """
     ユーザー設定を管理するクラス
     """
@@ -32,6 +124,7 @@ class UserSettings:
                 "show_suggestions": True
             }
         }
+        self._init_json_file(USER_SETTINGS_FILE, "user_settings", "設定の保存に失敗しました")
         self.load_settings()
     
     def load_settings(self):
@@ -39,8 +132,8 @@ class UserSettings:
         設定を読み込む
         """
         try:
-            if os.path.exists(USER_SETTINGS_FILE):
-                with open(USER_SETTINGS_FILE, 'r', encoding='utf-8') as f:
+            if os.path.exists(self.file_path):
+                with open(self.file_path, 'r', encoding='utf-8') as f:
                     loaded_settings = json.load(f)
                     # 既存の設定とマージ
                     for key, value in loaded_settings.items():
@@ -50,20 +143,16 @@ class UserSettings:
                             else:
                                 self.settings[key] = value
         except Exception as e:
-            print(f"設定の読み込みに失敗しました: {e}")
+            logger.error(f"設定の読み込みに失敗しました: {e}")
     
     def save_settings(self):
         """
-        設定を保存する
+        設定を今すぐ保存する
         """
-        try:
-            os.makedirs(os.path.dirname(USER_SETTINGS_FILE), exist_ok=True)
-            with open(USER_SETTINGS_FILE, 'w', encoding='utf-8') as f:
-                json.dump(self.settings, f, ensure_ascii=False, indent=2)
-            return True
-        except Exception as e:
-            print(f"設定の保存に失敗しました: {e}")
-            return False
+        return self._write_file()
+    
+    def _snapshot(self):
+        return self.settings
     
     def get_setting(self, key: str, default=None):
         """
@@ -80,86 +169,101 @@ class UserSettings:
     
     def set_setting(self, key: str, value):
         """
-        設定値を設定する
+        設定値を設定する（書き込みは遅延してまとめて行う）
         """
         keys = key.split('.')
-        target = self.settings
-        for k in keys[:-1]:
-            if k not in target:
-                target[k] = {}
-            target = target[k]
-        target[keys[-1]] = value
-        self.save_settings()
+        with self._lock:
+            target = self.settings
+            for k in keys[:-1]:
+                if k not in target:
+                    target[k] = {}
+                target = target[k]
+            target[keys[-1]] = value
+        self._mark_changed()
 
-class CustomKeywordManager:
+class CustomKeywordManager(DebouncedJsonFile):
     """
     カスタムキーワードを管理するクラス
     """
     def __init__(self):
-        self.custom_keywords = {}
+        self._custom_keywords = {}
+        # 内容が変わるたびに増える版番号（統合キーワード表のキャッシュ無効化に使用）
+        self.version = 0
+        self._init_json_file(CUSTOM_KEYWORDS_FILE, "custom_keywords", "カスタムキーワードの保存に失敗しました")
         self.load_custom_keywords()
     
+    @property
+    def custom_keywords(self):
+        return self._custom_keywords
+    
+    @custom_keywords.setter
+    def custom_keywords(self, keywords):
+        self._custom_keywords = keywords
+        self.version += 1
+    
     def load_custom_keywords(self):
         """
         カスタムキーワードを読み込む
         """
         try:
-            if os.path.exists(CUSTOM_KEYWORDS_FILE):
-                with open(CUSTOM_KEYWORDS_FILE, 'r', encoding='utf-8') as f:
+            if os.path.exists(self.file_path):
+                with open(self.file_path, 'r', encoding='utf-8') as f:
                     self.custom_keywords = json.load(f)
         except Exception as e:
-            print(f"カスタムキーワードの読み込みに失敗しました: {e}")
+            logger.error(f"カスタムキーワードの読み込みに失敗しました: {e}")
     
     def save_custom_keywords(self):
         """
-        カスタムキーワードを保存する
+        カスタムキーワードを今すぐ保存する
         """
-        try:
-            os.makedirs(os.path.dirname(CUSTOM_KEYWORDS_FILE), exist_ok=True)
-            with open(CUSTOM_KEYWORDS_FILE, 'w', encoding='utf-8') as f:
-                json.dump(self.custom_keywords, f, ensure_ascii=False, indent=2)
-            return True
-        except Exception as e:
-            print(f"カスタムキーワードの保存に失敗しました: {e}")
-            return False
+        return self._write_file()
+    
+    def _snapshot(self):
+        return self.custom_keywords
     
     def add_custom_keyword(self, category: str, keyword: str, weight: float = 1.0):
         """
-        カスタムキーワードを追加する
+        カスタムキーワードを追加する（書き込みは遅延してまとめて行う）
         """
         # 一般的すぎる単語は追加を拒否
         if keyword.lower().strip() in COMMON_WORDS:
             return False
         
-        if category not in self.custom_keywords:
-            self.custom_keywords[category] = []
-        
-        # 既存のキーワードをチェック
-        for existing in self.custom_keywords[category]:
-            if existing["keyword"] == keyword:
-                existing["weight"] = weight
-                return self.save_custom_keywords()
-        
-        # 新しいキーワードを追加
-        self.custom_keywords[category].append({
-            "keyword": keyword,
-            "weight": weight,
-            "created_at": "2025-07-27"  # 実際の実装ではdatetimeを使用
-        })
+        with self._lock:
+            if category not in self.custom_keywords:
+                self.custom_keywords[category] = []
+            
+            # 既存のキーワードをチェック
+            for existing in self.custom_keywords[category]:
+                if existing["keyword"] == keyword:
+                    existing["weight"] = weight
+                    break
+            else:
+                # 新しいキーワードを追加
+                self.custom_keywords[category].append({
+                    "keyword": keyword,
+                    "weight": weight,
+                    "created_at": "2025-07-27"  # 実際の実装ではdatetimeを使用
+                })
+                self.version += 1
         
-        return self.save_custom_keywords()
+        self._mark_changed()
+        return True
     
     def remove_custom_keyword(self, category: str, keyword: str):
         """
         カスタムキーワードを削除する
         """
-        if category in self.custom_keywords:
+        with self._lock:
+            if category not in self.custom_keywords:
+                return False
             self.custom_keywords[category] = [
                 kw for kw in self.custom_keywords[category] 
                 if kw["keyword"] != keyword
             ]
-            return self.save_custom_keywords()
-        return False
+            self.version += 1
+        self._mark_changed()
+        return True
     
     def get_custom_keywords(self, category: str = None):
         """
@@ -183,37 +287,51 @@ class CustomKeywordManager:
                     return kw.get("weight", 1.0)
         return 1.0
 
-class CustomRuleManager:
+class CustomRuleManager(DebouncedJsonFile):
     """
     カスタムルールを管理するクラス
     """
     def __init__(self):
-        self.custom_rules = []
+        self._custom_rules = []
+        # 有効なルールの評価用索引（ルール変更時に作り直す）
+        self._compiled: Optional[CompiledRules] = None
+        self._init_json_file(CUSTOM_RULES_FILE, "custom_rules", "カスタムルールの保存に失敗しました")
         self.load_custom_rules()
     
+    @property
+    def custom_rules(self):
+        return self._custom_rules
+    
+    @custom_rules.setter
+    def custom_rules(self, rules):
+        self._custom_rules = rules
+        self.invalidate_compiled_rules()
+    
+    def invalidate_compiled_rules(self):
+        """
+        custom_rulesを直接変更した後に呼び出し、評価用索引を作り直させる
+        """
+        self._compiled = None
+    
     def load_custom_rules(self):
         """
         カスタムルールを読み込む
         """
         try:
-            if os.path.exists(CUSTOM_RULES_FILE):
-                with open(CUSTOM_RULES_FILE, 'r', encoding='utf-8') as f:
+            if os.path.exists(self.file_path):
+                with open(self.file_path, 'r', encoding='utf-8') as f:
                     self.custom_rules = json.load(f)
         except Exception as e:
-            print(f"カスタムルールの読み込みに失敗しました: {e}")
+            logger.error(f"カスタムルールの読み込みに失敗しました: {e}")
     
     def save_custom_rules(self):
         """
-        カスタムルールを保存する
+        カスタムルールを今すぐ保存する
         """
-        try:
-            os.makedirs(os.path.dirname(CUSTOM_RULES_FILE), exist_ok=True)
-            with open(CUSTOM_RULES_FILE, 'w', encoding='utf-8') as f:
-                json.dump(self.custom_rules, f, ensure_ascii=False, indent=2)
-            return True
-        except Exception as e:
-            print(f"カスタムルールの保存に失敗しました: {e}")
-            return False
+        return self._write_file()
+    
+    def _snapshot(self):
+        return self.custom_rules
     
     def add_custom_rule(self, rule_type: str, condition: Dict[str, Any], action: Dict[str, Any], priority: int = 1):
         """
@@ -235,21 +353,26 @@ class CustomRuleManager:
             "created_at": "2025-07-27"  # 実際の実装ではdatetimeを使用
         }
         
-        self.custom_rules.append(rule)
-        return self.save_custom_rules()
+        with self._lock:
+            self.custom_rules.append(rule)
+            self.invalidate_compiled_rules()
+        self._mark_changed()
+        return True
     
     def remove_custom_rule(self, rule_id: str):
         """
         カスタムルールを削除する
         """
-        original_count = len(self.custom_rules)
-        self.custom_rules = [rule for rule in self.custom_rules if rule["id"] != rule_id]
+        with self._lock:
+            original_count = len(self.custom_rules)
+            self.custom_rules = [rule for rule in self.custom_rules if rule["id"] != rule_id]
+            removed = len(self.custom_rules) < original_count
         
         # ルールが実際に削除されたかチェック
-        if len(self.custom_rules) < original_count:
-            return self.save_custom_rules()
-        else:
+        if not removed:
             return False
+        self._mark_changed()
+        return True
     
     def get_custom_rules(self, rule_type: str = None):
         """
@@ -267,13 +390,10 @@ class CustomRuleManager:
         if tag.lower().strip() in COMMON_WORDS:
             return {}
         
-        results = {}
-        
-        for rule in self.get_custom_rules():
-            if self._evaluate_condition(rule["condition"], tag, context_tags):
-                results[rule["id"]] = rule["action"]
-        
-        return results
+        compiled = self._compiled
+        if compiled is None:
+            compiled = self._compiled = CompiledRules(self.get_custom_rules())
+        return compiled.evaluate(tag, context_tags)
     
     def _evaluate_condition(self, condition: Dict[str, Any], tag: str, context_tags: List[str] = None) -> bool:
         """
@@ -305,6 +425,18 @@ class CustomRuleManager:
         
         return False
 
+class CategoryKeywordTable:
+    """
+    カスタムキーワードを統合したカテゴリキーワード表（読み取り専用、全予測器で共有）
+    """
+    def __init__(self, keywords: Dict[str, List[str]], version: Any):
+        self.version = version
+        self.keywords: Mapping[str, Tuple[str, ...]] = MappingProxyType(
+            {category: tuple(words) for category, words in keywords.items()})
+        # 所属判定用の集合
+        self.keyword_sets: Mapping[str, FrozenSet[str]] = MappingProxyType(
+            {category: frozenset(words) for category, words in keywords.items()})
+
 class CustomizationManager:
     """
     カスタマイズ機能の統合管理クラス
@@ -313,25 +445,52 @@ class CustomizationManager:
         self.settings = UserSettings()
         self.keyword_manager = CustomKeywordManager()
         self.rule_manager = CustomRuleManager()
+        self._keyword_table: Optional[CategoryKeywordTable] = None
+        self._table_lock = threading.Lock()
+    
+    def flush(self) -> bool:
+        """
+        設定・カスタムキーワード・カスタムルールの予約中の書き込みを今すぐ行う
+        """
+        results = [self.settings.flush(), self.keyword_manager.flush(), self.rule_manager.flush()]
+        return all(results)
     
     def get_enhanced_category_keywords(self, base_keywords: Dict[str, List[str]]) -> Dict[str, List[str]]:
         """
         カスタムキーワードを含む拡張されたカテゴリキーワードを取得する
         """
-        enhanced_keywords = base_keywords.copy()
+        # 呼び出し元のリストを書き換えないよう、リストごと複製する
+        enhanced_keywords = {category: list(keywords) for category, keywords in base_keywords.items()}
         
         for category, custom_keywords in self.keyword_manager.get_custom_keywords().items():
             if category not in enhanced_keywords:
                 enhanced_keywords[category] = []
+            existing = set(enhanced_keywords[category])
             
             for custom_kw in custom_keywords:
                 # 一般的すぎる単語は除外
                 if custom_kw["keyword"].lower().strip() not in COMMON_WORDS:
-                    if custom_kw["keyword"] not in enhanced_keywords[category]:
+                    if custom_kw["keyword"] not in existing:
                         enhanced_keywords[category].append(custom_kw["keyword"])
+                        existing.add(custom_kw["keyword"])
         
         return enhanced_keywords
     
+    def get_category_keyword_table(self) -> "CategoryKeywordTable":
+        """
+        カテゴリキーワード設定ファイルとカスタムキーワードを統合した表を返す
+        ファイルの版かカスタムキーワードの版が変わったときだけ作り直す。
+        """
+        version = (get_category_keywords_version(), self.keyword_manager.version)
+        with self._table_lock:
+            table = self._keyword_table
+            if table is None or table.version != version:
+                base_keywords = {category: [kw for kw in keywords if kw.lower().strip() not in COMMON_WORDS]
+                                 for category, keywords in load_category_keywords_cached().items()}
+                table = CategoryKeywordTable(self.get_enhanced_category_keywords(base_keywords), version)
+                self._keyword_table = table
+            return table
+    
     def apply_custom_rules_to_score(self, tag: str, category: str, base_score: float, context_tags: List[str] = None) -> float:
         """
         カスタムルールをスコアに適用する
@@ -340,8 +499,15 @@ class CustomizationManager:
         if tag.lower().strip() in COMMON_WORDS:
             return base_score
         
-        modified_score = base_score
         rule_results = self.rule_manager.evaluate_custom_rules(tag, context_tags)
+        return self.apply_rule_results_to_score(rule_results, base_score)
+    
+    def apply_rule_results_to_score(self, rule_results: Dict[str, Any], base_score: float) -> float:
+        """
+        評価済みのルール結果をスコアに適用する
+        （ルールの評価はタグ毎に1回で済むため、カテゴリ毎のスコア計算ではこちらを使う）
+        """
+        modified_score = base_score
         
         for rule_id, action in rule_results.items():
             action_type = action.get("type", "boost_score")
@@ -375,8 +541,29 @@ class CustomizationManager:
             "categories_with_custom_keywords": list(self.keyword_manager.get_custom_keywords().keys())
         }
 
-# グローバルインスタンス
-customization_manager = CustomizationManager()
+# グローバルインスタンス（設定ファイルは初回使用時に読み込む）
+_customization_manager: Optional[CustomizationManager] = None
+_customization_manager_lock = threading.Lock()
+
+def get_customization_manager() -> CustomizationManager:
+    """
+    共有のCustomizationManagerを取得する（初回呼び出し時に生成）
+    """
+    global _customization_manager
+    if _customization_manager is None:
+        with _customization_manager_lock:
+            if _customization_manager is None:
+                manager = CustomizationManager()
+                # 遅延中の書き込みはプロセス終了時に書き出す
+                atexit.register(manager.flush)
+                _customization_manager = manager
+    return _customization_manager
+
+def __getattr__(name: str) -> Any:
+    # 後方互換: `from modules.customization import customization_manager` は参照時に生成する
+    if name == "customization_manager":
+        return get_customization_manager()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def get_customized_category_keywords(base_keywords: Dict[str, List[str]]) -> Dict[str, List[str]]:
     """
@@ -387,7 +574,13 @@ def get_customized_category_keywords(base_keywords: Dict[str, List[str]]) -> Dic
     for category, keywords in base_keywords.items():
         filtered_keywords[category] = [kw for kw in keywords if kw.lower().strip() not in COMMON_WORDS]
     
-    return customization_manager.get_enhanced_category_keywords(filtered_keywords)
+    return get_customization_manager().get_enhanced_category_keywords(filtered_keywords)
+
+def get_category_keyword_table() -> CategoryKeywordTable:
+    """
+    統合済みカテゴリキーワード表を取得する（キャッシュ済み、読み取り専用）
+    """
+    return get_customization_manager().get_category_keyword_table()
 
 def apply_custom_rules(tag: str, category: str, base_score: float, context_tags: List[str] = None) -> float:
     """
@@ -397,7 +590,7 @@ def apply_custom_rules(tag: str, category: str, base_score: float, context_tags:
     if tag.lower().strip() in COMMON_WORDS:
         return base_score
     
-    return customization_manager.apply_custom_rules_to_score(tag, category, base_score, context_tags)
+    return get_customization_manager().apply_custom_rules_to_score(tag, category, base_score, context_tags)
 
 def get_custom_category(tag: str) -> Optional[str]:
     """
@@ -408,7 +601,7 @@ def get_custom_category(tag: str) -> Optional[str]:
         return None
     
     # カスタムルールを評価
-    rule_results = customization_manager.rule_manager.evaluate_custom_rules(tag)
+    rule_results = get_customization_manager().rule_manager.evaluate_custom_rules(tag)
     
     for rule_id, action in rule_results.items():
         action_type = action.get("type", "score_boost")
@@ -0,0 +1,97 @@
+"""
+SQLiteデータベースのオンラインバックアップ
+
+sqlite3.Connection.backup() で、DBをpagesページずつ少しずつコピーする。元のDBを読み取りロックするのは
+各ステップの間だけなので、アプリが書き込みを続けていてもバックアップでき、コピー中に書き込みがあれば
+SQLiteがコピーをやり直すため、出来上がるファイルは常にある時点の整合したスナップショットになる
+（書き込み途中のファイルをそのまま写すshutil.copyとは異なる）。
+vacuum=Trueでは VACUUM INTO で空き領域を詰めた複製を作る（1文で実行されるため進捗は通知されない）。
+
+出力先にはまず一時ファイルを作り、完了してから置き換えるので、失敗しても壊れたバックアップは残らない。
+"""
+import logging
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# 1ステップでコピーするページ数（既定のページサイズ4KBで約1MB）
+BACKUP_PAGES_PER_STEP = 256
+# VACUUM INTO が使えるSQLiteの版
+VACUUM_INTO_VERSION = (3, 27, 0)
+
+ProgressCallback = Callable[[int, int], None]
+DoneCallback = Callable[[Optional[str], Optional[BaseException]], None]
+
+
+def _connect_read_only(db_file: str) -> sqlite3.Connection:
+    uri = Path(db_file).resolve().as_uri() + "?mode=ro"
+    return sqlite3.connect(uri, uri=True, check_same_thread=False)
+
+
+def backup_database(source: str, destination: str, pages: int = BACKUP_PAGES_PER_STEP,
+                    progress: Optional[ProgressCallback] = None, vacuum: bool = False) -> str:
+    """
+    sourceのDBをdestinationへバックアップし、destinationを返す
+
+    progressは各ステップの後に (コピー済みページ数, 総ページ数) で呼ばれる。
+    元のDBが無い・読めない場合はsqlite3.Error、書き出せない場合はOSErrorを送出する。
+    """
+    if not os.path.exists(source):
+        raise sqlite3.OperationalError(f"データベースファイルが見つかりません: {source}")
+    directory = os.path.dirname(os.path.abspath(destination))
+    os.makedirs(directory, exist_ok=True)
+    temp_path = f"{destination}.{os.getpid()}.{threading.get_ident()}.tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    use_vacuum = vacuum and sqlite3.sqlite_version_info >= VACUUM_INTO_VERSION
+    if vacuum and not use_vacuum:
+        logger.info(f"SQLite {sqlite3.sqlite_version} はVACUUM INTOに対応していないため、通常のバックアップを行います")
+
+    source_conn = _connect_read_only(source)
+    try:
+        if use_vacuum:
+            source_conn.execute("VACUUM INTO ?", (temp_path,))
+        else:
+            target_conn = sqlite3.connect(temp_path)
+            try:
+                def on_step(status: int, remaining: int, total: int) -> None:
+                    if progress:
+                        progress(total - remaining, total)
+
+                source_conn.backup(target_conn, pages=pages, progress=on_step)
+            finally:
+                target_conn.close()
+        os.replace(temp_path, destination)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    finally:
+        source_conn.close()
+    return destination
+
+
+def start_backup(source: str, destination: str, on_done: DoneCallback, pages: int = BACKUP_PAGES_PER_STEP,
+                 progress: Optional[ProgressCallback] = None, vacuum: bool = False) -> threading.Thread:
+    """
+    バックアップをバックグラウンドのスレッドで実行する
+
+    終了時にon_done(出力先, None)、失敗時にon_done(None, 例外)をそのスレッドから呼ぶ
+    （UIを更新する場合は呼び出し側でメインスレッドへ渡すこと）。
+    """
+    def worker() -> None:
+        try:
+            path = backup_database(source, destination, pages=pages, progress=progress, vacuum=vacuum)
+        except Exception as e:
+            logger.error(f"バックアップに失敗しました: {e}")
+            on_done(None, e)
+            return
+        on_done(path, None)
+
+    thread = threading.Thread(target=worker, name="db-backup", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,251 @@
+"""
+タグDB（tags.db）のスキーマ定義とマイグレーション
+
+スキーマの版はDBファイルの PRAGMA user_version に記録する。MIGRATIONS は版番号の昇順に並んだ
+変更手順の一覧で、migrate() は記録された版より新しい手順だけを順に1つずつトランザクションで適用する。
+途中で失敗した手順はロールバックされ、版は最後に成功した手順のまま残る（次回起動時に再実行される）。
+
+スキーマを変えるときは、既存の手順を書き換えずに末尾へ新しい版の手順を追加すること。
+"""
+import logging
+import sqlite3
+from typing import Callable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+Migration = Tuple[int, str, Callable[[sqlite3.Connection], None]]
+
+
+def _create_base_schema(conn: sqlite3.Connection) -> None:
+    """版1: tags・recent_tagsテーブルと単一列のインデックス（版管理を導入する前のスキーマ）"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tags (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tag TEXT UNIQUE NOT NULL,
+            jp TEXT,
+            favorite INTEGER DEFAULT 0,
+            category TEXT,
+            is_negative INTEGER DEFAULT 0
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS recent_tags (
+            tag TEXT NOT NULL,
+            is_negative INTEGER DEFAULT 0,
+            used_at TEXT NOT NULL,
+            PRIMARY KEY (tag, is_negative)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_tags_category ON tags(category)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_tags_favorite ON tags(favorite)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_tags_is_negative ON tags(is_negative)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_recent_tags_used_at ON recent_tags(used_at)')
+
+
+def _add_composite_indexes(conn: sqlite3.Connection) -> None:
+    """
+    版2: よく使う条件に合わせた複合インデックス
+
+    - (is_negative, category, tag): カテゴリ別一覧（category = ? AND is_negative = ? ORDER BY tag）を
+      ソートなしで索引の範囲だけ読む
+    - (tag, is_negative): タグ1件の存在確認・更新・削除（tag = ? AND is_negative = ?）と
+      最近使ったタグの結合を、テーブル本体を読まずに索引だけで判定する
+    is_negative単独のインデックスは(is_negative, category, tag)の先頭列で代用できるため削除する。
+    """
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_tags_negative_category_tag ON tags(is_negative, category, tag)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_tags_tag_negative ON tags(tag, is_negative)')
+    conn.execute('DROP INDEX IF EXISTS idx_tags_is_negative')
+    conn.execute('ANALYZE')
+
+
+def _normalize_categories(conn: sqlite3.Connection) -> None:
+    """
+    版3: カテゴリ名をcategoriesテーブルに分け、tagsはcategory_id（整数）で参照する
+
+    タグ毎に同じ日本語のカテゴリ名を持たなくなるため、DBとインデックスが小さくなり、
+    カテゴリの絞り込み・件数集計は整数の比較になる。カテゴリ名の変更もcategoriesの1行の更新で済む。
+    カテゴリが空（NULLまたは''）のタグはcategory_idをNULLにする。
+    以前の列の並び（categoryを文字列で持つ形）で読みたい場合はビューtags_with_categoryを使う。
+    """
+    conn.execute('''
+        CREATE TABLE categories (
+            id INTEGER PRIMARY KEY,
+            name TEXT UNIQUE NOT NULL,
+            priority INTEGER NOT NULL DEFAULT 0,
+            description TEXT NOT NULL DEFAULT ''
+        )
+    ''')
+    # 既存のカテゴリは最初に使われたタグの順に番号を振る
+    conn.execute('''
+        INSERT INTO categories (name)
+        SELECT category FROM tags WHERE category IS NOT NULL AND category <> ''
+        GROUP BY category ORDER BY MIN(id)
+    ''')
+    conn.execute('''
+        CREATE TABLE tags_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tag TEXT UNIQUE NOT NULL,
+            jp TEXT,
+            favorite INTEGER DEFAULT 0,
+            category_id INTEGER REFERENCES categories(id),
+            is_negative INTEGER DEFAULT 0
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO tags_new (id, tag, jp, favorite, category_id, is_negative)
+        SELECT t.id, t.tag, t.jp, t.favorite, c.id, t.is_negative
+        FROM tags t LEFT JOIN categories c ON c.name = t.category
+    ''')
+    # 削除済みの番号を再利用しないよう、AUTOINCREMENTの採番位置も引き継ぐ
+    conn.execute('''
+        UPDATE sqlite_sequence SET seq = (SELECT MAX(seq) FROM sqlite_sequence WHERE name IN ('tags', 'tags_new'))
+        WHERE name = 'tags_new'
+    ''')
+    conn.execute('''
+        INSERT INTO sqlite_sequence (name, seq)
+        SELECT 'tags_new', seq FROM sqlite_sequence
+        WHERE name = 'tags' AND NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'tags_new')
+    ''')
+    conn.execute('DROP TABLE tags')
+    conn.execute('ALTER TABLE tags_new RENAME TO tags')
+    conn.execute('CREATE INDEX idx_tags_category_id ON tags(category_id)')
+    conn.execute('CREATE INDEX idx_tags_favorite ON tags(favorite)')
+    conn.execute('CREATE INDEX idx_tags_negative_category_tag ON tags(is_negative, category_id, tag)')
+    conn.execute('CREATE INDEX idx_tags_tag_negative ON tags(tag, is_negative)')
+    conn.execute('''
+        CREATE VIEW tags_with_category AS
+        SELECT t.id, t.tag, t.jp, t.favorite, COALESCE(c.name, '') AS category, t.is_negative, t.category_id
+        FROM tags t LEFT JOIN categories c ON c.id = t.category_id
+    ''')
+    conn.execute('ANALYZE')
+
+
+# 変更を記録するトリガーが使う発生元と時刻。同期で他のDBの変更を適用する間はsync_stateの
+# apply_origin・apply_timeに元の発生元・時刻を入れ、それを記録する（modules.tag_sync）
+_CHANGE_ORIGIN_SQL = ("COALESCE((SELECT value FROM sync_state WHERE key = 'apply_origin'), "
+                      "(SELECT value FROM sync_state WHERE key = 'origin'))")
+_CHANGE_TIME_SQL = ("COALESCE((SELECT value FROM sync_state WHERE key = 'apply_time'), "
+                    "strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))")
+
+
+def _log_change_sql(table: str, key_sql: str, op: str) -> str:
+    return (f"INSERT INTO changelog (origin, changed_at, tbl, key, op) "
+            f"VALUES ({_CHANGE_ORIGIN_SQL}, {_CHANGE_TIME_SQL}, '{table}', {key_sql}, '{op}');")
+
+
+# 同期を使い始めたDB（modules.tag_syncが最初の同期でsync_stateにenabledを入れる）でだけ変更を記録する
+_SYNC_ENABLED_SQL = "EXISTS (SELECT 1 FROM sync_state WHERE key = 'enabled')"
+
+
+def _add_changelog(conn: sqlite3.Connection) -> None:
+    """
+    版4: 変更履歴（changelog）と同期用の状態（sync_state）
+
+    tags・recent_tagsへの追加・更新・削除をトリガーでchangelogに1行ずつ記録する。seqはAUTOINCREMENTで
+    削除後も再利用されない単調増加の番号。keyはtagsではタグ名、recent_tagsでは「is_negative:タグ名」で、
+    行の内容は持たない（同期の際に現在の行を読む）。originはこのDBを表すランダムなID（sync_state.origin）。
+    カテゴリ名の変更はcategoriesの1行の更新なので、そのカテゴリのタグの変更として記録する。
+    トリガーはsync_stateにenabledがあるときだけ記録するため、同期を使わないDBには変更履歴が溜まらず、
+    カテゴリ名の変更も1行の更新のままになる。
+    """
+    conn.execute('''
+        CREATE TABLE sync_state (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+    ''')
+    conn.execute("INSERT INTO sync_state (key, value) VALUES ('origin', lower(hex(randomblob(8))))")
+    conn.execute('''
+        CREATE TABLE changelog (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            origin TEXT NOT NULL,
+            changed_at TEXT NOT NULL,
+            tbl TEXT NOT NULL,
+            key TEXT NOT NULL,
+            op TEXT NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX idx_changelog_key ON changelog(tbl, key, seq)')
+
+    def when(condition: str = "") -> str:
+        return f"WHEN ({condition}) AND {_SYNC_ENABLED_SQL} " if condition else f"WHEN {_SYNC_ENABLED_SQL} "
+
+    recent_key = "{row}.is_negative || ':' || {row}.tag"
+    conn.execute(f"CREATE TRIGGER tags_log_insert AFTER INSERT ON tags {when()}BEGIN "
+                 f"{_log_change_sql('tags', 'NEW.tag', 'I')} END")
+    conn.execute(f"CREATE TRIGGER tags_log_update AFTER UPDATE ON tags {when()}BEGIN "
+                 f"{_log_change_sql('tags', 'NEW.tag', 'U')} END")
+    # タグ名の変更は古い名前の削除としても記録する
+    conn.execute(f"CREATE TRIGGER tags_log_rename AFTER UPDATE OF tag ON tags {when('OLD.tag <> NEW.tag')}BEGIN "
+                 f"{_log_change_sql('tags', 'OLD.tag', 'D')} END")
+    conn.execute(f"CREATE TRIGGER tags_log_delete AFTER DELETE ON tags {when()}BEGIN "
+                 f"{_log_change_sql('tags', 'OLD.tag', 'D')} END")
+    conn.execute(f"CREATE TRIGGER recent_tags_log_insert AFTER INSERT ON recent_tags {when()}BEGIN "
+                 f"{_log_change_sql('recent_tags', recent_key.format(row='NEW'), 'I')} END")
+    conn.execute(f"CREATE TRIGGER recent_tags_log_update AFTER UPDATE ON recent_tags {when()}BEGIN "
+                 f"{_log_change_sql('recent_tags', recent_key.format(row='NEW'), 'U')} END")
+    conn.execute(f"CREATE TRIGGER recent_tags_log_rename AFTER UPDATE ON recent_tags "
+                 f"{when('OLD.tag <> NEW.tag OR OLD.is_negative <> NEW.is_negative')}BEGIN "
+                 f"{_log_change_sql('recent_tags', recent_key.format(row='OLD'), 'D')} END")
+    conn.execute(f"CREATE TRIGGER recent_tags_log_delete AFTER DELETE ON recent_tags {when()}BEGIN "
+                 f"{_log_change_sql('recent_tags', recent_key.format(row='OLD'), 'D')} END")
+    conn.execute(f'''
+        CREATE TRIGGER categories_log_rename AFTER UPDATE OF name ON categories {when('OLD.name <> NEW.name')}BEGIN
+            INSERT INTO changelog (origin, changed_at, tbl, key, op)
+            SELECT {_CHANGE_ORIGIN_SQL}, {_CHANGE_TIME_SQL}, 'tags', tag, 'U' FROM tags WHERE category_id = NEW.id;
+        END
+    ''')
+
+
+MIGRATIONS: List[Migration] = [
+    (1, "tags・recent_tagsテーブルの作成", _create_base_schema),
+    (2, "複合インデックスの追加", _add_composite_indexes),
+    (3, "カテゴリの正規化（categoriesテーブルとcategory_id）", _normalize_categories),
+    (4, "変更履歴（changelog）と同期用の状態", _add_changelog),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """
+    未適用のマイグレーションを版の順に適用し、適用後の版を返す
+
+    アプリより新しい版のDB（新しい版で作られたDBを古い版で開いた場合）は変更せずにそのまま返す。
+    失敗した場合はその手順をロールバックして例外を送出する。
+    """
+    current = get_schema_version(conn)
+    if current > SCHEMA_VERSION:
+        logger.warning(f"DBのスキーマの版({current})がアプリの版({SCHEMA_VERSION})より新しいため、マイグレーションを行いません")
+        return current
+    if conn.in_transaction:
+        conn.commit()
+    for version, description, step in MIGRATIONS:
+        if version <= current:
+            continue
+        # sqlite3モジュールはDDLの前に自動でBEGINしないため、明示的にトランザクションを開始する
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            step(conn)
+            conn.execute(f'PRAGMA user_version = {version}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.error(f"マイグレーション{version}（{description}）に失敗しました")
+            raise
+        logger.info(f"マイグレーション{version}を適用しました: {description}")
+        current = version
+    return current
+
+
+def analyze(conn: sqlite3.Connection) -> None:
+    """
+    統計情報（sqlite_stat1）を更新する
+
+    大量のタグを追加した後に実行すると、クエリプランナーが件数の偏りに合ったインデックスを選べる。
+    """
+    conn.execute('ANALYZE')
+    conn.commit()
@@ -0,0 +1,77 @@
+"""
+最新のリクエストだけを処理する常駐ワーカー
+
+検索のたびにスレッドを起動すると、古い検索のスレッドが走り続けて結果を送ってしまう。
+FetchWorkerは1本のスレッドと1つのリクエスト枠を持ち、新しいリクエストは未処理のものを
+置き換える。各リクエストには世代番号が付き、処理関数はis_cancelled()で途中打ち切りできる。
+"""
+import logging
+import threading
+from typing import Any, Callable, Optional, Tuple
+
+
+class FetchWorker:
+    """
+    世代番号付きリクエストを1本の常駐スレッドで処理するワーカー
+
+    handler(*args, generation=世代番号, is_cancelled=関数) の形で呼び出す。
+    is_cancelled()は、より新しいリクエストが来ていればTrueを返す。
+    """
+
+    def __init__(self, handler: Callable[..., None], name: str = "FetchWorker") -> None:
+        self.handler = handler
+        self.logger = logging.getLogger(__name__)
+        self._condition = threading.Condition()
+        self._pending: Optional[Tuple[int, Tuple[Any, ...]]] = None
+        self._generation = 0
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    @property
+    def generation(self) -> int:
+        """最新リクエストの世代番号"""
+        return self._generation
+
+    def submit(self, *args: Any) -> int:
+        """
+        リクエストを登録する（未処理のリクエストは破棄される）。戻り値は世代番号。
+        """
+        with self._condition:
+            self._generation += 1
+            self._pending = (self._generation, args)
+            self._condition.notify()
+            return self._generation
+
+    def is_current(self, generation: int) -> bool:
+        return generation == self._generation
+
+    def stop(self, timeout: Optional[float] = 1.0) -> None:
+        """ワーカーを停止する（処理中のリクエストは打ち切り扱いになる）"""
+        with self._condition:
+            self._stopped = True
+            self._generation += 1
+            self._pending = None
+            self._condition.notify()
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while self._pending is None and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                generation, args = self._pending
+                self._pending = None
+
+            def is_cancelled(generation: int = generation) -> bool:
+                return self._stopped or generation != self._generation
+
+            if is_cancelled():
+                continue
+            try:
+                self.handler(*args, generation=generation, is_cancelled=is_cancelled)
+            except Exception as e:
+                self.logger.error(f"フェッチ処理エラー: {e}")
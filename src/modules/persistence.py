@@ -0,0 +1,225 @@
+"""
+変更のあった設定・学習データだけを保存する永続化マネージャー
+
+テーマ・ユーザー設定・カスタムキーワード/ルール・使用履歴・翻訳キャッシュなどの
+各コンポーネントは「変更があるか(is_dirty)」と「保存関数」を登録する。
+保存要求はバックグラウンドスレッドでまとめて(デバウンスして)処理し、
+実際に変更のあったコンポーネントだけをディスクに書き込む。
+終了時・緊急時はflush()で同期的に書き出す。
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import IO, Any, Callable, Iterator, List, Optional, Set
+
+DEFAULT_SAVE_DELAY = 1.0  # 最後の保存要求からこの秒数だけ待ってまとめて保存する
+DEFAULT_MAX_DELAY = 5.0   # 要求が続いても最初の要求からこの秒数以内には保存する
+
+
+# umaskを読めない環境で新しいファイルに付ける権限
+DEFAULT_NEW_FILE_MODE = 0o644
+
+
+def _read_umask() -> Optional[int]:
+    """
+    /proc/self/statusからumaskを読む（読めない環境ではNone）
+    os.umask()で調べると、一時的にプロセス全体のumaskが0になり他のスレッドが作るファイルに影響するため使わない。
+    """
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("Umask:"):
+                    return int(line.split()[1], 8)
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def new_file_mode() -> int:
+    """新しいファイルの権限（open()で作る場合と同じく0o666からumaskを除いたもの）"""
+    umask = _read_umask()
+    return 0o666 & ~umask if umask is not None else DEFAULT_NEW_FILE_MODE
+
+
+def _file_mode(path: str) -> int:
+    """置き換え後のファイルに付ける権限（既存のファイルがあればその権限を引き継ぐ）"""
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except OSError:
+        return new_file_mode()
+
+
+@contextmanager
+def atomic_open(path: str, mode: str = 'w', encoding: Optional[str] = 'utf-8') -> Iterator[IO[Any]]:
+    """
+    一時ファイルを開き、withブロックが正常に終わったらpathと置き換える
+    （書き込み途中で終了しても元のファイルが残る）
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, mode, encoding=encoding) as f:
+            yield f
+        # mkstempは0o600で作るため、元のファイル（なければ通常の新規ファイル）の権限に揃える
+        os.chmod(tmp_path, _file_mode(path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_json_atomic(path: str, data: Any) -> None:
+    """
+    JSONを一時ファイルに書き出してから置き換える
+    """
+    with atomic_open(path) as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+class PersistenceManager:
+    """
+    ダーティフラグ付きコンポーネントの保存をまとめて行うマネージャー
+
+    save_funcは保存に失敗したらFalseを返すか例外を送出する。その場合は次回も保存対象になる。
+    is_dirtyを省略したコンポーネントは、mark_dirty()で明示的に印を付けたときだけ保存される。
+    idle_exit=Trueの場合、スレッドは保存要求時に起動し、保存を終えて暇になったら終了する。
+    """
+
+    def __init__(self, delay: float = DEFAULT_SAVE_DELAY, max_delay: float = DEFAULT_MAX_DELAY,
+                 start_thread: bool = True, idle_exit: bool = False) -> None:
+        self.delay = delay
+        self.max_delay = max(delay, max_delay)
+        self.logger = logging.getLogger(__name__)
+        self._components: "OrderedDict[str, tuple]" = OrderedDict()
+        self._marked: Set[str] = set()
+        self._condition = threading.Condition()
+        self._save_lock = threading.Lock()
+        self._deadline: Optional[float] = None
+        self._first_request: Optional[float] = None
+        self._stopped = False
+        self._idle_exit = idle_exit
+        self._thread: Optional[threading.Thread] = None
+        if start_thread and not idle_exit:
+            self._start_thread()
+
+    def _start_thread(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="PersistenceManager", daemon=True)
+        self._thread.start()
+
+    def register(self, name: str, save_func: Callable[[], Optional[bool]],
+                 is_dirty: Optional[Callable[[], bool]] = None) -> None:
+        """コンポーネントを登録する（同名の登録は置き換える）"""
+        with self._condition:
+            self._components[name] = (save_func, is_dirty)
+
+    def mark_dirty(self, name: str) -> None:
+        """コンポーネントに変更ありの印を付け、保存を予約する"""
+        with self._condition:
+            self._marked.add(name)
+        self.request_save()
+
+    def request_save(self) -> None:
+        """
+        変更のあるコンポーネントの保存を予約する
+
+        連続した要求はdelay秒の間隔が空くまでまとめるが、最初の要求からmax_delay秒以内には保存する。
+        """
+        with self._condition:
+            now = time.monotonic()
+            if self._first_request is None:
+                self._first_request = now
+            self._deadline = min(now + self.delay, self._first_request + self.max_delay)
+            if self._idle_exit and not self._stopped and self._thread is None:
+                self._start_thread()
+            self._condition.notify()
+
+    def dirty_components(self) -> List[str]:
+        """変更のあるコンポーネント名のリスト"""
+        with self._condition:
+            components = list(self._components.items())
+            marked = set(self._marked)
+        dirty = []
+        for name, (_, is_dirty) in components:
+            try:
+                if name in marked or (is_dirty is not None and is_dirty()):
+                    dirty.append(name)
+            except Exception as e:
+                self.logger.error(f"変更状態の確認に失敗 ({name}): {e}")
+        return dirty
+
+    def flush(self) -> List[str]:
+        """
+        変更のあるコンポーネントを今すぐ保存する。戻り値は保存に成功したコンポーネント名。
+        """
+        saved = []
+        with self._save_lock:
+            for name in self.dirty_components():
+                with self._condition:
+                    save_func, _ = self._components[name]
+                    self._marked.discard(name)
+                try:
+                    ok = save_func()
+                except Exception as e:
+                    self.logger.error(f"保存に失敗 ({name}): {e}")
+                    ok = False
+                if ok is False:
+                    with self._condition:
+                        self._marked.add(name)
+                else:
+                    saved.append(name)
+        return saved
+
+    def stop(self, flush: bool = True, timeout: Optional[float] = 2.0) -> None:
+        """バックグラウンドスレッドを停止する（flush=Trueなら最後に同期保存する）"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        if flush:
+            self.flush()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                if self._idle_exit and self._deadline is None:
+                    self._thread = None
+                    return
+                while not self._stopped and self._deadline is None:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                remaining = self._deadline - time.monotonic()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+                self._deadline = None
+                self._first_request = None
+            self.flush()
+
+
+_shared_manager: Optional[PersistenceManager] = None
+_shared_manager_lock = threading.Lock()
+
+
+def get_shared_persistence_manager() -> PersistenceManager:
+    """
+    プロセス全体で共有する保存マネージャーを返す（初回呼び出し時に作成）
+
+    アプリ本体とカスタマイズ設定などが同じ書き込みスレッドを使い、保存が競合しないようにする。
+    スレッドは保存要求があるときだけ動く。
+    """
+    global _shared_manager
+    with _shared_manager_lock:
+        if _shared_manager is None:
+            _shared_manager = PersistenceManager(idle_exit=True)
+        return _shared_manager
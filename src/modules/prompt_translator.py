@@ -25,6 +25,8 @@ class PromptTranslator:
     def __init__(self):
         self.logger = logging.getLogger(__name__)
         self.translation_cache = self._load_translation_cache()
+        # キャッシュは翻訳のたびに書き出さず、PersistenceManagerが変更のあるときだけ保存する
+        self._cache_dirty = False
         self.custom_translations = self._load_custom_translations()
         self.translator = GoogleTranslator(source='ja', target='en')
         
@@ -175,14 +177,23 @@ class PromptTranslator:
             self.logger.error(f"翻訳キャッシュの読み込みに失敗: {e}")
         return {}
     
-    def _save_translation_cache(self) -> None:
+    def _save_translation_cache(self) -> bool:
         """翻訳キャッシュを保存する"""
+        self._cache_dirty = False
+        cache = dict(self.translation_cache)
         try:
             os.makedirs(os.path.dirname(TRANSLATION_CACHE_FILE), exist_ok=True)
             with open(TRANSLATION_CACHE_FILE, 'w', encoding='utf-8') as f:
-                json.dump(self.translation_cache, f, ensure_ascii=False, indent=2)
+                json.dump(cache, f, ensure_ascii=False, indent=2)
+            return True
         except Exception as e:
+            self._cache_dirty = True
             self.logger.error(f"翻訳キャッシュの保存に失敗: {e}")
+            return False
+    
+    def is_cache_dirty(self) -> bool:
+        """未保存の翻訳キャッシュがあるかどうか"""
+        return self._cache_dirty
     
     def _load_custom_translations(self) -> Dict[str, str]:
         """カスタム翻訳辞書を読み込む"""
@@ -269,7 +280,7 @@ class PromptTranslator:
             result = self.custom_translations[japanese_text]
             if use_cache:
                 self.translation_cache[japanese_text] = result
-                self._save_translation_cache()
+                self._cache_dirty = True
             return result
         
         # プロンプトルールチェック
@@ -277,7 +288,7 @@ class PromptTranslator:
             result = self.prompt_rules[japanese_text]
             if use_cache:
                 self.translation_cache[japanese_text] = result
-                self._save_translation_cache()
+                self._cache_dirty = True
             return result
         
         # Google翻訳APIを使用
@@ -285,7 +296,7 @@ class PromptTranslator:
             result = self.translator.translate(japanese_text)
             if use_cache:
                 self.translation_cache[japanese_text] = result
-                self._save_translation_cache()
+                self._cache_dirty = True
             return result
         except Exception as e:
             self.logger.error(f"翻訳に失敗: {e}")
@@ -335,7 +346,7 @@ class PromptTranslator:
                 
                 # キャッシュに保存
                 self.translation_cache[japanese_text] = result["translated"]
-                self._save_translation_cache()
+                self._cache_dirty = True
             except Exception as e:
                 result["translated"] = japanese_text
                 result["translation_method"] = "fallback"
@@ -382,6 +393,7 @@ class PromptTranslator:
         """翻訳キャッシュをクリアする"""
         try:
             self.translation_cache = {}
+            self._cache_dirty = False
             if os.path.exists(TRANSLATION_CACHE_FILE):
                 os.remove(TRANSLATION_CACHE_FILE)
             return True
@@ -10,8 +10,8 @@ from typing import Any, Dict, List, Optional, Callable
 import threading
 import time
 
-from modules.prompt_translator import PromptTranslator
-prompt_translator = PromptTranslator()
+# 翻訳キャッシュを共有するため、モジュールの共通インスタンスを使う
+from modules.prompt_translator import prompt_translator
 
 class PromptTranslatorDialog:
     """
@@ -0,0 +1,176 @@
+"""
+カスタムルールのコンパイル済み評価エンジン
+
+有効なルールを条件の種類ごとに索引化し、タグ1件につき1回の走査で一致するルールをすべて求める。
+    keyword_match    : キーワードのAho-Corasickオートマトン（タグ文字列を1回なめる）
+    context_contains : 必須タグ → ルールのハッシュ表（コンテキストタグの集合から必要数を数える）
+    tag_length       : 長さの区間表（区切り点を二分探索して該当区間の一致ルールを引く）
+結果はCustomRuleManager._evaluate_conditionを1件ずつ評価した場合と同じになる。
+"""
+import math
+from bisect import bisect_right
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from modules.common_words import COMMON_WORDS
+
+
+class KeywordAutomaton:
+    """
+    部分文字列検索用のAho-Corasickオートマトン
+
+    add()でキーワードと値を登録し、build()後にfind_all()でテキストに含まれる全キーワードの値を返す。
+    """
+
+    def __init__(self) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._outputs: List[List[Any]] = [[]]
+        self._built = False
+
+    def add(self, keyword: str, value: Any) -> None:
+        node = 0
+        for char in keyword:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+            node = next_node
+        self._outputs[node].append(value)
+        self._built = False
+
+    def build(self) -> None:
+        """失敗リンクを張り、各ノードの出力に接尾辞側の出力を合流させる"""
+        queue = deque()
+        for next_node in self._goto[0].values():
+            self._fail[next_node] = 0
+            queue.append(next_node)
+        while queue:
+            node = queue.popleft()
+            for char, next_node in self._goto[node].items():
+                queue.append(next_node)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_node] = self._goto[fail].get(char, 0)
+                self._outputs[next_node] = self._outputs[next_node] + self._outputs[self._fail[next_node]]
+        self._built = True
+
+    def find_all(self, text: str) -> List[Any]:
+        """テキストに含まれるキーワードの値（重複あり、出現順）"""
+        if not self._built:
+            self.build()
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        found: List[Any] = []
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if outputs[node]:
+                found.extend(outputs[node])
+        return found
+
+    def __len__(self) -> int:
+        return len(self._goto) - 1
+
+
+class CompiledRules:
+    """
+    有効なルールのリストから作る評価用の索引
+
+    evaluate()はルールID → アクション の辞書を、元のルールリストの順序で返す。
+    """
+
+    def __init__(self, rules: Iterable[Dict[str, Any]]) -> None:
+        self.rules: List[Tuple[str, Any]] = []
+        self._keywords = KeywordAutomaton()
+        self._always: List[int] = []  # 空キーワードなど常に一致するルール
+        self._context_index: Dict[str, List[int]] = {}
+        self._context_required: Dict[int, int] = {}
+        length_rules: List[Tuple[int, int, int]] = []
+
+        for rule in rules:
+            index = len(self.rules)
+            self.rules.append((rule["id"], rule["action"]))
+            condition = rule.get("condition") or {}
+            condition_type = condition.get("type", "keyword_match")
+
+            if condition_type == "keyword_match":
+                keyword = condition.get("keyword", "")
+                if keyword.lower().strip() in COMMON_WORDS:
+                    continue
+                if keyword:
+                    self._keywords.add(keyword.lower(), index)
+                else:
+                    self._always.append(index)
+
+            elif condition_type == "context_contains":
+                required = {tag.lower() for tag in condition.get("required_tags", [])
+                            if tag.lower().strip() not in COMMON_WORDS}
+                if not required:
+                    continue
+                self._context_required[index] = len(required)
+                for tag in required:
+                    self._context_index.setdefault(tag, []).append(index)
+
+            elif condition_type == "tag_length":
+                # タグの長さは整数なので、境界を整数に揃えておく
+                min_length = math.ceil(condition.get("min_length", 0))
+                max_length = math.floor(condition.get("max_length", 999))
+                if min_length <= max_length:
+                    length_rules.append((min_length, max_length, index))
+
+        self._keywords.build()
+        self._length_points, self._length_hits = self._build_length_table(length_rules)
+
+    @staticmethod
+    def _build_length_table(length_rules: List[Tuple[int, int, int]]
+                            ) -> Tuple[List[int], List[Tuple[int, ...]]]:
+        """
+        区切り点と、各区間[points[i], points[i+1])に一致するルールの表を作る
+
+        区間内では一致するルールが変わらないよう、各ルールの min と max+1 を区切り点にする。
+        """
+        if not length_rules:
+            return [], []
+        points = sorted({point for min_length, max_length, _ in length_rules
+                         for point in (min_length, max_length + 1)})
+        hits: List[Tuple[int, ...]] = []
+        for point in points:
+            hits.append(tuple(index for min_length, max_length, index in length_rules
+                              if min_length <= point <= max_length))
+        return points, hits
+
+    def _length_matches(self, length: int) -> Tuple[int, ...]:
+        position = bisect_right(self._length_points, length) - 1
+        if position < 0:
+            return ()
+        return self._length_hits[position]
+
+    def matching_indices(self, tag: str, context_tags: Optional[List[str]] = None) -> List[int]:
+        """一致したルールの位置（昇順）"""
+        matched = set(self._always)
+        if len(self._keywords):
+            matched.update(self._keywords.find_all(tag.lower()))
+        if context_tags and self._context_index:
+            counts: Dict[int, int] = {}
+            for context_tag in {ct.lower() for ct in context_tags}:
+                for index in self._context_index.get(context_tag, ()):
+                    counts[index] = counts.get(index, 0) + 1
+            matched.update(index for index, count in counts.items()
+                           if count == self._context_required[index])
+        if self._length_points:
+            matched.update(self._length_matches(len(tag)))
+        return sorted(matched)
+
+    def evaluate(self, tag: str, context_tags: Optional[List[str]] = None) -> Dict[str, Any]:
+        """一致したルールのID → アクション"""
+        results: Dict[str, Any] = {}
+        for index in self.matching_indices(tag, context_tags):
+            rule_id, action = self.rules[index]
+            results[rule_id] = action
+        return results
@@ -0,0 +1,136 @@
+"""
+タグ検索結果のキャッシュ
+
+(タブ, 検索語) をキーに絞り込み結果を保持する。"lon" → "long" → "long h" のように
+検索語が前回の語を含む場合は、全件ではなく前回の結果から絞り込めるよう基準となる結果を返す。
+タグストアの版（TagManager.version）が変わったらすべて破棄する。
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from modules.tag_collection import FLAG_FAVORITE, TagCollection
+
+TagList = Union[List[Dict[str, Any]], TagCollection]
+
+# お気に入りを検索する特別な語（文字列一致しなくてもお気に入りなら一致扱い）
+FAVORITE_SEARCH_WORDS = ("fav", "favorite", "お気に入り")
+DEFAULT_MAX_ENTRIES = 32
+
+
+def can_narrow_from(base_query: str, query: str) -> bool:
+    """
+    base_queryの結果からqueryの結果を絞り込めるかを判定する純粋関数
+
+    部分一致検索なので、queryがbase_queryを含めば結果は必ず部分集合になる。
+    ただしqueryがお気に入り検索語の場合は文字列に含まれないタグも一致するため、
+    空の検索語（全件）以外からは絞り込めない。
+    """
+    if base_query not in query:
+        return False
+    return base_query == "" or query not in FAVORITE_SEARCH_WORDS
+
+
+def filter_tags(tags: TagList, query: str, category: str) -> TagList:
+    """
+    検索語でタグ名・カテゴリ・日本語訳・お気に入りを横断的に絞り込み、タブ（カテゴリ）で絞り込む純粋関数
+
+    queryは小文字化・前後空白除去済みであること。TagCollectionを渡すとTagCollectionを返す。
+    """
+    if isinstance(tags, TagCollection):
+        return filter_tag_collection(tags, query, category)
+
+    def in_tab(t: Dict[str, Any]) -> bool:
+        return category == "全カテゴリ" or t["category"] == category or category == "お気に入り" and t["favorite"]
+
+    if not query:
+        return [t for t in tags if in_tab(t)]
+
+    def match(t: Dict[str, Any]) -> bool:
+        return (
+            query in t["tag"].lower()
+            or query in t.get("jp", "").lower()
+            or query in t.get("category", "").lower()
+            or (query in FAVORITE_SEARCH_WORDS and t.get("favorite", False))
+        )
+
+    # 検索語で絞り込んでからカテゴリで絞り込む
+    return [t for t in tags if match(t) and in_tab(t)]
+
+
+def filter_tag_collection(tags: TagCollection, query: str, category: str) -> TagCollection:
+    """filter_tagsと同じ条件でTagCollectionを絞り込む（行のビューを作らず列を直接走査する）"""
+    tab_id = tags.lookup_category(category)
+    all_tabs = category == "全カテゴリ"
+    favorite_tab = category == "お気に入り"
+    favorite_query = query in FAVORITE_SEARCH_WORDS
+    # カテゴリ名の一致はカテゴリ毎に1回だけ判定する
+    category_matches = [query in name.lower() for name in tags.categories]
+    rows = []
+    for index, (tag, jp, category_id, flags) in enumerate(zip(tags.tags, tags.jps, tags.category_ids, tags.flags)):
+        if not (all_tabs or category_id == tab_id or favorite_tab and flags & FLAG_FAVORITE):
+            continue
+        if query and not (query in tag.lower() or query in (jp or "").lower() or category_matches[category_id]
+                          or favorite_query and flags & FLAG_FAVORITE):
+            continue
+        rows.append(index)
+    return tags.take(rows)
+
+
+class SearchResultCache:
+    """
+    (タブ, 検索語) → 絞り込み結果 のLRUキャッシュ
+
+    結果のリストは共有されるため、呼び出し側で変更しないこと。
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], TagList]" = OrderedDict()
+        self._version: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _check_version(self, version: int) -> None:
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+
+    def get(self, tab: str, query: str, version: int) -> Optional[TagList]:
+        """完全一致するキャッシュを返す"""
+        with self._lock:
+            self._check_version(version)
+            key = (tab, query)
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+            return result
+
+    def find_base(self, tab: str, query: str, version: int) -> Optional[TagList]:
+        """
+        queryの絞り込みの起点にできる結果のうち、最も長い検索語のものを返す
+        """
+        with self._lock:
+            self._check_version(version)
+            best_query = None
+            for cached_tab, cached_query in self._entries:
+                if cached_tab != tab or not can_narrow_from(cached_query, query):
+                    continue
+                if best_query is None or len(cached_query) > len(best_query):
+                    best_query = cached_query
+            if best_query is None:
+                return None
+            return self._entries[(tab, best_query)]
+
+    def put(self, tab: str, query: str, version: int, results: TagList) -> None:
+        with self._lock:
+            self._check_version(version)
+            key = (tab, query)
+            self._entries[key] = results
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._version = None
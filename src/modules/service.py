@@ -0,0 +1,369 @@
+"""
+TagManagerとAIPredictorを公開するローカルJSON-RPCサービス
+
+他のプロセス（画像生成ツールなど）から、カテゴリ予測・類似タグ・検索・オートコンプリート・タグ追加を
+呼び出せるようにする。モデル・索引・タグストアを1プロセスで保持し続けるため、呼び出しのたびに
+読み込み直す必要がない。
+
+    python -m modules.service --port 8765            # http://127.0.0.1:8765/rpc
+    python -m modules.service --unix /tmp/tags.sock   # Unixソケット（同じHTTPプロトコル）
+
+プロトコルはHTTP/1.1（keep-alive対応）上のJSON-RPC 2.0。POST /rpc にリクエスト（またはその配列）を送る。
+処理は上限付きのワーカースレッドで並行に行い、同時に受け付ける処理数も上限で抑える。
+    predict       {"tags": [...], "context_tags": [...], "threshold": 0.5}
+    similar       {"tags": [...], "limit": 5}
+    search        {"query": "hair", "category": "全カテゴリ", "limit": 100}
+    autocomplete  {"prefixes": [...], "limit": 10}
+    tags          {"after": null, "limit": 1000, "order": "id", "category": null, "is_negative": null}
+                  → {"tags": [...], "next": 次のafter（最後ならnull）}
+    add_tags      {"tags": [...], "is_negative": false}
+    stats         {}
+"""
+import argparse
+import asyncio
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 4
+MAX_PENDING_PER_WORKER = 16  # ワーカー1つあたりの受付上限（超えた要求は空きが出るまで待たせる）
+MAX_BATCH_SIZE = 1000        # 1回の呼び出しで受け付ける要素数の上限
+MAX_BODY_SIZE = 8 * 1024 * 1024
+
+# JSON-RPC 2.0のエラーコード
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+
+class RpcError(Exception):
+    """呼び出し側に返すJSON-RPCのエラー"""
+
+    def __init__(self, code: int, message: str) -> None:
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def _string_list(params: Dict[str, Any], key: str) -> List[str]:
+    values = params.get(key)
+    if isinstance(values, str):
+        values = [values]
+    if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+        raise RpcError(INVALID_PARAMS, f"{key}は文字列の配列で指定してください")
+    if len(values) > MAX_BATCH_SIZE:
+        raise RpcError(INVALID_PARAMS, f"{key}は{MAX_BATCH_SIZE}件以下で指定してください")
+    return values
+
+
+class TagService:
+    """
+    RPCメソッドの実装（同期処理。ワーカースレッドから呼ばれる）
+
+    TagManagerの接続は1本なので、DBを触る処理は_db_lockで直列化する。
+    予測・類似タグはDBを使わないため並行に実行できる。
+    """
+
+    def __init__(self, tag_manager: Any, predictor_factory: Optional[Callable[[], Any]] = None) -> None:
+        from modules.search_cache import SearchResultCache
+        self.tag_manager = tag_manager
+        self._predictor_factory = predictor_factory
+        self._predictor: Any = None
+        self._predictor_lock = threading.Lock()
+        self._db_lock = threading.RLock()
+        self._search_cache = SearchResultCache()
+        self.methods: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+            "predict": self.predict,
+            "similar": self.similar,
+            "search": self.search,
+            "autocomplete": self.autocomplete,
+            "tags": self.tags,
+            "add_tags": self.add_tags,
+            "stats": self.stats,
+        }
+
+    @property
+    def predictor(self) -> Any:
+        """AIPredictor（初回利用時に取得し、以降は同じインスタンスを使う）"""
+        if self._predictor is None:
+            with self._predictor_lock:
+                if self._predictor is None:
+                    if self._predictor_factory is None:
+                        from modules.ai_predictor import get_ai_predictor
+                        self._predictor_factory = get_ai_predictor
+                    self._predictor = self._predictor_factory()
+        return self._predictor
+
+    def predict(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        tags = _string_list(params, "tags")
+        context_tags = _string_list(params, "context_tags") if params.get("context_tags") else None
+        threshold = float(params.get("threshold", 0.5))
+        results = []
+        for tag in tags:
+            category, confidence, _ = self.predictor.predict_category_with_confidence(
+                tag, context_tags, confidence_threshold=threshold, include_details=False)
+            results.append({"tag": tag, "category": category, "confidence": confidence})
+        return results
+
+    def similar(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        tags = _string_list(params, "tags")
+        limit = int(params.get("limit", 5))
+        return [{"tag": tag, "similar": [[name, score] for name, score in self.predictor.suggest_similar_tags(tag, limit)]}
+                for tag in tags]
+
+    def _tags_for_category(self, category: str) -> Any:
+        if category == "ネガティブ":
+            return self.tag_manager.negative_tags
+        if category in ("全カテゴリ", "未分類"):
+            return self.tag_manager.get_tag_collection()
+        return self.tag_manager.positive_tags
+
+    def search(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        from modules.search_cache import filter_tags
+        query = str(params.get("query", "")).lower().strip()
+        category = str(params.get("category", "全カテゴリ"))
+        limit = int(params.get("limit", 100))
+        with self._db_lock:
+            version = self.tag_manager.version
+            results = self._search_cache.get(category, query, version)
+            if results is None:
+                source = self._search_cache.find_base(category, query, version)
+                if source is None:
+                    source = self._tags_for_category(category)
+                results = filter_tags(source, query, category)
+                self._search_cache.put(category, query, version, results)
+        return results[:limit].to_dicts()
+
+    def autocomplete(self, params: Dict[str, Any]) -> Dict[str, List[str]]:
+        prefixes = _string_list(params, "prefixes")
+        limit = int(params.get("limit", 10))
+        with self._db_lock:
+            index = self.tag_manager.get_autocomplete_index()
+        return {prefix: index.search(prefix, limit) for prefix in prefixes}
+
+    def tags(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """タグ一覧をキーセット方式で1ページずつ返す（全件を取るときはnextを次のafterに渡して繰り返す）"""
+        limit = int(params.get("limit", MAX_BATCH_SIZE))
+        if not 0 < limit <= MAX_BATCH_SIZE:
+            raise RpcError(INVALID_PARAMS, f"limitは1以上{MAX_BATCH_SIZE}以下で指定してください")
+        flags = {key: params.get(key) for key in ("is_negative", "favorite")}
+        if any(value is not None and not isinstance(value, bool) for value in flags.values()):
+            raise RpcError(INVALID_PARAMS, "is_negative・favoriteはtrue/false/nullで指定してください")
+        with self._db_lock:
+            tags, next_key = self.tag_manager.page(params.get("after"), limit, str(params.get("order", "id")),
+                                                   params.get("category"), **flags)
+        return {"tags": tags, "next": next_key}
+
+    def add_tags(self, params: Dict[str, Any]) -> Dict[str, int]:
+        from modules.cli import _record, import_tags
+        tags = params.get("tags")
+        if not isinstance(tags, list) or len(tags) > MAX_BATCH_SIZE:
+            raise RpcError(INVALID_PARAMS, f"tagsは{MAX_BATCH_SIZE}件以下の配列で指定してください")
+        records = []
+        for item in tags:
+            if isinstance(item, str):
+                records.append(_record(item))
+            elif isinstance(item, dict):
+                records.append(_record(item.get("tag", ""), item.get("jp", ""), item.get("category", ""),
+                                       item.get("favorite", False), item.get("is_negative", False)))
+            else:
+                raise RpcError(INVALID_PARAMS, "tagsの要素は文字列かオブジェクトで指定してください")
+        with self._db_lock:
+            return import_tags(self.tag_manager, records, chunk_size=MAX_BATCH_SIZE,
+                               negative=bool(params.get("is_negative", False)))
+
+    def stats(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        from modules.cli import collect_stats
+        with self._db_lock:
+            return collect_stats(self.tag_manager)
+
+
+class RpcServer:
+    """
+    asyncioで動くHTTP/JSON-RPCサーバー
+
+    受付はイベントループで行い、メソッドの実行はmax_workers本のスレッドプールに回す。
+    同時に実行・待機できる呼び出し数はセマフォで制限する。
+    """
+
+    def __init__(self, service: TagService, max_workers: int = DEFAULT_WORKERS,
+                 max_pending: Optional[int] = None) -> None:
+        self.service = service
+        self.logger = logging.getLogger(__name__)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="TagService")
+        self._max_pending = max_pending or max_workers * MAX_PENDING_PER_WORKER
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                    unix_path: Optional[str] = None) -> asyncio.AbstractServer:
+        self._slots = asyncio.Semaphore(self._max_pending)
+        if unix_path:
+            self._server = await asyncio.start_unix_server(self._handle_connection, path=unix_path)
+        else:
+            self._server = await asyncio.start_server(self._handle_connection, host, port)
+        return self._server
+
+    @property
+    def port(self) -> Optional[int]:
+        if self._server is None or not self._server.sockets:
+            return None
+        address = self._server.sockets[0].getsockname()
+        return address[1] if isinstance(address, tuple) else None
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self._executor.shutdown(wait=True)
+
+    # --- JSON-RPC ---
+    async def _call(self, request: Any) -> Optional[Dict[str, Any]]:
+        """リクエスト1件を処理する（通知＝idなしなら応答しない）"""
+        if not isinstance(request, dict) or request.get("jsonrpc") != "2.0" or not isinstance(request.get("method"), str):
+            return self._error(None, INVALID_REQUEST, "Invalid Request")
+        request_id = request.get("id")
+        method = self.service.methods.get(request["method"])
+        params = request.get("params", {})
+        if method is None:
+            response = self._error(request_id, METHOD_NOT_FOUND, f"Method not found: {request['method']}")
+        elif not isinstance(params, dict):
+            response = self._error(request_id, INVALID_PARAMS, "paramsはオブジェクトで指定してください")
+        else:
+            assert self._slots is not None
+            async with self._slots:
+                try:
+                    loop = asyncio.get_running_loop()
+                    result = await loop.run_in_executor(self._executor, method, params)
+                    response = {"jsonrpc": "2.0", "id": request_id, "result": result}
+                except RpcError as e:
+                    response = self._error(request_id, e.code, e.message)
+                except (TypeError, ValueError) as e:
+                    response = self._error(request_id, INVALID_PARAMS, str(e))
+                except Exception as e:
+                    self.logger.exception(f"RPC呼び出しに失敗 ({request['method']})")
+                    response = self._error(request_id, INTERNAL_ERROR, str(e))
+        return None if "id" not in request else response
+
+    @staticmethod
+    def _error(request_id: Any, code: int, message: str) -> Dict[str, Any]:
+        return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+    async def handle_payload(self, body: bytes) -> Optional[Any]:
+        """リクエスト本文（単体または配列）を処理し、応答（なければNone）を返す"""
+        try:
+            payload = json.loads(body.decode("utf-8"))
+        except (UnicodeDecodeError, ValueError):
+            return self._error(None, PARSE_ERROR, "Parse error")
+        if isinstance(payload, list):
+            if not payload:
+                return self._error(None, INVALID_REQUEST, "Invalid Request")
+            responses = await asyncio.gather(*(self._call(request) for request in payload))
+            responses = [response for response in responses if response is not None]
+            return responses or None
+        return await self._call(payload)
+
+    # --- HTTP ---
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                if method == "GET" and path == "/health":
+                    status, payload = 200, {"status": "ok"}
+                elif method == "POST" and path == "/rpc":
+                    status, payload = 200, await self.handle_payload(body)
+                else:
+                    status, payload = 404, {"error": "not found"}
+                keep_alive = headers.get("connection", "").lower() != "close"
+                self._write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except ValueError as e:
+            self._write_response(writer, 400, {"error": str(e)}, keep_alive=False)
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        parts = request_line.decode("latin-1").split()
+        if len(parts) != 3:
+            raise ValueError("不正なリクエスト行です")
+        headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", "0") or 0)
+        if length > MAX_BODY_SIZE:
+            raise ValueError("リクエストが大きすぎます")
+        body = await reader.readexactly(length) if length else b""
+        return parts[0].upper(), parts[1], headers, body
+
+    @staticmethod
+    def _write_response(writer: asyncio.StreamWriter, status: int, payload: Any, keep_alive: bool) -> None:
+        reasons = {200: "OK", 204: "No Content", 400: "Bad Request", 404: "Not Found"}
+        if payload is None:
+            status, body = 204, b""
+        else:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (f"HTTP/1.1 {status} {reasons.get(status, 'OK')}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+
+
+async def serve(args: argparse.Namespace) -> None:
+    from modules.tag_manager import TagManager
+    if args.db:
+        db_file = args.db
+    else:
+        from modules.constants import DB_FILE
+        db_file = DB_FILE
+    tag_manager = TagManager(db_file=db_file)
+    server = RpcServer(TagService(tag_manager), max_workers=args.workers)
+    await server.start(args.host, args.port, args.unix)
+    where = args.unix or f"http://{args.host}:{server.port}/rpc"
+    logging.getLogger(__name__).info(f"タグサービスを開始しました: {where}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+        tag_manager.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m modules.service", description="Tag ManagerのローカルRPCサービス")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", help="TCPの代わりに使うUnixソケットのパス")
+    parser.add_argument("--db", help="タグデータベースのパス（既定はアプリと同じ）")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
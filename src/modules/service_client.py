@@ -0,0 +1,138 @@
+"""
+タグサービス（modules.service）のクライアントと負荷試験
+
+    client = ServiceClient("127.0.0.1", 8765)
+    client.call("predict", {"tags": ["blue hair"]})
+
+    python -m modules.service_client --concurrency 32 --requests 2000 --method autocomplete
+"""
+import argparse
+import asyncio
+import http.client
+import itertools
+import json
+import statistics
+import time
+from typing import Any, Dict, List, Optional
+
+
+class ServiceError(Exception):
+    """サービスがJSON-RPCのエラーを返した"""
+
+    def __init__(self, code: int, message: str) -> None:
+        super().__init__(f"{code}: {message}")
+        self.code = code
+
+
+class ServiceClient:
+    """keep-aliveの接続を使い回す同期クライアント"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765, timeout: float = 30.0) -> None:
+        self._connection = http.client.HTTPConnection(host, port, timeout=timeout)
+        self._ids = itertools.count(1)
+
+    def call(self, method: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        request = {"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": params or {}}
+        response = self._post(request)
+        if "error" in response:
+            raise ServiceError(response["error"]["code"], response["error"]["message"])
+        return response["result"]
+
+    def batch(self, calls: List[Any]) -> List[Dict[str, Any]]:
+        """(method, params)のリストを1回の要求で送り、id順に並べた応答を返す"""
+        requests = [{"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": params}
+                    for method, params in calls]
+        responses = {response["id"]: response for response in self._post(requests)}
+        return [responses[request["id"]] for request in requests]
+
+    def _post(self, payload: Any) -> Any:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self._connection.request("POST", "/rpc", body, {"Content-Type": "application/json"})
+        return json.loads(self._connection.getresponse().read().decode("utf-8"))
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+SAMPLE_PARAMS = {
+    "predict": {"tags": ["blue hair", "smile", "school uniform", "outdoors"]},
+    "similar": {"tags": ["smile"], "limit": 5},
+    "search": {"query": "hair", "limit": 50},
+    "autocomplete": {"prefixes": ["b", "bl", "lo", "sm"], "limit": 10},
+    "stats": {},
+}
+
+
+async def _worker(host: str, port: int, method: str, params: Dict[str, Any], counter: "itertools.count",
+                  total: int, latencies: List[float], errors: List[str]) -> None:
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while next(counter) < total:
+            body = json.dumps({"jsonrpc": "2.0", "id": 1, "method": method, "params": params}).encode("utf-8")
+            started = time.perf_counter()
+            writer.write(f"POST /rpc HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+            await writer.drain()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                if name.strip().lower() == "content-length":
+                    length = int(value)
+            response = json.loads(await reader.readexactly(length))
+            latencies.append(time.perf_counter() - started)
+            if "error" in response:
+                errors.append(response["error"]["message"])
+    finally:
+        writer.close()
+
+
+async def run_load_test(host: str, port: int, method: str = "autocomplete", params: Optional[Dict[str, Any]] = None,
+                        concurrency: int = 16, requests: int = 1000) -> Dict[str, Any]:
+    """
+    concurrency本の接続から合計requests回呼び出し、スループットと遅延の分布を返す
+    """
+    params = SAMPLE_PARAMS.get(method, {}) if params is None else params
+    latencies: List[float] = []
+    errors: List[str] = []
+    counter = itertools.count()
+    started = time.perf_counter()
+    await asyncio.gather(*(_worker(host, port, method, params, counter, requests, latencies, errors)
+                           for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    def percentile(p: float) -> float:
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 3) if latencies else 0.0
+
+    return {
+        "method": method,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "concurrency": concurrency,
+        "elapsed_sec": round(elapsed, 3),
+        "requests_per_sec": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {"mean": round(statistics.mean(latencies) * 1000, 3) if latencies else 0.0,
+                       "p50": percentile(0.50), "p95": percentile(0.95), "p99": percentile(0.99)},
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m modules.service_client", description="タグサービスの負荷試験")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--method", default="autocomplete", choices=sorted(SAMPLE_PARAMS))
+    parser.add_argument("--params", help="JSONで指定するパラメータ（省略時は既定のサンプル）")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=1000)
+    args = parser.parse_args(argv)
+    params = json.loads(args.params) if args.params else None
+    result = asyncio.run(run_load_test(args.host, args.port, args.method, params, args.concurrency, args.requests))
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
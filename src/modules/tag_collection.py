@@ -0,0 +1,201 @@
+"""
+大量のタグを少ないメモリで保持するコレクション
+
+タグ1件を辞書にすると、辞書本体に加えて行ごとに別のカテゴリ文字列・真偽値の参照を持つため、
+20万件では数百MBになりGCの停止も長くなる。TagCollectionは列ごとの配列
+（タグ名・日本語訳のリスト、カテゴリ番号の配列、お気に入り/ネガティブのビット列）で保持し、
+カテゴリ名は1つの表に集約（インターン）する。
+
+既存の呼び出し側のために、行はTagView（辞書と同じように t["tag"]・t.get()・dict(t) が使える
+軽量なビュー）として取り出せる。JSONに書き出すなど本物の辞書が必要な場合はto_dicts()を使う。
+"""
+import sys
+from array import array
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+FLAG_FAVORITE = 0x01
+FLAG_NEGATIVE = 0x02
+
+# load_tags() の行のキー（is_negativeは持たない）と get_all_tags() の行のキー
+TAG_KEYS = ("tag", "jp", "favorite", "category")
+TAG_KEYS_WITH_NEGATIVE = TAG_KEYS + ("is_negative",)
+
+
+class TagView(Mapping):
+    """TagCollectionの1行を辞書のように見せるビュー（値の書き換えもコレクションに反映される）"""
+
+    __slots__ = ("_collection", "_index")
+
+    def __init__(self, collection: "TagCollection", index: int) -> None:
+        self._collection = collection
+        self._index = index
+
+    def __getitem__(self, key: str) -> Any:
+        collection, index = self._collection, self._index
+        if key == "tag":
+            return collection.tags[index]
+        if key == "jp":
+            return collection.jps[index]
+        if key == "category":
+            return collection.categories[collection.category_ids[index]]
+        if key == "favorite":
+            return bool(collection.flags[index] & FLAG_FAVORITE)
+        if key == "is_negative" and collection.with_negative:
+            return bool(collection.flags[index] & FLAG_NEGATIVE)
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        collection, index = self._collection, self._index
+        if key == "tag":
+            collection.tags[index] = value
+            collection._positions = None
+        elif key == "jp":
+            collection.jps[index] = value
+        elif key == "category":
+            collection.category_ids[index] = collection._category_id(value or "")
+        elif key in ("favorite", "is_negative") and key in collection.keys:
+            bit = FLAG_FAVORITE if key == "favorite" else FLAG_NEGATIVE
+            flags = collection.flags[index]
+            collection.flags[index] = (flags | bit) if value else (flags & ~bit)
+        else:
+            raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._collection.keys)
+
+    def __len__(self) -> int:
+        return len(self._collection.keys)
+
+    def __repr__(self) -> str:
+        return f"TagView({dict(self)!r})"
+
+
+class TagCollection(Sequence):
+    """
+    列ごとの配列で保持するタグの並び（DBから読んだ順を保つ）
+
+    with_negative=Falseの場合、行にis_negativeキーを持たない（load_tags()の辞書と同じ形）。
+    """
+
+    def __init__(self, with_negative: bool = True, categories: Optional[List[str]] = None,
+                 category_lookup: Optional[Dict[str, int]] = None) -> None:
+        self.with_negative = with_negative
+        self.keys = TAG_KEYS_WITH_NEGATIVE if with_negative else TAG_KEYS
+        self.tags: List[str] = []
+        self.jps: List[Optional[str]] = []
+        self.category_ids = array('I')
+        self.flags = bytearray()
+        # カテゴリ名の表（部分集合とは共有する。追記しかしないので共有しても安全）
+        self.categories: List[str] = categories if categories is not None else []
+        self._category_lookup: Dict[str, int] = category_lookup if category_lookup is not None else {}
+        self._positions: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Sequence[Any]], with_negative: bool = True) -> "TagCollection":
+        """(tag, jp, favorite, category[, is_negative]) の行から作る（SQLiteの行をそのまま渡せる）"""
+        collection = cls(with_negative)
+        for row in rows:
+            collection.append(row[0], row[1], row[2], row[3], row[4] if with_negative else False)
+        return collection
+
+    @classmethod
+    def from_dicts(cls, tags: Iterable[Dict[str, Any]], with_negative: bool = True) -> "TagCollection":
+        collection = cls(with_negative)
+        for t in tags:
+            collection.append(t["tag"], t.get("jp", ""), t.get("favorite", False), t.get("category"),
+                              t.get("is_negative", False))
+        return collection
+
+    def _category_id(self, category: str) -> int:
+        category_id = self._category_lookup.get(category)
+        if category_id is None:
+            category_id = len(self.categories)
+            self.categories.append(sys.intern(category))
+            self._category_lookup[category] = category_id
+        return category_id
+
+    def lookup_category(self, category: str) -> Optional[int]:
+        """カテゴリ名の番号（表に無ければNone）"""
+        return self._category_lookup.get(category)
+
+    def append(self, tag: str, jp: Optional[str], favorite: Any, category: Optional[str],
+               is_negative: Any = False) -> None:
+        self.tags.append(tag)
+        self.jps.append(jp)
+        self.category_ids.append(self._category_id(category or ""))
+        self.flags.append((FLAG_FAVORITE if favorite else 0) | (FLAG_NEGATIVE if is_negative else 0))
+        if self._positions is not None:
+            self._positions.setdefault(tag, len(self.tags) - 1)
+
+    def take(self, rows: Iterable[int]) -> "TagCollection":
+        """指定した行番号の行だけを持つコレクション（カテゴリ表は共有する）"""
+        subset = TagCollection(self.with_negative, self.categories, self._category_lookup)
+        tags, jps, category_ids, flags = self.tags, self.jps, self.category_ids, self.flags
+        rows = list(rows)
+        subset.tags = [tags[i] for i in rows]
+        subset.jps = [jps[i] for i in rows]
+        subset.category_ids = array('I', [category_ids[i] for i in rows])
+        subset.flags = bytearray(flags[i] for i in rows)
+        return subset
+
+    def with_categories(self, categories: Iterable[str]) -> "TagCollection":
+        """カテゴリがいずれかに一致する行だけを持つコレクション"""
+        wanted = {self._category_lookup[c] for c in categories if c in self._category_lookup}
+        return self.take(i for i, category_id in enumerate(self.category_ids) if category_id in wanted)
+
+    def __len__(self) -> int:
+        return len(self.tags)
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:  # type: ignore[override]
+        if isinstance(index, slice):
+            return self.take(range(*index.indices(len(self))))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("TagCollection index out of range")
+        return TagView(self, index)
+
+    def __iter__(self) -> Iterator[TagView]:
+        for index in range(len(self)):
+            yield TagView(self, index)
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, (TagCollection, list, tuple)):
+            return NotImplemented
+        return len(self) == len(other) and all(view == item for view, item in zip(self, other))
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"TagCollection({len(self)} tags)"
+
+    def find(self, tag: str) -> Optional[TagView]:
+        """タグ名で行を探す（初回呼び出し時に位置の索引を作る）"""
+        if self._positions is None:
+            positions: Dict[str, int] = {}
+            for index, name in enumerate(self.tags):
+                positions.setdefault(name, index)
+            self._positions = positions
+        index = self._positions.get(tag)
+        return None if index is None else TagView(self, index)
+
+    def category_of(self, tag: str, default: Optional[str] = None) -> Optional[str]:
+        view = self.find(tag)
+        return default if view is None else view["category"]
+
+    def tree_rows(self) -> List[Tuple[str, str, str, str]]:
+        """タグ一覧（Treeview）の行 (tag, jp, ★, category) を作る"""
+        categories = self.categories
+        return [(tag, jp, "★" if flags & FLAG_FAVORITE else "", categories[category_id])
+                for tag, jp, category_id, flags in zip(self.tags, self.jps, self.category_ids, self.flags)]
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """従来と同じ辞書のリストに変換する（JSONへの書き出しなど）"""
+        categories = self.categories
+        if self.with_negative:
+            return [{"tag": tag, "jp": jp, "favorite": bool(flags & FLAG_FAVORITE),
+                     "category": categories[category_id], "is_negative": bool(flags & FLAG_NEGATIVE)}
+                    for tag, jp, category_id, flags in zip(self.tags, self.jps, self.category_ids, self.flags)]
+        return [{"tag": tag, "jp": jp, "favorite": bool(flags & FLAG_FAVORITE), "category": categories[category_id]}
+                for tag, jp, category_id, flags in zip(self.tags, self.jps, self.category_ids, self.flags)]
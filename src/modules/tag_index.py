@@ -0,0 +1,149 @@
+"""
+タグのオートコンプリート用インデックス
+
+小文字化したタグ名と日本語訳をソート済み配列に保持し、bisectで前方一致範囲を求める。
+タグの追加・削除・リネームに合わせて差分更新でき、候補は使用頻度順に上位k件を返す。
+"""
+import bisect
+import heapq
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+DEFAULT_LIMIT = 20
+# 短いプレフィックスは一致範囲が広いので上位候補をキャッシュする
+CACHED_PREFIX_LENGTH = 2
+CACHED_TOP_K = 50
+_MAX_CHAR = "\U0010ffff"
+
+
+class AutocompleteIndex:
+    """
+    前方一致検索用のソート済みインデックス
+
+    - エントリは (小文字化した検索語, タグ名) のタプルで、1タグにつき英語・日本語の最大2件
+    - 候補の並びは使用回数の降順、同数ならタグ名の昇順
+    """
+
+    def __init__(self, ignored_jp: Optional[Iterable[str]] = None) -> None:
+        self._entries: List[Tuple[str, str]] = []
+        self._terms: Dict[str, Tuple[str, ...]] = {}
+        self._usage: Dict[str, int] = {}
+        self._top_cache: Dict[str, List[str]] = {}
+        self._ignored_jp: Set[str] = set(ignored_jp or ())
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def __contains__(self, tag: str) -> bool:
+        return tag in self._terms
+
+    def _make_terms(self, tag: str, jp: Optional[str]) -> Tuple[str, ...]:
+        terms = [tag.lower()]
+        if jp and jp not in self._ignored_jp:
+            jp_term = jp.lower()
+            if jp_term != terms[0]:
+                terms.append(jp_term)
+        return tuple(terms)
+
+    def _invalidate_prefixes(self, term: str) -> None:
+        for length in range(1, CACHED_PREFIX_LENGTH + 1):
+            self._top_cache.pop(term[:length], None)
+
+    def _insert_terms(self, tag: str, terms: Tuple[str, ...]) -> None:
+        for term in terms:
+            bisect.insort(self._entries, (term, tag))
+            self._invalidate_prefixes(term)
+        self._terms[tag] = terms
+
+    def _remove_terms(self, tag: str) -> None:
+        for term in self._terms.pop(tag, ()):
+            index = bisect.bisect_left(self._entries, (term, tag))
+            if index < len(self._entries) and self._entries[index] == (term, tag):
+                del self._entries[index]
+            self._invalidate_prefixes(term)
+
+    # --- 構築・更新 ---
+    def build(self, tags: Iterable[Tuple[str, Optional[str]]],
+              usage_counts: Optional[Dict[str, int]] = None) -> None:
+        """(タグ, 日本語訳) の列からインデックスを一括構築する"""
+        with self._lock:
+            self._terms = {}
+            entries = []
+            for tag, jp in tags:
+                if not tag:
+                    continue
+                terms = self._make_terms(tag, jp)
+                self._terms[tag] = terms
+                entries.extend((term, tag) for term in terms)
+            entries.sort()
+            self._entries = entries
+            self._usage = dict(usage_counts or {})
+            self._top_cache = {}
+
+    def add(self, tag: str, jp: Optional[str] = None) -> None:
+        """タグを追加する（既存の場合は日本語訳を更新する）"""
+        if not tag:
+            return
+        with self._lock:
+            terms = self._make_terms(tag, jp)
+            if self._terms.get(tag) == terms:
+                return
+            self._remove_terms(tag)
+            self._insert_terms(tag, terms)
+
+    def remove(self, tag: str) -> None:
+        with self._lock:
+            self._remove_terms(tag)
+            self._usage.pop(tag, None)
+
+    def rename(self, old_tag: str, new_tag: str, jp: Optional[str] = None) -> None:
+        """タグ名・日本語訳の変更を反映する（使用回数は引き継ぐ）"""
+        with self._lock:
+            usage = self._usage.pop(old_tag, 0)
+            self._remove_terms(old_tag)
+            if new_tag:
+                self._insert_terms(new_tag, self._make_terms(new_tag, jp))
+                if usage:
+                    self._usage[new_tag] = usage
+
+    def set_usage(self, tag: str, count: int) -> None:
+        with self._lock:
+            self._usage[tag] = count
+            for term in self._terms.get(tag, ()):
+                self._invalidate_prefixes(term)
+
+    def increment_usage(self, tag: str, amount: int = 1) -> None:
+        with self._lock:
+            self._usage[tag] = self._usage.get(tag, 0) + amount
+            for term in self._terms.get(tag, ()):
+                self._invalidate_prefixes(term)
+
+    # --- 検索 ---
+    def _rank(self, tags: Iterable[str], limit: int) -> List[str]:
+        usage = self._usage
+        return heapq.nsmallest(limit, tags, key=lambda t: (-usage.get(t, 0), t))
+
+    def _scan(self, prefix: str, limit: int) -> List[str]:
+        lo = bisect.bisect_left(self._entries, (prefix,))
+        hi = bisect.bisect_left(self._entries, (prefix + _MAX_CHAR,), lo)
+        if lo == hi:
+            return []
+        matched = {tag for _, tag in self._entries[lo:hi]}
+        return self._rank(matched, limit)
+
+    def search(self, prefix: str, limit: int = DEFAULT_LIMIT) -> List[str]:
+        """
+        前方一致する候補タグを使用回数順に最大limit件返す
+        """
+        prefix = prefix.lower()
+        if not prefix:
+            return []
+        with self._lock:
+            if len(prefix) <= CACHED_PREFIX_LENGTH and limit <= CACHED_TOP_K:
+                cached = self._top_cache.get(prefix)
+                if cached is None:
+                    cached = self._scan(prefix, CACHED_TOP_K)
+                    self._top_cache[prefix] = cached
+                return cached[:limit]
+            return self._scan(prefix, limit)
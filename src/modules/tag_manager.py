@@ -3,14 +3,44 @@ import datetime
 import json
 import logging
 import re
-from tkinter import messagebox
-from typing import Any, Optional, Dict, List, Tuple, Union, Callable
-import tkinter as tk
-from deep_translator import GoogleTranslator
+import threading
+from typing import Any, Optional, Dict, Iterable, Iterator, List, Mapping, Set, Tuple, Union, Callable, TYPE_CHECKING
 from modules.constants import DB_FILE, category_keywords, TRANSLATING_PLACEHOLDER
+from modules.tag_index import AutocompleteIndex
+from modules.tag_collection import TagCollection
+from modules.db_migrations import analyze, migrate
 import csv
 import os
 
+if TYPE_CHECKING:
+    import tkinter as tk
+
+# IN句に並べるパラメータ数の上限（SQLiteの変数上限999を下回るように分割する）
+BULK_CHUNK_SIZE = 500
+# page()/iter_tags() の1回のSELECTで読む件数
+DEFAULT_PAGE_SIZE = 1000
+# page()/iter_tags() で指定できる並び順（どちらもインデックス順に読める列: idはrowid、tagはUNIQUE索引）
+TAG_ORDERS = ("id", "tag")
+# 一括取り込みの後にANALYZEを実行する追加・更新件数の下限
+ANALYZE_MIN_ROWS = 1000
+# カテゴリ名からcategories.idを引く副問い合わせ（空のカテゴリは登録しないのでNULLになる）
+CATEGORY_ID_SQL = "(SELECT id FROM categories WHERE name = ?)"
+
+
+def category_condition(category: Optional[str], column: str = "category_id") -> Tuple[str, Tuple[Any, ...]]:
+    """カテゴリ名で絞り込むWHERE句の条件とパラメータ（空のカテゴリはcategory_idがNULLの行）"""
+    if not category:
+        return f"{column} IS NULL", ()
+    return f"{column} = {CATEGORY_ID_SQL}", (category,)
+
+
+def __getattr__(name: str) -> Any:
+    # CLIなどTkを使わない環境で読み込めるよう、tkinter.messageboxは参照されたときに読み込む
+    if name == "messagebox":
+        from tkinter import messagebox
+        return messagebox
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 # --- 純粋関数: タグ正規化・バリデーション ---
 def normalize_tag(tag: str) -> str:
     """
@@ -95,18 +125,26 @@ def is_valid_category(category: str) -> bool:
     return True
 
 class TagManager:
-    def __init__(self, db_file: str, parent: Optional[tk.Tk] = None) -> None:
+    def __init__(self, db_file: str, parent: Optional["tk.Tk"] = None) -> None:
         """TagManagerのコンストラクタ
 
         Args:
             db_file (str): 使用するデータベースファイルの絶対パス。
-            parent (Optional[tk.Tk]): UIの親ウィジェット。
+            parent (Optional[tk.Tk]): UIの親ウィジェット。Noneの場合（CLIなど）はエラーをログにのみ記録する。
         """
         self.db_file = db_file
         self.parent = parent
         self._conn: Optional[sqlite3.Connection] = None
-        self._positive_tags_cache: Optional[List[Dict[str, Any]]] = None
-        self._negative_tags_cache: Optional[List[Dict[str, Any]]] = None
+        # ポジティブ/ネガティブのタグ一覧（列ごとの配列で保持するTagCollection）
+        self._positive_tags_cache: Optional[TagCollection] = None
+        self._negative_tags_cache: Optional[TagCollection] = None
+        # オートコンプリート用インデックス（初回利用時に構築し、以降は差分更新）
+        self._autocomplete_index: Optional[AutocompleteIndex] = None
+        self._autocomplete_lock = threading.Lock()
+        # タグデータが変更されるたびに増える版番号（検索キャッシュ等の無効化に使用）
+        self._version = 0
+        # 前回のANALYZE以降に一括で追加・更新したタグ数
+        self._rows_since_analyze = 0
         
         self.logger = logging.getLogger(__name__)
         self._init_database()
@@ -114,6 +152,14 @@ class TagManager:
         # 初期タグのインポートを無効化（デフォルトタグはインポートしない）
         # self._import_default_tags()
 
+    def _show_error(self, title: str, message: str) -> None:
+        """エラーを通知する（UIの親ウィジェットがあるときだけダイアログを表示する）"""
+        if self.parent is None:
+            self.logger.error(f"{title}: {message}")
+            return
+        from tkinter import messagebox
+        messagebox.showerror(title, message, parent=self.parent)
+
     def _get_conn(self) -> sqlite3.Connection:
         try:
             if self._conn is None:
@@ -127,7 +173,7 @@ class TagManager:
             return self._conn
         except sqlite3.Error as e:
             self._conn = None
-            messagebox.showerror("データベースエラー", f"接続に失敗しました: {e}", parent=self.parent)
+            self._show_error("データベースエラー", f"接続に失敗しました: {e}")
             raise
 
     def _execute_query(self, query: str, params: Optional[Union[Tuple[Any, ...], Dict[str, Any]]] = None) -> sqlite3.Cursor:
@@ -140,7 +186,7 @@ class TagManager:
                 cursor.execute(query)
             return cursor
         except sqlite3.Error as e:
-            messagebox.showerror("データベースエラー", f"クエリ実行に失敗しました: {e}", parent=self.parent)
+            self._show_error("データベースエラー", f"クエリ実行に失敗しました: {e}")
             raise
 
     def _init_database(self) -> None:
@@ -152,40 +198,12 @@ class TagManager:
                 os.makedirs(db_dir, exist_ok=True)
                 print(f"データベースディレクトリを作成しました: {db_dir}")
             
-            # データベース接続とテーブル作成
+            # データベース接続とスキーマのマイグレーション（テーブル・インデックスの作成を含む）
             conn = sqlite3.connect(self.db_file)
-            cursor = conn.cursor()
-            
-            # tagsテーブルの作成
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS tags (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    tag TEXT UNIQUE NOT NULL,
-                    jp TEXT,
-                    favorite INTEGER DEFAULT 0,
-                    category TEXT,
-                    is_negative INTEGER DEFAULT 0
-                )
-            ''')
-            
-            # recent_tagsテーブルの作成
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS recent_tags (
-                    tag TEXT NOT NULL,
-                    is_negative INTEGER DEFAULT 0,
-                    used_at TEXT NOT NULL,
-                    PRIMARY KEY (tag, is_negative)
-                )
-            ''')
-            
-            # インデックスの作成
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_tags_category ON tags(category)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_tags_favorite ON tags(favorite)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_tags_is_negative ON tags(is_negative)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_recent_tags_used_at ON recent_tags(used_at)')
-            
-            conn.commit()
-            conn.close()
+            try:
+                migrate(conn)
+            finally:
+                conn.close()
             print(f"データベースとテーブルを初期化しました: {self.db_file}")
             
             # 個人データJSONファイルの初期化
@@ -194,7 +212,7 @@ class TagManager:
             # self._import_default_tags()  # 無効化：初期タグの自動追加を停止
             
         except Exception as e:
-            messagebox.showerror("エラー", f"データベース初期化に失敗しました:\n{e}", parent=self.parent)
+            self._show_error("エラー", f"データベース初期化に失敗しました:\n{e}")
     
     def _init_personal_data_files(self) -> None:
         """個人データJSONファイルを初期化する"""
@@ -306,12 +324,35 @@ class TagManager:
             # エラーが発生してもアプリケーションは継続
             pass
 
-    def _create_indexes(self, cursor: Any) -> None:
-        """データベースインデックスを作成する"""
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tags_category ON tags(category)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tags_favorite ON tags(favorite)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tags_is_negative ON tags(is_negative)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_recent_tags_used_at ON recent_tags(used_at)')
+    def analyze(self, min_rows: int = ANALYZE_MIN_ROWS) -> bool:
+        """
+        前回から追加・更新したタグがmin_rows件以上ならANALYZEで統計情報を更新する（一括取り込みの後に呼ぶ）。
+        実行した場合はTrueを返す。
+        """
+        if self._rows_since_analyze < min_rows:
+            return False
+        try:
+            analyze(self._get_conn())
+        except sqlite3.Error as e:
+            self.logger.error(f"統計情報の更新に失敗しました: {e}")
+            return False
+        self._rows_since_analyze = 0
+        return True
+
+    def sync(self, folder: str, new_origin: bool = False) -> Dict[str, Any]:
+        """
+        共有フォルダを介して他のDBと変更を同期する（modules.tag_sync.sync_folder）。
+        new_origin=TrueではDBファイルをコピーして使い始めた場合に備えて発生元IDを作り直してから同期する。
+        """
+        from modules import tag_sync
+        conn = self._get_conn()
+        if new_origin:
+            tag_sync.reset_origin(conn)
+        result = tag_sync.sync_folder(conn, folder)
+        if result["applied"]:
+            self.invalidate_cache()
+            self._autocomplete_index = None
+        return result
 
     def close(self) -> None:
         """データベース接続を閉じる"""
@@ -325,11 +366,21 @@ class TagManager:
     def __del__(self) -> None:
         self.close()
 
+    @property
+    def version(self) -> int:
+        """タグデータの版番号（変更のたびに増加する）"""
+        return self._version
+
     def invalidate_cache(self) -> None:
         self._positive_tags_cache = None
         self._negative_tags_cache = None
+        self._version += 1
 
-    def load_tags(self, is_negative: bool = False) -> List[Dict[str, Any]]:
+    def load_tags(self, is_negative: bool = False) -> TagCollection:
+        """
+        ポジティブまたはネガティブのタグ一覧を返す（キャッシュ済み）。
+        各行は辞書と同じように使えるビュー（tag, jp, favorite, category）。
+        """
         if is_negative and self._negative_tags_cache is not None:
             return self._negative_tags_cache
         if not is_negative and self._positive_tags_cache is not None:
@@ -337,13 +388,10 @@ class TagManager:
 
         try:
             cursor = self._execute_query(
-                "SELECT tag, jp, favorite, category FROM tags WHERE is_negative = ?",
+                "SELECT tag, jp, favorite, category FROM tags_with_category WHERE is_negative = ?",
                 (int(is_negative),)
             )
-            rows = cursor.fetchall()
-            result = [{"tag": row["tag"], "jp": row["jp"], 
-                      "favorite": bool(row["favorite"]),
-                      "category": row["category"] or ""} for row in rows]
+            result = TagCollection.from_rows(cursor, with_negative=False)
             
             if is_negative:
                 self._negative_tags_cache = result
@@ -352,13 +400,27 @@ class TagManager:
             
             return result
         except Exception as e:
-            messagebox.showerror("エラー", f"タグ読み込みに失敗しました:\n{e}", parent=self.parent)
-            return []
+            self._show_error("エラー", f"タグ読み込みに失敗しました:\n{e}")
+            return TagCollection(with_negative=False)
+
+    def get_tag_collection(self) -> TagCollection:
+        """
+        全タグ（ネガティブを含む）をTagCollectionで返す（キャッシュしない）。
+        get_all_tags()と同じ行・同じ順で、辞書を作らない分メモリが少ない。
+        """
+        try:
+            cursor = self._execute_query(
+                "SELECT tag, jp, favorite, category, is_negative FROM tags_with_category"
+            )
+            return TagCollection.from_rows(cursor)
+        except Exception as e:
+            self._show_error("エラー", f"全タグの取得に失敗しました:\n{e}")
+            return TagCollection()
 
     def get_all_tags(self) -> List[Dict[str, Any]]:
         try:
             cursor = self._execute_query(
-                "SELECT tag, jp, favorite, category, is_negative FROM tags"
+                "SELECT tag, jp, favorite, category, is_negative FROM tags_with_category"
             )
             rows = cursor.fetchall()
             return [{
@@ -369,14 +431,100 @@ class TagManager:
                 "is_negative": bool(row["is_negative"])
             } for row in rows]
         except Exception as e:
-            messagebox.showerror("エラー", f"全タグの取得に失敗しました:\n{e}", parent=self.parent)
+            self._show_error("エラー", f"全タグの取得に失敗しました:\n{e}")
             return []
 
+    def page(self, after_key: Optional[Union[int, str]] = None, limit: int = DEFAULT_PAGE_SIZE, order: str = "id",
+             category: Optional[str] = None, is_negative: Optional[bool] = None,
+             favorite: Optional[bool] = None) -> Tuple[List[Dict[str, Any]], Optional[Union[int, str]]]:
+        """
+        タグをキーセット方式で1ページ分返す（行はget_all_tags()と同じ形の辞書）。
+
+        orderの列（"id"または"tag"）がafter_keyより後の行をlimit件読み、
+        (行のリスト, 次のページのafter_key) を返す。最後のページでは次のキーはNone。
+        OFFSETを使わないので何ページ目でも索引から直接読み始められ、
+        ページの間にタグが追加・削除されても行の重複や取りこぼしが起きない。
+        条件（category, is_negative, favorite）はNoneなら問わない。
+        """
+        if order not in TAG_ORDERS:
+            raise ValueError(f"未対応の並び順です: {order}")
+        if limit <= 0:
+            raise ValueError("limitは1以上で指定してください")
+        conditions: List[str] = []
+        params: List[Any] = []
+        if after_key is not None:
+            conditions.append(f"{order} > ?")
+            params.append(after_key)
+        if category is not None:
+            condition, condition_params = category_condition(category)
+            conditions.append(condition)
+            params.extend(condition_params)
+        for column, value in (("is_negative", is_negative), ("favorite", favorite)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(int(value))
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        cursor = self._execute_query(
+            f"SELECT id, tag, jp, favorite, category, is_negative FROM tags_with_category{where} ORDER BY {order} LIMIT ?",
+            tuple(params) + (limit,)
+        )
+        rows = cursor.fetchall()
+        tags = [{
+            "tag": row["tag"],
+            "jp": row["jp"],
+            "favorite": bool(row["favorite"]),
+            "category": row["category"] or "",
+            "is_negative": bool(row["is_negative"])
+        } for row in rows]
+        next_key = rows[-1][order] if len(rows) == limit else None
+        return tags, next_key
+
+    def iter_tags(self, category: Optional[str] = None, is_negative: Optional[bool] = None,
+                  favorite: Optional[bool] = None, order: str = "id",
+                  batch_size: int = DEFAULT_PAGE_SIZE) -> Iterator[Dict[str, Any]]:
+        """
+        条件に合うタグを1件ずつ返すジェネレータ（エクスポートや集計向け）。
+
+        page()でbatch_size件ずつ読むため、全件をリストにせずメモリ使用量は一定で、
+        最初の行はすぐに返る。ページ毎に別のSELECTを発行するので、
+        途中で他の処理がDBに書き込んでもカーソルを開いたまま待たせることはない。
+        """
+        after_key: Optional[Union[int, str]] = None
+        while True:
+            tags, after_key = self.page(after_key, batch_size, order, category, is_negative, favorite)
+            yield from tags
+            if after_key is None:
+                return
+
+    def get_autocomplete_index(self, usage_provider: Optional[Callable[[], Dict[str, int]]] = None) -> AutocompleteIndex:
+        """
+        オートコンプリート用インデックスを返す（未構築なら全タグから構築する）。
+        usage_providerは構築時に一度だけ呼ばれ、使用回数の初期値を返す。
+        構築は全タグを読むため、UIではワーカースレッドで呼び、UIスレッドではpeek_autocomplete_index()を使う。
+        """
+        with self._autocomplete_lock:
+            if self._autocomplete_index is None:
+                usage_counts = usage_provider() if usage_provider else None
+                # 構築中の変更はインデックスに反映されないため、その間にタグが変わったら作り直す
+                for _ in range(3):
+                    version = self._version
+                    index = AutocompleteIndex(ignored_jp=(TRANSLATING_PLACEHOLDER, "翻訳失敗"))
+                    tags = self.get_tag_collection()
+                    index.build(zip(tags.tags, tags.jps), usage_counts)
+                    if self._version == version:
+                        break
+                self._autocomplete_index = index
+            return self._autocomplete_index
+
+    def peek_autocomplete_index(self) -> Optional[AutocompleteIndex]:
+        """構築済みのオートコンプリート用インデックスを返す（未構築ならNone。構築はしない）"""
+        return self._autocomplete_index
+
     def get_recent_tags(self) -> List[Dict[str, Any]]:
         try:
             cursor = self._execute_query('''
                 SELECT t.tag, t.jp, t.favorite, t.category 
-                FROM tags t 
+                FROM tags_with_category t 
                 INNER JOIN recent_tags r ON t.tag = r.tag AND t.is_negative = r.is_negative 
                 ORDER BY r.used_at DESC LIMIT 50
             ''')
@@ -385,7 +533,7 @@ class TagManager:
                     "favorite": bool(row["favorite"]),
                     "category": row["category"] or ""} for row in rows]
         except Exception as e:
-            messagebox.showerror("エラー", f"最近使ったタグの取得に失敗しました:\n{e}", parent=self.parent)
+            self._show_error("エラー", f"最近使ったタグの取得に失敗しました:\n{e}")
             return []
 
     def add_recent_tag(self, tag: str, is_negative: bool = False) -> None:
@@ -396,6 +544,10 @@ class TagManager:
                 (tag, int(is_negative), datetime.datetime.now().isoformat())
             )
             self._get_conn().commit()
+            # 「最近使った」タブの内容が変わるため版を進める
+            self._version += 1
+            if self._autocomplete_index is not None:
+                self._autocomplete_index.increment_usage(tag)
         except Exception as e:
             print(f"最近使ったタグ保存エラー: {e}")
 
@@ -410,18 +562,21 @@ class TagManager:
     def save_tag(self, tag: str, jp: str, favorite: bool, category: str, is_negative: bool) -> bool:
         print(f"[DEBUG] save_tag - Input: tag='{tag}', jp='{jp}', favorite={favorite}, category='{category}', is_negative={is_negative}")
         try:
+            self._ensure_categories([category])
             self._execute_query(
-                '''INSERT INTO tags (tag, jp, favorite, category, is_negative)
-                   VALUES (?, ?, ?, ?, ?)
+                f'''INSERT INTO tags (tag, jp, favorite, category_id, is_negative)
+                   VALUES (?, ?, ?, {CATEGORY_ID_SQL}, ?)
                    ON CONFLICT(tag) DO UPDATE SET
                    jp=excluded.jp,
                    favorite=excluded.favorite,
-                   category=excluded.category,
+                   category_id=excluded.category_id,
                    is_negative=excluded.is_negative''',
                 (tag, jp, int(favorite), category, int(is_negative))
             )
             self._get_conn().commit()
             self.invalidate_cache()
+            if self._autocomplete_index is not None:
+                self._autocomplete_index.add(tag, jp)
             print(f"[DEBUG] save_tag - 保存成功")
             return True
         except sqlite3.IntegrityError as e:
@@ -429,7 +584,7 @@ class TagManager:
             return False
         except Exception as e:
             print(f"[DEBUG] save_tag - 例外発生: {e}")
-            messagebox.showerror("エラー", f"タグ保存に失敗しました:\n{e}", parent=self.parent)
+            self._show_error("エラー", f"タグ保存に失敗しました:\n{e}")
             return False
 
     def _translate_tag(self, tag: str) -> str:
@@ -448,6 +603,8 @@ class TagManager:
             if cursor.rowcount == 0:
                 # (翻訳中...)のままのタグがなければ何もしない
                 return False
+            if self._autocomplete_index is not None:
+                self._autocomplete_index.add(tag, jp_trans)
             return True
         except Exception as e: # GoogleTranslatorのエラーは一般的なExceptionでキャッチ
             self.logger.error(f"翻訳と更新に失敗: {e}")
@@ -501,7 +658,7 @@ class TagManager:
         except Exception as e:
             self.logger.error(f"add_tagエラー: {e}")
             print(f"[DEBUG] add_tag - 例外発生: {e}")
-            messagebox.showerror("エラー", f"タグ追加に失敗しました:\n{e}", parent=self.parent)
+            self._show_error("エラー", f"タグ追加に失敗しました:\n{e}")
             return False
 
     def exists_tag(self, tag: str) -> bool:
@@ -537,20 +694,23 @@ class TagManager:
         失敗時はFalseを返し、logger.errorと必要に応じてmessagebox.showerrorで通知。
         """
         try:
-            self._execute_query(
+            cursor = self._execute_query(
                 "DELETE FROM tags WHERE tag = ? AND is_negative = ?",
                 (tag, int(is_negative))
             )
+            deleted = cursor.rowcount > 0
             self._execute_query(
                 "DELETE FROM recent_tags WHERE tag = ? AND is_negative = ?",
                 (tag, int(is_negative))
             )
             self._get_conn().commit()
             self.invalidate_cache()
+            if deleted and self._autocomplete_index is not None:
+                self._autocomplete_index.remove(tag)
             return True
         except sqlite3.Error as e:
             self.logger.error(f"タグ削除に失敗しました: {e}")
-            messagebox.showerror("エラー", f"タグ削除に失敗しました:\n{e}", parent=self.parent)
+            self._show_error("エラー", f"タグ削除に失敗しました:\n{e}")
             return False
 
     def toggle_favorite(self, tag: str, is_negative: bool = False) -> bool:
@@ -576,7 +736,7 @@ class TagManager:
             return True
         except sqlite3.Error as e:
             self.logger.error(f"お気に入り切替に失敗しました: {e}")
-            messagebox.showerror("エラー", f"お気に入り切替に失敗しました:\n{e}", parent=self.parent)
+            self._show_error("エラー", f"お気に入り切替に失敗しました:\n{e}")
             return False
 
     def set_category(self, tag: str, category: str, is_negative: bool = False) -> bool:
@@ -589,8 +749,9 @@ class TagManager:
         if not is_valid_category(category):
             return False
         try:
+            self._ensure_categories([category])
             cursor = self._execute_query(
-                "UPDATE tags SET category = ? WHERE tag = ? AND is_negative = ?",
+                f"UPDATE tags SET category_id = {CATEGORY_ID_SQL} WHERE tag = ? AND is_negative = ?",
                 (category, tag, int(is_negative))
             )
             self._get_conn().commit()
@@ -600,7 +761,7 @@ class TagManager:
             return True
         except sqlite3.Error as e:
             self.logger.error(f"カテゴリ設定に失敗しました: {e}")
-            messagebox.showerror("エラー", f"カテゴリ設定に失敗しました:\n{e}", parent=self.parent)
+            self._show_error("エラー", f"カテゴリ設定に失敗しました:\n{e}")
             return False
 
     def update_tag(self, old_tag: str, new_tag: str, jp: str, category: str, is_negative: bool = False) -> bool:
@@ -617,8 +778,9 @@ class TagManager:
                     return False
             
             # 更新を実行
-            self._execute_query(
-                '''UPDATE tags SET tag = ?, jp = ?, category = ? 
+            self._ensure_categories([category])
+            update_cursor = self._execute_query(
+                f'''UPDATE tags SET tag = ?, jp = ?, category_id = {CATEGORY_ID_SQL}
                    WHERE tag = ? AND is_negative = ?''',
                 (new_tag, jp, category, old_tag, int(is_negative))
             )
@@ -632,12 +794,14 @@ class TagManager:
             
             self._get_conn().commit()
             self.invalidate_cache()
+            if update_cursor.rowcount > 0 and self._autocomplete_index is not None:
+                self._autocomplete_index.rename(old_tag, new_tag, jp)
             self.logger.info(f"タグ更新成功: '{old_tag}' -> '{new_tag}'")
             return True
             
         except sqlite3.Error as e:
             self.logger.error(f"タグ更新に失敗しました: {e}")
-            messagebox.showerror("エラー", f"タグ更新に失敗しました:\n{e}", parent=self.parent)
+            self._show_error("エラー", f"タグ更新に失敗しました:\n{e}")
             return False
 
     def bulk_assign_category(self, tags: List[str], category: str, is_negative: bool = False) -> bool:
@@ -645,22 +809,183 @@ class TagManager:
         複数タグのカテゴリを一括設定する。
         失敗時はFalseを返し、logger.errorと必要に応じてmessagebox.showerrorで通知。
         """
+        results = self.set_categories({tag: category for tag in tags}, is_negative)
+        return results is not None
+
+    # --- 一括操作: 1トランザクションでまとめて実行し、タグ毎の結果を返す ---
+    def _select_existing(self, tags: List[str], is_negative: Optional[bool]) -> Set[str]:
+        """tagsのうちDBに存在するもの（is_negative=Noneなら正負を問わない）"""
+        found: Set[str] = set()
+        for start in range(0, len(tags), BULK_CHUNK_SIZE):
+            chunk = tags[start:start + BULK_CHUNK_SIZE]
+            query = f"SELECT tag FROM tags WHERE tag IN ({','.join('?' * len(chunk))})"
+            params: List[Any] = list(chunk)
+            if is_negative is not None:
+                query += " AND is_negative = ?"
+                params.append(int(is_negative))
+            found.update(row[0] for row in self._execute_query(query, tuple(params)))
+        return found
+
+    def existing_tags(self, tags: Iterable[str], is_negative: Optional[bool] = None) -> Set[str]:
+        """
+        指定したタグのうち既に存在するものを返す（タグ毎の問い合わせをしない）。
+        is_negativeを省略した場合は、ポジティブ・ネガティブのどちらかに存在すれば含める。
+        """
+        unique_tags = list(dict.fromkeys(tags))
+        if not unique_tags:
+            return set()
         try:
-            conn = self._get_conn()
-            conn.execute("BEGIN TRANSACTION")
-            for tag in tags:
-                self._execute_query(
-                    "UPDATE tags SET category = ? WHERE tag = ? AND is_negative = ?",
-                    (category, tag, int(is_negative))
-                )
-            conn.commit()
-            self.invalidate_cache()
-            return True
+            return self._select_existing(unique_tags, is_negative)
+        except sqlite3.Error as e:
+            self.logger.error(f"タグ存在チェックエラー: {e}")
+            return set()
+
+    def delete_tags(self, tags: Iterable[str], is_negative: Optional[bool] = False) -> Optional[Dict[str, bool]]:
+        """
+        複数タグを1トランザクションで削除する。
+        is_negative=Noneの場合は正負を問わず削除する。
+        戻り値はタグ → 削除されたかどうか。失敗時はNoneを返し、何も削除しない。
+        """
+        unique_tags = list(dict.fromkeys(tags))
+        if not unique_tags:
+            return {}
+        conn = self._get_conn()
+        condition = "" if is_negative is None else " AND is_negative = ?"
+        extra = () if is_negative is None else (int(is_negative),)
+        try:
+            with conn:
+                existing = self._select_existing(unique_tags, is_negative)
+                params = [(tag,) + extra for tag in unique_tags if tag in existing]
+                conn.executemany(f"DELETE FROM tags WHERE tag = ?{condition}", params)
+                conn.executemany(f"DELETE FROM recent_tags WHERE tag = ?{condition}", params)
+        except sqlite3.Error as e:
+            self.logger.error(f"一括削除に失敗しました: {e}")
+            self._show_error("エラー", f"一括削除に失敗しました:\n{e}")
+            return None
+        self.invalidate_cache()
+        if self._autocomplete_index is not None:
+            for tag in existing:
+                self._autocomplete_index.remove(tag)
+        return {tag: tag in existing for tag in unique_tags}
+
+    def set_categories(self, assignments: Mapping[str, str], is_negative: bool = False) -> Optional[Dict[str, bool]]:
+        """
+        タグ → カテゴリ の対応をまとめて設定する（空文字は未分類）。
+        ネガティブタグに「ネガティブ」以外を指定した行や、不正なカテゴリの行は更新しない。
+        戻り値はタグ → 更新されたかどうか。失敗時はNoneを返し、何も更新しない。
+        """
+        if not assignments:
+            return {}
+        results = {tag: False for tag in assignments}
+        valid = {tag: category for tag, category in assignments.items()
+                 if (category == "" or is_valid_category(category))
+                 and not (is_negative and category != "ネガティブ")}
+        conn = self._get_conn()
+        try:
+            with conn:
+                existing = self._select_existing(list(valid), is_negative)
+                self._ensure_categories(valid.values())
+                conn.executemany(
+                    f"UPDATE tags SET category_id = {CATEGORY_ID_SQL} WHERE tag = ? AND is_negative = ?",
+                    [(category, tag, int(is_negative)) for tag, category in valid.items() if tag in existing])
         except sqlite3.Error as e:
-            conn.rollback()
             self.logger.error(f"一括カテゴリ設定に失敗しました: {e}")
-            messagebox.showerror("エラー", f"一括カテゴリ設定に失敗しました:\n{e}", parent=self.parent)
-            return False
+            self._show_error("エラー", f"一括カテゴリ設定に失敗しました:\n{e}")
+            return None
+        self.invalidate_cache()
+        for tag in existing:
+            results[tag] = True
+        return results
+
+    def set_favorites(self, tags: Iterable[str], favorite: bool, is_negative: bool = False) -> Optional[Dict[str, bool]]:
+        """
+        複数タグのお気に入り状態をまとめて設定する。
+        戻り値はタグ → 対象のタグが存在したかどうか。失敗時はNoneを返す。
+        """
+        return self._update_favorites(tags, "?", (int(favorite),), is_negative)
+
+    def toggle_favorites(self, tags: Iterable[str], is_negative: bool = False) -> Optional[Dict[str, bool]]:
+        """
+        複数タグのお気に入り状態をそれぞれ反転する。
+        戻り値はタグ → 対象のタグが存在したかどうか。失敗時はNoneを返す。
+        """
+        return self._update_favorites(tags, "1 - favorite", (), is_negative)
+
+    def _update_favorites(self, tags: Iterable[str], value_sql: str, value_params: Tuple[Any, ...],
+                          is_negative: bool) -> Optional[Dict[str, bool]]:
+        unique_tags = list(dict.fromkeys(tags))
+        if not unique_tags:
+            return {}
+        conn = self._get_conn()
+        try:
+            with conn:
+                existing = self._select_existing(unique_tags, is_negative)
+                conn.executemany(
+                    f"UPDATE tags SET favorite = {value_sql} WHERE tag = ? AND is_negative = ?",
+                    [value_params + (tag, int(is_negative)) for tag in unique_tags if tag in existing])
+        except sqlite3.Error as e:
+            self.logger.error(f"お気に入りの一括設定に失敗しました: {e}")
+            self._show_error("エラー", f"お気に入りの一括設定に失敗しました:\n{e}")
+            return None
+        self.invalidate_cache()
+        return {tag: tag in existing for tag in unique_tags}
+
+    def set_translations(self, translations: Mapping[str, str]) -> Optional[Dict[str, bool]]:
+        """
+        タグ → 日本語訳 をまとめて設定する。
+        戻り値はタグ → 更新されたかどうか。失敗時はNoneを返す。
+        """
+        if not translations:
+            return {}
+        conn = self._get_conn()
+        try:
+            with conn:
+                existing = self._select_existing(list(translations), None)
+                conn.executemany("UPDATE tags SET jp = ? WHERE tag = ?",
+                                 [(jp, tag) for tag, jp in translations.items() if tag in existing])
+        except sqlite3.Error as e:
+            self.logger.error(f"翻訳の一括保存に失敗しました: {e}")
+            self._show_error("エラー", f"翻訳の一括保存に失敗しました:\n{e}")
+            return None
+        self.invalidate_cache()
+        if self._autocomplete_index is not None:
+            for tag in existing:
+                self._autocomplete_index.add(tag, translations[tag])
+        return {tag: tag in existing for tag in translations}
+
+    def save_tags(self, rows: Iterable[Dict[str, Any]]) -> Optional[int]:
+        """
+        タグ情報（tag, jp, favorite, category, is_negative）をまとめて追加・更新する。
+        既存タグは上書きする（save_tagと同じ）。戻り値は保存した件数、失敗時はNone。
+        """
+        params = [(row["tag"], row.get("jp", ""), int(bool(row.get("favorite", False))),
+                   row.get("category", ""), int(bool(row.get("is_negative", False))))
+                  for row in rows]
+        if not params:
+            return 0
+        conn = self._get_conn()
+        try:
+            with conn:
+                self._ensure_categories(category for _, _, _, category, _ in params)
+                conn.executemany(
+                    f'''INSERT INTO tags (tag, jp, favorite, category_id, is_negative)
+                       VALUES (?, ?, ?, {CATEGORY_ID_SQL}, ?)
+                       ON CONFLICT(tag) DO UPDATE SET
+                       jp=excluded.jp,
+                       favorite=excluded.favorite,
+                       category_id=excluded.category_id,
+                       is_negative=excluded.is_negative''',
+                    params)
+        except sqlite3.Error as e:
+            self.logger.error(f"タグの一括保存に失敗しました: {e}")
+            self._show_error("エラー", f"タグの一括保存に失敗しました:\n{e}")
+            return None
+        self.invalidate_cache()
+        self._rows_since_analyze += len(params)
+        if self._autocomplete_index is not None:
+            for tag, jp, _, _, _ in params:
+                self._autocomplete_index.add(tag, jp)
+        return len(params)
 
     def get_tags_by_category(self, category: str, is_negative: bool = False) -> List[Dict[str, Any]]:
         """
@@ -668,9 +993,10 @@ class TagManager:
         失敗時は空リストを返し、logger.errorで記録。
         """
         try:
+            condition, params = category_condition(category)
             cursor = self._execute_query(
-                "SELECT tag, jp, favorite, category FROM tags WHERE category = ? AND is_negative = ? ORDER BY tag",
-                (category, int(is_negative))
+                f"SELECT tag, jp, favorite, category FROM tags_with_category WHERE {condition} AND is_negative = ? ORDER BY tag",
+                params + (int(is_negative),)
             )
             tags = []
             for row in cursor.fetchall():
@@ -685,17 +1011,99 @@ class TagManager:
             self.logger.error(f"カテゴリ別タグ取得に失敗しました: {e}")
             return []
 
+    # --- カテゴリ（categoriesテーブル） ---
+    def _ensure_categories(self, categories: Iterable[Optional[str]]) -> None:
+        """カテゴリ名をcategoriesテーブルに登録する（登録済み・空のカテゴリは何もしない）"""
+        names = {category for category in categories if category}
+        if names:
+            self._get_conn().executemany(
+                "INSERT OR IGNORE INTO categories (name) VALUES (?)", [(name,) for name in names])
+
+    def get_categories(self) -> List[Dict[str, Any]]:
+        """
+        登録済みのカテゴリ（name, priority, description, count）を登録順に返す。
+        countはそのカテゴリのタグ数（タグが無くなったカテゴリは0）。
+        """
+        try:
+            cursor = self._execute_query('''
+                SELECT c.name, c.priority, c.description,
+                       (SELECT COUNT(*) FROM tags t WHERE t.category_id = c.id) AS count
+                FROM categories c ORDER BY c.id
+            ''')
+            return [{"name": row["name"], "priority": row["priority"], "description": row["description"],
+                     "count": row["count"]} for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            self.logger.error(f"カテゴリ一覧の取得に失敗しました: {e}")
+            return []
+
+    def count_tags_by_category(self, is_negative: Optional[bool] = None) -> Dict[str, int]:
+        """カテゴリ名 → タグ数（category_idでまとめて数える。カテゴリが空のタグは""）"""
+        where, params = ("WHERE t.is_negative = ?", (int(is_negative),)) if is_negative is not None else ("", ())
+        try:
+            cursor = self._execute_query(f'''
+                SELECT COALESCE(c.name, '') AS category, counts.n FROM
+                    (SELECT t.category_id, COUNT(*) AS n FROM tags t {where} GROUP BY t.category_id) AS counts
+                LEFT JOIN categories c ON c.id = counts.category_id
+            ''', params)
+            return {row["category"]: row["n"] for row in cursor.fetchall()}
+        except sqlite3.Error as e:
+            self.logger.error(f"カテゴリ別件数の取得に失敗しました: {e}")
+            return {}
+
+    def set_category_info(self, name: str, priority: Optional[int] = None,
+                          description: Optional[str] = None) -> bool:
+        """カテゴリの優先度・説明を設定する（未登録のカテゴリは登録する）"""
+        if not is_valid_category(name):
+            return False
+        try:
+            self._ensure_categories([name])
+            self._execute_query(
+                "UPDATE categories SET priority = COALESCE(?, priority), description = COALESCE(?, description) "
+                "WHERE name = ?", (priority, description, name))
+            self._get_conn().commit()
+            return True
+        except sqlite3.Error as e:
+            self.logger.error(f"カテゴリ情報の設定に失敗しました: {e}")
+            return False
+
+    def rename_category(self, old_name: str, new_name: str) -> bool:
+        """
+        カテゴリ名を変更する（categoriesの1行を書き換えるだけで、タグの行は更新しない）。
+        new_nameのカテゴリが既にある場合は、old_nameのタグをそちらへ移してold_nameを削除する。
+        """
+        if not is_valid_category(new_name) or old_name == new_name:
+            return False
+        conn = self._get_conn()
+        try:
+            with conn:
+                row = conn.execute("SELECT id FROM categories WHERE name = ?", (old_name,)).fetchone()
+                if row is None:
+                    return False
+                target = conn.execute("SELECT id FROM categories WHERE name = ?", (new_name,)).fetchone()
+                if target is None:
+                    conn.execute("UPDATE categories SET name = ? WHERE id = ?", (new_name, row["id"]))
+                else:
+                    conn.execute("UPDATE tags SET category_id = ? WHERE category_id = ?", (target["id"], row["id"]))
+                    conn.execute("DELETE FROM categories WHERE id = ?", (row["id"],))
+        except sqlite3.Error as e:
+            self.logger.error(f"カテゴリ名の変更に失敗しました: {e}")
+            self._show_error("エラー", f"カテゴリ名の変更に失敗しました:\n{e}")
+            return False
+        self.invalidate_cache()
+        return True
+
     def get_tag_info(self, tag: str, category: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """
         指定されたタグの情報を取得する。
         カテゴリが指定された場合は、そのカテゴリ内のタグを検索する。
         """
         try:
-            query = "SELECT tag, jp, favorite, category, is_negative FROM tags WHERE tag = ?"
-            params = (tag,)
+            query = "SELECT tag, jp, favorite, category, is_negative FROM tags_with_category WHERE tag = ?"
+            params: Tuple[Any, ...] = (tag,)
             if category is not None:
-                query += " AND category = ?"
-                params += (category,)
+                condition, condition_params = category_condition(category)
+                query += f" AND {condition}"
+                params += condition_params
 
             cursor = self._execute_query(query, params)
             row = cursor.fetchone()
@@ -726,14 +1134,14 @@ class TagManager:
             return True
         except Exception as e:
             self.logger.error(f"タグエクスポート失敗: {e}")
-            messagebox.showerror("エラー", f"エクスポートに失敗しました:\n{e}", parent=self.parent)
+            self._show_error("エラー", f"エクスポートに失敗しました:\n{e}")
             return False
 
     def export_all_tags_to_json(self, file_path: str) -> bool:
         try:
             tags = self.get_all_tags()
             if not tags:
-                messagebox.showerror("エラー", "エクスポートするタグがありません。", parent=self.parent)
+                self._show_error("エラー", "エクスポートするタグがありません。")
                 return False
             return self.export_tags_to_json(tags, file_path)
         except Exception as e:
@@ -791,13 +1199,15 @@ class TagManager:
                 else:
                     skip_count += 1
             self.invalidate_cache()
+            self._rows_since_analyze += len(added_tags)
+            self.analyze()
             return len(added_tags), skip_count, added_tags
         except FileNotFoundError:
             self.logger.error(f"ファイルが見つかりません: {file_path}")
             import os
             if "PYTEST_CURRENT_TEST" in os.environ:
                 return 0, 0, []
-            messagebox.showerror("エラー", f"ファイルが見つかりません: {file_path}", parent=self.parent)
+            self._show_error("エラー", f"ファイルが見つかりません: {file_path}")
             return 0, 0, []
         except json.decoder.JSONDecodeError as e:
             error_msg = f"JSONファイルの書式エラー:\n行 {e.lineno}、列 {e.colno}付近を確認してください。\n問題の部分: {e.doc[max(0, e.pos-20):e.pos+20]}"
@@ -805,35 +1215,35 @@ class TagManager:
             import os
             if "PYTEST_CURRENT_TEST" in os.environ:
                 return 0, 0, []
-            messagebox.showerror("エラー", error_msg, parent=self.parent)
+            self._show_error("エラー", error_msg)
             return 0, 0, []
         except UnicodeDecodeError:
             self.logger.error(f"ファイルのエンコーディングがUTF-8ではありません: {file_path}")
             import os
             if "PYTEST_CURRENT_TEST" in os.environ:
                 return 0, 0, []
-            messagebox.showerror("エラー", "ファイルのエンコーディングがUTF-8ではありません。UTF-8で保存してください。", parent=self.parent)
+            self._show_error("エラー", "ファイルのエンコーディングがUTF-8ではありません。UTF-8で保存してください。")
             return 0, 0, []
         except IOError as e:
             self.logger.error(f"ファイルの読み込みに失敗しました: {e}")
             import os
             if "PYTEST_CURRENT_TEST" in os.environ:
                 return 0, 0, []
-            messagebox.showerror("エラー", f"ファイルの読み込みに失敗しました:\n{e}", parent=self.parent)
+            self._show_error("エラー", f"ファイルの読み込みに失敗しました:\n{e}")
             return 0, 0, []
         except sqlite3.Error as e:
             self.logger.error(f"データベース操作中にエラーが発生しました: {e}")
             import os
             if "PYTEST_CURRENT_TEST" in os.environ:
                 return 0, 0, []
-            messagebox.showerror("エラー", f"データベース操作中にエラーが発生しました:\n{e}", parent=self.parent)
+            self._show_error("エラー", f"データベース操作中にエラーが発生しました:\n{e}")
             return 0, 0, []
         except Exception as e:
             self.logger.error(f"タグインポート失敗: {e}")
             import os
             if "PYTEST_CURRENT_TEST" in os.environ:
                 return 0, 0, []
-            messagebox.showerror("エラー", f"インポートに失敗しました:\n{e}", parent=self.parent)
+            self._show_error("エラー", f"インポートに失敗しました:\n{e}")
             return 0, 0, []
 
     def export_tags_to_csv(self, tags: List[Dict[str, Any]], file_path: str) -> bool:
@@ -855,7 +1265,7 @@ class TagManager:
             return True
         except Exception as e:
             self.logger.error(f"CSVエクスポート失敗: {e}")
-            messagebox.showerror("エラー", f"CSVエクスポートに失敗しました:\n{e}", parent=self.parent)
+            self._show_error("エラー", f"CSVエクスポートに失敗しました:\n{e}")
             return False
 
     def import_tags_from_csv(self, file_path: str) -> Tuple[int, int, List[Dict[str, Any]]]:
@@ -881,8 +1291,10 @@ class TagManager:
                         if favorite:
                             self.toggle_favorite(tag, is_negative)
                         added_tags.append({"tag": tag, "jp": jp, "category": category, "favorite": favorite, "is_negative": is_negative})
+                self._rows_since_analyze += len(added_tags)
+                self.analyze()
                 return len(added_tags), skip_count, added_tags
         except Exception as e:
             self.logger.error(f"CSVインポート失敗: {e}")
-            messagebox.showerror("エラー", f"CSVインポートに失敗しました:\n{e}", parent=self.parent)
+            self._show_error("エラー", f"CSVインポートに失敗しました:\n{e}")
             return 0, 0, []
@@ -0,0 +1,280 @@
+"""
+起動直後のタグ一覧表示に使うバイナリスナップショット
+
+終了時に全タグを列ごとの配列に詰めて1ファイルに書き出し、次回起動時はmmapで開いて
+表示中のタブの行だけを取り出す。SQLiteを開いて全件をSELECTし辞書を組み立てる前に
+一覧を描画でき、DBとの照合はその後ワーカースレッドの通常の読み込みで行う。
+
+ファイルにはDBのスタンプ（SQLiteヘッダーのファイル変更カウンタ・サイズ・更新時刻）を記録し、
+前回終了後にDBが書き換えられていれば（CLI・サービスからの更新など）スナップショットは使わない。
+
+レイアウト（ネイティブのバイト順。各配列は4バイト境界に揃える）:
+    ヘッダー
+    flags          u8  × 行数           bit0=お気に入り, bit1=ネガティブ
+    category_ids   u16 × 行数
+    string_offsets u32 × (2×行数+1)     strings内の tag0, jp0, tag1, jp1, ... の開始位置
+    category_rows  u32 × (カテゴリ数+1)  postings内の各カテゴリの範囲
+    postings       u32 × 行数           カテゴリ毎の行番号（昇順）
+    name_offsets   u32 × (カテゴリ数+1)
+    names          UTF-8
+    strings        UTF-8。各文字列の後ろにNUL（一括デコードしてsplitできるようにする）
+"""
+import logging
+import mmap
+import os
+import struct
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from modules.persistence import atomic_open
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"TAGSNAP\x00"
+FORMAT_VERSION = 1
+BYTE_ORDER_MARK = 0x01020304
+# magic, 形式の版, バイト順, 行数, カテゴリ数, 文字列の総バイト数, 変更カウンタ, ページ数, DBサイズ, DB更新時刻
+HEADER = struct.Struct("=8sIIIIIIIQq")
+FLAG_FAVORITE = 0x01
+FLAG_NEGATIVE = 0x02
+MAX_CATEGORIES = 0xFFFF
+
+SQLITE_HEADER_MAGIC = b"SQLite format 3\x00"
+
+DatabaseStamp = Tuple[int, int, int, int]
+
+
+def database_stamp(db_file: str) -> Optional[DatabaseStamp]:
+    """
+    DBファイルの版を表す値 (変更カウンタ, ページ数, サイズ, 更新時刻ns) を返す（読めなければNone）
+
+    変更カウンタはSQLiteがトランザクションのコミット毎に増やすヘッダーの値。
+    """
+    try:
+        with open(db_file, 'rb') as f:
+            header = f.read(100)
+            stat = os.fstat(f.fileno())
+    except OSError:
+        return None
+    if len(header) < 100 or not header.startswith(SQLITE_HEADER_MAGIC):
+        return None
+    change_counter, page_count = struct.unpack_from(">II", header, 24)
+    return change_counter, page_count, stat.st_size, stat.st_mtime_ns
+
+
+def _pad(data: bytes) -> bytes:
+    return data + b"\x00" * (-len(data) % 4)
+
+
+def write_snapshot(path: str, tags: Iterable[Dict[str, Any]], db_file: str) -> bool:
+    """
+    タグ一覧（DBの並び順）をスナップショットとして書き出す
+
+    DBを閉じた後に呼ぶこと（スタンプは書き出し時点のDBファイルから取る）。
+    """
+    stamp = database_stamp(db_file)
+    if stamp is None:
+        logger.warning(f"スナップショットを作成できません（DBを読めません）: {db_file}")
+        return False
+    category_index: Dict[str, int] = {}
+    flags = bytearray()
+    category_ids = array('H')
+    string_offsets = array('I', [0])
+    strings = bytearray()
+    for tag in tags:
+        category = tag.get("category") or ""
+        category_id = category_index.setdefault(category, len(category_index))
+        if category_id > MAX_CATEGORIES:
+            logger.warning("カテゴリが多すぎるためスナップショットを作成しません")
+            return False
+        category_ids.append(category_id)
+        flags.append((FLAG_FAVORITE if tag.get("favorite") else 0) | (FLAG_NEGATIVE if tag.get("is_negative") else 0))
+        for text in (tag["tag"], tag.get("jp") or ""):
+            if "\x00" in text:
+                logger.warning("NULを含むタグがあるためスナップショットを作成しません")
+                return False
+            strings += text.encode("utf-8") + b"\x00"
+            string_offsets.append(len(strings))
+
+    # カテゴリ毎の行番号（安定ソートなので各カテゴリ内ではDBの並び順が保たれる）
+    postings = array('I', sorted(range(len(category_ids)), key=category_ids.__getitem__))
+    counts = [0] * len(category_index)
+    for category_id in category_ids:
+        counts[category_id] += 1
+    category_rows = array('I', [0])
+    for count in counts:
+        category_rows.append(category_rows[-1] + count)
+    names = bytearray()
+    name_offsets = array('I', [0])
+    for name in category_index:
+        names += name.encode("utf-8")
+        name_offsets.append(len(names))
+
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, BYTE_ORDER_MARK, len(category_ids), len(category_index),
+                         len(strings), *stamp)
+    parts = [header, _pad(bytes(flags)), _pad(category_ids.tobytes()), string_offsets.tobytes(),
+             category_rows.tobytes(), postings.tobytes(), name_offsets.tobytes(), bytes(names), bytes(strings)]
+    try:
+        with atomic_open(path, 'wb', encoding=None) as f:
+            for part in parts:
+                f.write(part)
+    except OSError as e:
+        logger.warning(f"スナップショットの書き出しに失敗しました: {e}")
+        return False
+    return True
+
+
+class TagSnapshot:
+    """
+    mmapで開いたスナップショット（読み取り専用）
+
+    使い終わったらclose()するか、withで使うこと。
+    """
+
+    def __init__(self, path: str) -> None:
+        self._file = open(path, 'rb')
+        self._mmap: Optional[mmap.mmap] = None
+        self._views: List[memoryview] = []
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._parse()
+        except BaseException:
+            self.close()
+            raise
+
+    def _section(self, start: int, size: int, fmt: str = 'B') -> memoryview:
+        view = self._buffer[start:start + size]
+        if fmt != 'B':
+            view = view.cast(fmt)
+        self._views.append(view)
+        return view
+
+    def _parse(self) -> None:
+        if len(self._mmap) < HEADER.size:
+            raise ValueError("スナップショットが短すぎます")
+        (magic, version, byte_order, rows, categories, strings_size,
+         *stamp) = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != FORMAT_VERSION or byte_order != BYTE_ORDER_MARK:
+            raise ValueError("スナップショットの形式が異なります")
+        self.stamp: DatabaseStamp = tuple(stamp)
+        self._buffer = memoryview(self._mmap)
+        offset = HEADER.size
+        sizes = [("flags", rows, 'B'), ("category_ids", 2 * rows, 'H'), ("string_offsets", 4 * (2 * rows + 1), 'I'),
+                 ("category_rows", 4 * (categories + 1), 'I'), ("postings", 4 * rows, 'I'),
+                 ("name_offsets", 4 * (categories + 1), 'I')]
+        for name, size, fmt in sizes:
+            if offset + size > len(self._mmap):
+                raise ValueError("スナップショットが壊れています")
+            setattr(self, "_" + name, self._section(offset, size, fmt))
+            offset += size + (-size % 4)
+        names_size = self._name_offsets[categories]
+        if offset + names_size + strings_size != len(self._mmap):
+            raise ValueError("スナップショットが壊れています")
+        names = bytes(self._buffer[offset:offset + names_size])
+        self.categories: List[str] = [names[self._name_offsets[i]:self._name_offsets[i + 1]].decode("utf-8")
+                                      for i in range(categories)]
+        self._category_lookup = {name: i for i, name in enumerate(self.categories)}
+        self._strings = self._section(offset + names_size, strings_size)
+
+    def __len__(self) -> int:
+        return len(self._flags)
+
+    def __enter__(self) -> "TagSnapshot":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """mmapとファイルを閉じる（取り出した行は閉じた後も使える）"""
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        buffer = getattr(self, "_buffer", None)
+        if buffer is not None:
+            buffer.release()
+            self._buffer = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+    def select(self, category: Optional[str] = None, is_negative: Optional[bool] = None,
+               favorite: Optional[bool] = None) -> List[int]:
+        """条件に合う行番号をDBの並び順で返す（Noneの条件は問わない）"""
+        if category is None:
+            rows: Iterable[int] = range(len(self))
+        else:
+            category_id = self._category_lookup.get(category)
+            if category_id is None:
+                return []
+            rows = self._postings[self._category_rows[category_id]:self._category_rows[category_id + 1]]
+        if is_negative is None and favorite is None:
+            return list(rows)
+        flags = self._flags
+        return [row for row in rows
+                if (is_negative is None or bool(flags[row] & FLAG_NEGATIVE) == is_negative)
+                and (favorite is None or bool(flags[row] & FLAG_FAVORITE) == favorite)]
+
+    def _text(self, index: int) -> str:
+        start, end = self._string_offsets[index], self._string_offsets[index + 1] - 1
+        return str(self._strings[start:end], "utf-8")
+
+    def tag(self, row: int) -> Dict[str, Any]:
+        """行をTagManager.get_all_tags()と同じ形の辞書で返す"""
+        flags = self._flags[row]
+        return {
+            "tag": self._text(2 * row),
+            "jp": self._text(2 * row + 1),
+            "favorite": bool(flags & FLAG_FAVORITE),
+            "category": self.categories[self._category_ids[row]],
+            "is_negative": bool(flags & FLAG_NEGATIVE),
+        }
+
+    def tags(self, rows: List[int]) -> List[Dict[str, Any]]:
+        """複数行をまとめて辞書にする（多い場合は文字列領域を一括でデコードする）"""
+        if len(rows) * 8 < len(self):
+            return [self.tag(row) for row in rows]
+        texts = str(self._strings, "utf-8").split("\x00")
+        flags, category_ids, categories = self._flags, self._category_ids, self.categories
+        return [{"tag": texts[2 * row], "jp": texts[2 * row + 1],
+                 "favorite": bool(flags[row] & FLAG_FAVORITE),
+                 "category": categories[category_ids[row]],
+                 "is_negative": bool(flags[row] & FLAG_NEGATIVE)} for row in rows]
+
+    def tags_for_tab(self, tab: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        タブを検索語なしで開いたときの一覧（UIの読み込み＋filter_tagsと同じ行・同じ順）を返す。
+        スナップショットに含まれない「最近使った」はNone。
+        """
+        if tab == "最近使った":
+            return None
+        if tab == "全カテゴリ":
+            rows = self.select()
+        elif tab == "お気に入り":
+            rows = self.select(is_negative=False, favorite=True)
+        elif tab == "未分類":
+            rows = self.select(category="未分類")
+        elif tab == "ネガティブ":
+            rows = self.select(category="ネガティブ", is_negative=True)
+        else:
+            rows = self.select(category=tab, is_negative=False)
+        return self.tags(rows)
+
+
+def load_snapshot(path: str, db_file: str) -> Optional[TagSnapshot]:
+    """
+    スナップショットを開く。無い・壊れている・DBと版が一致しない場合はNone
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        snapshot = TagSnapshot(path)
+    except (OSError, ValueError) as e:
+        logger.warning(f"スナップショットを読み込めません: {e}")
+        return None
+    if snapshot.stamp != database_stamp(db_file):
+        logger.info("前回終了後にDBが更新されているため、スナップショットは使いません")
+        snapshot.close()
+        return None
+    return snapshot
@@ -0,0 +1,298 @@
+"""
+共有フォルダを介したタグDBの差分同期
+
+tags・recent_tagsへの変更はトリガーでchangelogに記録される（db_migrationsの版4）。記録は最初の
+sync_folder()で有効になり（既存の行はそのとき1度だけ記録する）、同期を使わないDBには変更履歴が溜まらない。
+各DBはランダムな発生元ID（origin）を持ち、共有フォルダ（クラウドストレージやネットワークドライブ）に
+<origin>.json を1つ書き出す。
+
+    {"format": 1, "origin": "...", "since": 120, "through": 135,
+     "acks": {"<相手のorigin>": 受け取り済みのseq, ...},
+     "changes": [{"seq": 121, "table": "tags", "key": "smile", "origin": "...",
+                  "changed_at": "2025-01-27T10:00:00.000Z", "row": {...} または null（削除）}, ...]}
+
+sync_folder() は他のDBのファイルから前回受け取ったseqより後の変更を取り込み、自分のファイルには
+全員が受け取り済み（acksの最小値）より後の変更だけを書くため、同期の手間はDBの大きさではなく変更の数に比例する。
+1つのキーの複数の変更はその時点の最新の行1つにまとめる。相手がまだ何も受け取っていない（最初の同期）
+ときだけ、変更履歴のない既存の行も含めたDB全体を書き出す。
+
+同じキーを両方で変更した場合は (changed_at, origin) が大きい方を採用する（後勝ち。時刻が同じなら
+originの大きい方）。どちらのDBでも同じ規則で判定するので、同期を繰り返すと全員が同じ内容になる。
+採用した変更は元の発生元・時刻のまま自分のchangelogにも記録されるため、他のDBへも中継される。
+DBファイルをコピーして別のPCで使い始める場合は reset_origin() で発生元IDを作り直すこと。
+"""
+import json
+import logging
+import os
+import sqlite3
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from modules.persistence import write_json_atomic
+from modules.tag_manager import CATEGORY_ID_SQL
+
+logger = logging.getLogger(__name__)
+
+SYNC_FORMAT = 1
+# 変更履歴のない行（版4より前からある行）の時刻。どの変更よりも古いものとして扱う
+BASELINE_TIME = "1970-01-01T00:00:00.000Z"
+SYNC_TABLES = ("tags", "recent_tags")
+
+
+class SyncError(Exception):
+    """共有フォルダの内容が同期できない状態の場合の例外"""
+
+
+def _get_state(conn: sqlite3.Connection, key: str) -> Optional[str]:
+    row = conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def get_origin(conn: sqlite3.Connection) -> str:
+    """このDBの発生元ID"""
+    origin = _get_state(conn, "origin")
+    if origin is None:
+        raise SyncError("sync_stateにoriginがありません（DBのマイグレーションが済んでいません）")
+    return origin
+
+
+def reset_origin(conn: sqlite3.Connection) -> str:
+    """発生元IDを作り直して返す（DBファイルをコピーして使い始めたとき、2つのDBが同じIDにならないようにする）"""
+    conn.execute("UPDATE sync_state SET value = lower(hex(randomblob(8))) WHERE key = 'origin'")
+    conn.execute("DELETE FROM sync_state WHERE key LIKE 'received:%'")
+    conn.commit()
+    return get_origin(conn)
+
+
+def last_seq(conn: sqlite3.Connection) -> int:
+    row = conn.execute("SELECT MAX(seq) FROM changelog").fetchone()
+    return row[0] or 0
+
+
+def received_seqs(conn: sqlite3.Connection) -> Dict[str, int]:
+    """他のDBから受け取り済みのseq（{origin: seq}）"""
+    rows = conn.execute("SELECT key, value FROM sync_state WHERE key LIKE 'received:%'").fetchall()
+    return {key[len("received:"):]: int(value) for key, value in rows}
+
+
+def _split_recent_key(key: str) -> Tuple[str, int]:
+    is_negative, tag = key.split(":", 1)
+    return tag, int(is_negative)
+
+
+def _read_row(conn: sqlite3.Connection, table: str, key: str) -> Optional[Dict[str, Any]]:
+    """キーの現在の行（削除されていればNone）"""
+    if table == "tags":
+        row = conn.execute("SELECT tag, jp, favorite, category, is_negative FROM tags_with_category WHERE tag = ?",
+                           (key,)).fetchone()
+        if row is None:
+            return None
+        return {"tag": row[0], "jp": row[1] or "", "favorite": bool(row[2]), "category": row[3] or "",
+                "is_negative": bool(row[4])}
+    tag, is_negative = _split_recent_key(key)
+    row = conn.execute("SELECT used_at FROM recent_tags WHERE tag = ? AND is_negative = ?",
+                       (tag, is_negative)).fetchone()
+    if row is None:
+        return None
+    return {"tag": tag, "is_negative": bool(is_negative), "used_at": row[0]}
+
+
+def _latest_version(conn: sqlite3.Connection, table: str, key: str, origin: str) -> Tuple[str, str]:
+    """
+    キーの最後の変更の (changed_at, origin)
+    変更履歴がなければ、行があれば (BASELINE_TIME, 自分のorigin)、なければどの変更よりも古い ("", "")。
+    """
+    row = conn.execute("SELECT changed_at, origin FROM changelog WHERE tbl = ? AND key = ? ORDER BY seq DESC LIMIT 1",
+                       (table, key)).fetchone()
+    if row:
+        return row[0], row[1]
+    return (BASELINE_TIME, origin) if _read_row(conn, table, key) is not None else ("", "")
+
+
+def _iter_baseline_keys(conn: sqlite3.Connection) -> Iterator[Tuple[str, str]]:
+    """変更履歴のない行のキー"""
+    for (tag,) in conn.execute("SELECT tag FROM tags t WHERE NOT EXISTS "
+                               "(SELECT 1 FROM changelog c WHERE c.tbl = 'tags' AND c.key = t.tag)"):
+        yield "tags", tag
+    for (key,) in conn.execute("SELECT r.is_negative || ':' || r.tag AS k FROM recent_tags r WHERE NOT EXISTS "
+                               "(SELECT 1 FROM changelog c WHERE c.tbl = 'recent_tags' "
+                               "AND c.key = r.is_negative || ':' || r.tag)"):
+        yield "recent_tags", key
+
+
+def export_changes(conn: sqlite3.Connection, since: int) -> Dict[str, Any]:
+    """
+    seqがsinceより後の変更を、キー毎に最新の行1つにまとめて返す
+
+    since=0の場合は変更履歴のない行も含めてDB全体を返す。
+    """
+    origin = get_origin(conn)
+    # 読んでいる間に書き込まれても行の内容とchangelogが食い違わないよう、1つの読み取りトランザクションで読む
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN")
+    try:
+        through = last_seq(conn)
+        changes: List[Dict[str, Any]] = []
+        if since == 0:
+            for table, key in list(_iter_baseline_keys(conn)):
+                changes.append({"seq": 0, "table": table, "key": key, "origin": origin,
+                                "changed_at": BASELINE_TIME, "row": _read_row(conn, table, key)})
+        entries = conn.execute('''
+            SELECT c.seq, c.tbl, c.key, c.origin, c.changed_at FROM changelog c
+            WHERE c.seq > ? AND c.seq <= ?
+              AND NOT EXISTS (SELECT 1 FROM changelog n WHERE n.tbl = c.tbl AND n.key = c.key AND n.seq > c.seq)
+            ORDER BY c.seq
+        ''', (since, through)).fetchall()
+        for seq, table, key, change_origin, changed_at in entries:
+            changes.append({"seq": seq, "table": table, "key": key, "origin": change_origin,
+                            "changed_at": changed_at, "row": _read_row(conn, table, key)})
+    finally:
+        conn.commit()
+    return {"format": SYNC_FORMAT, "origin": origin, "since": since, "through": through, "changes": changes}
+
+
+def _apply_row(conn: sqlite3.Connection, table: str, key: str, row: Optional[Dict[str, Any]]) -> None:
+    if table == "tags":
+        if row is None:
+            conn.execute("DELETE FROM tags WHERE tag = ?", (key,))
+            return
+        if row.get("category"):
+            conn.execute("INSERT OR IGNORE INTO categories (name) VALUES (?)", (row["category"],))
+        conn.execute(f'''
+            INSERT INTO tags (tag, jp, favorite, category_id, is_negative) VALUES (?, ?, ?, {CATEGORY_ID_SQL}, ?)
+            ON CONFLICT(tag) DO UPDATE SET
+                jp = excluded.jp, favorite = excluded.favorite,
+                category_id = excluded.category_id, is_negative = excluded.is_negative
+        ''', (key, row.get("jp", ""), int(bool(row.get("favorite"))), row.get("category", ""),
+              int(bool(row.get("is_negative")))))
+        return
+    tag, is_negative = _split_recent_key(key)
+    if row is None:
+        conn.execute("DELETE FROM recent_tags WHERE tag = ? AND is_negative = ?", (tag, is_negative))
+        return
+    conn.execute('''
+        INSERT INTO recent_tags (tag, is_negative, used_at) VALUES (?, ?, ?)
+        ON CONFLICT(tag, is_negative) DO UPDATE SET used_at = excluded.used_at
+    ''', (tag, is_negative, row["used_at"]))
+
+
+def apply_changes(conn: sqlite3.Connection, batch: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    他のDBが書き出した変更を取り込み、{"applied", "skipped", "gap"} を返す
+
+    前回受け取ったseqより後の変更だけを、(changed_at, origin) がこちらの最後の変更より新しい場合に適用する。
+    相手が前回より後の分しか持っていない（gap）場合は、受け取り済みのseqを進めずに全体の再送を待つ。
+    1回分の変更は1つのトランザクションで適用し、失敗したら何も変更しない。
+    """
+    if batch.get("format") != SYNC_FORMAT:
+        raise SyncError(f"対応していない同期ファイルの形式です: {batch.get('format')}")
+    origin = get_origin(conn)
+    peer = batch["origin"]
+    if peer == origin:
+        raise SyncError(f"同じorigin（{origin}）のDBが別にあります。コピーしたDBでは発生元IDを作り直してください")
+    received = received_seqs(conn).get(peer, 0)
+    gap = batch["since"] > received
+    stats = {"applied": 0, "skipped": 0, "gap": gap}
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for change in batch["changes"]:
+            if not gap and change["seq"] and change["seq"] <= received:
+                continue
+            table, key = change["table"], change["key"]
+            if table not in SYNC_TABLES:
+                raise SyncError(f"同期できないテーブルです: {table}")
+            if (change["changed_at"], change["origin"]) <= _latest_version(conn, table, key, origin):
+                stats["skipped"] += 1
+                continue
+            # トリガーが元の発生元・時刻で記録するようにしてから適用する
+            conn.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES ('apply_origin', ?), ('apply_time', ?)",
+                         (change["origin"], change["changed_at"]))
+            _apply_row(conn, table, key, change["row"])
+            stats["applied"] += 1
+        conn.execute("DELETE FROM sync_state WHERE key IN ('apply_origin', 'apply_time')")
+        if not gap:
+            conn.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)",
+                         (f"received:{peer}", str(batch["through"])))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return stats
+
+
+def enable_logging(conn: sqlite3.Connection) -> bool:
+    """
+    変更の記録を有効にする。今回有効にした（それまで記録していなかった）場合はTrueを返す
+    変更履歴のない既存の行は、BASELINE_TIMEの変更として1度だけ記録する（以降の同期のseqの起点になる）。
+    """
+    if _get_state(conn, "enabled") is not None:
+        return False
+    origin = get_origin(conn)
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany("INSERT INTO changelog (origin, changed_at, tbl, key, op) VALUES (?, ?, ?, ?, 'I')",
+                         ((origin, BASELINE_TIME, table, key) for table, key in list(_iter_baseline_keys(conn))))
+        conn.execute("INSERT INTO sync_state (key, value) VALUES ('enabled', '1')")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return True
+
+
+def compact_changelog(conn: sqlite3.Connection, through: int) -> int:
+    """
+    seqがthrough以下で、同じキーのより新しい変更がある行を削除し、削除数を返す
+    書き出すのはキー毎の最新の変更だけなので、まだ受け取っていない相手がいても送る内容は変わらない。
+    """
+    cursor = conn.execute('''
+        DELETE FROM changelog WHERE seq <= ?
+          AND EXISTS (SELECT 1 FROM changelog n WHERE n.tbl = changelog.tbl AND n.key = changelog.key
+                      AND n.seq > changelog.seq)
+    ''', (through,))
+    conn.commit()
+    return cursor.rowcount
+
+
+def sync_folder(conn: sqlite3.Connection, folder: str) -> Dict[str, Any]:
+    """
+    共有フォルダの他のDBの変更を取り込み、自分の変更を <origin>.json に書き出す
+
+    使わなくなったDBのファイルはフォルダから削除すること（残っているとその受け取り済みのseqより後の
+    変更を書き出し続け、変更履歴も整理されない）。
+    """
+    origin = get_origin(conn)
+    os.makedirs(folder, exist_ok=True)
+    enable_logging(conn)
+    own_file = f"{origin}.json"
+    batches = []
+    for file_name in sorted(os.listdir(folder)):
+        if not file_name.endswith(".json") or file_name == own_file:
+            continue
+        path = os.path.join(folder, file_name)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                batches.append(json.load(f))
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"同期ファイルを読み込めません: {path}: {e}")
+
+    result: Dict[str, Any] = {"origin": origin, "peers": {}, "applied": 0, "skipped": 0}
+    for batch in batches:
+        stats = apply_changes(conn, batch)
+        result["peers"][batch["origin"]] = stats
+        result["applied"] += stats["applied"]
+        result["skipped"] += stats["skipped"]
+
+    # 全員が受け取り済みの分は書き出さない（まだ何も受け取っていない相手がいればDB全体を書き出す）
+    since = min((batch.get("acks", {}).get(origin, 0) for batch in batches), default=0)
+    outgoing = export_changes(conn, since)
+    outgoing["acks"] = received_seqs(conn)
+    write_json_atomic(os.path.join(folder, own_file), outgoing)
+    result["sent"] = len(outgoing["changes"])
+    # 相手がいなければ毎回DB全体を書き出すので、書き出した分まで古い変更を整理する
+    result["compacted"] = compact_changelog(conn, since if batches else outgoing["through"])
+    return result
@@ -9,7 +9,7 @@ class ThemeManager:
         self.logger = logging.getLogger(__name__)
         settings = self._load_theme_settings()
         self.current_theme = settings.get('theme', 'darkly') if settings else 'darkly'
-        
+        self._dirty = False
     
     def _load_theme_settings(self) -> Optional[Dict[str, Any]]:
         """
@@ -31,22 +31,41 @@ class ThemeManager:
             self.logger.error(f"テーマ設定ファイルの読み込みに失敗: {e}")
             return {}
     
-    def save_theme_settings(self, theme_name: str) -> None:
+    def save_theme_settings(self, theme_name: str) -> bool:
         """
         テーマ設定をファイルに保存する。
-        失敗時はlogger.errorで記録。
-        戻り値なし。
+        失敗時はlogger.errorで記録し、Falseを返す。
         """
         settings = {'theme': theme_name}
         try:
             with open(THEME_FILE, 'w', encoding='utf-8') as f:
                 json.dump(settings, f, ensure_ascii=False, indent=2)
+            return True
         except Exception as e:
             self.logger.error(f"テーマ設定保存エラー: {e}")
+            return False
     
     def set_theme(self, theme_name: str) -> None:
-        self.current_theme = theme_name
-        self.save_theme_settings(theme_name)
+        """
+        テーマを変更する。保存はPersistenceManager経由でsave()が行う。
+        """
+        if theme_name != self.current_theme:
+            self.current_theme = theme_name
+            self._dirty = True
+
+    def is_dirty(self) -> bool:
+        """未保存のテーマ変更があるかどうか"""
+        return self._dirty
+
+    def save(self) -> bool:
+        """
+        現在のテーマを保存する。失敗時は変更ありのまま残す。
+        """
+        self._dirty = False
+        if not self.save_theme_settings(self.current_theme):
+            self._dirty = True
+            return False
+        return True
 
     
 
@@ -0,0 +1,202 @@
+"""
+UIディスパッチャ
+
+ワーカースレッドからTkウィジェットへの操作を一元的に受け付け、
+メインスレッドでまとめて処理するためのモジュール。
+
+- ポーリング（root.after(100, ...)）の代わりに仮想イベントでメインループを起こす
+- 溜まったメッセージを一括で取り出し、status/progressなど上書き可能なものは最新の1件に集約する
+- 1回の処理時間に予算を設け、超過分は次のアイドル時に持ち越す
+"""
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+DISPATCH_EVENT = "<<UIDispatch>>"
+DEFAULT_TIME_BUDGET_MS = 16
+
+# 最新の1件だけを処理すればよいメッセージタイプ
+_COALESCE_TYPES = ("status", "refresh", "immediate_save")
+
+
+def get_coalesce_key(message: Dict[str, Any]) -> Optional[Hashable]:
+    """
+    メッセージの集約キーを返す（Noneの場合は集約しない）
+    """
+    if not isinstance(message, dict):
+        return None
+    if message.get("coalesce_key") is not None:
+        return ("explicit", message["coalesce_key"])
+    msg_type = message.get("type")
+    if msg_type in _COALESCE_TYPES:
+        return (msg_type,)
+    if msg_type == "progress":
+        return ("progress", id(message.get("dialog")))
+    if msg_type == "update_tree":
+        return ("update_tree", message.get("category"))
+    return None
+
+
+def coalesce_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    同じ集約キーを持つメッセージを最後の1件にまとめる純粋関数
+
+    順序は各キーの最後のメッセージの位置に揃える（集約されないメッセージは元の順序を維持）。
+    """
+    last_index: Dict[Hashable, int] = {}
+    keys: List[Optional[Hashable]] = []
+    for index, message in enumerate(messages):
+        key = get_coalesce_key(message)
+        keys.append(key)
+        if key is not None:
+            last_index[key] = index
+
+    result = []
+    for index, message in enumerate(messages):
+        key = keys[index]
+        if key is None or last_index[key] == index:
+            result.append(message)
+    return result
+
+
+class UIDispatcher:
+    """
+    ワーカースレッドからのUI更新要求をメインスレッドで処理するディスパッチャ
+
+    queue.Queueと同じput/get_nowait/qsize/emptyを備えているため、
+    既存のself.qの置き換えとしてそのまま使える。
+    """
+
+    def __init__(self, root, handler: Callable[[Dict[str, Any]], None],
+                 time_budget_ms: int = DEFAULT_TIME_BUDGET_MS):
+        self.root = root
+        self.handler = handler
+        self.time_budget = time_budget_ms / 1000.0
+        self.logger = logging.getLogger(__name__)
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        self._backlog: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._wake_pending = False
+        self._draining = False
+        self._continuation_scheduled = False
+        try:
+            self.root.bind(DISPATCH_EVENT, self._on_wake, add="+")
+        except Exception as e:
+            self.logger.warning(f"ディスパッチイベントのバインドに失敗しました: {e}")
+
+    # --- queue.Queue互換API ---
+    def put(self, message: Dict[str, Any], block: bool = True, timeout: Optional[float] = None) -> None:
+        """メッセージを登録し、メインスレッドを起こす"""
+        self._queue.put(message, block, timeout)
+        self._request_wake()
+
+    def put_nowait(self, message: Dict[str, Any]) -> None:
+        self.put(message, block=False)
+
+    def get_nowait(self) -> Dict[str, Any]:
+        with self._lock:
+            if self._backlog:
+                return self._backlog.pop(0)
+        return self._queue.get_nowait()
+
+    def qsize(self) -> int:
+        with self._lock:
+            backlog = len(self._backlog)
+        return backlog + self._queue.qsize()
+
+    def empty(self) -> bool:
+        return self.qsize() == 0
+
+    # --- ワーカー向けAPI ---
+    def call(self, func: Callable, *args, key: Optional[Hashable] = None, **kwargs) -> None:
+        """
+        任意の関数をメインスレッドで実行するよう依頼する
+
+        keyを指定すると、同じkeyの未処理の呼び出しは最新の1件にまとめられる。
+        """
+        self.put({"type": "call", "func": func, "args": args, "kwargs": kwargs, "coalesce_key": key})
+
+    # --- メインスレッド側 ---
+    def _request_wake(self) -> None:
+        """メインループへ仮想イベントを送る（未処理のイベントがあれば送らない）"""
+        with self._lock:
+            if self._wake_pending:
+                return
+            self._wake_pending = True
+        try:
+            self.root.event_generate(DISPATCH_EVENT, when="tail")
+        except Exception:
+            # メインループ未開始・終了済みの場合は次のdrain呼び出しに任せる
+            with self._lock:
+                self._wake_pending = False
+
+    def _on_wake(self, event=None) -> None:
+        with self._lock:
+            self._wake_pending = False
+        self.drain()
+
+    def _on_continuation(self) -> None:
+        self._continuation_scheduled = False
+        self.drain()
+
+    def _take_pending(self) -> List[Dict[str, Any]]:
+        """バックログとキュー内のメッセージをまとめて取り出して集約する"""
+        with self._lock:
+            pending = self._backlog
+            self._backlog = []
+        while True:
+            try:
+                pending.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return coalesce_messages(pending)
+
+    def drain(self) -> int:
+        """
+        溜まっているメッセージを時間予算内で処理する
+
+        戻り値は処理したメッセージ数。予算を超えた分はバックログに残し、
+        root.afterで続きを予約する。
+        """
+        if self._draining:
+            # モーダルダイアログ等による再入時は後で処理する
+            return 0
+        self._draining = True
+        processed = 0
+        try:
+            pending = self._take_pending()
+            deadline = time.perf_counter() + self.time_budget
+            index = 0
+            while index < len(pending):
+                message = pending[index]
+                index += 1
+                self.dispatch(message)
+                processed += 1
+                if time.perf_counter() >= deadline:
+                    break
+            remaining = pending[index:]
+            if remaining:
+                with self._lock:
+                    self._backlog = remaining + self._backlog
+        finally:
+            self._draining = False
+
+        if self.qsize() and not self._continuation_scheduled:
+            try:
+                self._continuation_scheduled = True
+                self.root.after(1, self._on_continuation)
+            except Exception:
+                self._continuation_scheduled = False
+        return processed
+
+    def dispatch(self, message: Dict[str, Any]) -> None:
+        """メッセージ1件を処理する（例外はログに記録して握りつぶす）"""
+        try:
+            if isinstance(message, dict) and message.get("type") == "call":
+                message["func"](*message.get("args", ()), **message.get("kwargs", {}))
+            else:
+                self.handler(message)
+        except Exception as e:
+            self.logger.error(f"UIメッセージ処理エラー: {e}")
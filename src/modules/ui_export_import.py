@@ -8,7 +8,6 @@ from tkinter import simpledialog, messagebox, Menu, filedialog, Toplevel
 import tkinter as tk
 from tkinter import ttk
 import threading
-import shutil
 import datetime
 import os
 import sys
@@ -46,6 +45,12 @@ def get_safe_path(base_path: str, relative_path: str) -> str:
     except Exception:
         return base_path
 
+def _post_progress(app_instance: Any, progress_dialog: Any, message: str) -> None:
+    """
+    ワーカースレッドから進捗メッセージをUIディスパッチャへ送る
+    """
+    app_instance.q.put({"type": "progress", "dialog": progress_dialog, "message": message})
+
 def export_personal_data(app_instance: Any) -> None:
     """個人データ包括的エクスポート機能"""
     try:
@@ -86,7 +91,7 @@ def export_personal_data(app_instance: Any) -> None:
                 }
                 
                 # 1. タグデータ
-                progress_dialog.set_message("タグデータを収集中...")
+                _post_progress(app_instance, progress_dialog, "タグデータを収集中...")
                 try:
                     all_tags = app_instance.tag_manager.get_all_tags()
                     export_data["data"]["tags"] = {
@@ -99,7 +104,7 @@ def export_personal_data(app_instance: Any) -> None:
                     export_data["data"]["tags"] = {"error": str(e)}
                 
                 # 2. AI学習データ
-                progress_dialog.set_message("AI学習データを収集中...")
+                _post_progress(app_instance, progress_dialog, "AI学習データを収集中...")
                 try:
                     from modules.ai_predictor import get_ai_predictor
                     ai_predictor = get_ai_predictor()
@@ -115,11 +120,11 @@ def export_personal_data(app_instance: Any) -> None:
                     export_data["data"]["ai_learning"] = {"error": str(e)}
                 
                 # 3. カスタム設定
-                progress_dialog.set_message("カスタム設定を収集中...")
+                _post_progress(app_instance, progress_dialog, "カスタム設定を収集中...")
                 try:
                     from modules.customization import customization_manager
                     export_data["data"]["customization"] = {
-                        "user_settings": customization_manager.user_settings.settings,
+                        "user_settings": customization_manager.settings.settings,
                         "custom_keywords": customization_manager.keyword_manager.custom_keywords,
                         "custom_rules": customization_manager.rule_manager.custom_rules
                     }
@@ -128,7 +133,7 @@ def export_personal_data(app_instance: Any) -> None:
                     export_data["data"]["customization"] = {"error": str(e)}
                 
                 # 4. テーマ設定
-                progress_dialog.set_message("テーマ設定を収集中...")
+                _post_progress(app_instance, progress_dialog, "テーマ設定を収集中...")
                 try:
                     export_data["data"]["theme"] = {
                         "current_theme": app_instance.theme_manager.current_theme,
@@ -139,7 +144,7 @@ def export_personal_data(app_instance: Any) -> None:
                     export_data["data"]["theme"] = {"error": str(e)}
                 
                 # 5. カテゴリ設定
-                progress_dialog.set_message("カテゴリ設定を収集中...")
+                _post_progress(app_instance, progress_dialog, "カテゴリ設定を収集中...")
                 try:
                     export_data["data"]["categories"] = {
                         "category_keywords": getattr(app_instance, 'category_keywords', {}),
@@ -151,7 +156,7 @@ def export_personal_data(app_instance: Any) -> None:
                     export_data["data"]["categories"] = {"error": str(e)}
                 
                 # 6. 統計情報
-                progress_dialog.set_message("統計情報を収集中...")
+                _post_progress(app_instance, progress_dialog, "統計情報を収集中...")
                 try:
                     all_tags = app_instance.tag_manager.get_all_tags()
                     export_data["data"]["statistics"] = {
@@ -166,7 +171,7 @@ def export_personal_data(app_instance: Any) -> None:
                     export_data["data"]["statistics"] = {"error": str(e)}
                 
                 # 7. メタデータ
-                progress_dialog.set_message("メタデータを収集中...")
+                _post_progress(app_instance, progress_dialog, "メタデータを収集中...")
                 try:
                     export_data["data"]["metadata"] = {
                         "database_file": getattr(app_instance.tag_manager, 'db_file', ''),
@@ -178,16 +183,16 @@ def export_personal_data(app_instance: Any) -> None:
                     export_data["data"]["metadata"] = {"error": str(e)}
                 
                 # ファイルに保存
-                progress_dialog.set_message("ファイルに保存中...")
+                _post_progress(app_instance, progress_dialog, "ファイルに保存中...")
                 with open(file_path, 'w', encoding='utf-8') as f:
                     json.dump(export_data, f, ensure_ascii=False, indent=2)
                 
                 # 完了メッセージを表示
-                app_instance.root.after(0, lambda: show_completion())
+                app_instance.dispatcher.call(show_completion)
                 
             except Exception as e:
                 app_instance.logger.error(f"エクスポート処理エラー: {e}")
-                app_instance.root.after(0, lambda: show_error(str(e)))
+                app_instance.dispatcher.call(show_error, str(e))
         
         def show_completion():
             progress_dialog.close()
@@ -286,7 +291,7 @@ def import_personal_data(app_instance: Any) -> None:
                 import_errors = []
                 
                 # 1. タグデータのインポート
-                progress_dialog.set_message("タグデータをインポート中...")
+                _post_progress(app_instance, progress_dialog, "タグデータをインポート中...")
                 if "tags" in data and "error" not in data["tags"]:
                     try:
                         tags_data = data["tags"]
@@ -319,13 +324,13 @@ def import_personal_data(app_instance: Any) -> None:
                         import_errors.append(f"タグデータインポートエラー: {e}")
                 
                 # 2. AI学習データのインポート
-                progress_dialog.set_message("AI学習データをインポート中...")
+                _post_progress(app_instance, progress_dialog, "AI学習データをインポート中...")
                 if "ai_learning" in data and "error" not in data["ai_learning"]:
                     try:
                         from modules.ai_predictor import get_ai_predictor
                         ai_predictor = get_ai_predictor()
                         if hasattr(ai_predictor, 'usage_tracker'):
-                            ai_predictor.usage_tracker.usage_data.update(data["ai_learning"].get("usage_data", {}))
+                            ai_predictor.usage_tracker.import_usage_data(data["ai_learning"].get("usage_data", {}))
                             if hasattr(ai_predictor, 'learning_history'):
                                 ai_predictor.learning_history.update(data["ai_learning"].get("learning_history", {}))
                         else:
@@ -334,29 +339,42 @@ def import_personal_data(app_instance: Any) -> None:
                         import_errors.append(f"AI学習データインポートエラー: {e}")
                 
                 # 3. カスタム設定のインポート
-                progress_dialog.set_message("カスタム設定をインポート中...")
+                _post_progress(app_instance, progress_dialog, "カスタム設定をインポート中...")
                 if "customization" in data and "error" not in data["customization"]:
                     try:
                         from modules.customization import customization_manager
-                        customization_manager.user_settings.settings.update(data["customization"].get("user_settings", {}))
-                        customization_manager.keyword_manager.custom_keywords.update(data["customization"].get("custom_keywords", {}))
-                        customization_manager.rule_manager.custom_rules.update(data["customization"].get("custom_rules", {}))
+                        customization = data["customization"]
+                        # 項目ごとに書き込まず、ファイル毎に1回の書き込みにまとめる
+                        settings = customization_manager.settings
+                        with settings.batch():
+                            for key, value in customization.get("user_settings", {}).items():
+                                settings.set_setting(key, value)
+                        keyword_manager = customization_manager.keyword_manager
+                        with keyword_manager.batch():
+                            for category, keywords in customization.get("custom_keywords", {}).items():
+                                for kw in keywords:
+                                    keyword_manager.add_custom_keyword(category, kw["keyword"], kw.get("weight", 1.0))
+                        rule_manager = customization_manager.rule_manager
+                        with rule_manager.batch():
+                            for rule in customization.get("custom_rules", []):
+                                rule_manager.add_custom_rule(rule["type"], rule["condition"], rule["action"],
+                                                             rule.get("priority", 1))
                     except Exception as e:
                         import_errors.append(f"カスタム設定インポートエラー: {e}")
                 
                 # 4. テーマ設定のインポート
-                progress_dialog.set_message("テーマ設定をインポート中...")
+                _post_progress(app_instance, progress_dialog, "テーマ設定をインポート中...")
                 if "theme" in data and "error" not in data["theme"]:
                     try:
                         theme_data = data["theme"]
                         if "current_theme" in theme_data:
-                            app_instance.theme_manager.current_theme = theme_data["current_theme"]
-                            app_instance.apply_theme(theme_data["current_theme"])
+                            # テーマの変更はTkを操作するため、メインスレッドで行う（theme_managerもapply_themeで更新される）
+                            app_instance.dispatcher.call(app_instance.apply_theme, theme_data["current_theme"])
                     except Exception as e:
                         import_errors.append(f"テーマ設定インポートエラー: {e}")
                 
                 # 5. カテゴリ設定のインポート
-                progress_dialog.set_message("カテゴリ設定をインポート中...")
+                _post_progress(app_instance, progress_dialog, "カテゴリ設定をインポート中...")
                 if "categories" in data and "error" not in data["categories"]:
                     try:
                         categories_data = data["categories"]
@@ -370,12 +388,12 @@ def import_personal_data(app_instance: Any) -> None:
                         import_errors.append(f"カテゴリ設定インポートエラー: {e}")
                 
                 # UIの更新をメインスレッドで実行
-                progress_dialog.set_message("UIを更新中...")
-                app_instance.root.after(0, lambda: update_ui_and_complete(import_errors))
+                _post_progress(app_instance, progress_dialog, "UIを更新中...")
+                app_instance.dispatcher.call(update_ui_and_complete, import_errors)
                 
             except Exception as e:
                 app_instance.logger.error(f"インポート処理エラー: {e}")
-                app_instance.root.after(0, lambda: show_error(str(e)))
+                app_instance.dispatcher.call(show_error, str(e))
         
         def update_ui_and_complete(import_errors: List[str]):
             """UIを更新して完了処理を実行"""
@@ -531,16 +549,15 @@ def export_all_tags(app_instance: Any) -> None:
         return
     
     try:
-        # 全タグの情報を取得
-        all_tags = app_instance.tag_manager.get_all_tags()
-        
         # ファイル形式に応じて保存
         if file_path.lower().endswith('.csv'):
             import csv
+            exported = 0
             with open(file_path, 'w', newline='', encoding='utf-8') as f:
                 writer = csv.writer(f)
                 writer.writerow(['Tag', 'Japanese', 'Favorite', 'Category', 'IsNegative'])
-                for tag_info in all_tags:
+                # 全件をリストにせず、ページ単位で読みながら書き出す
+                for tag_info in app_instance.tag_manager.iter_tags():
                     writer.writerow([
                         tag_info['tag'],
                         tag_info.get('jp', ''),
@@ -548,8 +565,11 @@ def export_all_tags(app_instance: Any) -> None:
                         tag_info.get('category', ''),
                         'Yes' if tag_info.get('is_negative', False) else 'No'
                     ])
+                    exported += 1
         else:
             # JSON形式で保存
+            all_tags = app_instance.tag_manager.get_all_tags()
+            exported = len(all_tags)
             export_data = {
                 "export_date": datetime.datetime.now().isoformat(),
                 "total_tags": len(all_tags),
@@ -560,7 +580,7 @@ def export_all_tags(app_instance: Any) -> None:
         
         messagebox.showinfo(
             "エクスポート完了",
-            f"{len(all_tags)}個のタグをエクスポートしました。\n保存先: {file_path}",
+            f"{exported}個のタグをエクスポートしました。\n保存先: {file_path}",
             parent=app_instance.root
         )
         
@@ -571,9 +591,15 @@ def export_all_tags(app_instance: Any) -> None:
             parent=app_instance.root
         )
 
-def backup_database(app_instance: Any) -> None:
-    """データベースバックアップ機能"""
+def backup_database(app_instance: Any, compact: bool = False) -> None:
+    """
+    データベースバックアップ機能
+
+    sqlite3のバックアップAPIでバックグラウンドのスレッドからコピーするため、実行中も操作を続けられる。
+    進捗はステータスバーに表示する。compact=Trueでは VACUUM INTO で空き領域を詰めたバックアップを作る。
+    """
     from modules.constants import DB_FILE
+    from modules.db_backup import start_backup
     
     if not os.path.exists(DB_FILE):
         messagebox.showerror("エラー", "データベースファイルが見つかりません。", parent=app_instance.root)
@@ -581,20 +607,23 @@ def backup_database(app_instance: Any) -> None:
     
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
     backup_file = os.path.join('backup', f"tags_backup_{timestamp}.db")
+    last_percent = [-1]
     
-    try:
-        # バックアップディレクトリが存在しない場合は作成
-        os.makedirs('backup', exist_ok=True)
-        shutil.copy(DB_FILE, backup_file)
-        messagebox.showinfo(
-            "バックアップ完了", 
-            f"バックアップを作成しました：\n{backup_file}", 
-            parent=app_instance.root
-        )
-    except (IOError, shutil.Error) as e:
-        app_instance.logger.error(f"バックアップに失敗しました: {e}")
-        messagebox.showerror(
-            "エラー", 
-            f"バックアップに失敗しました：{e}", 
-            parent=app_instance.root
-        ) 
\ No newline at end of file
+    def on_progress(copied: int, total: int) -> None:
+        percent = copied * 100 // total if total else 100
+        # 同じ割合の間は通知しない（大きなDBでもキューに溜めすぎない）
+        if percent != last_percent[0]:
+            last_percent[0] = percent
+            app_instance.q.put({"type": "status", "message": f"データベースをバックアップ中... {percent}%"})
+    
+    def on_done(path: Optional[str], error: Optional[BaseException]) -> None:
+        if error is not None:
+            app_instance.logger.error(f"バックアップに失敗しました: {error}")
+            app_instance.q.put({"type": "status", "message": "バックアップに失敗しました"})
+            app_instance.q.put({"type": "error", "title": "エラー", "message": f"バックアップに失敗しました：{error}"})
+            return
+        app_instance.q.put({"type": "status", "message": "バックアップ完了"})
+        app_instance.q.put({"type": "info", "title": "バックアップ完了", "message": f"バックアップを作成しました：\n{path}"})
+    
+    app_instance.q.put({"type": "status", "message": "データベースをバックアップ中..."})
+    start_backup(DB_FILE, backup_file, on_done, progress=None if compact else on_progress, vacuum=compact)
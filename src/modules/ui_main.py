@@ -14,19 +14,23 @@ import logging
 import sqlite3
 import json
 import re
-import time
 from typing import Any, Dict, List, Optional, Callable, cast, Tuple
 import webbrowser
 
 from modules.constants import category_keywords, DB_FILE, TRANSLATING_PLACEHOLDER, auto_assign_category
+from modules.config import TAG_SNAPSHOT_FILE
 from modules.theme_manager import ThemeManager
-from modules.tag_manager import TagManager
+from modules.tag_manager import TagManager, is_valid_tag, normalize_tag
 from modules.dialogs import CategorySelectDialog, BulkCategoryDialog, MultiTagCategoryAssignDialog, LowConfidenceTagsDialog
-# 新しいモジュールからインポート
-from modules.ai_predictor import predict_category_ai, suggest_similar_tags_ai, get_ai_predictor
-from modules.customization import get_customized_category_keywords, apply_custom_rules
 
 # 分離されたモジュールからインポート
+from modules.ui_dispatcher import UIDispatcher
+from modules.ui_virtual_tree import VirtualTreeview, compute_tree_diff
+from modules.fetch_worker import FetchWorker
+from modules.search_cache import SearchResultCache, filter_tags
+from modules.persistence import get_shared_persistence_manager
+from modules.tag_snapshot import load_snapshot, write_snapshot
+from modules.tag_collection import TagCollection
 from modules.ui_dialogs import ProgressDialog, ToolTip, show_help_dialog, show_about_dialog, show_license_info_dialog, show_shortcuts_dialog
 from modules.ui_export_import import export_personal_data, import_personal_data, export_tags, export_all_tags, backup_database
 from modules.ui_utils import (
@@ -38,6 +42,22 @@ from modules.ui_utils import (
     worker_thread_fetch, show_guide_on_startup, clear_search, get_search_text
 )
 
+# AI予測（とその先のtorch/transformers）は起動を軽くするため初回使用時に読み込む
+def get_ai_predictor() -> Any:
+    from modules.ai_predictor import get_ai_predictor as _get_ai_predictor
+    return _get_ai_predictor()
+
+def predict_category_ai(tag: str, context_tags: Optional[List[str]] = None) -> Tuple[str, float]:
+    from modules.ai_predictor import predict_category_ai as _predict_category_ai
+    return _predict_category_ai(tag, context_tags)
+
+def suggest_similar_tags_ai(tag: str, limit: int = 5) -> List[Tuple[str, float]]:
+    from modules.ai_predictor import suggest_similar_tags_ai as _suggest_similar_tags_ai
+    return _suggest_similar_tags_ai(tag, limit)
+
+# 最初の描画が終わってからAIモデルの確認・予測器の読み込みを始めるまでの待ち時間
+DEFERRED_STARTUP_DELAY_MS = 200
+
 # --- テスト容易化のためのロジック分離 ---
 def build_category_list(category_keywords: Dict[str, List[str]]) -> List[str]:
     """
@@ -94,7 +114,18 @@ class TagManagerApp:
         self.tag_manager = TagManager(db_file=DB_FILE, parent=self.root)
         # キャッシュを無効化してデータを再読み込み
         self.tag_manager.invalidate_cache()
-        self.q: queue.Queue[Any] = queue.Queue()
+        # ワーカースレッドからのUI更新はすべてディスパッチャ経由で行う
+        self.dispatcher = UIDispatcher(self.root, self._handle_message)
+        self.q: Any = self.dispatcher
+        # タグ一覧の取得は常駐ワーカー1本で行い、古い検索は世代番号で打ち切る
+        self.fetch_worker = FetchWorker(self._fetch_for_worker)
+        # オートコンプリート用インデックスを構築中のスレッド（UIスレッドでは構築しない）
+        self._autocomplete_warmup: Optional[threading.Thread] = None
+        # (タブ, 検索語)毎の絞り込み結果。検索語を伸ばすと前回の結果から絞り込む
+        self.search_cache = SearchResultCache()
+        # 設定・学習データは変更のあったものだけをバックグラウンドでまとめて保存する
+        self.persistence = get_shared_persistence_manager()
+        self._register_persistence_components()
         self.refresh_debounce_id: Optional[str] = None # ここを追加
         self.search_timer: Optional[str] = None
         self.suggest_listbox: Optional[tk.Listbox] = None
@@ -140,10 +171,10 @@ class TagManagerApp:
         # UIの設定
         self.setup_ui()
         
-        # 初回起動時のAIモデルダウンロード処理
-        self.check_and_download_ai_models()
+        # AIモデルの確認と予測器の読み込みはウィンドウ表示後に行う
+        self.root.after(DEFERRED_STARTUP_DELAY_MS, self._run_deferred_startup)
         
-        # キュー処理の開始
+        # 起動前に溜まったメッセージを処理（以降はイベント駆動）
         self.process_queue()
         
         # 終了時の処理を設定
@@ -156,10 +187,61 @@ class TagManagerApp:
         # ガイド表示（初回起動時のみ）
         self.show_guide_on_startup()
         
-        # 自動保存タイマーを開始（5分ごと）
+        # 自動保存タイマーを開始（2分ごと、変更のあるものだけ保存）
         self.auto_save_timer = None
         self.start_auto_save()
 
+    def _run_deferred_startup(self) -> None:
+        """ウィンドウ表示後の初期化（AIモデルの確認と予測器の事前読み込み）"""
+        self.check_and_download_ai_models()
+        # オートコンプリート用インデックスは、予測器を読み込んだ後に使用回数付きで同じスレッドで構築する
+        self._autocomplete_warmup = threading.Thread(target=self._warm_up_ai_predictor, name="AIPredictorWarmup",
+                                                     daemon=True)
+        self._autocomplete_warmup.start()
+
+    def _warm_up_ai_predictor(self) -> None:
+        """AI予測器と学習データ、オートコンプリート用インデックスをバックグラウンドで読み込んでおく"""
+        try:
+            get_ai_predictor()
+        except Exception as e:
+            self.logger.warning(f"AI予測器の事前読み込みに失敗しました: {e}")
+        self._build_autocomplete_index()
+
+    def _build_autocomplete_index(self) -> None:
+        """オートコンプリート用インデックスを構築する（ワーカースレッドで呼ぶ）"""
+        try:
+            self.tag_manager.get_autocomplete_index(usage_provider=self._get_tag_usage_counts)
+        except Exception as e:
+            self.logger.warning(f"オートコンプリート用インデックスの構築に失敗しました: {e}")
+
+    def _start_autocomplete_warmup(self) -> None:
+        """オートコンプリート用インデックスの構築を始める（構築中なら何もしない）"""
+        if self._autocomplete_warmup is not None and self._autocomplete_warmup.is_alive():
+            return
+        self._autocomplete_warmup = threading.Thread(target=self._build_autocomplete_index,
+                                                     name="AutocompleteWarmup", daemon=True)
+        self._autocomplete_warmup.start()
+
+    def _verify_ai_models(self, ai_settings: Dict[str, Any], ai_settings_path: str) -> None:
+        """
+        ダウンロード済みのモデルが実際に使えるかをワーカースレッドで確認する
+        （モデル管理側がtorch等を読み込むためUIスレッドでは行わない）
+        """
+        try:
+            if get_ai_predictor().is_models_available():
+                print("AIモデルが正常に利用可能です。")
+                return
+            print("AIモデルファイルが見つかりません。再ダウンロードが必要です。")
+            # 設定をリセット
+            ai_settings["models_downloaded"] = False
+            ai_settings["download_completed"] = False
+            with open(ai_settings_path, 'w', encoding='utf-8') as f:
+                json.dump(ai_settings, f, indent=2, ensure_ascii=False)
+        except Exception as e:
+            print(f"AIモデル確認エラー: {e}")
+        # ダウンロードダイアログはUIスレッドで表示する
+        self.dispatcher.call(self.show_ai_model_download_dialog, key="ai_model_download_dialog")
+
     def check_and_download_ai_models(self) -> None:
         """初回起動時のAIモデルダウンロード処理"""
         # --- デバッグ用: 強制的にダウンロードダイアログを表示 --- 
@@ -170,10 +252,6 @@ class TagManagerApp:
             return
         # --- デバッグ用コードここまで ---
         try:
-            import os
-            import json
-            from modules.ai_predictor import get_ai_predictor
-            
             # AI設定ファイルのパスを確認（config.pyから取得）
             from modules.config import AI_SETTINGS_FILE
             ai_settings_path = AI_SETTINGS_FILE
@@ -202,24 +280,9 @@ class TagManagerApp:
                 # ダウンロード完了フラグをチェック
                 if ai_settings.get("download_completed", False):
                     print("AIモデルダウンロードは既に完了しています。")
-                    # 実際のモデルファイルの存在を確認
-                    try:
-                        ai_predictor = get_ai_predictor()
-                        if ai_predictor.is_models_available():
-                            print("AIモデルが正常に利用可能です。")
-                            return
-                        else:
-                            print("AIモデルファイルが見つかりません。再ダウンロードが必要です。")
-                            # 設定をリセット
-                            ai_settings["models_downloaded"] = False
-                            ai_settings["download_completed"] = False
-                            with open(ai_settings_path, 'w', encoding='utf-8') as f:
-                                json.dump(ai_settings, f, indent=2, ensure_ascii=False)
-                            self.show_ai_model_download_dialog()
-                    except Exception as e:
-                        print(f"AIモデル確認エラー: {e}")
-                        # エラーが発生した場合はダウンロードダイアログを表示
-                        self.show_ai_model_download_dialog()
+                    # 実際のモデルファイルの存在はワーカースレッドで確認する
+                    threading.Thread(target=self._verify_ai_models, args=(ai_settings, ai_settings_path),
+                                     name="AIModelCheck", daemon=True).start()
                 else:
                     print("AIモデルがダウンロードされていません。")
                     self.show_ai_model_download_dialog()
@@ -296,38 +359,38 @@ class TagManagerApp:
                 download_button.config(state=tk.DISABLED)
                 skip_button.config(state=tk.DISABLED)
                 
+                def report(text: str, value: int) -> None:
+                    # ワーカースレッドからはディスパッチャ経由でUIを更新する
+                    self.dispatcher.call(status_var.set, text, key="download_status")
+                    self.dispatcher.call(progress_var.set, value, key="download_progress")
+                
                 def download_worker():
                     try:
                         from modules.ai_predictor import get_ai_predictor
                         from modules.local_hf_manager import LocalHuggingFaceManager
                         
                         # ステータス更新
-                        self.root.after(0, lambda: status_var.set("AI予測器を初期化中..."))
-                        self.root.after(0, lambda: progress_var.set(10))
+                        report("AI予測器を初期化中...", 10)
                         
                         # AI予測器を取得
                         ai_predictor = get_ai_predictor()
                         
-                        self.root.after(0, lambda: status_var.set("ローカルAIマネージャーを初期化中..."))
-                        self.root.after(0, lambda: progress_var.set(20))
+                        report("ローカルAIマネージャーを初期化中...", 20)
                         
                         # ローカルAIマネージャーを初期化
                         hf_manager = LocalHuggingFaceManager()
                         
-                        self.root.after(0, lambda: status_var.set("モデルファイルをダウンロード中..."))
-                        self.root.after(0, lambda: progress_var.set(30))
+                        report("モデルファイルをダウンロード中...", 30)
                         
                         # モデルをダウンロード
                         hf_manager.download_models()
                         
-                        self.root.after(0, lambda: status_var.set("モデルを読み込み中..."))
-                        self.root.after(0, lambda: progress_var.set(70))
+                        report("モデルを読み込み中...", 70)
                         
                         # モデルを読み込み
                         hf_manager.load_models()
                         
-                        self.root.after(0, lambda: status_var.set("設定を保存中..."))
-                        self.root.after(0, lambda: progress_var.set(90))
+                        report("設定を保存中...", 90)
                         
                         # AI設定を保存
                         ai_settings = {
@@ -352,16 +415,16 @@ class TagManagerApp:
                         with open(ai_settings_path, 'w', encoding='utf-8') as f:
                             json.dump(ai_settings, f, ensure_ascii=False, indent=2)
                         
-                        self.root.after(0, lambda: status_var.set("完了！"))
-                        self.root.after(0, lambda: progress_var.set(100))
+                        report("完了！", 100)
                         
                         # 完了メッセージを表示
-                        self.root.after(2000, lambda: show_completion_message(dialog))
+                        self.dispatcher.call(self.root.after, 2000, lambda: show_completion_message(dialog))
                         
                     except Exception as e:
-                        self.root.after(0, lambda: status_var.set(f"エラー: {str(e)}"))
-                        self.root.after(0, lambda: download_button.config(state=tk.NORMAL))
-                        self.root.after(0, lambda: skip_button.config(state=tk.NORMAL))
+                        error_text = f"エラー: {str(e)}"
+                        self.dispatcher.call(status_var.set, error_text, key="download_status")
+                        self.dispatcher.call(download_button.config, state=tk.NORMAL)
+                        self.dispatcher.call(skip_button.config, state=tk.NORMAL)
                         print(f"AIモデルダウンロードエラー: {e}")
                 
                 # ワーカースレッドでダウンロード実行
@@ -476,8 +539,16 @@ class TagManagerApp:
         """データベースバックアップ"""
         backup_database(self)
 
+    def backup_db_compact(self) -> None:
+        """空き領域を詰めたデータベースバックアップ（VACUUM INTO）"""
+        backup_database(self, compact=True)
+
     def setup_ui(self) -> None:
         self.trees = {}  # ← ここで必ず初期化
+        self.virtual_trees: Dict[str, VirtualTreeview] = {}
+        # ワーカーが最後に送った行（カテゴリ毎の版と行リスト）。差分計算の基準にする
+        self._tree_snapshots: Dict[str, Tuple[int, List[Tuple[Any, ...]]]] = {}
+        self._tree_snapshot_lock = threading.Lock()
         
         # メソッド参照を初期化
         def prompt_and_add_tags_negative() -> None:
@@ -525,6 +596,7 @@ class TagManagerApp:
         menubar.add_cascade(label="設定", menu=settings_menu)
         settings_menu.add_command(label="テーマ切替", command=self.show_theme_dialog)
         settings_menu.add_command(label="データベースバックアップ", command=self.backup_db)
+        settings_menu.add_command(label="データベースバックアップ（圧縮）", command=self.backup_db_compact)
         settings_menu.add_separator()
         settings_menu.add_command(label="個人データエクスポート", command=self.export_personal_data)
         settings_menu.add_command(label="個人データインポート", command=self.import_personal_data)
@@ -732,16 +804,20 @@ class TagManagerApp:
             for col in cols:
                 tree.heading(col, text=col)
                 tree.column(col, width=120 if col != "★" else 30, anchor=tk.CENTER)
-            tree.bind("<<TreeviewSelect>>", self.on_tree_select)
             tree.bind("<Double-1>", self.add_to_output)
             self.setup_context_menu(tree)
             self.trees[cat] = tree
+            # 可視範囲だけを実体化する仮想リスト（イベントのバインド後に作成する）
+            self.virtual_trees[cat] = VirtualTreeview(tree, tree_scrollbar)
+            # 仮想リストが選択中のキーを更新してから読むよう、選択イベントはその後に追加する
+            tree.bind("<<TreeviewSelect>>", self.on_tree_select, add="+")
         # 初期カテゴリのTreeviewを表示
         for tree_frame in self.treeview_frame.winfo_children():
             tree_frame.pack_forget()
         self.trees[self.current_category].master.pack(fill=tb.BOTH, expand=True)
 
-        # 初期カテゴリのタグ一覧を必ず表示
+        # 初期カテゴリのタグ一覧を必ず表示（スナップショットがあれば先に表示し、DBとの照合はワーカーで行う）
+        self._show_startup_snapshot()
         self.refresh_tabs()
 
         # --- オートコンプリート・日本語→英語変換サジェスト機能 ---
@@ -750,16 +826,12 @@ class TagManagerApp:
         self.suggest_var = tk.StringVar()
 
         def get_tag_candidates(prefix: str) -> List[str]:
-            """既存タグ（英語・日本語）から部分一致候補を返す"""
-            tags = self.tag_manager.get_all_tags()
-            candidates = set()
-            prefix_lower = prefix.lower()
-            for t in tags:
-                if t["tag"].lower().startswith(prefix_lower):
-                    candidates.add(t["tag"])
-                if t["jp"] and t["jp"].startswith(prefix):
-                    candidates.add(t["tag"])  # 日本語→英語逆引き
-            return sorted(candidates)
+            """既存タグ（英語・日本語）から前方一致候補を使用頻度順に返す（インデックスの構築中は候補なし）"""
+            index = self.tag_manager.peek_autocomplete_index()
+            if index is None:
+                self._start_autocomplete_warmup()
+                return []
+            return index.search(prefix)
 
         def ai_translate_jp_to_en(jp_text: str) -> List[str]:
             """AI翻訳APIや既存関数で日本語→英語タグ候補を返す（ダミー実装）"""
@@ -841,63 +913,116 @@ class TagManagerApp:
         # Listboxのイベントはshow_suggest_listbox内でバインド
         # --- 既存のon_output_focus_outはそのまま維持 ---
 
+    def _get_tag_usage_counts(self) -> Dict[str, int]:
+        """
+        AI学習履歴からタグ毎の使用回数を取得する（オートコンプリートの並び順に使用）
+        予測器がまだ読み込まれていなければ、ここでは読み込まずに空を返す。
+        """
+        try:
+            tracker = self._get_loaded_usage_tracker()
+            return tracker.get_usage_counts() if tracker is not None else {}
+        except Exception as e:
+            self.logger.warning(f"使用回数の取得に失敗しました: {e}")
+            return {}
+
     def on_closing(self) -> None:
         if messagebox.askokcancel("終了", "アプリケーションを終了しますか？"):
             try:
                 # 自動保存タイマーを停止
                 self.stop_auto_save()
-                # 設定を保存
-                self.save_app_settings()
-                # データベースを閉じる
-                self.tag_manager.close()
+                # タグ取得ワーカーを停止
+                self.fetch_worker.stop()
+                # 保存スレッドを停止し、未保存の変更を書き出す
+                self.persistence.stop(flush=True)
+                # データベースを閉じ、次回起動時の一覧表示用スナップショットを書き出す
+                self._close_database_with_snapshot()
                 # アプリケーションを終了
                 self.root.destroy()
             except Exception as e:
                 print(f"終了処理中にエラーが発生しました: {e}")
                 self.root.destroy()
     
+    def _close_database_with_snapshot(self) -> None:
+        """全タグをスナップショットに書き出してからDBを閉じる（スタンプは閉じた後のDBから取る）"""
+        tags = self.tag_manager.get_tag_collection()
+        self.tag_manager.close()
+        write_snapshot(TAG_SNAPSHOT_FILE, tags, self.tag_manager.db_file)
+
+    def _show_startup_snapshot(self) -> None:
+        """
+        前回終了時のスナップショットで最初のタブの一覧を即座に表示する。
+        SQLiteとの照合は直後のrefresh_tabs()でワーカーが行い、差分だけが反映される。
+        """
+        if self.get_search_text():
+            return
+        category = self.current_category
+        snapshot = load_snapshot(TAG_SNAPSHOT_FILE, self.tag_manager.db_file)
+        if snapshot is None:
+            return
+        with snapshot:
+            tags = snapshot.tags_for_tab(category)
+        if tags is None:
+            return
+        items = [(t["tag"], t["jp"], "★" if t["favorite"] else "", t["category"]) for t in tags]
+        with self._tree_snapshot_lock:
+            version = self._tree_snapshots.get(category, (0, None))[0] + 1
+            self._tree_snapshots[category] = (version, items)
+        self.virtual_trees[category].set_rows(items, version=version)
+
+    def _register_persistence_components(self) -> None:
+        """PersistenceManagerに保存対象のコンポーネントを登録する"""
+        self.persistence.register("theme", self.theme_manager.save, self.theme_manager.is_dirty)
+        # カスタマイズ設定は読み込み時に同じマネージャーへ自ら登録する
+        # AI予測・翻訳は遅延読み込みのため、読み込み済みのときだけ対象にする
+        self.persistence.register("usage_tracker", self._save_usage_tracker, self._is_usage_tracker_dirty)
+        self.persistence.register("translation_cache", self._save_translation_cache,
+                                  self._is_translation_cache_dirty)
+
+    def _get_loaded_usage_tracker(self) -> Any:
+        ai_predictor_module = sys.modules.get("modules.ai_predictor")
+        predictor = getattr(ai_predictor_module, "_ai_predictor_instance", None)
+        return getattr(predictor, "usage_tracker", None)
+
+    def _is_usage_tracker_dirty(self) -> bool:
+        tracker = self._get_loaded_usage_tracker()
+        return tracker is not None and tracker.is_dirty()
+
+    def _save_usage_tracker(self) -> bool:
+        tracker = self._get_loaded_usage_tracker()
+        return tracker.save_usage_data() if tracker is not None else True
+
+    def _get_loaded_prompt_translator(self) -> Any:
+        prompt_translator_module = sys.modules.get("modules.prompt_translator")
+        return getattr(prompt_translator_module, "prompt_translator", None)
+
+    def _is_translation_cache_dirty(self) -> bool:
+        translator = self._get_loaded_prompt_translator()
+        return translator is not None and translator.is_cache_dirty()
+
+    def _save_translation_cache(self) -> bool:
+        translator = self._get_loaded_prompt_translator()
+        return translator._save_translation_cache() if translator is not None else True
+
     def save_app_settings(self) -> None:
-        """アプリケーション終了時に設定を保存"""
+        """変更のある設定・学習データを同期的に保存する"""
         try:
-            # テーマ設定を保存
-            if hasattr(self, 'theme_manager'):
-                self.theme_manager.save_theme_settings(self.theme_manager.current_theme)
-            
-            # カスタマイズ設定を保存
-            if hasattr(self, 'customization_manager'):
-                self.customization_manager.user_settings.save_settings()
-                self.customization_manager.custom_keywords.save_settings()
-                self.customization_manager.custom_rules.save_settings()
-            
-            # AI学習データを保存
-            try:
-                from modules.ai_predictor import get_ai_predictor
-                ai_predictor = get_ai_predictor()
-                if ai_predictor and hasattr(ai_predictor, 'usage_tracker'):
-                    ai_predictor.usage_tracker.save_usage_data()
-            except Exception as e:
-                print(f"AI学習データの保存に失敗: {e}")
-                
+            saved = self.persistence.flush()
+            if saved:
+                self.logger.info(f"保存しました: {', '.join(saved)}")
         except Exception as e:
             print(f"設定の保存に失敗しました: {e}")
     
     def immediate_save(self) -> None:
-        """変更が起きる度に即座に保存を実行"""
+        """変更が起きたときに保存を予約する（短時間の連続した変更はまとめて保存される）"""
         try:
-            # 設定を保存
-            self.save_app_settings()
-            print("即座保存が実行されました")
+            self.persistence.request_save()
         except Exception as e:
-            print(f"即座保存中にエラーが発生しました: {e}")
+            print(f"保存予約中にエラーが発生しました: {e}")
     
     def start_auto_save(self) -> None:
         """自動保存タイマーを開始（バックアップ用）"""
-        try:
-            # 設定を保存
-            self.save_app_settings()
-            print("自動保存が実行されました")
-        except Exception as e:
-            print(f"自動保存中にエラーが発生しました: {e}")
+        # 変更の通知が漏れたコンポーネント（翻訳キャッシュなど）もここで拾う
+        self.immediate_save()
         
         # 2分後に再度実行（バックアップ用）
         self.auto_save_timer = self.root.after(120000, self.start_auto_save)  # 120000ms = 2分
@@ -911,9 +1036,9 @@ class TagManagerApp:
     def emergency_save(self) -> None:
         """緊急時の設定保存（強制終了時など）"""
         try:
-            print("緊急保存を実行中...")
-            self.save_app_settings()
-            print("緊急保存が完了しました")
+            saved = self.persistence.flush()
+            if saved:
+                print(f"緊急保存が完了しました: {', '.join(saved)}")
         except Exception as e:
             print(f"緊急保存中にエラーが発生しました: {e}")
 
@@ -945,8 +1070,8 @@ class TagManagerApp:
         self.show_current_tree()
         # 検索テキストを取得
         filter_text = self.get_search_text().lower()
-        # 非同期でタグデータを取得
-        threading.Thread(target=self.worker_thread_fetch, args=(self.q, filter_text, self.current_category), daemon=True).start()
+        # 非同期でタグデータを取得（未処理の古いリクエストは置き換えられる）
+        self.fetch_worker.submit(filter_text, self.current_category)
         # 全カテゴリ時は一括操作ボタンを無効化（カテゴリ一括変更と削除は除く）
         if hasattr(self, 'ops_panel'):
             for child in self.ops_panel.winfo_children():
@@ -1045,13 +1170,8 @@ class TagManagerApp:
         self.root.after(200, delayed_select_edit)
 
     def select_tag_in_tree(self, tag_to_select: str) -> None:
-        tree = self.trees[self.current_category]
-        for iid in tree.get_children():
-            if tree.item(iid, "values")[0] == tag_to_select:
-                tree.selection_set(iid)
-                tree.focus(iid)
-                tree.see(iid)  # 追加：自動スクロール
-                break
+        # 画面外の行もスクロールして選択する
+        self.virtual_trees[self.current_category].select_key(tag_to_select)
 
     def insert_weighted_tags(self) -> None:
         if not self.weight_values: return
@@ -1077,8 +1197,12 @@ class TagManagerApp:
             self.root.after_cancel(self.search_timer)
         self.search_timer = self.root.after(300, self.refresh_tabs)
 
+    def get_selected_tags(self) -> List[str]:
+        """現在のタグ一覧で選択中のタグ（スクロールして画面外になった行も含む）"""
+        return [row[0] for row in self.virtual_trees[self.current_category].get_selected_rows()]
+
     def show_context_menu(self, event: Any, tree: Any) -> None:
-        selected = tree.selection()
+        selected = self.get_selected_tags()
         tree.context_menu.entryconfig("カテゴリ変更", state="disabled" if self.current_category == "ネガティブ" else "normal")
         tree.context_menu.entryconfig("タグを削除 (Del)", state="normal" if selected else "disabled")
         tree.context_menu.entryconfig("お気に入り切替 (F)", state="normal" if selected else "disabled")
@@ -1103,15 +1227,13 @@ class TagManagerApp:
             self.category_description_label.config(text=description)
 
     def set_category_from_menu(self, category: str) -> None:
-        tree = self.trees[self.current_category]
-        selected = tree.selection()
+        selected = self.get_selected_tags()
         if not selected:
             return
         if category == "未分類":
             category = ""
         changed = False
-        for item in selected:
-            tag_text = tree.item(item, "values")[0]
+        for tag_text in selected:
             if self.tag_manager.set_category(tag_text, category):
                 changed = True
                 # AI学習: カテゴリ変更を記録
@@ -1145,36 +1267,56 @@ class TagManagerApp:
         show_shortcuts_dialog(self.root)
 
     def process_queue(self) -> None:
-        try:
-            message = self.q.get_nowait()
-            msg_type = message.get("type")
-            if msg_type == "update_tree":
-                if message.get("category") == self.current_category:
-                    tree = self.trees[self.current_category]
-                    tree.delete(*tree.get_children())
-                    for item in message["items"]:
-                        tree.insert("", tk.END, values=item)
-            elif msg_type == "refresh":
-                if self.refresh_debounce_id:
-                    self.root.after_cancel(self.refresh_debounce_id)
-                self.refresh_debounce_id = self.root.after(100, self.refresh_tabs)
-            elif msg_type == "info":
-                messagebox.showinfo(message["title"], message["message"], parent=self.root)
-            elif msg_type == "error":
-                self.logger.error(f"{message['title']}: {message['message']}")
-                messagebox.showerror(message["title"], message["message"], parent=self.root)
-            elif msg_type == "status":
-                self.status_var.set(message["message"])
-                # 追加完了や準備完了などであれば数秒後に消す
-                if any(word in message["message"] for word in ["完了", "準備完了"]):
-                    self.root.after(3000, self.clear_status_var)
-            elif msg_type == "immediate_save":
-                # 即座保存を実行
-                self.immediate_save()
-        except queue.Empty:
-            pass
-        finally:
-            self.root.after(100, self.process_queue)
+        """溜まっているUIメッセージを即座に処理する（通常はディスパッチャがイベントで起動する）"""
+        self.dispatcher.drain()
+
+    def _handle_message(self, message: Dict[str, Any]) -> None:
+        """ディスパッチャから渡されたメッセージをメインスレッドで処理する"""
+        msg_type = message.get("type")
+        if msg_type == "update_tree":
+            generation = message.get("generation")
+            if generation is not None and not self.fetch_worker.is_current(generation):
+                # 後続の検索に置き換えられた結果は描画しない
+                return
+            if message.get("category") == self.current_category:
+                virtual_tree = self.virtual_trees[self.current_category]
+                diff = message.get("diff")
+                version = message.get("version")
+                if version is not None and version <= virtual_tree.version:
+                    # 追い越された古い結果は捨てる
+                    return
+                if diff is not None and virtual_tree.version == message.get("base_version"):
+                    # 表示中の内容が差分の基準と一致する場合は変更行だけを反映
+                    virtual_tree.apply_diff(diff, version=version)
+                else:
+                    virtual_tree.set_rows(message["items"], version=version)
+        elif msg_type == "refresh":
+            if self.refresh_debounce_id:
+                self.root.after_cancel(self.refresh_debounce_id)
+            self.refresh_debounce_id = self.root.after(100, self.refresh_tabs)
+        elif msg_type == "info":
+            messagebox.showinfo(message["title"], message["message"], parent=self.root)
+        elif msg_type == "error":
+            self.logger.error(f"{message['title']}: {message['message']}")
+            messagebox.showerror(message["title"], message["message"], parent=self.root)
+        elif msg_type == "status":
+            self.status_var.set(message["message"])
+            # 追加完了や準備完了などであれば数秒後に消す
+            if any(word in message["message"] for word in ["完了", "準備完了"]):
+                self.root.after(3000, self.clear_status_var)
+        elif msg_type == "progress":
+            dialog = message.get("dialog") or getattr(self, "progress_dialog", None)
+            if dialog:
+                dialog.set_message(message["message"])
+        elif msg_type == "close_progress":
+            delay = message.get("delay", 0)
+            if delay:
+                self.root.after(delay, self.close_progress_dialog)
+            else:
+                self.close_progress_dialog()
+        elif msg_type == "immediate_save":
+            # 即座保存を実行
+            self.immediate_save()
 
     def clear_status_var(self) -> None:
         """ステータス変数をクリアする"""
@@ -1220,14 +1362,9 @@ class TagManagerApp:
     def _show_save_tags_dialog(self, tags: List[str]) -> None:
         """タグ保存確認ダイアログを表示する"""
         # 既存のタグをチェック
-        existing_tags = []
-        new_tags = []
-        
-        for tag in tags:
-            if self.tag_manager.tag_exists(tag, False) or self.tag_manager.tag_exists(tag, True):
-                existing_tags.append(tag)
-            else:
-                new_tags.append(tag)
+        existing = self.tag_manager.existing_tags(tags)
+        existing_tags = [tag for tag in tags if tag in existing]
+        new_tags = [tag for tag in tags if tag not in existing]
         
         # ダイアログメッセージを作成
         message = "プロンプトをコピーしました。\n\n"
@@ -1274,17 +1411,14 @@ class TagManagerApp:
             )
             
             def save_worker():
-                saved_count = 0
-                for i, tag in enumerate(tags):
-                    # プログレス更新
-                    progress_dialog.set_message(f"タグを保存中... ({i+1}/{len(tags)})")
-                    
-                    # タグを保存（通常タグとして）
-                    if self.tag_manager.add_tag(tag, False, ""):
-                        saved_count += 1
-                    
-                    # UI更新のため少し待機
-                    time.sleep(0.01)
+                # add_tagと同じ正規化・検証を行い、既存チェックと保存はそれぞれ1回の問い合わせにまとめる
+                normalized = [tag for tag in dict.fromkeys(normalize_tag(t) for t in tags) if is_valid_tag(tag)]
+                existing = self.tag_manager.existing_tags(normalized)
+                rows = [{"tag": tag, "jp": TRANSLATING_PLACEHOLDER, "category": auto_assign_category(tag),
+                         "is_negative": False}
+                        for tag in normalized if tag not in existing]
+                # 通常タグとして1トランザクションで保存
+                saved_count = self.tag_manager.save_tags(rows) or 0
                 
                 # 完了メッセージ
                 def show_completion():
@@ -1297,7 +1431,7 @@ class TagManagerApp:
                     # タブを更新
                     self.refresh_tabs()
                 
-                self.root.after(0, show_completion)
+                self.dispatcher.call(show_completion)
             
             # ワーカースレッドを開始
             import threading
@@ -1318,13 +1452,11 @@ class TagManagerApp:
         messagebox.showinfo("クリア完了", "出力欄をクリアしました！", parent=self.root) 
 
     def add_to_output(self, event: Optional[Any] = None) -> None:
-        tree = self.trees[self.current_category]
-        selected = tree.selection()
+        selected = self.get_selected_tags()
         if not selected:
             return
         is_negative = (self.current_category == "ネガティブ")
-        for item in selected:
-            tag_text = tree.item(item, "values")[0]
+        for tag_text in selected:
             if not any(d["tag"] == tag_text for d in self.output_tags_data):
                 self.output_tags_data.append({"tag": tag_text, "weight": 1.0})
                 self.tag_manager.add_recent_tag(tag_text, is_negative)
@@ -1338,53 +1470,31 @@ class TagManagerApp:
         pass 
 
     def toggle_favorite(self) -> None:
-        tree = self.trees[self.current_category]
-        selected = tree.selection()
-        if not selected:
+        selected_tags_text = self.get_selected_tags()
+        if not selected_tags_text:
             messagebox.showinfo("お気に入り", "お気に入りにするタグが選択されていません。", parent=self.root)
             return
         is_negative = (self.current_category == "ネガティブ")
-        for item in selected:
-            tag_text = tree.item(item, "values")[0]
-            if self.tag_manager.toggle_favorite(tag_text, is_negative):
-                self.refresh_tabs()
-                # 即座保存を実行
-                self.immediate_save() 
+        results = self.tag_manager.toggle_favorites(selected_tags_text, is_negative)
+        if results and any(results.values()):
+            self.refresh_tabs()
+            # 即座保存を実行
+            self.immediate_save() 
 
     def delete_tag(self) -> None:
-        print(f"[DEBUG] delete_tag - 開始")
-        tree = self.trees[self.current_category]
-        selected = tree.selection()
-        print(f"[DEBUG] delete_tag - current_category: {self.current_category}")
-        print(f"[DEBUG] delete_tag - selected: {selected}")
-        
-        if not selected:
-            print(f"[DEBUG] delete_tag - 選択されたタグがありません")
+        selected_tags_text = self.get_selected_tags()
+        if not selected_tags_text:
             messagebox.showinfo("削除", "削除するタグが選択されていません。", parent=self.root)
             return
         
-        # 全カテゴリの場合は、各タグの実際のis_negativeフラグを確認
         if self.current_category == "全カテゴリ":
-            all_tags = self.tag_manager.get_all_tags()
-            tag_info_map = {tag_info["tag"]: tag_info for tag_info in all_tags}
-            
-            for item in selected:
-                tag_text = tree.item(item, "values")[0]
-                print(f"[DEBUG] delete_tag - 削除対象タグ: {tag_text}")
-                if tag_text in tag_info_map:
-                    is_negative = tag_info_map[tag_text].get("is_negative", False)
-                    print(f"[DEBUG] delete_tag - is_negative: {is_negative}")
-                    self.tag_manager.delete_tag(tag_text, is_negative)
+            # 全カテゴリの場合は、ポジティブ・ネガティブを問わず削除
+            is_negative = None
         else:
             # 特定のカテゴリの場合は、カテゴリに基づいてis_negativeを判定
             is_negative = (self.current_category == "ネガティブ")
-            print(f"[DEBUG] delete_tag - カテゴリベースのis_negative: {is_negative}")
-            for item in selected:
-                tag_text = tree.item(item, "values")[0]
-                print(f"[DEBUG] delete_tag - 削除対象タグ: {tag_text}")
-                self.tag_manager.delete_tag(tag_text, is_negative)
+        self.tag_manager.delete_tags(selected_tags_text, is_negative)
         
-        print(f"[DEBUG] delete_tag - 削除完了、refresh_tabsを実行")
         self.refresh_tabs()
         self.clear_edit_panel()
         self.clear_weight_selection()
@@ -1392,9 +1502,8 @@ class TagManagerApp:
         self.immediate_save()
 
     def bulk_category_change(self) -> None:
-        tree = self.trees[self.current_category]
-        selected = tree.selection()
-        if not selected:
+        selected_tags_text = self.get_selected_tags()
+        if not selected_tags_text:
             messagebox.showinfo("カテゴリ一括変更", "変更したいタグを選択してください。", parent=self.root)
             return
         if self.current_category == "ネガティブ":
@@ -1402,15 +1511,11 @@ class TagManagerApp:
             return
         # 全カテゴリの場合は、選択されたタグがネガティブタグでないかチェック
         if self.current_category == "全カテゴリ":
-            selected_tags_text = [tree.item(item, "values")[0] for item in selected]
             # ネガティブタグが含まれているかチェック
-            all_tags = self.tag_manager.get_all_tags()
-            tag_info_map = {tag_info["tag"]: tag_info for tag_info in all_tags}
-            negative_tags = [tag for tag in selected_tags_text if tag in tag_info_map and tag_info_map[tag].get("is_negative", False)]
+            negative_tags = self.tag_manager.existing_tags(selected_tags_text, is_negative=True)
             if negative_tags:
                 messagebox.showinfo("カテゴリ一括変更", "ネガティブタグのカテゴリは変更できません。\nネガティブタグを除外して選択し直してください。", parent=self.root)
             return
-        selected_tags_text = [tree.item(item, "values")[0] for item in selected]
         dialog = BulkCategoryDialog(self.root, selected_tags_text)
         if dialog.result and dialog.result['action'] == 'change':
             to_category = dialog.result['to_category']
@@ -1448,9 +1553,7 @@ class TagManagerApp:
                 msg = f"{total}件中{idx}件目を追加中..."
                 self.q.put({"type": "status", "message": msg})
                 if hasattr(self, "progress_dialog"):
-                    def set_progress() -> None:
-                        self.set_progress_message(msg)
-                    self.root.after(0, set_progress)
+                    self.q.put({"type": "progress", "message": msg})
                 cleaned_tags = self._strip_weight_from_tag(raw_tag)
                 for tag in cleaned_tags:
                     category = "ネガティブ" if is_negative else auto_assign_category(tag)
@@ -1474,17 +1577,13 @@ class TagManagerApp:
             done_msg = f"追加完了！（追加数: {added_count}件）"
             self.q.put({"type": "status", "message": done_msg})
             if hasattr(self, "progress_dialog"):
-                def set_done_message() -> None:
-                    self.set_progress_message(done_msg)
-                self.root.after(0, set_done_message)
-                self.root.after(1200, self.close_progress_dialog)
+                self.q.put({"type": "progress", "message": done_msg})
+                self.q.put({"type": "close_progress", "delay": 1200})
         except Exception as e:
             self.q.put({"type": "error", "title": "タグ追加エラー", "message": f"タグの追加中にエラーが発生しました:\n{e}"})
             if hasattr(self, "progress_dialog"):
-                def set_error_message() -> None:
-                    self.set_progress_message("エラーが発生しました")
-                self.root.after(0, set_error_message)
-                self.root.after(2000, self.close_progress_dialog)
+                self.q.put({"type": "progress", "message": "エラーが発生しました"})
+                self.q.put({"type": "close_progress", "delay": 2000})
         finally:
             pass
 
@@ -1561,12 +1660,11 @@ class TagManagerApp:
 
     def export_tags(self, tree: Any) -> None:
         """タグエクスポート"""
-        selected = tree.selection()
+        selected = self.virtual_trees[self.current_category].get_selected_rows()
         tags_to_export = []
         is_negative = (self.current_category == "ネガティブ")
         if selected:
-            for item in selected:
-                tag, jp, favorite, category = tree.item(item, "values")
+            for tag, jp, favorite, category in selected:
                 tags_to_export.append({"tag": tag, "jp": jp, "category": category, "favorite": favorite, "is_negative": is_negative})
         else:
             tags = self.tag_manager.get_recent_tags() if self.current_category == "最近使った" else \
@@ -1606,35 +1704,22 @@ class TagManagerApp:
     def filter_tags_optimized(self, tags: List[Dict[str, Any]], filter_text: str, category: str) -> List[Dict[str, Any]]:
         """検索語でタグ名・カテゴリ・日本語訳・お気に入りを横断的にフィルタ"""
         filter_text = filter_text.lower().strip()
-        if not filter_text or filter_text in ("タグ名・カテゴリ・日本語訳・お気に入りで検索…", ""):
-            return [t for t in tags if (category=="全カテゴリ" or t["category"]==category or category=="お気に入り" and t["favorite"])]
-        
-        def match(t: Dict[str, Any]) -> bool:
-            return (
-                filter_text in t["tag"].lower()
-                or filter_text in t.get("jp", "").lower()
-                or filter_text in t.get("category", "").lower()
-                or (filter_text in ("fav", "favorite", "お気に入り") and t.get("favorite", False))
-            )
-        
-        # 検索テキストがある場合は、まず検索でフィルタしてからカテゴリでフィルタ
-        filtered_by_search = [t for t in tags if match(t)]
-        return [t for t in filtered_by_search if (category=="全カテゴリ" or t["category"]==category or category=="お気に入り" and t["favorite"])]
+        if filter_text == "タグ名・カテゴリ・日本語訳・お気に入りで検索…":
+            filter_text = ""
+        return filter_tags(tags, filter_text, category)
 
     def sort_prompt_by_priority(self, tags_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """プロンプト構造の優先度に基づいてタグをソート"""
         if not tags_data:
             return []
         
-        all_tags_info = self.tag_manager.get_all_tags()
-        tag_info_map = {t["tag"]: t for t in all_tags_info}
+        all_tags = self.tag_manager.get_tag_collection()
         tags_with_priority = []
         
         for item in tags_data:
             tag = item["tag"]
             weight = item["weight"]
-            info = tag_info_map.get(tag)
-            category = info.get("category", "") if info else ""
+            category = all_tags.category_of(tag, "")
             priority = self.prompt_structure_priorities.get(category, 999)
             tags_with_priority.append({"tag": tag, "weight": weight, "priority": priority})
         
@@ -1711,31 +1796,76 @@ class TagManagerApp:
         self.label_weight_display.config(text="")
         self.refresh_weight_output()
 
-    def worker_thread_fetch(self, q: queue.Queue[Any], filter_text: str, category_to_fetch: str) -> None:
-        """非同期でタグデータを取得"""
+    def _fetch_for_worker(self, filter_text: str, category_to_fetch: str,
+                          generation: int, is_cancelled: Callable[[], bool]) -> None:
+        """FetchWorkerから呼ばれるタグ取得処理"""
+        self.worker_thread_fetch(self.q, filter_text, category_to_fetch,
+                                 generation=generation, is_cancelled=is_cancelled)
+
+    def _load_tags_for_category(self, category: str) -> TagCollection:
+        """タブに応じた検索対象のタグを取得（辞書を作らないTagCollectionで返す）"""
+        if category == "最近使った":
+            return TagCollection.from_dicts(self.tag_manager.get_recent_tags(), with_negative=False)
+        elif category == "ネガティブ":
+            return self.tag_manager.negative_tags
+        elif category == "未分類":
+            return self.tag_manager.get_tag_collection().with_categories(("", "未分類"))
+        elif category == "全カテゴリ":
+            return self.tag_manager.get_tag_collection()
+        return self.tag_manager.positive_tags
+
+    def _filter_with_cache(self, filter_text: str, category: str,
+                           is_cancelled: Callable[[], bool]) -> Optional[TagCollection]:
+        """
+        検索結果キャッシュを使ってタグを絞り込む（打ち切られた場合はNone）。
+        前回の検索語を含む語であれば、前回の結果を起点に絞り込む。
+        """
+        query = filter_text.lower().strip()
+        if query == "タグ名・カテゴリ・日本語訳・お気に入りで検索…":
+            query = ""
+        # 読み込み前の版を使う（読み込み中に変更されたら次回破棄される）
+        version = self.tag_manager.version
+        cached = self.search_cache.get(category, query, version)
+        if cached is not None:
+            return cached
+        source = self.search_cache.find_base(category, query, version)
+        if source is None:
+            source = self._load_tags_for_category(category)
+            if is_cancelled():
+                return None
+        filtered = self.filter_tags_optimized(source, query, category)
+        self.search_cache.put(category, query, version, filtered)
+        return filtered
+
+    def worker_thread_fetch(self, q: queue.Queue[Any], filter_text: str, category_to_fetch: str,
+                            generation: Optional[int] = None,
+                            is_cancelled: Optional[Callable[[], bool]] = None) -> None:
+        """非同期でタグデータを取得（is_cancelledがTrueになれば各段階の間で打ち切る）"""
+        cancelled = is_cancelled or (lambda: False)
         try:
             q.put({"type": "status", "message": f"{category_to_fetch}カテゴリのタグを読み込み中..."})
             
-            # カテゴリに応じてタグを取得
-            if category_to_fetch == "最近使った":
-                tags = self.tag_manager.get_recent_tags()
-            elif category_to_fetch == "ネガティブ":
-                tags = self.tag_manager.negative_tags
-            elif category_to_fetch == "未分類":
-                tags = [t for t in self.tag_manager.get_all_tags() if not t.get("category") or t.get("category") == "未分類"]
-            elif category_to_fetch == "全カテゴリ":
-                tags = self.tag_manager.get_all_tags()
-            else:
-                tags = self.tag_manager.positive_tags
-            
-            # フィルタリング
-            filtered_tags = self.filter_tags_optimized(tags, filter_text, category_to_fetch)
+            # フィルタリング（キャッシュがあればタグの読み込み自体を省略する）
+            filtered_tags = self._filter_with_cache(filter_text, category_to_fetch, cancelled)
+            if filtered_tags is None or cancelled():
+                return
             
             # アイテム形式に変換
-            items = [(t["tag"], t["jp"], "★" if t.get("favorite") else "", t.get("category", "")) for t in filtered_tags]
+            items = filtered_tags.tree_rows()
+            if cancelled():
+                return
+            
+            # 前回送信した内容との差分を計算（UI側は変更行だけを反映する）
+            with self._tree_snapshot_lock:
+                base_version, previous_items = self._tree_snapshots.get(category_to_fetch, (0, None))
+                version = base_version + 1
+                self._tree_snapshots[category_to_fetch] = (version, items)
+            diff = compute_tree_diff(previous_items, items)
             
             # キューに結果を送信
-            q.put({"type": "update_tree", "items": items, "category": category_to_fetch})
+            q.put({"type": "update_tree", "items": items, "category": category_to_fetch,
+                   "diff": diff, "base_version": base_version, "version": version,
+                   "generation": generation})
             q.put({"type": "status", "message": "準備完了"})
             
         except Exception as e:
@@ -1744,13 +1874,14 @@ class TagManagerApp:
 
     def on_tree_select(self, event: Any) -> None:
         tree = self.trees[self.current_category]
-        selected = tree.selection()
-        if not selected:
+        selected_rows = self.virtual_trees[self.current_category].get_selected_rows()
+        if not selected_rows:
             self.clear_edit_panel()
             self.clear_weight_selection()
             return
-        item = selected[0]
-        tag_text, jp_text, _, category_text = tree.item(item, "values")
+        # 編集パネルにはクリックした（画面内で選択されている）行を表示する
+        visible = tree.selection()
+        tag_text, jp_text, _, category_text = tree.item(visible[0], "values") if visible else selected_rows[0]
         print(f"[DEBUG] Selected Tag: {tag_text}, JP: {jp_text}, Category: {category_text}")
         
         # 選択されたタグがネガティブタグかどうかを正確に判定
@@ -1784,7 +1915,7 @@ class TagManagerApp:
         self.entry_category.delete(0, tk.END)
         self.entry_category.insert(0, category_text)
         print(f"[DEBUG] Entry Tag: {self.entry_tag.get()}, Entry JP: {self.entry_jp.get()}, Entry Category: {self.entry_category.get()}")
-        self.selected_tags = [tree.item(item, "values")[0] for item in selected]
+        self.selected_tags = [row[0] for row in selected_rows]
         self.update_weight_selection()
 
     def show_theme_dialog(self) -> None:
@@ -2019,7 +2150,8 @@ class TagManagerApp:
                         is_negative = tag_data.get("is_negative", False)
                         
                         # プログレス更新
-                        progress_dialog.set_message(f"AI予測中... ({i+1}/{len(uncategorized_tags)}) {tag_name}")
+                        self.q.put({"type": "progress", "dialog": progress_dialog,
+                                    "message": f"AI予測中... ({i+1}/{len(uncategorized_tags)}) {tag_name}"})
                         
                         try:
                             # AI予測機能を使用してカテゴリを予測
@@ -2125,16 +2257,13 @@ class TagManagerApp:
                             # タブを更新
                             self.refresh_tabs()
                     
-                    def show_error() -> None:
-                        progress_dialog.close()
-                        messagebox.showerror("エラー", "自動割り当て処理中にエラーが発生しました。")
-                    
                     # メインスレッドで結果を表示
-                    self.root.after(0, show_completion)
+                    self.dispatcher.call(show_completion)
                     
                 except Exception as e:
                     print(f"自動割り当て処理エラー: {e}")
-                    self.root.after(0, show_error)
+                    self.dispatcher.call(progress_dialog.close)
+                    self.q.put({"type": "error", "title": "エラー", "message": "自動割り当て処理中にエラーが発生しました。"})
             
             # ワーカースレッドを開始
             threading.Thread(target=worker_auto_assign, daemon=True).start()
@@ -2870,15 +2999,12 @@ class TagManagerApp:
         選択中のタグのみAI自動割り当て（候補スコア差が小さい場合は2位・3位も考慮）
         """
         try:
-            tree = self.trees[self.current_category]
-            selected = tree.selection()
-            if not selected:
+            selected_tags = self.get_selected_tags()
+            if not selected_tags:
                 messagebox.showinfo("自動割り当て", "自動割り当てしたいタグを選択してください。", parent=self.root)
                 return
-            selected_tags = [tree.item(item, "values")[0] for item in selected]
-            all_tags = self.tag_manager.get_all_tags()
-            tag_info_map = {tag_info["tag"]: tag_info for tag_info in all_tags}
-            selected_tag_data = [tag_info_map[tag] for tag in selected_tags if tag in tag_info_map]
+            all_tags = self.tag_manager.get_tag_collection()
+            selected_tag_data = [dict(info) for info in map(all_tags.find, selected_tags) if info is not None]
             if not selected_tag_data:
                 messagebox.showinfo("自動割り当て", "選択タグの情報が取得できませんでした。", parent=self.root)
                 return
@@ -2890,7 +3016,8 @@ class TagManagerApp:
                     detailed_results = []
                     for i, tag_data in enumerate(selected_tag_data):
                         tag_name = tag_data.get("tag", "")
-                        progress_dialog.set_message(f"AI予測中... ({i+1}/{len(selected_tag_data)}) {tag_name}")
+                        self.q.put({"type": "progress", "dialog": progress_dialog,
+                                    "message": f"AI予測中... ({i+1}/{len(selected_tag_data)}) {tag_name}"})
                         try:
                             from modules.ai_predictor import ai_predictor
                             cat, conf, details = ai_predictor.predict_category_with_confidence(tag_name)
@@ -2927,10 +3054,10 @@ class TagManagerApp:
                         result_text += f"カテゴリ割り当て: {assigned_count}個\n"
                         result_text += f"未分類のまま: {skipped_count}個\n"
                         self.show_detailed_assignment_results(detailed_results, result_text)
-                    self.root.after(0, show_completion)
+                    self.dispatcher.call(show_completion)
                 except Exception as e:
-                    progress_dialog.close()
-                    messagebox.showerror("エラー", f"選択タグの自動割り当て中にエラーが発生しました: {str(e)}")
+                    self.dispatcher.call(progress_dialog.close)
+                    self.q.put({"type": "error", "title": "エラー", "message": f"選択タグの自動割り当て中にエラーが発生しました: {str(e)}"})
             threading.Thread(target=worker_auto_assign_selected, daemon=True).start()
         except Exception as e:
             messagebox.showerror("エラー", f"選択タグの自動割り当て初期化中にエラーが発生しました: {str(e)}")
@@ -3049,7 +3176,7 @@ class TagManagerApp:
         def show_statistics():
             try:
                 usage_data = ai_predictor.usage_tracker.usage_data
-                all_tags = self.tag_manager.get_all_tags()
+                all_tags = self.tag_manager.get_tag_collection()
                 
                 total_learning_tags = len(usage_data)
                 total_db_tags = len(all_tags)
@@ -3156,13 +3283,12 @@ class TagManagerApp:
                 usage_data = ai_predictor.usage_tracker.usage_data
                 
                 # 全タグデータを取得
-                all_tags = self.tag_manager.get_all_tags()
-                tag_info_map = {tag_info["tag"]: tag_info for tag_info in all_tags}
+                all_tags = self.tag_manager.get_tag_collection()
                 
                 # 表示するタグを決定
                 if show_all_tags_var.get():
                     # 全タグを表示
-                    display_tags = set(tag_info_map.keys())
+                    display_tags = set(all_tags.tags)
                     # 学習履歴のあるタグも追加
                     for tag in usage_data.keys():
                         display_tags.add(tag)
@@ -3189,9 +3315,7 @@ class TagManagerApp:
                 
                 for tag in filtered_tags:
                     # 現在のカテゴリを取得
-                    current_category = "不明"
-                    if tag in tag_info_map:
-                        current_category = tag_info_map[tag].get("category", "未分類")
+                    current_category = all_tags.category_of(tag, "不明")
                     
                     # 学習履歴情報を取得
                     usage_count = 0
@@ -3227,24 +3351,23 @@ class TagManagerApp:
                         f"{conf*100:.1f}%" if conf > 0 else "-", 
                         reason[:80]+("..." if len(reason)>80 else "") if reason else "-"
                     )
-                    dialog.after(0, lambda v=values: tree.insert("", tk.END, values=v))
+                    self.dispatcher.call(tree.insert, "", tk.END, values=values)
                     
                     processed += 1
-                    # プログレス更新（5件ごと）
+                    # プログレス更新（5件ごと、未処理の更新は最新のみ反映）
                     if processed % 5 == 0:
                         progress_text = f"データ処理中... {processed}/{total_items}"
-                        dialog.after(0, lambda t=progress_text: progress_label.config(text=t))
-                        dialog.after(0, lambda: dialog.update())
+                        self.dispatcher.call(progress_label.config, text=progress_text, key=("ai_learning_progress", id(dialog)))
                 
                 # 完了時の処理
-                dialog.after(0, lambda: progress_label.config(text=f"完了 - {total_items}件のタグを表示"))
-                dialog.after(0, progress_bar.stop)
-                dialog.after(0, lambda: progress_frame.pack_forget())  # プログレスバーを非表示
+                self.dispatcher.call(progress_label.config, text=f"完了 - {total_items}件のタグを表示", key=("ai_learning_progress", id(dialog)))
+                self.dispatcher.call(progress_bar.stop)
+                self.dispatcher.call(progress_frame.pack_forget)  # プログレスバーを非表示
                 
             except Exception as e:
-                dialog.after(0, lambda: progress_label.config(text=f"エラー: {str(e)}"))
-                dialog.after(0, progress_bar.stop)
-                messagebox.showerror("エラー", f"データ読み込み中にエラーが発生しました: {str(e)}")
+                self.dispatcher.call(progress_label.config, text=f"エラー: {str(e)}", key=("ai_learning_progress", id(dialog)))
+                self.dispatcher.call(progress_bar.stop)
+                self.dispatcher.put({"type": "error", "title": "エラー", "message": f"データ読み込み中にエラーが発生しました: {str(e)}"})
         
         # ローカルAI状態の定期更新
         def update_status():
@@ -3399,8 +3522,8 @@ class TagManagerApp:
         プロンプト出力欄の日本語を一括翻訳する
         """
         try:
-            from modules.prompt_translator import PromptTranslator
-            prompt_translator = PromptTranslator()
+            # キャッシュを共有・保存するため、モジュールの共通インスタンスを使う
+            from modules.prompt_translator import prompt_translator
             
             # 現在の出力欄内容を取得
             current_text = self.output.get("1.0", tk.END).strip()
@@ -3449,11 +3572,11 @@ class TagManagerApp:
                     details = f"翻訳方法: {result['translation_method']}, 信頼度: {result['confidence']:.2f}"
                     
                     # UIスレッドで結果を処理
-                    self.root.after(0, lambda: process_translation_result(translated_text, details))
+                    self.dispatcher.call(process_translation_result, translated_text, details)
                     
                 except Exception as e:
                     # UIスレッドでエラーを表示
-                    self.root.after(0, lambda: show_translation_error(str(e)))
+                    self.dispatcher.call(show_translation_error, str(e))
             
             def process_translation_result(translated_text: str, details: str):
                 progress_dialog.destroy()
@@ -3504,7 +3627,7 @@ class TagManagerApp:
         """
         try:
             ai_predictor = get_ai_predictor()
-            all_tags = self.tag_manager.get_all_tags()
+            all_tags = self.tag_manager.get_tag_collection()
             low_confidence_tags = []
             
             for tag_data in all_tags:
@@ -3581,12 +3704,12 @@ class TagManagerApp:
                     low_confidence_tags = self.get_low_confidence_tags(confidence_threshold)
                     
                     # UIスレッドでダイアログを表示
-                    self.root.after(0, lambda: show_dialog(low_confidence_tags))
+                    self.dispatcher.call(show_dialog, low_confidence_tags)
                     
                 except Exception as e:
-                    self.root.after(0, lambda: show_error(f"低信頼度タグ検出エラー: {e}"))
+                    self.dispatcher.call(show_error, f"低信頼度タグ検出エラー: {e}")
                 finally:
-                    self.root.after(0, progress_dialog.close)
+                    self.dispatcher.call(progress_dialog.close)
             
             def show_dialog(tags: List[Dict[str, Any]]):
                 if not tags:
@@ -3616,11 +3739,11 @@ class TagManagerApp:
         """
         try:
             changed_count = 0
+            current_tags = self.tag_manager.get_tag_collection()
             
             for tag, new_category in changes.items():
                 # 現在のカテゴリを取得
-                current_tags = self.tag_manager.get_all_tags()
-                current_tag_data = next((t for t in current_tags if t["tag"] == tag), None)
+                current_tag_data = current_tags.find(tag)
                 
                 if current_tag_data:
                     current_category = current_tag_data["category"] or "未分類"
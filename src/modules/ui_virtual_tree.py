@@ -0,0 +1,363 @@
+"""
+仮想スクロール対応Treeview
+
+大量の行（数万件）をTreeviewに全件insertすると、更新のたびにTkのメインループが
+数秒止まってしまう。VirtualTreeviewは行データをPythonのリストに保持し、
+画面に見えている範囲＋前後のオーバースキャン分だけをTreeviewに実体化する。
+スクロールバーは論理的な行数に基づいて制御するため、更新コストは件数に依存しない。
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+DEFAULT_VISIBLE_ROWS = 30
+DEFAULT_OVERSCAN = 15
+DEFAULT_ROW_HEIGHT = 20
+SLOT_PREFIX = "vrow"
+# 差分がこれより大きい場合は全件差し替えの方が安い
+MAX_DIFF_CHANGES = 500
+# 選択を追加・切り替えにする修飾キー（event.stateのShift・Control・macOSのCommand）
+EXTEND_SELECTION_MASK = 0x0001 | 0x0004 | 0x0008
+
+
+def compute_window(total: int, offset: int, visible: int, overscan: int) -> Tuple[int, int]:
+    """
+    実体化する行範囲 [start, end) を返す純粋関数
+    """
+    if total <= 0:
+        return 0, 0
+    start = max(0, offset - overscan)
+    end = min(total, offset + visible + overscan)
+    return start, end
+
+
+def scroll_fractions(offset: int, visible: int, total: int) -> Tuple[float, float]:
+    """
+    論理行数に基づくスクロールバーの位置 (first, last) を返す純粋関数
+    """
+    if total <= 0 or visible >= total:
+        return 0.0, 1.0
+    first = offset / total
+    last = min(1.0, (offset + visible) / total)
+    return first, last
+
+
+def clamp_offset(offset: int, visible: int, total: int) -> int:
+    """先頭行の位置を有効範囲に収める"""
+    return max(0, min(offset, max(0, total - visible)))
+
+
+def compute_tree_diff(old_rows: Optional[Sequence[Sequence[Any]]], new_rows: Sequence[Sequence[Any]],
+                      key_index: int = 0, max_changes: int = MAX_DIFF_CHANGES) -> Optional[Dict[str, Any]]:
+    """
+    2つの行リストの差分をキー単位で計算する純粋関数（ワーカースレッドで実行する想定）
+
+    戻り値は {"inserted": [(新しい位置, 行)], "deleted": [キー], "updated": [行]}。
+    残った行の相対順序が変わった場合や、変更が多すぎる場合はNone（全件差し替え）を返す。
+    """
+    if old_rows is None:
+        return None
+    old_map = {row[key_index]: row for row in old_rows}
+    new_map = {row[key_index]: row for row in new_rows}
+    if len(old_map) != len(old_rows) or len(new_map) != len(new_rows):
+        # キーが重複している場合は差分で表現できない
+        return None
+
+    deleted = [key for key in old_map if key not in new_map]
+    inserted = []
+    updated = []
+    survivors_new = []
+    for index, row in enumerate(new_rows):
+        key = row[key_index]
+        old_row = old_map.get(key)
+        if old_row is None:
+            inserted.append((index, row))
+        else:
+            survivors_new.append(key)
+            if tuple(old_row) != tuple(row):
+                updated.append(row)
+        if len(inserted) + len(deleted) + len(updated) > max_changes:
+            return None
+
+    survivors_old = [row[key_index] for row in old_rows if row[key_index] in new_map]
+    if survivors_old != survivors_new:
+        return None
+    return {"inserted": inserted, "deleted": deleted, "updated": updated}
+
+
+class VirtualTreeview:
+    """
+    Treeviewに可視範囲だけを実体化する仮想リスト
+
+    - rowsは各行のvalues（タプル）のリスト。key_index列の値を行の識別キーとする
+    - Treeviewのiidは再利用されるスロット（vrow0, vrow1, ...）で、tree.item(iid, "values")は
+      従来通りその行の値を返す
+    - 選択状態はキーで保持するため、スクロールや再描画をまたいでも維持される
+    """
+
+    def __init__(self, tree: Any, scrollbar: Any = None, overscan: int = DEFAULT_OVERSCAN,
+                 key_index: int = 0, visible_rows: int = DEFAULT_VISIBLE_ROWS):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.overscan = overscan
+        self.key_index = key_index
+        self.visible_rows = visible_rows
+        self.rows: List[Sequence[Any]] = []
+        self.offset = 0
+        self.selected_keys: Set[Any] = set()
+        self._window_start = 0
+        self._slots: List[str] = []
+        self._slot_values: List[Tuple[Any, ...]] = []
+        self._yview_fraction: Optional[float] = None
+        self._key_index: Optional[Dict[Any, int]] = None
+        # 修飾キーなしのクリック・キー操作の直後は、選択を画面内の選択で置き換える
+        self._replace_selection = False
+        # 表示中のデータの版（ワーカー側の差分の基準と一致するか確認する）
+        self.version = 0
+
+        self.tree.configure(yscrollcommand=self._on_tree_yscroll)
+        if self.scrollbar is not None:
+            self.scrollbar.configure(command=self.yview)
+        self.tree.bind("<<TreeviewSelect>>", self._on_select, add="+")
+        self.tree.bind("<ButtonPress-1>", self._on_user_select, add="+")
+        self.tree.bind("<KeyPress>", self._on_user_select, add="+")
+        self.tree.bind("<Configure>", self._on_configure, add="+")
+
+    # --- データ操作 ---
+    def set_rows(self, rows: Iterable[Sequence[Any]], version: Optional[int] = None) -> None:
+        """
+        表示する行を丸ごと差し替える（スクロール位置と選択は可能な範囲で維持）
+        """
+        anchor = self._anchor_key()
+        self.rows = list(rows)
+        self._key_index = None
+        self.selected_keys &= set(self._index_map())
+        self._restore_anchor(anchor)
+        if version is not None:
+            self.version = version
+        self.render()
+
+    def apply_diff(self, diff: Dict[str, Any], version: Optional[int] = None) -> None:
+        """
+        compute_tree_diffの差分を適用する
+
+        実際に内容が変わったスロットだけをTreeviewに書き込むため、
+        1行の更新ならTreeviewの操作も1回で済む。先頭に見えている行と選択は維持する。
+        """
+        anchor = self._anchor_key()
+        deleted = set(diff.get("deleted", ()))
+        inserted = diff.get("inserted", ())
+        if deleted:
+            self.rows = [row for row in self.rows if row[self.key_index] not in deleted]
+            self.selected_keys -= deleted
+            self._key_index = None
+        for index, row in inserted:
+            self.rows.insert(index, row)
+        if inserted:
+            self._key_index = None
+        updated = diff.get("updated", ())
+        if updated:
+            index_map = self._index_map()
+            for row in updated:
+                index = index_map.get(row[self.key_index])
+                if index is not None:
+                    self.rows[index] = row
+        if deleted or inserted:
+            self._restore_anchor(anchor)
+        if version is not None:
+            self.version = version
+        self.render()
+
+    def row_count(self) -> int:
+        return len(self.rows)
+
+    def key_of(self, row: Sequence[Any]) -> Any:
+        return row[self.key_index]
+
+    def index_of(self, key: Any) -> int:
+        """キーに対応する論理行番号を返す（見つからない場合は-1）"""
+        return self._index_map().get(key, -1)
+
+    def _index_map(self) -> Dict[Any, int]:
+        if self._key_index is None:
+            self._key_index = {row[self.key_index]: index for index, row in enumerate(self.rows)}
+        return self._key_index
+
+    def _anchor_key(self) -> Any:
+        """現在先頭に見えている行のキー"""
+        if 0 <= self.offset < len(self.rows):
+            return self.rows[self.offset][self.key_index]
+        return None
+
+    def _restore_anchor(self, anchor: Any) -> None:
+        """先頭に見えていた行が残っていればその位置へ、なければ同じ行番号に留まる"""
+        index = self._index_map().get(anchor, -1) if anchor is not None else -1
+        offset = index if index >= 0 else self.offset
+        self.offset = clamp_offset(offset, self.visible_rows, len(self.rows))
+
+    def get_selected_rows(self) -> List[Sequence[Any]]:
+        """画面外も含めて選択中の行を論理順で返す"""
+        return [row for row in self.rows if row[self.key_index] in self.selected_keys]
+
+    def select_key(self, key: Any) -> bool:
+        """
+        指定キーの行を選択し、見える位置までスクロールする
+        """
+        index = self.index_of(key)
+        if index < 0:
+            return False
+        self.selected_keys = {key}
+        if not (self.offset <= index < self.offset + self.visible_rows):
+            self.offset = clamp_offset(index - self.visible_rows // 2, self.visible_rows, len(self.rows))
+        self.render()
+        iid = self._iid_for_index(index)
+        if iid is not None:
+            self.tree.focus(iid)
+        return True
+
+    # --- 描画 ---
+    def render(self) -> None:
+        """可視範囲＋オーバースキャン分の行をスロットに書き込む"""
+        total = len(self.rows)
+        start, end = compute_window(total, self.offset, self.visible_rows, self.overscan)
+        needed = end - start
+
+        # 既存スロットは値の書き換えで再利用し、内容が変わったものだけ書き込む
+        for i in range(needed):
+            values = tuple(self.rows[start + i])
+            if i < len(self._slots):
+                if self._slot_values[i] != values:
+                    self.tree.item(self._slots[i], values=values)
+                    self._slot_values[i] = values
+            else:
+                iid = f"{SLOT_PREFIX}{i}"
+                self.tree.insert("", "end", iid=iid, values=values)
+                self._slots.append(iid)
+                self._slot_values.append(values)
+        if len(self._slots) > needed:
+            self.tree.delete(*self._slots[needed:])
+            del self._slots[needed:]
+            del self._slot_values[needed:]
+        moved = start != self._window_start
+        self._window_start = start
+
+        self._apply_selection()
+        if self._slots:
+            fraction = (self.offset - start) / len(self._slots)
+            if moved or fraction != self._yview_fraction:
+                self.tree.yview_moveto(fraction)
+                self._yview_fraction = fraction
+        self._update_scrollbar()
+
+    def _iid_for_index(self, index: int) -> Optional[str]:
+        slot = index - self._window_start
+        if 0 <= slot < len(self._slots):
+            return self._slots[slot]
+        return None
+
+    def _apply_selection(self) -> None:
+        desired = tuple(
+            iid for i, iid in enumerate(self._slots)
+            if self.rows[self._window_start + i][self.key_index] in self.selected_keys
+        )
+        # 変化がない場合は<<TreeviewSelect>>を発生させない
+        if tuple(self.tree.selection()) != desired:
+            self.tree.selection_set(desired)
+
+    def _update_scrollbar(self) -> None:
+        if self.scrollbar is not None:
+            first, last = scroll_fractions(self.offset, self.visible_rows, len(self.rows))
+            self.scrollbar.set(first, last)
+
+    # --- スクロール ---
+    def yview(self, *args: Any) -> None:
+        """スクロールバーからのコマンド（moveto / scroll）を論理行に変換する"""
+        if not args:
+            return
+        total = len(self.rows)
+        if args[0] == "moveto":
+            offset = int(float(args[1]) * total)
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            if len(args) > 2 and args[2] == "pages":
+                amount *= max(1, self.visible_rows - 1)
+            offset = self.offset + amount
+        else:
+            return
+        offset = clamp_offset(offset, self.visible_rows, total)
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+
+    def _on_tree_yscroll(self, first: Any, last: Any) -> None:
+        """
+        Treeview内部のスクロール（マウスホイール・キー操作）を論理位置に反映する
+
+        オーバースキャン領域の端に近づいたら窓をずらして再描画する。
+        """
+        self._yview_fraction = float(first)
+        if not self._slots:
+            self._update_scrollbar()
+            return
+        internal_top = int(round(float(first) * len(self._slots)))
+        offset = clamp_offset(self._window_start + internal_top, self.visible_rows, len(self.rows))
+        if offset != self.offset:
+            self.offset = offset
+            margin = self.overscan // 2
+            near_top = self._window_start > 0 and internal_top < margin
+            near_bottom = (self._window_start + len(self._slots) < len(self.rows)
+                           and internal_top + self.visible_rows > len(self._slots) - margin)
+            if near_top or near_bottom:
+                self.render()
+                return
+        self._update_scrollbar()
+
+    # --- イベント ---
+    def _on_user_select(self, event: Any) -> None:
+        """
+        クリック・キー操作の修飾キーを記録する（Treeviewのクラスバインドが選択を変える前に呼ばれる）
+
+        選択の変更で発生する<<TreeviewSelect>>の処理が終わったアイドル時に記録を消すので、
+        スクロールなどによる再描画の選択変更は置き換えとして扱わない。
+        """
+        self._replace_selection = not (getattr(event, "state", 0) & EXTEND_SELECTION_MASK)
+        self.tree.after_idle(self._end_user_select)
+
+    def _end_user_select(self) -> None:
+        self._replace_selection = False
+
+    def _on_select(self, event: Any = None) -> None:
+        """
+        画面内の選択状態をキー集合に反映する
+
+        修飾キーなしのクリックでは画面外の選択も解除し、それ以外（Shift・Ctrlでの追加や再描画）では維持する。
+        """
+        selected = set(self.tree.selection())
+        if self._replace_selection:
+            self._replace_selection = False
+            self.selected_keys = set()
+        for i, iid in enumerate(self._slots):
+            key = self.rows[self._window_start + i][self.key_index]
+            if iid in selected:
+                self.selected_keys.add(key)
+            else:
+                self.selected_keys.discard(key)
+
+    def _on_configure(self, event: Any) -> None:
+        height = getattr(event, "height", 0)
+        if height <= 1:
+            return
+        row_height = self._row_height()
+        # 見出し行の分を差し引く
+        visible = max(1, height // row_height - 1)
+        if visible != self.visible_rows:
+            self.visible_rows = visible
+            self.offset = clamp_offset(self.offset, self.visible_rows, len(self.rows))
+            self.render()
+
+    def _row_height(self) -> int:
+        try:
+            from tkinter import ttk
+            style_name = self.tree.cget("style") or "Treeview"
+            row_height = ttk.Style().lookup(style_name, "rowheight")
+            return int(row_height) if row_height else DEFAULT_ROW_HEIGHT
+        except Exception:
+            return DEFAULT_ROW_HEIGHT
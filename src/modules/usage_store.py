@@ -0,0 +1,179 @@
+"""
+タグ使用履歴のSQLiteストア
+
+TagUsageTrackerの学習データを3つのテーブルに保存する。
+    usage(tag, count, last_used)
+    usage_category(tag, category, n)
+    usage_context(tag, ctx, n)
+記録は加算（UPSERT）でまとめて書き込むため、JSON全体を書き直す必要がない。
+"""
+import logging
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS usage (
+        tag TEXT PRIMARY KEY,
+        count INTEGER NOT NULL DEFAULT 0,
+        last_used REAL NOT NULL DEFAULT 0
+    )''',
+    '''CREATE TABLE IF NOT EXISTS usage_category (
+        tag TEXT NOT NULL,
+        category TEXT NOT NULL,
+        n INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (tag, category)
+    )''',
+    '''CREATE TABLE IF NOT EXISTS usage_context (
+        tag TEXT NOT NULL,
+        ctx TEXT NOT NULL,
+        n INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (tag, ctx)
+    )''',
+)
+
+
+def new_usage_entry() -> Dict[str, Any]:
+    """使用データ1件分の空エントリ（TagUsageTracker.usage_dataの値と同じ形）"""
+    return {"count": 0, "categories": {}, "last_used": 0, "context_tags": {}}
+
+
+def aggregate_usage_events(events: Iterable[Tuple[str, str, float, List[str]]]
+                           ) -> Tuple[Dict[str, List[float]], Dict[Tuple[str, str], int], Dict[Tuple[str, str], int]]:
+    """
+    記録イベント (tag, category, time, context_tags) を差分にまとめる純粋関数
+
+    Returns:
+        (tag → [回数, 最終使用時刻], (tag, category) → 回数, (tag, ctx) → 回数)
+    """
+    usage: Dict[str, List[float]] = {}
+    categories: Dict[Tuple[str, str], int] = {}
+    contexts: Dict[Tuple[str, str], int] = {}
+    for tag, category, used_at, context_tags in events:
+        delta = usage.get(tag)
+        if delta is None:
+            usage[tag] = [1, used_at]
+        else:
+            delta[0] += 1
+            delta[1] = max(delta[1], used_at)
+        key = (tag, category)
+        categories[key] = categories.get(key, 0) + 1
+        for ctx in context_tags:
+            key = (tag, ctx)
+            contexts[key] = contexts.get(key, 0) + 1
+    return usage, categories, contexts
+
+
+class UsageStore:
+    """
+    使用履歴テーブルへの読み書きを行うクラス
+
+    接続は保存スレッドからも使うため、check_same_thread=Falseとロックで保護する。
+    """
+
+    def __init__(self, db_file: str) -> None:
+        self.db_file = db_file
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _get_conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            db_dir = os.path.dirname(self.db_file)
+            if db_dir:
+                os.makedirs(db_dir, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_file, check_same_thread=False)
+            for statement in SCHEMA:
+                self._conn.execute(statement)
+            self._conn.commit()
+        return self._conn
+
+    def exists(self) -> bool:
+        return os.path.exists(self.db_file)
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return self._get_conn().execute("SELECT 1 FROM usage LIMIT 1").fetchone() is None
+
+    def load_all(self) -> Dict[str, Dict[str, Any]]:
+        """全使用データを usage_data と同じ形の辞書で返す"""
+        with self._lock:
+            conn = self._get_conn()
+            data: Dict[str, Dict[str, Any]] = {}
+            for tag, count, last_used in conn.execute("SELECT tag, count, last_used FROM usage"):
+                entry = new_usage_entry()
+                entry["count"] = count
+                entry["last_used"] = last_used
+                data[tag] = entry
+            for tag, category, n in conn.execute("SELECT tag, category, n FROM usage_category"):
+                data.setdefault(tag, new_usage_entry())["categories"][category] = n
+            for tag, ctx, n in conn.execute("SELECT tag, ctx, n FROM usage_context"):
+                data.setdefault(tag, new_usage_entry())["context_tags"][ctx] = n
+            return data
+
+    def apply_events(self, events: List[Tuple[str, str, float, List[str]]]) -> None:
+        """記録イベントを1トランザクションで加算する"""
+        if not events:
+            return
+        usage, categories, contexts = aggregate_usage_events(events)
+        with self._lock:
+            conn = self._get_conn()
+            with conn:
+                conn.executemany(
+                    "INSERT INTO usage (tag, count, last_used) VALUES (?, ?, ?) "
+                    "ON CONFLICT(tag) DO UPDATE SET count = count + excluded.count, "
+                    "last_used = MAX(last_used, excluded.last_used)",
+                    [(tag, int(delta[0]), delta[1]) for tag, delta in usage.items()])
+                conn.executemany(
+                    "INSERT INTO usage_category (tag, category, n) VALUES (?, ?, ?) "
+                    "ON CONFLICT(tag, category) DO UPDATE SET n = n + excluded.n",
+                    [(tag, category, n) for (tag, category), n in categories.items()])
+                conn.executemany(
+                    "INSERT INTO usage_context (tag, ctx, n) VALUES (?, ?, ?) "
+                    "ON CONFLICT(tag, ctx) DO UPDATE SET n = n + excluded.n",
+                    [(tag, ctx, n) for (tag, ctx), n in contexts.items()])
+
+    def replace_entries(self, data: Dict[str, Dict[str, Any]]) -> None:
+        """タグ毎のエントリを丸ごと置き換える（移行・インポート用）"""
+        if not data:
+            return
+        with self._lock:
+            conn = self._get_conn()
+            with conn:
+                self._delete(conn, list(data.keys()))
+                conn.executemany(
+                    "INSERT INTO usage (tag, count, last_used) VALUES (?, ?, ?)",
+                    [(tag, int(info.get("count", 0)), info.get("last_used", 0) or 0)
+                     for tag, info in data.items()])
+                conn.executemany(
+                    "INSERT INTO usage_category (tag, category, n) VALUES (?, ?, ?)",
+                    [(tag, category, int(n)) for tag, info in data.items()
+                     for category, n in (info.get("categories") or {}).items()])
+                conn.executemany(
+                    "INSERT INTO usage_context (tag, ctx, n) VALUES (?, ?, ?)",
+                    [(tag, ctx, int(n)) for tag, info in data.items()
+                     for ctx, n in (info.get("context_tags") or {}).items()])
+
+    def delete_tags(self, tags: List[str]) -> None:
+        if not tags:
+            return
+        with self._lock:
+            conn = self._get_conn()
+            with conn:
+                self._delete(conn, tags)
+
+    @staticmethod
+    def _delete(conn: sqlite3.Connection, tags: List[str]) -> None:
+        params = [(tag,) for tag in tags]
+        for table in ("usage", "usage_category", "usage_context"):
+            conn.executemany(f"DELETE FROM {table} WHERE tag = ?", params)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.close()
+                except Exception as e:
+                    self.logger.error(f"使用履歴DBのクローズに失敗: {e}")
+                self._conn = None
@@ -74,6 +74,14 @@ class TestTagUsageTracker:
         assert tracker.get_tag_frequency("blue hair") == 3
         assert tracker.get_most_common_category("blue hair") == "髪型・髪色"
     
+    def test_get_usage_counts(self):
+        """タグ毎の使用回数の取得テスト"""
+        tracker = TagUsageTracker(load_existing_data=False, usage_file=self.test_usage_file)
+        tracker.record_tag_usage("blue hair", "髪型・髪色")
+        tracker.record_tag_usage("blue hair", "髪型・髪色")
+        tracker.record_tag_usage("smile", "表情・感情")
+        assert tracker.get_usage_counts() == {"blue hair": 2, "smile": 1}
+    
     def test_get_tag_frequency_nonexistent(self):
         """存在しないタグの頻度取得テスト"""
         tracker = TagUsageTracker(load_existing_data=False, usage_file=self.test_usage_file)
@@ -131,17 +139,18 @@ class TestTagUsageTracker:
         tracker.record_tag_usage("blue hair", "髪型・髪色", ["long"])
         
         # 保存を強制実行
-        tracker.save_usage_data()
+        assert tracker.save_usage_data()
+        tracker.close()
         
-        # ファイルが作成されていることを確認
-        assert os.path.exists(self.test_usage_file)
+        # データベースが作成されていることを確認
+        assert os.path.exists(tracker.db_file)
         
         # データが正しく保存されていることを確認
-        with open(self.test_usage_file, 'r', encoding='utf-8') as f:
-            saved_data = json.load(f)
+        saved_data = TagUsageTracker(usage_file=self.test_usage_file).usage_data
         
         assert "blue hair" in saved_data
         assert saved_data["blue hair"]["count"] == 1
+        assert saved_data["blue hair"]["context_tags"] == {"long": 1}
 
 
 class TestDynamicWeightCalculator:
@@ -253,6 +262,44 @@ class TestAIPredictor:
         assert isinstance(details, dict)
         assert 0 <= confidence <= 1
     
+    def test_weight_from_features_matches_dynamic_weight(self):
+        """抽出済み特徴量からの重みがカテゴリ毎の計算と一致するテスト"""
+        tracker = TagUsageTracker(load_existing_data=False, usage_file=os.path.join(self.temp_dir, "usage.json"))
+        tracker.record_tag_usage("blue hair", "髪型・髪色", ["long"])
+        tracker.record_tag_usage("long", "髪型・髪色", ["blue hair"])
+        calculator = DynamicWeightCalculator(tracker)
+        features = calculator.extract_features("blue hair", ["long", "smile"])
+        for category in ["髪型・髪色", "表情・感情"]:
+            assert calculator.weight_from_features(features, category) == \
+                calculator.calculate_dynamic_weight("blue hair", category, ["long", "smile"])
+    
+    def test_context_boost_raises_category_score(self):
+        """コンテキストブーストが該当カテゴリのスコアに加算されるテスト"""
+        from modules.customization import CategoryKeywordTable
+        table = CategoryKeywordTable({"髪型・ヘアスタイル": ["long hair"], "色彩・照明": ["red"],
+                                      "表情・感情": ["smile"]}, version="test")
+        predictor = AIPredictor()
+        assert predictor._extract_tag_features("long hair", ["1girl", "blue eyes"]).context_boosts == \
+            {"髪型・ヘアスタイル": 50, "色彩・照明": 50}
+        with patch("modules.ai_predictor.get_category_keyword_table", return_value=table):
+            _, _, boosted = predictor.predict_category_with_confidence("long hair", ["1girl", "blue eyes"])
+            _, _, plain = predictor.predict_category_with_confidence("long hair", ["1girl"])
+        assert plain["category_scores"]["色彩・照明"] == 0
+        assert boosted["category_scores"]["色彩・照明"] > 0
+        assert boosted["category_scores"]["表情・感情"] == plain["category_scores"]["表情・感情"] == 0
+        assert boosted["category_scores"]["髪型・ヘアスタイル"] > plain["category_scores"]["髪型・ヘアスタイル"]
+    
+    def test_predict_without_details(self):
+        """詳細情報なしの予測テスト"""
+        predictor = AIPredictor()
+        
+        full = predictor.predict_category_with_confidence("blue hair", ["long"])
+        light = predictor.predict_category_with_confidence("blue hair", ["long"], include_details=False)
+        
+        assert light[:2] == full[:2]
+        assert "category_scores" in full[2]
+        assert set(light[2]) == {"reason"}
+    
     def test_suggest_similar_tags(self):
         """類似タグ提案テスト"""
         predictor = AIPredictor()
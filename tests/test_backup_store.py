@@ -0,0 +1,112 @@
+"""
+backup_store.pyのテスト
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pytest
+
+from modules.backup_store import BackupStore, BackupStoreError
+from modules.persistence import write_json_atomic
+
+
+CHUNK = 1024
+
+
+def chunk_files(store):
+    return sorted(name for name, _ in store._iter_chunk_files())
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BackupStore(str(tmp_path / "store"), chunk_size=CHUNK)
+
+
+def test_unchanged_chunks_are_written_once(tmp_path, store):
+    data = bytearray(os.urandom(CHUNK * 8))
+    source = tmp_path / "tags.db"
+    source.write_bytes(bytes(data))
+    _, first = store.create("b1", {"data/tags.db": str(source)})
+    assert (first["chunks"], first["new_chunks"]) == (8, 8)
+
+    # 1ページ分だけ書き換えると、新たに保存されるのはそのチャンクだけ
+    data[CHUNK * 3 + 10] ^= 0xFF
+    source.write_bytes(bytes(data))
+    _, second = store.create("b2", {"data/tags.db": str(source)})
+    assert (second["chunks"], second["new_chunks"]) == (8, 1)
+    assert len(chunk_files(store)) == 9
+
+    # それぞれの時点の内容を復元できる
+    restored = tmp_path / "restored.db"
+    store.restore("b2", {"data/tags.db": str(restored)})
+    assert restored.read_bytes() == bytes(data)
+    store.restore_file("b1", "data/tags.db", str(restored))
+    data[CHUNK * 3 + 10] ^= 0xFF
+    assert restored.read_bytes() == bytes(data)
+
+
+def test_prune_and_gc_remove_unreferenced_chunks(tmp_path, store):
+    source = tmp_path / "settings.json"
+    for i in range(3):
+        source.write_bytes(os.urandom(CHUNK // 2) + b"shared" * 10)
+        store.create(f"b{i}", {"settings.json": str(source)})
+    # 書きかけのまま残った一時ファイルも削除される
+    leftover = os.path.join(store.chunks_dir, "ab", "ab00.tmp")
+    os.makedirs(os.path.dirname(leftover), exist_ok=True)
+    open(leftover, "wb").close()
+
+    assert store.prune(keep=1) == ["b1", "b0"]
+    removed, _ = store.gc()
+    assert removed == 3
+    assert [m["name"] for m in store.list()] == ["b2"]
+    assert chunk_files(store) == sorted(store.referenced_chunks())
+    store.restore_file("b2", "settings.json", str(tmp_path / "out.json"))
+    assert (tmp_path / "out.json").read_bytes() == source.read_bytes()
+
+
+def test_corrupted_chunk_is_detected(tmp_path, store):
+    source = tmp_path / "tags.db"
+    source.write_bytes(os.urandom(CHUNK * 2))
+    manifest, _ = store.create("b1", {"data/tags.db": str(source)})
+    with open(store._chunk_path(manifest["files"]["data/tags.db"]["chunks"][1]), "wb") as f:
+        f.write(b"broken")
+
+    destination = tmp_path / "restored.db"
+    destination.write_bytes(b"current")
+    with pytest.raises(BackupStoreError):
+        store.restore_file("b1", "data/tags.db", str(destination))
+    # 復元に失敗しても書き出し先は元のまま
+    assert destination.read_bytes() == b"current"
+    with pytest.raises(BackupStoreError):
+        store.create("b1", {"data/tags.db": str(source)})
+
+
+def test_size_mismatch_leaves_destination_unchanged(tmp_path, store):
+    source = tmp_path / "tags.db"
+    source.write_bytes(os.urandom(CHUNK * 2))
+    manifest, _ = store.create("b1", {"data/tags.db": str(source)})
+    manifest["files"]["data/tags.db"]["size"] += 1
+    write_json_atomic(store._manifest_path("b1"), manifest)
+
+    destination = tmp_path / "restored.db"
+    destination.write_bytes(b"current")
+    with pytest.raises(BackupStoreError):
+        store.restore("b1", {"data/tags.db": str(destination)})
+    # 書き出し先は置き換えられず、一時ファイルも残らない
+    assert destination.read_bytes() == b"current"
+    assert sorted(os.listdir(tmp_path)) == ["restored.db", "store", "tags.db"]
+
+
+@pytest.mark.parametrize("content", [b'{"version": 1, "name": "b1", "fil', b'{"version": 1}'])
+def test_gc_keeps_chunks_when_a_manifest_is_unreadable(tmp_path, store, content):
+    source = tmp_path / "tags.db"
+    source.write_bytes(os.urandom(CHUNK * 2))
+    store.create("b1", {"data/tags.db": str(source)})
+    before = chunk_files(store)
+    # 同期途中・壊れたマニフェストがあるときは、gc()はそのチャンクを削除しない
+    with open(store._manifest_path("b1"), "wb") as f:
+        f.write(content)
+    with pytest.raises(BackupStoreError):
+        store.gc()
+    assert chunk_files(store) == before
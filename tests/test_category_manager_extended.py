@@ -12,6 +12,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 import pytest
 from modules.category_manager import (
     load_category_keywords,
+    load_category_keywords_cached,
     save_category_keywords,
     get_category_priority,
     calculate_keyword_score,
@@ -97,6 +98,19 @@ class TestCategoryManagerExtended:
         assert isinstance(keywords, dict)
         assert len(keywords) > 0  # デフォルトキーワードが読み込まれる
     
+    def test_load_category_keywords_cached(self):
+        """キャッシュ付きカテゴリキーワード読み込みテスト"""
+        save_category_keywords({"髪型・髪色": ["blue"]})
+        keywords = load_category_keywords_cached()
+        assert keywords["髪型・髪色"] == ("blue",)
+        # ファイルが変わらなければ同じオブジェクトを返す
+        assert load_category_keywords_cached() is keywords
+        with pytest.raises(TypeError):
+            keywords["髪型・髪色"] = ("red",)
+        
+        save_category_keywords({"髪型・髪色": ["blue", "red"]})
+        assert load_category_keywords_cached()["髪型・髪色"] == ("blue", "red")
+    
     def test_save_category_keywords_basic(self):
         """基本的なカテゴリキーワード保存テスト"""
         test_keywords = {
@@ -0,0 +1,89 @@
+"""
+cli.pyのテスト
+"""
+import sys
+import os
+import json
+import subprocess
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pytest
+
+from modules import cli
+from modules.constants import TRANSLATING_PLACEHOLDER
+from modules.tag_manager import TagManager
+
+
+@pytest.fixture
+def tag_manager(tmp_path):
+    tm = TagManager(db_file=str(tmp_path / "tags.db"))
+    yield tm
+    tm.close()
+
+
+def test_import_streams_chunks_and_skips_duplicates(tag_manager, tmp_path):
+    source = tmp_path / "tags.jsonl"
+    lines = [{"tag": f"tag_{i}", "category": "テスト"} for i in range(25)]
+    lines += [{"tag": "tag_0"}, {"tag": "bad/tag"}, {"tag": "neg", "is_negative": 1}]
+    source.write_text("\n".join(json.dumps(line, ensure_ascii=False) for line in lines), encoding="utf-8")
+
+    progress = cli.ProgressReporter("none")
+    result = cli.import_tags(tag_manager, cli.iter_import_records(str(source)), chunk_size=10,
+                             progress=progress)
+    assert result == {"added": 26, "skipped": 2}
+    assert progress.done == 28
+    neg = tag_manager.get_tag_info("neg")
+    assert neg["is_negative"] and neg["category"] == "ネガティブ"
+    assert tag_manager.get_tag_info("tag_3")["jp"] == TRANSLATING_PLACEHOLDER
+
+
+def test_translate_pending_and_stats(tag_manager):
+    tag_manager.save_tags([{"tag": "smile", "jp": TRANSLATING_PLACEHOLDER, "category": "表情・感情"},
+                           {"tag": "cry", "jp": TRANSLATING_PLACEHOLDER, "category": "表情・感情"},
+                           {"tag": "done", "jp": "済み", "category": ""}])
+
+    def fake_translate(text):
+        if text == "cry":
+            raise RuntimeError("network")
+        return "笑顔"
+
+    assert cli.translate_pending(tag_manager, translate=fake_translate, workers=2) == {"translated": 1, "failed": 1}
+    assert tag_manager.get_tag_info("smile")["jp"] == "笑顔"
+    stats = cli.collect_stats(tag_manager)
+    assert stats["total"] == 3
+    assert stats["failed_translation"] == 1
+    assert stats["categories"] == {"表情・感情": 2, "未分類": 1}
+
+
+@pytest.mark.parametrize("file_format", ["json", "jsonl", "csv"])
+def test_export_round_trip(tag_manager, tmp_path, file_format):
+    tag_manager.save_tags([{"tag": "a", "jp": "あ", "category": "c", "favorite": True},
+                           {"tag": "b", "jp": "い", "category": "ネガティブ", "is_negative": True}])
+    out = tmp_path / f"out.{file_format}"
+    assert cli.export_tags(tag_manager, str(out), is_negative=False) == {"exported": 1}
+    records = list(cli.iter_import_records(str(out)))
+    assert records == [{"tag": "a", "jp": "あ", "category": "c", "favorite": True, "is_negative": False}]
+
+
+def test_parallel_assignment_matches_serial():
+    tags = ["blue hair", "smile", "school uniform", "outdoors", "long hair", "red eyes"]
+    assert cli.assign_categories(tags, workers=2) == cli.assign_categories(tags, workers=1)
+
+
+def test_main_writes_json_result(tmp_path, capsys):
+    db = str(tmp_path / "tags.db")
+    source = tmp_path / "tags.txt"
+    source.write_text("smile, blue hair\nsmile\n", encoding="utf-8")
+    assert cli.main(["--db", db, "--progress", "json", "import", str(source)]) == 0
+    captured = capsys.readouterr()
+    result = json.loads(captured.out.strip().splitlines()[-1])
+    assert result == {"added": 2, "skipped": 1, "command": "import", "ok": True}
+    events = [json.loads(line) for line in captured.err.splitlines() if line.startswith("{")]
+    assert events[-1]["event"] == "done"
+
+
+def test_core_modules_do_not_import_tkinter():
+    src_dir = os.path.join(os.path.dirname(__file__), '..', 'src')
+    code = "import sys, modules.cli, modules.tag_manager; print('tkinter' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=src_dir, capture_output=True, text=True)
+    assert result.stdout.strip().splitlines()[-1] == "False"
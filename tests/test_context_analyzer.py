@@ -9,6 +9,7 @@ import pytest
 from modules.context_analyzer import (
     analyze_tag_context,
     calculate_context_boost,
+    calculate_context_boosts,
     get_synonyms,
     has_negation,
     has_modifier,
@@ -113,6 +114,22 @@ class TestContextAnalyzer:
         
         assert boost == 0
     
+    def test_calculate_context_boosts_matches_per_category(self):
+        """全カテゴリ一括のブーストがカテゴリ毎の計算と一致するテスト"""
+        all_tags = ["long hair", "blue", "smiling girl", "dress"]
+        categories = {cat for pair in CONTEXT_BOOST_RULES for cat in pair}
+        for tag in ["long hair", "smiling", "red dress", "girl"]:
+            boosts = calculate_context_boosts(tag, all_tags)
+            for category in categories:
+                assert boosts.get(category, 0) == calculate_context_boost(tag, category, all_tags)
+        assert calculate_context_boosts(list(COMMON_WORDS)[0], all_tags) == {}
+    
+    def test_calculate_context_boosts_values(self):
+        """髪型と色の組み合わせで両カテゴリに50ずつ加算されるテスト（引数の順序の修正の回帰テスト）"""
+        assert calculate_context_boosts("long hair", ["1girl", "blue eyes"]) == {"髪型・ヘアスタイル": 50, "色彩・照明": 50}
+        assert calculate_context_boosts("smiling", ["1girl", "long hair"]) == {"表情・感情": 40, "人物・キャラクター": 40}
+        assert calculate_context_boosts("long hair", ["1girl"]) == {}
+    
     def test_get_synonyms_existing_word(self):
         """存在する単語の同義語取得テスト"""
         synonyms = get_synonyms("hair")
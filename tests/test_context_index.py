@@ -0,0 +1,72 @@
+"""
+context_index.pyのテスト
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from modules.context_index import (
+    ContextIndex, exact_jaccard, estimate_jaccard, minhash_signature, MINHASH_PERMUTATIONS,
+)
+
+
+class TestJaccard:
+    def test_exact_jaccard(self):
+        assert exact_jaccard({"a", "b"}, {"a", "b"}) == 1.0
+        assert exact_jaccard({"a", "b", "c"}, {"b", "c", "d"}) == 0.5
+        assert exact_jaccard({"a"}, set()) == 0.0
+
+    def test_minhash_estimate_is_close(self):
+        set1 = {f"ctx{i}" for i in range(0, 300)}
+        set2 = {f"ctx{i}" for i in range(100, 400)}
+        estimate = estimate_jaccard(minhash_signature(set1), minhash_signature(set2))
+        assert len(minhash_signature(set1)) == MINHASH_PERMUTATIONS
+        assert abs(estimate - exact_jaccard(set1, set2)) < 0.2
+        assert estimate_jaccard(minhash_signature(set1), minhash_signature(set1)) == 1.0
+
+
+class TestContextIndex:
+    def test_incremental_add(self):
+        index = ContextIndex()
+        index.add("blue hair", "long")
+        index.add("blue hair", "long")
+        index.add("blue hair", "smile")
+        index.add("red hair", "long")
+        assert index.get_contexts("blue hair") == {"long", "smile"}
+        assert index.similarity("blue hair", "red hair") == 0.5
+        assert index.similarity("blue hair", "unknown") == 0.0
+        assert len(index) == 2
+
+    def test_large_contexts_use_signature(self):
+        index = ContextIndex(threshold=50)
+        for i in range(200):
+            index.add("a", f"ctx{i}")
+            index.add("b", f"ctx{i}")
+        assert "a" in index._signatures and "b" in index._signatures
+        assert index.similarity("a", "b") == 1.0
+        # 署名を付けた後の追加も反映される
+        index.add("b", "extra")
+        assert index._signatures["b"] == minhash_signature(index.get_contexts("b"))
+
+    def test_rebuild_and_replace(self):
+        index = ContextIndex(threshold=2)
+        index.rebuild({
+            "blue hair": {"context_tags": {"long": 1, "smile": 2}},
+            "red hair": {"context_tags": {}},
+        })
+        assert index.get_contexts("red hair") == set()
+        assert "blue hair" in index._signatures
+        index.set_contexts("blue hair", ["long"])
+        assert "blue hair" not in index._signatures
+        index.remove("blue hair")
+        assert len(index) == 0
+
+    def test_tracker_uses_index(self, tmp_path):
+        from modules.ai_predictor import TagUsageTracker
+        tracker = TagUsageTracker(load_existing_data=False, usage_file=str(tmp_path / "usage.json"))
+        tracker.record_tag_usage("blue hair", "髪型・髪色", ["long", "beautiful"])
+        tracker.record_tag_usage("red hair", "髪型・髪色", ["long"])
+        assert tracker.get_context_similarity("Blue Hair", "red hair") == 0.5
+        tracker.close()
+        reloaded = TagUsageTracker(usage_file=str(tmp_path / "usage.json"))
+        assert reloaded.get_context_similarity("blue hair", "red hair") == 0.5
@@ -6,6 +6,7 @@ import os
 import json
 import tempfile
 import shutil
+import time
 from unittest.mock import patch, MagicMock
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
@@ -16,6 +17,7 @@ from modules.customization import (
     CustomRuleManager,
     CustomizationManager,
     get_customized_category_keywords,
+    get_category_keyword_table,
     apply_custom_rules,
     USER_SETTINGS_FILE,
     CUSTOM_KEYWORDS_FILE,
@@ -147,6 +149,66 @@ class TestUserSettings:
             saved_data = json.load(f)
         
         assert saved_data["test_setting"] == "test_value"
+    
+    def test_batch_writes_once(self):
+        """batch内の複数の変更が1回の書き込みにまとめられるテスト"""
+        settings = UserSettings()
+        writes = []
+        original_write = settings._write_file
+        settings._write_file = lambda: writes.append(1) or original_write()
+        
+        with settings.batch():
+            settings.set_setting("ai_prediction_enabled", False)
+            settings.set_setting("confidence_threshold", 0.9)
+            with settings.batch():
+                settings.set_setting("ui_preferences.theme", "darkly")
+            # batchの途中では書き込まない
+            assert settings.is_dirty()
+            assert "user_settings" in settings._writer.flush()
+            assert not os.path.exists(self.test_settings_file)
+        
+        assert settings.flush()
+        assert len(writes) == 1
+        assert not settings.is_dirty()
+        with open(self.test_settings_file, 'r', encoding='utf-8') as f:
+            saved_data = json.load(f)
+        assert saved_data["confidence_threshold"] == 0.9
+        assert saved_data["ui_preferences"]["theme"] == "darkly"
+    
+    def test_debounced_write_in_background(self):
+        """連続した変更がバックグラウンドで1回だけ書き込まれるテスト"""
+        settings = UserSettings()
+        original_delay = settings._writer.delay
+        settings._writer.delay = 0.05
+        try:
+            for i in range(20):
+                settings.set_setting("counter", i)
+            assert not os.path.exists(self.test_settings_file)
+            
+            deadline = time.monotonic() + 2
+            while settings.is_dirty() and time.monotonic() < deadline:
+                time.sleep(0.02)
+        finally:
+            settings._writer.delay = original_delay
+        assert not settings.is_dirty()
+        with open(self.test_settings_file, 'r', encoding='utf-8') as f:
+            assert json.load(f)["counter"] == 19
+        # 一時ファイルは残らない
+        assert os.listdir(self.temp_dir) == ["user_settings.json"]
+    
+    def test_files_share_one_writer(self):
+        """設定・キーワード・ルールがアプリ共通の保存マネージャーで書き込まれるテスト"""
+        from modules.customization import DebouncedJsonFile
+        from modules.persistence import get_shared_persistence_manager
+        
+        writer = get_shared_persistence_manager()
+        assert UserSettings()._writer is writer
+        assert CustomKeywordManager()._writer is writer
+        assert CustomRuleManager()._writer is writer
+        assert {"user_settings", "custom_keywords", "custom_rules"} <= set(writer._components)
+        # _snapshotを実装しないサブクラスは作れない
+        with pytest.raises(TypeError):
+            type("NoSnapshot", (DebouncedJsonFile,), {})()
 
 
 class TestCustomKeywordManager:
@@ -585,6 +647,32 @@ class TestCustomizationFunctions:
         assert "髪型・髪色" in customized_keywords
         assert "表情・感情" in customized_keywords
     
+    def test_category_keyword_table_is_cached(self, monkeypatch):
+        """統合キーワード表のキャッシュと無効化のテスト"""
+        from modules import customization, category_manager
+        monkeypatch.setattr(customization, "CUSTOM_KEYWORDS_FILE", os.path.join(self.temp_dir, "custom_keywords.json"))
+        monkeypatch.setattr(category_manager, "CATEGORY_KEYWORDS_FILE", os.path.join(self.temp_dir, "category_keywords.json"))
+        category_manager.save_category_keywords({"髪型・髪色": ["blue hair"], "表情・感情": ["smile"]})
+        manager = CustomizationManager()
+        
+        table = manager.get_category_keyword_table()
+        assert table.keywords["髪型・髪色"] == ("blue hair",)
+        assert "smile" in table.keyword_sets["表情・感情"]
+        assert manager.get_category_keyword_table() is table
+        with pytest.raises(TypeError):
+            table.keywords["髪型・髪色"] = ()
+        
+        # カスタムキーワードが変わったら作り直す
+        manager.keyword_manager.add_custom_keyword("髪型・髪色", "twintails")
+        rebuilt = manager.get_category_keyword_table()
+        assert rebuilt is not table
+        assert rebuilt.keywords["髪型・髪色"] == ("blue hair", "twintails")
+        
+        # 基本キーワードファイルが変わっても作り直す
+        category_manager.save_category_keywords({"髪型・髪色": ["ponytail"]})
+        assert manager.get_category_keyword_table().keywords["髪型・髪色"] == ("ponytail", "twintails")
+        assert isinstance(get_category_keyword_table().keywords, type(table.keywords))
+    
     def test_apply_custom_rules(self):
         """カスタムルール適用テスト"""
         score = apply_custom_rules("blue hair", "髪型・髪色", 50.0)
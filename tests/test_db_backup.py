@@ -0,0 +1,69 @@
+"""
+db_backup.pyのテスト
+"""
+import sys
+import os
+import sqlite3
+import threading
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pytest
+
+from modules.db_backup import backup_database, start_backup
+
+
+def make_database(path, rows=5000):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE tags (id INTEGER PRIMARY KEY, tag TEXT, jp TEXT)")
+    conn.executemany("INSERT INTO tags (tag, jp) VALUES (?, ?)",
+                     ((f"tag_{i}", "説明" * 20) for i in range(rows)))
+    conn.commit()
+    return conn
+
+
+def test_backup_is_consistent_while_writing(tmp_path):
+    source = str(tmp_path / "tags.db")
+    writer = make_database(source)
+    progress = []
+
+    def on_progress(copied, total):
+        progress.append((copied, total))
+        # コピーの途中でアプリ側の書き込みが入ってもよい
+        if len(progress) == 2:
+            writer.execute("INSERT INTO tags (tag, jp) VALUES ('added', '')")
+            writer.commit()
+
+    path = backup_database(source, str(tmp_path / "backup" / "tags_backup.db"), pages=8, progress=on_progress)
+    writer.close()
+    assert len(progress) > 2 and progress[-1][0] == progress[-1][1]
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA integrity_check").fetchone() == ("ok",)
+    assert conn.execute("SELECT COUNT(*) FROM tags").fetchone()[0] in (5000, 5001)
+    conn.close()
+
+
+@pytest.mark.skipif(sqlite3.sqlite_version_info < (3, 27, 0), reason="VACUUM INTOに対応していないSQLite")
+def test_compact_backup_drops_free_pages(tmp_path):
+    source = str(tmp_path / "tags.db")
+    conn = make_database(source)
+    conn.execute("DELETE FROM tags WHERE id > 100")
+    conn.commit()
+    conn.close()
+    path = backup_database(source, str(tmp_path / "compact.db"), vacuum=True)
+    assert os.path.getsize(path) < os.path.getsize(source) / 4
+    assert sqlite3.connect(path).execute("SELECT COUNT(*) FROM tags").fetchone()[0] == 100
+
+
+def test_failed_backup_leaves_no_file(tmp_path):
+    results = []
+    done = threading.Event()
+
+    def on_done(path, error):
+        results.append((path, error))
+        done.set()
+
+    start_backup(str(tmp_path / "missing.db"), str(tmp_path / "out.db"), on_done)
+    assert done.wait(5)
+    path, error = results[0]
+    assert path is None and isinstance(error, sqlite3.Error)
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,134 @@
+"""
+db_migrations.pyのテスト
+"""
+import sys
+import os
+import re
+import sqlite3
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pytest
+
+from modules import db_migrations
+from modules.db_migrations import SCHEMA_VERSION, get_schema_version, migrate
+from modules.tag_manager import TagManager
+
+
+def index_names(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+
+def test_migrate_upgrades_unversioned_database(tmp_path):
+    """版管理を導入する前に作られたDB（user_version = 0）も、データを保ったまま最新の版にする"""
+    db_file = str(tmp_path / "old.db")
+    conn = sqlite3.connect(db_file)
+    db_migrations._create_base_schema(conn)
+    conn.execute("INSERT INTO tags (tag, jp, category) VALUES ('smile', '笑顔', '表情・感情')")
+    conn.commit()
+
+    assert migrate(conn) == SCHEMA_VERSION == get_schema_version(conn)
+    assert {"idx_tags_negative_category_tag", "idx_tags_tag_negative"} <= index_names(conn)
+    assert "idx_tags_is_negative" not in index_names(conn)
+    # カテゴリはcategoriesテーブルへ移り、互換ビューでは従来どおり文字列で読める
+    assert conn.execute("SELECT jp, category FROM tags_with_category WHERE tag = 'smile'").fetchone() == ("笑顔", "表情・感情")
+    assert conn.execute("SELECT name FROM categories").fetchall() == [("表情・感情",)]
+    # 2回目以降は何もしない
+    assert migrate(conn) == SCHEMA_VERSION
+    conn.close()
+
+
+def test_failed_migration_rolls_back(tmp_path, monkeypatch):
+    def broken(conn):
+        conn.execute("CREATE TABLE half_done (x INTEGER)")
+        raise sqlite3.OperationalError("テスト用の失敗")
+
+    monkeypatch.setattr(db_migrations, "MIGRATIONS", db_migrations.MIGRATIONS + [(SCHEMA_VERSION + 1, "失敗する手順", broken)])
+    monkeypatch.setattr(db_migrations, "SCHEMA_VERSION", SCHEMA_VERSION + 1)
+    conn = sqlite3.connect(str(tmp_path / "tags.db"))
+    with pytest.raises(sqlite3.OperationalError):
+        migrate(conn)
+    # 成功した手順までは適用され、失敗した手順の変更は残らない
+    assert get_schema_version(conn) == SCHEMA_VERSION
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'half_done'").fetchone() is None
+    conn.close()
+
+
+def test_newer_database_is_left_untouched(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "tags.db"))
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION + 5}")
+    assert migrate(conn) == SCHEMA_VERSION + 5
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'tags'").fetchone() is None
+    conn.close()
+
+
+@pytest.fixture
+def loaded_manager(tmp_path):
+    tm = TagManager(db_file=str(tmp_path / "tags.db"))
+    rows = [{"tag": f"tag_{i}", "jp": f"タグ{i}", "category": f"カテゴリ{i % 12}", "favorite": i % 7 == 0,
+             "is_negative": i % 9 == 0} for i in range(3000)]
+    tm.save_tags(rows)
+    for i in range(60):
+        tm.add_recent_tag(f"tag_{i}")
+    assert tm.analyze()
+    yield tm
+    tm.close()
+
+
+# よく使う処理（インデックスで絞り込めるもの）。全件を読むload_tags・get_all_tagsは含めない
+HOT_CALLS = {
+    "get_tags_by_category": lambda tm: tm.get_tags_by_category("カテゴリ3"),
+    "get_recent_tags": lambda tm: tm.get_recent_tags(),
+    "get_tag_info": lambda tm: tm.get_tag_info("tag_5"),
+    "tag_exists": lambda tm: tm.tag_exists("tag_5", is_negative=False),
+    "exists_tag": lambda tm: tm.exists_tag("tag_5"),
+    "existing_tags": lambda tm: tm.existing_tags(["tag_1", "tag_2", "missing"], is_negative=False),
+    "toggle_favorite": lambda tm: tm.toggle_favorite("tag_5"),
+    "set_category": lambda tm: tm.set_category("tag_5", "カテゴリ4"),
+    "update_tag": lambda tm: tm.update_tag("tag_1", "tag_1_renamed", "タグ", "カテゴリ1"),
+    "delete_tag": lambda tm: tm.delete_tag("tag_2"),
+    "page_by_category": lambda tm: tm.page(limit=50, category="カテゴリ5", is_negative=False),
+    "page_by_tag": lambda tm: tm.page("tag_5", limit=50, order="tag"),
+    "count_tags_by_category": lambda tm: tm.count_tags_by_category(),
+    "count_negative_tags_by_category": lambda tm: tm.count_tags_by_category(is_negative=True),
+    "rename_category": lambda tm: tm.rename_category("カテゴリ1", "カテゴリ2"),
+}
+
+
+@pytest.mark.parametrize("name", sorted(HOT_CALLS))
+def test_hot_queries_use_indexes(loaded_manager, name):
+    """EXPLAIN QUERY PLANで、tagsの全件走査や一時的なソート・集計が起きないことを確認する"""
+    conn = loaded_manager._get_conn()
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        HOT_CALLS[name](loaded_manager)
+    finally:
+        conn.set_trace_callback(None)
+    queries = [sql for sql in statements if sql.lstrip().split(None, 1)[0].upper() in ("SELECT", "UPDATE", "DELETE")]
+    assert queries
+    for sql in queries:
+        details = [row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+        full_scans = [d for d in details if re.match(r"SCAN (TABLE )?(tags|t)\b", d) and "INDEX" not in d]
+        assert not full_scans, (sql, details)
+        assert not any("TEMP B-TREE" in d for d in details), (sql, details)
+
+
+def test_categories_are_stored_once(tmp_path):
+    tm = TagManager(db_file=str(tmp_path / "tags.db"))
+    tm.save_tags([{"tag": "blue hair", "category": "髪色"}, {"tag": "red hair", "category": "髪色"},
+                  {"tag": "smile", "category": "表情"}, {"tag": "misc", "category": ""}])
+    assert tm.count_tags_by_category() == {"髪色": 2, "表情": 1, "": 1}
+    assert [t["tag"] for t in tm.get_tags_by_category("")] == ["misc"]
+
+    # 名前の変更はcategoriesの1行だけを書き換える（同期を使っていなければ変更履歴も記録しない）
+    conn = tm._get_conn()
+    before = conn.total_changes
+    assert tm.rename_category("髪色", "髪型・髪色")
+    assert conn.total_changes - before == 1
+    assert conn.execute("SELECT COUNT(*) FROM changelog").fetchone()[0] == 0
+    assert tm.get_tag_info("red hair")["category"] == "髪型・髪色"
+    # 既存のカテゴリへの変更はタグを移して統合する
+    assert tm.rename_category("表情", "髪型・髪色")
+    assert tm.count_tags_by_category() == {"髪型・髪色": 3, "": 1}
+    assert [c["name"] for c in tm.get_categories()] == ["髪型・髪色"]
+    tm.close()
@@ -0,0 +1,80 @@
+"""
+fetch_worker.pyのテスト
+"""
+import sys
+import os
+import threading
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from modules.fetch_worker import FetchWorker
+
+
+class TestFetchWorker:
+    def test_handler_receives_args_and_generation(self):
+        results = []
+        done = threading.Event()
+
+        def handler(text, category, generation, is_cancelled):
+            results.append((text, category, generation, is_cancelled()))
+            done.set()
+
+        worker = FetchWorker(handler)
+        try:
+            generation = worker.submit("long", "全カテゴリ")
+            assert done.wait(2)
+            assert results == [("long", "全カテゴリ", generation, False)]
+        finally:
+            worker.stop()
+
+    def test_pending_requests_are_superseded(self):
+        started = threading.Event()
+        release = threading.Event()
+        finished = threading.Event()
+        calls = []
+
+        def handler(text, generation, is_cancelled):
+            calls.append(text)
+            if text == "l":
+                started.set()
+                release.wait(2)
+                calls.append(("l cancelled", is_cancelled()))
+            if text == "long h":
+                finished.set()
+
+        worker = FetchWorker(handler)
+        try:
+            worker.submit("l")
+            assert started.wait(2)
+            # 処理中に連続してリクエストが来ても、最後のものだけが処理される
+            worker.submit("lo")
+            worker.submit("lon")
+            last = worker.submit("long h")
+            assert worker.generation == last
+            release.set()
+            assert finished.wait(2)
+            assert calls == ["l", ("l cancelled", True), "long h"]
+        finally:
+            worker.stop()
+
+    def test_handler_exception_keeps_worker_alive(self):
+        done = threading.Event()
+
+        def handler(text, generation, is_cancelled):
+            if text == "bad":
+                raise ValueError("boom")
+            done.set()
+
+        worker = FetchWorker(handler)
+        try:
+            worker.submit("bad")
+            worker.submit("ok")
+            assert done.wait(2)
+        finally:
+            worker.stop()
+
+    def test_stop_cancels_and_joins(self):
+        worker = FetchWorker(lambda *args, **kwargs: None)
+        generation = worker.submit("x")
+        worker.stop()
+        assert not worker.is_current(generation)
+        assert not worker._thread.is_alive()
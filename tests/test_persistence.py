@@ -0,0 +1,203 @@
+"""
+persistence.pyのテスト
+"""
+import sys
+import os
+import json
+import threading
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pytest
+
+from modules.persistence import PersistenceManager
+
+
+class DirtyComponent:
+    def __init__(self, fail=False):
+        self.dirty = False
+        self.fail = fail
+        self.saves = 0
+        self.saved = threading.Event()
+
+    def is_dirty(self):
+        return self.dirty
+
+    def save(self):
+        self.dirty = False
+        self.saves += 1
+        self.saved.set()
+        if self.fail:
+            self.dirty = True
+            return False
+        return True
+
+
+class TestPersistenceManager:
+    def test_flush_saves_only_dirty_components(self):
+        manager = PersistenceManager(start_thread=False)
+        theme, usage = DirtyComponent(), DirtyComponent()
+        manager.register("theme", theme.save, theme.is_dirty)
+        manager.register("usage", usage.save, usage.is_dirty)
+
+        usage.dirty = True
+        assert manager.flush() == ["usage"]
+        assert (theme.saves, usage.saves) == (0, 1)
+        # 変更がなければ何も書き込まない
+        assert manager.flush() == []
+        assert usage.saves == 1
+
+    def test_mark_dirty_without_flag(self):
+        manager = PersistenceManager(start_thread=False)
+        calls = []
+        manager.register("settings", lambda: calls.append("settings"))
+        assert manager.flush() == []
+        manager.mark_dirty("settings")
+        assert manager.dirty_components() == ["settings"]
+        assert manager.flush() == ["settings"]
+        assert manager.flush() == []
+        assert calls == ["settings"]
+
+    def test_failed_save_stays_dirty(self):
+        manager = PersistenceManager(start_thread=False)
+
+        def broken():
+            raise OSError("disk full")
+
+        manager.register("broken", broken)
+        manager.mark_dirty("broken")
+        failing = DirtyComponent(fail=True)
+        failing.dirty = True
+        manager.register("failing", failing.save, failing.is_dirty)
+
+        assert manager.flush() == []
+        assert manager.dirty_components() == ["broken", "failing"]
+
+    def test_requests_are_coalesced(self):
+        manager = PersistenceManager(delay=0.05, max_delay=1.0)
+        component = DirtyComponent()
+        manager.register("usage", component.save, component.is_dirty)
+        try:
+            for _ in range(5):
+                component.dirty = True
+                manager.request_save()
+            assert component.saved.wait(2)
+            time.sleep(0.1)
+            assert component.saves == 1
+        finally:
+            manager.stop(flush=False)
+
+    def test_max_delay_bounds_debounce(self):
+        manager = PersistenceManager(delay=0.2, max_delay=0.3)
+        component = DirtyComponent()
+        manager.register("usage", component.save, component.is_dirty)
+        try:
+            start = time.monotonic()
+            # 要求が途切れなくても最大待ち時間で保存される
+            while not component.saved.is_set() and time.monotonic() - start < 2:
+                component.dirty = True
+                manager.request_save()
+                time.sleep(0.02)
+            assert component.saved.is_set()
+            assert time.monotonic() - start < 1.0
+        finally:
+            manager.stop(flush=False)
+
+    def test_stop_flushes(self):
+        manager = PersistenceManager(delay=10)
+        component = DirtyComponent()
+        manager.register("usage", component.save, component.is_dirty)
+        component.dirty = True
+        manager.request_save()
+        manager.stop()
+        assert component.saves == 1
+        assert not manager._thread.is_alive()
+
+
+class TestComponentDirtyFlags:
+    def test_usage_tracker_saves_only_when_dirty(self, tmp_path):
+        from modules.ai_predictor import TagUsageTracker
+        usage_file = str(tmp_path / "usage.json")
+        tracker = TagUsageTracker(load_existing_data=False, usage_file=usage_file)
+        assert not tracker.is_dirty()
+        for _ in range(10):
+            tracker.record_tag_usage("blue hair", "髪型・髪色", ["long"])
+        # 記録のたびにファイルへ書き込まない
+        assert tracker.is_dirty()
+        assert not os.path.exists(usage_file)
+
+        manager = PersistenceManager(start_thread=False)
+        manager.register("usage_tracker", tracker.save_usage_data, tracker.is_dirty)
+        assert manager.flush() == ["usage_tracker"]
+        assert not tracker.is_dirty()
+        reloaded = TagUsageTracker(usage_file=usage_file)
+        assert reloaded.get_tag_frequency("blue hair") == 10
+
+    def test_theme_change_marks_dirty(self, monkeypatch, tmp_path):
+        import modules.theme_manager
+        from modules.theme_manager import ThemeManager
+        theme_file = tmp_path / "theme.json"
+        monkeypatch.setattr(modules.theme_manager, "THEME_FILE", str(theme_file))
+        tm = ThemeManager()
+        tm.set_theme(tm.current_theme)
+        assert not tm.is_dirty()
+        tm.set_theme("flatly" if tm.current_theme != "flatly" else "cosmo")
+        assert tm.is_dirty()
+        assert not theme_file.exists()
+        assert tm.save()
+        assert not tm.is_dirty()
+        assert theme_file.exists()
+
+
+class TestWriteJsonAtomic:
+    def test_replaces_file_without_leaving_temp(self, tmp_path):
+        from modules.persistence import write_json_atomic
+        path = tmp_path / "sub" / "data.json"
+        write_json_atomic(str(path), {"a": 1})
+        write_json_atomic(str(path), {"a": "日本語"})
+        assert json.loads(path.read_text(encoding="utf-8")) == {"a": "日本語"}
+        assert os.listdir(path.parent) == ["data.json"]
+
+    def test_failed_write_keeps_original(self, tmp_path):
+        from modules.persistence import write_json_atomic
+        path = tmp_path / "data.json"
+        write_json_atomic(str(path), {"a": 1})
+        with pytest.raises(TypeError):
+            write_json_atomic(str(path), {"a": object()})
+        assert json.loads(path.read_text(encoding="utf-8")) == {"a": 1}
+        assert os.listdir(tmp_path) == ["data.json"]
+
+    @pytest.mark.skipif(os.name == "nt", reason="POSIXの権限ビットのみ確認する")
+    def test_keeps_file_mode(self, tmp_path):
+        from modules.persistence import new_file_mode, write_json_atomic
+        path = tmp_path / "data.json"
+        write_json_atomic(str(path), {"a": 1})
+        assert os.stat(path).st_mode & 0o777 == new_file_mode()
+        # 新しいファイルはopen()で作った場合と同じ権限になる
+        with open(tmp_path / "plain.json", "w") as f:
+            f.write("{}")
+        assert new_file_mode() == os.stat(tmp_path / "plain.json").st_mode & 0o777
+        os.chmod(path, 0o640)
+        write_json_atomic(str(path), {"a": 2})
+        assert os.stat(path).st_mode & 0o777 == 0o640
+
+
+class TestIdleExit:
+    def test_thread_starts_on_demand_and_exits_when_idle(self):
+        manager = PersistenceManager(delay=0.02, idle_exit=True)
+        assert manager._thread is None
+        component = DirtyComponent()
+        manager.register("settings", component.save, component.is_dirty)
+        component.dirty = True
+        manager.request_save()
+        assert component.saved.wait(2)
+        deadline = time.monotonic() + 2
+        while manager._thread is not None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert manager._thread is None
+        # 再度の要求でスレッドが起動し直す
+        component.saved.clear()
+        component.dirty = True
+        manager.request_save()
+        assert component.saved.wait(2)
+        assert component.saves == 2
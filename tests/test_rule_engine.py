@@ -0,0 +1,90 @@
+"""
+rule_engine.pyのテスト
+"""
+import sys
+import os
+import random
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from modules.rule_engine import KeywordAutomaton, CompiledRules
+from modules.customization import CustomRuleManager
+
+
+def make_rule(rule_id, condition, value=1):
+    return {"id": rule_id, "type": "t", "condition": condition,
+            "action": {"type": "boost_score", "value": value}, "enabled": True}
+
+
+class TestKeywordAutomaton:
+    def test_find_all_overlapping(self):
+        automaton = KeywordAutomaton()
+        for keyword in ["he", "she", "his", "hers", "blue hair", "hair"]:
+            automaton.add(keyword, keyword)
+        assert sorted(automaton.find_all("ushers")) == ["he", "hers", "she"]
+        assert sorted(automaton.find_all("long blue hair")) == ["blue hair", "hair"]
+        assert automaton.find_all("xyz") == []
+
+
+class TestCompiledRules:
+    def test_each_condition_type(self):
+        rules = [
+            make_rule("kw", {"type": "keyword_match", "keyword": "Blue"}),
+            make_rule("ctx", {"type": "context_contains", "required_tags": ["Long Hair", "smile"]}),
+            make_rule("len", {"type": "tag_length", "min_length": 3, "max_length": 9}),
+            make_rule("unknown", {"type": "regex", "pattern": ".*"}),
+        ]
+        compiled = CompiledRules(rules)
+        assert list(compiled.evaluate("blue hair")) == ["kw", "len"]
+        assert list(compiled.evaluate("red", ["smile", "long hair"])) == ["ctx", "len"]
+        assert compiled.evaluate("ab", ["smile"]) == {}
+
+    def test_matches_linear_evaluation(self):
+        rng = random.Random(0)
+        words = ["blue", "hair", "long", "smile", "dress", "red", "girl", "sky"]
+        rules = []
+        for i in range(300):
+            kind = rng.choice(["keyword_match", "context_contains", "tag_length"])
+            if kind == "keyword_match":
+                condition = {"type": kind, "keyword": rng.choice(words)[:rng.randint(2, 5)]}
+            elif kind == "context_contains":
+                condition = {"type": kind, "required_tags": rng.sample(words, rng.randint(1, 3))}
+            else:
+                low = rng.randint(0, 12)
+                condition = {"type": kind, "min_length": low, "max_length": low + rng.randint(-1, 8)}
+            rules.append(make_rule(f"rule_{i}", condition, i))
+        manager = CustomRuleManager.__new__(CustomRuleManager)
+        compiled = CompiledRules(rules)
+        for _ in range(200):
+            tag = " ".join(rng.sample(words, rng.randint(1, 3)))
+            context = rng.sample(words, rng.randint(0, 4))
+            expected = {rule["id"]: rule["action"] for rule in rules
+                        if manager._evaluate_condition(rule["condition"], tag, context)}
+            result = compiled.evaluate(tag, context)
+            assert list(result.items()) == list(expected.items())
+
+    def test_thousands_of_rules_are_cheap(self):
+        rules = [make_rule(f"rule_{i}", {"type": "keyword_match", "keyword": f"kw{i:05d}"}) for i in range(5000)]
+        compiled = CompiledRules(rules)
+        start = time.perf_counter()
+        for _ in range(1000):
+            result = compiled.evaluate("tag with kw01234 inside")
+        elapsed = (time.perf_counter() - start) / 1000
+        assert list(result) == ["rule_1234"]
+        assert elapsed < 0.001
+
+
+class TestCustomRuleManagerCompiled:
+    def test_recompiles_when_rules_change(self, monkeypatch, tmp_path):
+        import modules.customization as customization
+        monkeypatch.setattr(customization, "CUSTOM_RULES_FILE", str(tmp_path / "custom_rules.json"))
+        manager = CustomRuleManager()
+        assert manager.evaluate_custom_rules("blue hair") == {}
+        manager.add_custom_rule("keyword_boost", {"type": "keyword_match", "keyword": "blue"},
+                                {"type": "boost_score", "value": 10})
+        assert list(manager.evaluate_custom_rules("blue hair")) == ["rule_1"]
+        manager.custom_rules[0]["enabled"] = False
+        manager.invalidate_compiled_rules()
+        assert manager.evaluate_custom_rules("blue hair") == {}
+        manager.remove_custom_rule("rule_1")
+        assert manager.evaluate_custom_rules("blue hair") == {}
@@ -0,0 +1,94 @@
+"""
+search_cache.pyのテスト
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from modules.search_cache import SearchResultCache, can_narrow_from, filter_tags
+
+
+class TestCanNarrowFrom:
+    def test_extended_query(self):
+        assert can_narrow_from("lon", "long")
+        assert can_narrow_from("long", "long h")
+        assert can_narrow_from("hair", "long hair")
+        assert can_narrow_from("", "anything")
+
+    def test_unrelated_query(self):
+        assert not can_narrow_from("long", "lo")
+        assert not can_narrow_from("short", "long")
+
+    def test_favorite_words(self):
+        # "fav"はお気に入りタグにも一致するため"fa"の結果から絞り込めない
+        assert not can_narrow_from("fa", "fav")
+        assert can_narrow_from("", "fav")
+        assert not can_narrow_from("fav", "favorite")
+        assert can_narrow_from("fav", "fave")
+
+
+class TestFilterTags:
+    TAGS = [
+        {"tag": "blue hair", "jp": "青髪", "category": "髪型・髪色", "favorite": False},
+        {"tag": "smile", "jp": "笑顔", "category": "表情・感情", "favorite": True},
+    ]
+
+    def test_filters_by_query_and_tab(self):
+        assert filter_tags(self.TAGS, "hair", "全カテゴリ") == [self.TAGS[0]]
+        assert filter_tags(self.TAGS, "笑", "髪型・髪色") == []
+        assert filter_tags(self.TAGS, "", "表情・感情") == [self.TAGS[1]]
+
+    def test_favorite_words(self):
+        assert filter_tags(self.TAGS, "fav", "全カテゴリ") == [self.TAGS[1]]
+        assert filter_tags(self.TAGS, "", "お気に入り") == [self.TAGS[1]]
+
+
+class TestSearchResultCache:
+    def test_get_and_put(self):
+        cache = SearchResultCache()
+        results = [{"tag": "long hair"}]
+        cache.put("全カテゴリ", "long", 1, results)
+        assert cache.get("全カテゴリ", "long", 1) is results
+        assert cache.get("ネガティブ", "long", 1) is None
+
+    def test_find_base_prefers_longest(self):
+        cache = SearchResultCache()
+        all_results = [{"tag": "long hair"}, {"tag": "smile"}]
+        lon_results = [{"tag": "long hair"}]
+        cache.put("全カテゴリ", "", 1, all_results)
+        cache.put("全カテゴリ", "lon", 1, lon_results)
+        cache.put("ネガティブ", "long", 1, [])
+        assert cache.find_base("全カテゴリ", "long h", 1) is lon_results
+        assert cache.find_base("全カテゴリ", "smi", 1) is all_results
+        assert cache.find_base("お気に入り", "smi", 1) is None
+
+    def test_version_change_invalidates(self):
+        cache = SearchResultCache()
+        cache.put("全カテゴリ", "lon", 1, [{"tag": "long hair"}])
+        assert cache.get("全カテゴリ", "lon", 2) is None
+        assert cache.find_base("全カテゴリ", "long", 2) is None
+        assert cache.get("全カテゴリ", "lon", 1) is None
+
+    def test_lru_eviction(self):
+        cache = SearchResultCache(max_entries=2)
+        cache.put("t", "a", 1, [])
+        cache.put("t", "b", 1, [])
+        cache.get("t", "a", 1)
+        cache.put("t", "c", 1, [])
+        assert cache.get("t", "a", 1) == []
+        assert cache.get("t", "b", 1) is None
+
+
+class TestTagManagerVersion:
+    def test_version_increments_on_change(self, tmp_path):
+        from modules.tag_manager import TagManager
+        tm = TagManager(db_file=str(tmp_path / "test_tags.db"))
+        version = tm.version
+        tm.add_tag("long hair", category="髪型・髪色", jp="長い髪")
+        assert tm.version > version
+        version = tm.version
+        tm.load_tags()
+        assert tm.version == version
+        tm.add_recent_tag("long hair")
+        assert tm.version > version
+        tm.close()
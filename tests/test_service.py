@@ -0,0 +1,143 @@
+"""
+service.pyのテスト
+"""
+import sys
+import os
+import asyncio
+import json
+import threading
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pytest
+
+from modules.service import RpcError, RpcServer, TagService, METHOD_NOT_FOUND, INVALID_PARAMS
+from modules.service_client import ServiceClient, ServiceError, run_load_test
+from modules.tag_manager import TagManager
+
+
+class FakePredictor:
+    def __init__(self):
+        self.threads = set()
+
+    def predict_category_with_confidence(self, tag, context_tags=None, confidence_threshold=0.5, include_details=True):
+        self.threads.add(threading.get_ident())
+        return ("髪型・髪色" if "hair" in tag else "未分類"), 0.9, {}
+
+    def suggest_similar_tags(self, tag, limit=5):
+        return [(tag + " alt", 0.8)][:limit]
+
+
+@pytest.fixture
+def service(tmp_path):
+    tm = TagManager(db_file=str(tmp_path / "tags.db"))
+    tm.save_tags([{"tag": "blue hair", "jp": "青髪", "category": "髪型・髪色"},
+                  {"tag": "blonde hair", "jp": "金髪", "category": "髪型・髪色"},
+                  {"tag": "smile", "jp": "笑顔", "category": "表情・感情"}])
+    yield TagService(tm, predictor_factory=FakePredictor)
+    tm.close()
+
+
+def run_with_server(service, scenario):
+    async def main():
+        server = RpcServer(service, max_workers=2)
+        await server.start(port=0)
+        try:
+            return await scenario(server)
+        finally:
+            await server.close()
+    return asyncio.run(main())
+
+
+def test_rpc_methods_over_http(service):
+    async def scenario(server):
+        def calls():
+            client = ServiceClient(port=server.port)
+            try:
+                results = {
+                    "predict": client.call("predict", {"tags": ["blue hair", "smile"]}),
+                    "similar": client.call("similar", {"tags": ["smile"]}),
+                    "search": client.call("search", {"query": "HAIR"}),
+                    "autocomplete": client.call("autocomplete", {"prefixes": ["bl", "笑"]}),
+                    "add_tags": client.call("add_tags", {"tags": ["red eyes", "smile", "bad/tag"]}),
+                    "batch": client.batch([("stats", {}), ("nope", {})]),
+                }
+                with pytest.raises(ServiceError) as excinfo:
+                    client.call("predict", {"tags": 3})
+                results["invalid_code"] = excinfo.value.code
+                return results
+            finally:
+                client.close()
+        return await asyncio.get_running_loop().run_in_executor(None, calls)
+
+    results = run_with_server(service, scenario)
+    assert results["predict"] == [{"tag": "blue hair", "category": "髪型・髪色", "confidence": 0.9},
+                                  {"tag": "smile", "category": "未分類", "confidence": 0.9}]
+    assert results["similar"] == [{"tag": "smile", "similar": [["smile alt", 0.8]]}]
+    assert {t["tag"] for t in results["search"]} == {"blue hair", "blonde hair"}
+    assert results["autocomplete"] == {"bl": ["blonde hair", "blue hair"], "笑": ["smile"]}
+    assert results["add_tags"] == {"added": 1, "skipped": 2}
+    stats, missing = results["batch"]
+    assert stats["result"]["total"] == 4
+    assert missing["error"]["code"] == METHOD_NOT_FOUND
+    assert results["invalid_code"] == INVALID_PARAMS
+
+
+def test_concurrent_load_uses_worker_pool(service):
+    async def scenario(server):
+        return await run_load_test("127.0.0.1", server.port, "predict", concurrency=8, requests=200)
+
+    result = run_with_server(service, scenario)
+    assert result["requests"] == 200
+    assert result["errors"] == 0
+    # 予測はワーカースレッドで実行される（イベントループのスレッドでは実行しない）
+    assert threading.get_ident() not in service.predictor.threads
+    assert len(service.predictor.threads) <= 2
+
+
+def test_notifications_and_parse_errors(service):
+    async def scenario(server):
+        notification = await server.handle_payload(json.dumps(
+            {"jsonrpc": "2.0", "method": "stats", "params": {}}).encode("utf-8"))
+        parse_error = await server.handle_payload(b"{not json")
+        return notification, parse_error
+
+    notification, parse_error = run_with_server(service, scenario)
+    assert notification is None
+    assert parse_error["error"]["code"] == -32700
+
+
+def test_tags_pages_through_all_rows(service):
+    first = service.tags({"limit": 2, "order": "tag"})
+    assert [t["tag"] for t in first["tags"]] == ["blonde hair", "blue hair"]
+    rest = service.tags({"limit": 2, "order": "tag", "after": first["next"]})
+    assert [t["tag"] for t in rest["tags"]] == ["smile"] and rest["next"] is None
+    assert service.tags({"category": "表情・感情"})["tags"][0]["jp"] == "笑顔"
+    with pytest.raises(RpcError):
+        service.tags({"limit": 0})
+
+
+
+def test_real_predictor_handles_concurrent_calls(service):
+    """実際のAIPredictorを複数スレッドから呼んでも、予測キャッシュの追い出しで例外が起きない"""
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from modules.ai_predictor import AIPredictor
+
+    class SlowIterDict(dict):
+        # 最古のキーを選んでから削除するまでの間に、他のスレッドへ切り替わるようにする
+        def __iter__(self):
+            keys = list(super().__iter__())
+            time.sleep(0.001)
+            return iter(keys)
+
+    predictor = AIPredictor()
+    predictor._prediction_cache = SlowIterDict()
+    predictor._cache_max_size = 8
+    real_service = TagService(service.tag_manager, predictor_factory=lambda: predictor)
+    batches = [[f"tag_{n}_{i}" for i in range(20)] for n in range(16)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        predicted = list(pool.map(lambda tags: real_service.predict({"tags": tags}), batches))
+        similar = list(pool.map(lambda tags: real_service.similar({"tags": tags[:2], "limit": 3}), batches))
+    assert [[r["tag"] for r in rows] for rows in predicted] == batches
+    assert all(len(rows) == 2 for rows in similar)
+    assert dict.__len__(predictor._prediction_cache) <= 8
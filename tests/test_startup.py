@@ -0,0 +1,57 @@
+"""
+起動時のインポート（python -X importtime）のテスト
+"""
+import sys
+import os
+import subprocess
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pytest
+
+SRC_DIR = os.path.join(os.path.dirname(__file__), '..', 'src')
+# ウィンドウ表示までに読み込んではいけない重いモジュール
+HEAVY_MODULES = {
+    "torch", "transformers", "sentence_transformers", "deep_translator",
+    "modules.ai_predictor", "modules.customization", "modules.local_hf_manager",
+    "modules.huggingface_manager", "modules.prompt_translator",
+}
+# modules.ui_main の累積インポート時間の上限（ミリ秒）。遅い環境では環境変数で緩められる
+IMPORT_BUDGET_MS = float(os.environ.get("TAG_MANAGER_IMPORT_BUDGET_MS", "1500"))
+
+
+def import_times(module):
+    """新しいインタプリタでmoduleをインポートし、{モジュール名: 累積マイクロ秒}と標準出力を返す"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=SRC_DIR, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times, result.stdout
+
+
+def test_main_window_imports_stay_light():
+    pytest.importorskip("ttkbootstrap")
+    times, stdout = import_times("modules.ui_main")
+    assert HEAVY_MODULES.isdisjoint(times)
+    assert times["modules.ui_main"] / 1000 < IMPORT_BUDGET_MS
+    # インポートだけでは何も出力しない（config.pyのパス出力など）
+    assert stdout == ""
+
+
+def test_headless_core_imports_stay_light():
+    times, stdout = import_times("modules.constants, modules.tag_manager")
+    assert HEAVY_MODULES.isdisjoint(times)
+    assert "tkinter" not in times
+    assert stdout == ""
+
+
+def test_lazy_attributes_keep_old_import_paths():
+    from modules import constants, customization
+    assert constants.customization_manager is customization.get_customization_manager()
+    assert constants.apply_custom_rules is customization.apply_custom_rules
+    with pytest.raises(AttributeError):
+        constants.no_such_attribute
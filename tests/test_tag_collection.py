@@ -0,0 +1,82 @@
+"""
+tag_collection.pyのテスト
+"""
+import sys
+import os
+import sqlite3
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pytest
+
+from modules.search_cache import filter_tags
+from modules.tag_collection import TagCollection
+
+ROWS = [
+    {"tag": "blue hair", "jp": "青髪", "favorite": True, "category": "髪型・髪色", "is_negative": False},
+    {"tag": "smile", "jp": "笑顔", "favorite": False, "category": "表情・感情", "is_negative": False},
+    {"tag": "long hair", "jp": None, "favorite": False, "category": "髪型・髪色", "is_negative": False},
+    {"tag": "lowres", "jp": "低解像度", "favorite": True, "category": "ネガティブ", "is_negative": True},
+    {"tag": "thing", "jp": "", "favorite": False, "category": "", "is_negative": False},
+]
+
+
+def test_views_behave_like_dicts():
+    tags = TagCollection.from_dicts(ROWS)
+    assert len(tags) == 5
+    assert tags == ROWS
+    assert tags[-1] == ROWS[-1]
+    assert dict(tags[0]) == ROWS[0]
+    assert tags[2].get("jp", "x") is None
+    assert tags[0].get("missing", "x") == "x"
+    assert [t["tag"] for t in tags[1:3]] == ["smile", "long hair"]
+    # 同じカテゴリ名は1つの表にまとめられる
+    assert tags.categories == ["髪型・髪色", "表情・感情", "ネガティブ", ""]
+
+    tags[1]["category"] = "新カテゴリ"
+    tags[1]["favorite"] = True
+    assert tags.find("smile") == dict(ROWS[1], category="新カテゴリ", favorite=True)
+    assert tags.find("nothing") is None
+    assert tags.category_of("nothing", "未分類") == "未分類"
+    assert tags.tree_rows()[1] == ("smile", "笑顔", "★", "新カテゴリ")
+
+
+def test_positive_rows_have_no_negative_key():
+    tags = TagCollection.from_rows([("a", "あ", 1, None)], with_negative=False)
+    assert tags.to_dicts() == [{"tag": "a", "jp": "あ", "favorite": True, "category": ""}]
+    with pytest.raises(KeyError):
+        tags[0]["is_negative"]
+
+
+@pytest.mark.parametrize("tab", ["全カテゴリ", "お気に入り", "髪型・髪色", "ネガティブ", "存在しない"])
+def test_filter_matches_dict_filter(tab):
+    plain = [dict(row, jp=row["jp"] or "") for row in ROWS]
+    collection = TagCollection.from_dicts(plain)
+    for query in ["", "hair", "青", "髪型", "fav", "none"]:
+        result = filter_tags(collection, query, tab)
+        assert isinstance(result, TagCollection)
+        assert result.to_dicts() == filter_tags(plain, query, tab), query
+
+
+def test_collection_uses_much_less_memory_than_dicts():
+    import tracemalloc
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE tags (tag TEXT, jp TEXT, favorite INTEGER, category TEXT, is_negative INTEGER)")
+    conn.executemany("INSERT INTO tags VALUES (?, ?, ?, ?, ?)",
+                     ((f"tag {i}", f"タグ{i}", i % 7 == 0, f"カテゴリ{i % 12}", i % 13 == 0) for i in range(20000)))
+    query = "SELECT tag, jp, favorite, category, is_negative FROM tags"
+
+    def retained(loader):
+        tracemalloc.start()
+        try:
+            result = loader()
+            return tracemalloc.get_traced_memory()[0], result
+        finally:
+            tracemalloc.stop()
+
+    dict_bytes, dicts = retained(lambda: [
+        {"tag": r[0], "jp": r[1], "favorite": bool(r[2]), "category": r[3] or "", "is_negative": bool(r[4])}
+        for r in conn.execute(query)])
+    collection_bytes, collection = retained(lambda: TagCollection.from_rows(conn.execute(query)))
+    conn.close()
+    assert collection.to_dicts() == dicts
+    assert collection_bytes < dict_bytes * 0.5
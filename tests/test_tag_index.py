@@ -0,0 +1,108 @@
+"""
+tag_index.pyのテスト
+"""
+import sys
+import os
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pytest
+
+from modules.tag_index import AutocompleteIndex
+
+
+@pytest.fixture
+def index():
+    idx = AutocompleteIndex(ignored_jp=("(翻訳中...)",))
+    idx.build([
+        ("long hair", "長い髪"),
+        ("long sleeves", "長袖"),
+        ("Looking at viewer", "視聴者を見る"),
+        ("smile", "笑顔"),
+        ("short hair", "(翻訳中...)"),
+    ])
+    return idx
+
+
+class TestAutocompleteIndex:
+    def test_prefix_search_is_case_insensitive(self, index):
+        assert index.search("lo") == ["Looking at viewer", "long hair", "long sleeves"]
+        assert index.search("LONG") == ["long hair", "long sleeves"]
+        assert index.search("") == []
+        assert index.search("xyz") == []
+
+    def test_japanese_reverse_lookup(self, index):
+        assert index.search("長") == ["long hair", "long sleeves"]
+        assert index.search("笑") == ["smile"]
+        # 翻訳中のプレースホルダーは検索対象外
+        assert index.search("(") == []
+
+    def test_ranked_by_usage(self, index):
+        index.set_usage("long sleeves", 5)
+        assert index.search("lo") == ["long sleeves", "Looking at viewer", "long hair"]
+        index.increment_usage("long hair", 10)
+        assert index.search("lo", limit=1) == ["long hair"]
+
+    def test_add_remove_rename(self, index):
+        index.add("longcoat", "ロングコート")
+        assert "longcoat" in index.search("lon")
+        assert index.search("ロング") == ["longcoat"]
+
+        index.remove("long hair")
+        assert "long hair" not in index.search("lo")
+        assert index.search("長い") == []
+
+        index.increment_usage("smile", 3)
+        index.rename("smile", "grin", "にやり")
+        assert index.search("sm") == []
+        assert index.search("gr") == ["grin"]
+        assert index.search("笑") == []
+        # 使用回数は引き継がれる
+        index.add("grass", "草")
+        assert index.search("gr") == ["grin", "grass"]
+        assert len(index) == 6
+
+    def test_add_updates_jp(self, index):
+        index.add("short hair", "短い髪")
+        assert index.search("短") == ["short hair"]
+        assert index.search("sh") == ["short hair"]
+
+    def test_large_index_latency(self):
+        idx = AutocompleteIndex()
+        idx.build((f"tag{i:06d}", f"タグ{i}") for i in range(100000))
+        idx.search("tag0")  # 短いプレフィックスのキャッシュを温める
+        start = time.perf_counter()
+        for _ in range(100):
+            result = idx.search("tag0123")
+        elapsed = (time.perf_counter() - start) / 100
+        assert len(result) == 20
+        assert elapsed < 0.001
+
+
+class TestTagManagerAutocomplete:
+    def test_index_follows_tag_changes(self, tmp_path):
+        from modules.tag_manager import TagManager
+        tm = TagManager(db_file=str(tmp_path / "test_tags.db"))
+        tm.add_tag("long hair", category="髪型・髪色", jp="長い髪")
+        # peekは構築しない（UIスレッドでは構築済みのときだけ使う）
+        assert tm.peek_autocomplete_index() is None
+        index = tm.get_autocomplete_index(usage_provider=lambda: {"long hair": 2})
+        assert tm.peek_autocomplete_index() is index
+        assert index.search("lon") == ["long hair"]
+
+        tm.add_tag("long sleeves", category="服装・ファッション", jp="長袖")
+        assert index.search("長") == ["long hair", "long sleeves"]
+
+        tm.update_tag("long sleeves", "short sleeves", "半袖", "服装・ファッション")
+        assert index.search("lon") == ["long hair"]
+        assert index.search("sho") == ["short sleeves"]
+
+        tm.add_recent_tag("short sleeves")
+        tm.add_recent_tag("short sleeves")
+        tm.add_recent_tag("short sleeves")
+        tm.add_tag("shirt", category="服装・ファッション", jp="シャツ")
+        assert index.search("sh") == ["short sleeves", "shirt"]
+
+        tm.delete_tag("long hair")
+        assert index.search("lon") == []
+        tm.close()
@@ -370,21 +370,6 @@ def test_init_database_exception_handling(monkeypatch, tmp_path):
     except Exception as e:
         assert "テスト用の_init_database例外" in str(e)
 
-@pytest.mark.skip(reason="sqlite3.Cursorのexecute属性がread-onlyのためスキップ")
-def test_create_indexes_exception_handling(monkeypatch, tag_manager):
-    """_create_indexesの例外処理をテスト"""
-    # 例外を発生させるモック
-    def mock_execute(*args, **kwargs):
-        raise sqlite3.Error("テスト用の_create_indexes例外")
-    
-    monkeypatch.setattr(tag_manager._get_conn().cursor(), "execute", mock_execute)
-    
-    # _create_indexesを実行（例外が発生するが、アプリケーションがクラッシュしないことを確認）
-    try:
-        tag_manager._create_indexes(tag_manager._get_conn().cursor())
-    except sqlite3.Error as e:
-        assert "テスト用の_create_indexes例外" in str(e)
-
 def test_load_tags_exception_handling(monkeypatch, tag_manager):
     """load_tagsの例外処理をテスト"""
     # 例外を発生させるモック
@@ -979,4 +964,92 @@ def test_db_schema_corruption(monkeypatch, tmp_path):
     tm = TagManager(db_file=str(db_file))
     # 正しいスキーマを期待する操作でエラーが発生することを確認
     with pytest.raises(sqlite3.OperationalError):
-        tm.load_tags()
\ No newline at end of file
+        tm.load_tags()
+# 一括操作
+def test_existing_tags(tag_manager):
+    tag_manager.add_tag("pos_tag", category="c")
+    tag_manager.add_tag("neg_tag", is_negative=True)
+    assert tag_manager.existing_tags(["pos_tag", "neg_tag", "missing"]) == {"pos_tag", "neg_tag"}
+    assert tag_manager.existing_tags(["pos_tag", "neg_tag"], is_negative=True) == {"neg_tag"}
+    assert tag_manager.existing_tags([]) == set()
+
+def test_bulk_operations_return_per_tag_results(tag_manager):
+    rows = [{"tag": f"bulk_{i}", "jp": "", "favorite": False, "category": "old", "is_negative": False}
+            for i in range(1200)]
+    assert tag_manager.save_tags(rows) == 1200
+    tag_manager.add_recent_tag("bulk_0")
+
+    results = tag_manager.set_categories({"bulk_0": "new", "bulk_1": "bad/cat", "missing": "new"})
+    assert results == {"bulk_0": True, "bulk_1": False, "missing": False}
+    assert tag_manager.get_tag_info("bulk_0")["category"] == "new"
+    assert tag_manager.get_tag_info("bulk_1")["category"] == "old"
+
+    assert tag_manager.set_favorites(["bulk_2", "missing"], True) == {"bulk_2": True, "missing": False}
+    assert tag_manager.toggle_favorites(["bulk_2", "bulk_3"]) == {"bulk_2": True, "bulk_3": True}
+    assert not tag_manager.get_tag_info("bulk_2")["favorite"]
+    assert tag_manager.get_tag_info("bulk_3")["favorite"]
+
+    # チャンク境界をまたぐ件数でも1回の呼び出しで削除できる
+    results = tag_manager.delete_tags([row["tag"] for row in rows] + ["missing"], is_negative=None)
+    assert sum(results.values()) == 1200 and results["missing"] is False
+    assert tag_manager.get_all_tags() == []
+    assert tag_manager.get_recent_tags() == []
+
+def test_bulk_delete_rolls_back_on_error(monkeypatch, tag_manager):
+    tag_manager.add_tag("keep_tag", category="c")
+    conn = tag_manager._get_conn()
+
+    class FailingConn:
+        def __enter__(self):
+            return conn.__enter__()
+
+        def __exit__(self, *exc):
+            return conn.__exit__(*exc)
+
+        def executemany(self, sql, params):
+            if sql.startswith("DELETE FROM recent_tags"):
+                raise sqlite3.OperationalError("テスト用の例外")
+            return conn.executemany(sql, params)
+
+    monkeypatch.setattr("modules.tag_manager.messagebox.showerror", lambda *a, **k: None)
+    monkeypatch.setattr(tag_manager, "_get_conn", lambda: FailingConn())
+    monkeypatch.setattr(tag_manager, "_execute_query", lambda q, p=None: conn.execute(q, p or ()))
+    assert tag_manager.delete_tags(["keep_tag"]) is None
+    monkeypatch.undo()
+    assert tag_manager.tag_exists("keep_tag")
+
+def test_page_and_iter_tags_keyset(tag_manager):
+    rows = [{"tag": f"page_{i:04d}", "jp": "", "category": "c" if i % 3 else "d",
+             "is_negative": i % 5 == 0} for i in range(250)]
+    tag_manager.save_tags(rows)
+
+    # 全ページをつなげるとget_all_tags()と同じ行・同じ順になる
+    assert list(tag_manager.iter_tags(batch_size=64)) == tag_manager.get_all_tags()
+    page, next_key = tag_manager.page(limit=100, order="tag", category="c", is_negative=False)
+    assert [t["tag"] for t in page] == sorted(t["tag"] for t in page)
+    assert all(t["category"] == "c" and not t["is_negative"] for t in page)
+    assert next_key == page[-1]["tag"]
+
+    # 読み進める途中で行が削除・追加されても重複や取りこぼしがない
+    tags = tag_manager.iter_tags(order="tag", batch_size=50)
+    seen = [next(tags)["tag"] for _ in range(60)]
+    tag_manager.delete_tag("page_0011")
+    tag_manager.delete_tag("page_0201")
+    tag_manager.add_tag("page_9999", category="c")
+    seen += [t["tag"] for t in tags]
+    assert len(seen) == len(set(seen)) == 250
+    assert "page_0201" not in seen and "page_9999" in seen
+
+    with pytest.raises(ValueError):
+        tag_manager.page(order="jp")
+
+@pytest.mark.parametrize("order, filters", [("id", {}), ("id", {"category": "c", "is_negative": False}), ("tag", {})])
+def test_page_reads_rows_in_index_order(tag_manager, order, filters):
+    """ORDER BYのために一時的なソート（USE TEMP B-TREE）を行わない"""
+    conn = tag_manager._get_conn()
+    queries = []
+    conn.set_trace_callback(queries.append)
+    tag_manager.page(limit=10, order=order, **filters)
+    conn.set_trace_callback(None)
+    plan = conn.execute("EXPLAIN QUERY PLAN " + queries[-1]).fetchall()
+    assert not any("TEMP B-TREE" in row[-1] for row in plan)
@@ -0,0 +1,92 @@
+"""
+tag_snapshot.pyのテスト
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pytest
+
+from modules.search_cache import filter_tags
+from modules.tag_manager import TagManager
+from modules.tag_snapshot import TagSnapshot, database_stamp, load_snapshot, write_snapshot
+
+TABS = ["全カテゴリ", "お気に入り", "未分類", "ネガティブ", "髪型・髪色", "存在しないカテゴリ"]
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    path = str(tmp_path / "tags.db")
+    tm = TagManager(db_file=path)
+    tm.save_tags([
+        {"tag": "blue hair", "jp": "青髪", "category": "髪型・髪色", "favorite": True},
+        {"tag": "smile", "jp": "笑顔", "category": "表情・感情"},
+        {"tag": "long hair", "jp": "", "category": "髪型・髪色"},
+        {"tag": "thing", "jp": "もの", "category": "未分類"},
+        {"tag": "nocat", "jp": "", "category": ""},
+        {"tag": "lowres", "jp": "低解像度", "category": "ネガティブ", "is_negative": True, "favorite": True},
+    ])
+    tm.close()
+    return path
+
+
+def expected_for_tab(tm, tab):
+    """ui_mainの_load_tags_for_category + filter_tags（検索語なし）と同じ結果"""
+    if tab == "ネガティブ":
+        source = tm.negative_tags
+    elif tab == "未分類":
+        source = [t for t in tm.get_all_tags() if not t.get("category") or t.get("category") == "未分類"]
+    elif tab == "全カテゴリ":
+        source = tm.get_all_tags()
+    else:
+        source = tm.positive_tags
+    return [(t["tag"], t["jp"], t["favorite"], t["category"]) for t in filter_tags(source, "", tab)]
+
+
+def test_round_trip_matches_database_views(db_file, tmp_path):
+    tm = TagManager(db_file=db_file)
+    tags = tm.get_all_tags()
+    tm.close()
+    path = str(tmp_path / "tags.snapshot")
+    assert write_snapshot(path, tags, db_file)
+
+    tm = TagManager(db_file=db_file)
+    try:
+        with load_snapshot(path, db_file) as snapshot:
+            assert len(snapshot) == 6
+            assert snapshot.tag(0) == tags[0]
+            for tab in TABS:
+                rows = [(t["tag"], t["jp"], t["favorite"], t["category"]) for t in snapshot.tags_for_tab(tab)]
+                assert rows == expected_for_tab(tm, tab), tab
+            assert snapshot.tags_for_tab("最近使った") is None
+    finally:
+        tm.close()
+
+
+def test_stale_or_broken_snapshot_is_ignored(db_file, tmp_path):
+    path = str(tmp_path / "tags.snapshot")
+    assert load_snapshot(path, db_file) is None
+    tm = TagManager(db_file=db_file)
+    write_snapshot(path, tm.get_all_tags(), db_file)
+    stamp = database_stamp(db_file)
+    tm.save_tags([{"tag": "new tag", "jp": "", "category": ""}])
+    tm.close()
+    # 書き出し後にコミットされたのでスタンプが変わり、スナップショットは使われない
+    assert database_stamp(db_file) != stamp
+    assert load_snapshot(path, db_file) is None
+
+    with open(path, "r+b") as f:
+        f.write(b"broken!!")
+    assert load_snapshot(path, db_file) is None
+    with pytest.raises(ValueError):
+        TagSnapshot(path).close()
+
+
+def test_empty_database_snapshot(tmp_path):
+    db_path = str(tmp_path / "empty.db")
+    TagManager(db_file=db_path).close()
+    path = str(tmp_path / "empty.snapshot")
+    assert write_snapshot(path, [], db_path)
+    with load_snapshot(path, db_path) as snapshot:
+        assert len(snapshot) == 0
+        assert snapshot.tags_for_tab("全カテゴリ") == []
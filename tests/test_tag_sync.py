@@ -0,0 +1,121 @@
+"""
+tag_sync.pyのテスト
+"""
+import sys
+import os
+import json
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pytest
+
+from modules.tag_manager import TagManager
+from modules.tag_sync import SyncError, get_origin
+
+
+def snapshot(tm):
+    tags = {t["tag"]: (t["jp"], t["favorite"], t["category"], t["is_negative"]) for t in tm.iter_tags()}
+    recent = sorted((r[0], r[1], r[2]) for r in tm._get_conn().execute("SELECT tag, is_negative, used_at FROM recent_tags"))
+    return tags, recent
+
+
+def sync_all(shared, *managers):
+    # 2巡すると、各DBが相手の変更を受け取り、相手もその受け取りを確認した状態になる
+    for _ in range(2):
+        for tm in managers:
+            tm.sync(str(shared))
+
+
+@pytest.fixture
+def pair(tmp_path):
+    a = TagManager(db_file=str(tmp_path / "a" / "tags.db"))
+    b = TagManager(db_file=str(tmp_path / "b" / "tags.db"))
+    yield a, b
+    a.close()
+    b.close()
+
+
+def test_first_sync_merges_existing_tags(tmp_path, pair):
+    a, b = pair
+    a.save_tags([{"tag": "smile", "jp": "笑顔", "category": "表情"}, {"tag": "blue hair", "category": "髪色"}])
+    a.add_recent_tag("smile")
+    b.save_tags([{"tag": "red eyes", "jp": "赤い目", "category": "目"}])
+    sync_all(tmp_path / "shared", a, b)
+    assert snapshot(a) == snapshot(b)
+    assert set(snapshot(a)[0]) == {"smile", "blue hair", "red eyes"}
+
+
+def test_later_syncs_send_only_changes(tmp_path, pair):
+    a, b = pair
+    shared = tmp_path / "shared"
+    a.save_tags([{"tag": f"tag_{i}", "category": f"カテゴリ{i % 3}"} for i in range(200)])
+    sync_all(shared, a, b)
+
+    a.set_category("tag_1", "カテゴリ2")
+    a.delete_tag("tag_2")
+    a.update_tag("tag_3", "tag_3_renamed", "改名", "カテゴリ0")
+    assert a.rename_category("カテゴリ1", "カテゴリ1改")
+    result = a.sync(str(shared))
+    # 未確認の変更は、変更したタグと改名したカテゴリのタグだけ
+    sent = json.loads((shared / f"{get_origin(a._get_conn())}.json").read_text(encoding="utf-8"))
+    assert result["sent"] == len(sent["changes"]) < 80
+    sync_all(shared, b, a)
+    assert snapshot(a) == snapshot(b)
+    assert "tag_2" not in snapshot(b)[0] and "tag_3_renamed" in snapshot(b)[0]
+    assert b.get_tag_info("tag_4")["category"] == "カテゴリ1改"
+    # 全員が受け取った後は何も書き出さず、古い変更履歴は整理される
+    assert a.sync(str(shared))["sent"] == 0
+    conn = a._get_conn()
+    assert conn.execute("SELECT COUNT(*) FROM changelog").fetchone()[0] == \
+        conn.execute("SELECT COUNT(DISTINCT tbl || key) FROM changelog").fetchone()[0]
+
+
+def test_conflicting_edits_resolve_to_the_later_change(tmp_path, pair):
+    a, b = pair
+    shared = tmp_path / "shared"
+    a.save_tags([{"tag": "smile", "jp": "笑顔", "category": "表情"}])
+    sync_all(shared, a, b)
+
+    b.update_tag("smile", "smile", "ほほえみ", "表情")
+    time.sleep(0.01)
+    a.update_tag("smile", "smile", "にっこり", "感情")
+    sync_all(shared, b, a)
+    assert snapshot(a) == snapshot(b)
+    assert b.get_tag_info("smile")["jp"] == "にっこり"
+
+
+def test_copied_database_needs_new_origin(tmp_path, pair):
+    a, _ = pair
+    shared = tmp_path / "shared"
+    a.sync(str(shared))
+    copied = shared / "copy.json"
+    copied.write_text((shared / f"{get_origin(a._get_conn())}.json").read_text(encoding="utf-8"), encoding="utf-8")
+    with pytest.raises(SyncError):
+        a.sync(str(shared))
+    assert a.sync(str(shared), new_origin=True)["applied"] == 0
+
+
+def changelog_count(tm):
+    return tm._get_conn().execute("SELECT COUNT(*) FROM changelog").fetchone()[0]
+
+
+def test_changes_are_logged_only_after_first_sync(tmp_path, pair):
+    a, b = pair
+    shared = tmp_path / "shared"
+    a.save_tags([{"tag": f"tag_{i}", "category": "カテゴリ"} for i in range(50)])
+    for _ in range(20):
+        a.add_recent_tag("tag_1")
+    assert a.rename_category("カテゴリ", "カテゴリ改")
+    # 同期を使っていないDBには変更履歴が溜まらない
+    assert changelog_count(a) == 0
+
+    # 相手がいない間の同期でも、同じキーの古い変更は整理される
+    a.sync(str(shared))
+    for _ in range(20):
+        a.add_recent_tag("tag_1")
+    a.sync(str(shared))
+    assert changelog_count(a) == 51
+
+    sync_all(shared, b, a)
+    assert snapshot(a) == snapshot(b)
+    assert b.get_tag_info("tag_3")["category"] == "カテゴリ改"
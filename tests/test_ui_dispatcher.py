@@ -0,0 +1,191 @@
+"""
+ui_dispatcher.pyのテスト
+"""
+import sys
+import os
+import threading
+from unittest.mock import MagicMock
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pytest
+
+from modules.ui_dispatcher import UIDispatcher, coalesce_messages, get_coalesce_key, DISPATCH_EVENT
+
+
+class FakeRoot:
+    """event_generate/after/bindだけを持つTkルートの代用"""
+
+    def __init__(self, running=True):
+        self.running = running
+        self.events = []
+        self.after_calls = []
+        self.bindings = {}
+
+    def bind(self, sequence, func, add=None):
+        self.bindings[sequence] = func
+
+    def event_generate(self, sequence, when=None):
+        if not self.running:
+            raise RuntimeError("main thread is not in main loop")
+        self.events.append((sequence, when))
+
+    def after(self, ms, func):
+        self.after_calls.append((ms, func))
+
+
+class TestCoalesceMessages:
+    def test_status_keeps_last(self):
+        messages = [
+            {"type": "status", "message": "1"},
+            {"type": "info", "title": "a", "message": "b"},
+            {"type": "status", "message": "2"},
+        ]
+        result = coalesce_messages(messages)
+        assert result == [messages[1], messages[2]]
+
+    def test_progress_is_per_dialog(self):
+        d1, d2 = object(), object()
+        messages = [
+            {"type": "progress", "dialog": d1, "message": "a"},
+            {"type": "progress", "dialog": d2, "message": "b"},
+            {"type": "progress", "dialog": d1, "message": "c"},
+        ]
+        result = coalesce_messages(messages)
+        assert [m["message"] for m in result] == ["b", "c"]
+
+    def test_info_and_error_are_never_coalesced(self):
+        messages = [
+            {"type": "error", "title": "t", "message": "1"},
+            {"type": "error", "title": "t", "message": "2"},
+        ]
+        assert coalesce_messages(messages) == messages
+
+    def test_explicit_key(self):
+        assert get_coalesce_key({"type": "call", "coalesce_key": None}) is None
+        assert get_coalesce_key({"type": "call", "coalesce_key": "x"}) == ("explicit", "x")
+
+    def test_update_tree_per_category(self):
+        messages = [
+            {"type": "update_tree", "category": "A", "items": [1]},
+            {"type": "update_tree", "category": "B", "items": [2]},
+            {"type": "update_tree", "category": "A", "items": [3]},
+        ]
+        result = coalesce_messages(messages)
+        assert [m["items"] for m in result] == [[2], [3]]
+
+
+class TestUIDispatcher:
+    def test_put_wakes_once_until_drained(self):
+        root = FakeRoot()
+        handled = []
+        dispatcher = UIDispatcher(root, handled.append)
+        assert DISPATCH_EVENT in root.bindings
+
+        dispatcher.put({"type": "status", "message": "a"})
+        dispatcher.put({"type": "status", "message": "b"})
+        assert len(root.events) == 1
+
+        root.bindings[DISPATCH_EVENT](None)
+        assert handled == [{"type": "status", "message": "b"}]
+        assert dispatcher.empty()
+
+        dispatcher.put({"type": "refresh"})
+        assert len(root.events) == 2
+
+    def test_put_without_mainloop_is_kept(self):
+        root = FakeRoot(running=False)
+        handled = []
+        dispatcher = UIDispatcher(root, handled.append)
+        dispatcher.put({"type": "refresh"})
+        assert dispatcher.qsize() == 1
+        assert dispatcher.drain() == 1
+        assert handled == [{"type": "refresh"}]
+
+    def test_call_runs_function(self):
+        root = FakeRoot()
+        dispatcher = UIDispatcher(root, MagicMock())
+        func = MagicMock()
+        dispatcher.call(func, 1, 2, key=None, text="x")
+        dispatcher.drain()
+        func.assert_called_once_with(1, 2, text="x")
+
+    def test_call_with_key_coalesces(self):
+        root = FakeRoot()
+        dispatcher = UIDispatcher(root, MagicMock())
+        func = MagicMock()
+        for i in range(5):
+            dispatcher.call(func, i, key="progress")
+        dispatcher.drain()
+        func.assert_called_once_with(4)
+
+    def test_time_budget_leaves_backlog(self):
+        root = FakeRoot()
+        handled = []
+        dispatcher = UIDispatcher(root, handled.append, time_budget_ms=0)
+        for i in range(3):
+            dispatcher.put({"type": "info", "title": "t", "message": str(i)})
+
+        assert dispatcher.drain() == 1
+        assert dispatcher.qsize() == 2
+        assert len(root.after_calls) == 1
+
+        # 継続処理で残りが順序通りに処理される
+        _, continuation = root.after_calls[0]
+        continuation()
+        continuation()
+        assert [m["message"] for m in handled] == ["0", "1", "2"]
+
+    def test_handler_exception_does_not_stop_drain(self):
+        root = FakeRoot()
+        handled = []
+
+        def handler(message):
+            if message["message"] == "bad":
+                raise ValueError("boom")
+            handled.append(message["message"])
+
+        dispatcher = UIDispatcher(root, handler)
+        dispatcher.put({"type": "info", "title": "t", "message": "bad"})
+        dispatcher.put({"type": "info", "title": "t", "message": "ok"})
+        dispatcher.drain()
+        assert handled == ["ok"]
+
+    def test_reentrant_drain_is_deferred(self):
+        root = FakeRoot()
+        handled = []
+        dispatcher = None
+
+        def handler(message):
+            # モーダルダイアログ内からの再入を模擬
+            handled.append((message["message"], dispatcher.drain()))
+
+        dispatcher = UIDispatcher(root, handler)
+        dispatcher.put({"type": "info", "title": "t", "message": "a"})
+        dispatcher.drain()
+        assert handled == [("a", 0)]
+
+    def test_put_from_threads(self):
+        root = FakeRoot()
+        handled = []
+        dispatcher = UIDispatcher(root, handled.append)
+
+        def worker(n):
+            for i in range(50):
+                dispatcher.put({"type": "info", "title": "t", "message": f"{n}-{i}"})
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        while not dispatcher.empty():
+            dispatcher.drain()
+        assert len(handled) == 200
+
+    def test_queue_compatible_get_nowait(self):
+        import queue
+        dispatcher = UIDispatcher(FakeRoot(), MagicMock())
+        with pytest.raises(queue.Empty):
+            dispatcher.get_nowait()
+        dispatcher.put({"type": "refresh"})
+        assert dispatcher.get_nowait() == {"type": "refresh"}
@@ -0,0 +1,283 @@
+"""
+ui_virtual_tree.pyのテスト
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pytest
+
+from modules.ui_virtual_tree import VirtualTreeview, compute_window, scroll_fractions, clamp_offset, compute_tree_diff
+
+
+class FakeTree:
+    """VirtualTreeviewが使うTreeview APIだけを持つ代用品（操作回数も記録する）"""
+
+    def __init__(self):
+        self.items = {}
+        self.order = []
+        self._selection = ()
+        self.ops = 0
+        self.bindings = {}
+        self.options = {}
+        self.moveto = None
+        self.focused = None
+        self.idle = []
+
+    def configure(self, **kwargs):
+        self.options.update(kwargs)
+
+    def bind(self, sequence, func, add=None):
+        self.bindings[sequence] = func
+
+    def insert(self, parent, index, iid=None, values=()):
+        self.ops += 1
+        self.items[iid] = tuple(values)
+        self.order.append(iid)
+        return iid
+
+    def item(self, iid, option=None, **kwargs):
+        if "values" in kwargs:
+            self.ops += 1
+            self.items[iid] = tuple(kwargs["values"])
+            return None
+        return self.items[iid]
+
+    def delete(self, *iids):
+        self.ops += 1
+        for iid in iids:
+            del self.items[iid]
+            self.order.remove(iid)
+
+    def get_children(self):
+        return tuple(self.order)
+
+    def selection(self):
+        return self._selection
+
+    def selection_set(self, items):
+        self._selection = tuple(items)
+
+    def yview_moveto(self, fraction):
+        self.moveto = fraction
+
+    def focus(self, iid):
+        self.focused = iid
+
+    def after_idle(self, func):
+        self.idle.append(func)
+
+
+class FakeScrollbar:
+    def __init__(self):
+        self.position = None
+        self.options = {}
+
+    def configure(self, **kwargs):
+        self.options.update(kwargs)
+
+    def set(self, first, last):
+        self.position = (first, last)
+
+
+def make_rows(n):
+    return [(f"tag{i}", f"訳{i}", "", "未分類") for i in range(n)]
+
+
+class TestPureFunctions:
+    def test_compute_window(self):
+        assert compute_window(0, 0, 30, 10) == (0, 0)
+        assert compute_window(100, 0, 30, 10) == (0, 40)
+        assert compute_window(100, 50, 30, 10) == (40, 90)
+        assert compute_window(100, 90, 30, 10) == (80, 100)
+
+    def test_scroll_fractions(self):
+        assert scroll_fractions(0, 30, 0) == (0.0, 1.0)
+        assert scroll_fractions(0, 30, 10) == (0.0, 1.0)
+        assert scroll_fractions(50, 25, 100) == (0.5, 0.75)
+
+    def test_clamp_offset(self):
+        assert clamp_offset(-5, 10, 100) == 0
+        assert clamp_offset(95, 10, 100) == 90
+        assert clamp_offset(5, 10, 3) == 0
+
+
+class TestComputeTreeDiff:
+    def test_no_base_returns_none(self):
+        assert compute_tree_diff(None, make_rows(3)) is None
+
+    def test_update_insert_delete(self):
+        old = make_rows(5)
+        new = list(old)
+        new[1] = ("tag1", "訳1", "★", "未分類")
+        del new[3]
+        new.insert(2, ("new", "新", "", "未分類"))
+        diff = compute_tree_diff(old, new)
+        assert diff == {
+            "inserted": [(2, ("new", "新", "", "未分類"))],
+            "deleted": ["tag3"],
+            "updated": [("tag1", "訳1", "★", "未分類")],
+        }
+
+    def test_reordered_survivors_fall_back(self):
+        old = make_rows(3)
+        assert compute_tree_diff(old, [old[1], old[0], old[2]]) is None
+
+    def test_too_many_changes_fall_back(self):
+        assert compute_tree_diff(make_rows(10), make_rows(30), max_changes=5) is None
+
+
+class TestVirtualTreeview:
+    def setup_method(self):
+        self.tree = FakeTree()
+        self.scrollbar = FakeScrollbar()
+        self.vt = VirtualTreeview(self.tree, self.scrollbar, overscan=10, visible_rows=30)
+
+    def test_only_window_is_materialized(self):
+        self.vt.set_rows(make_rows(50000))
+        assert len(self.tree.get_children()) == 40
+        assert self.vt.row_count() == 50000
+        assert self.scrollbar.position == (0.0, 30 / 50000)
+
+    def test_refresh_cost_is_constant(self):
+        self.vt.set_rows(make_rows(100))
+        small_ops = self.tree.ops
+        tree = FakeTree()
+        vt = VirtualTreeview(tree, FakeScrollbar(), overscan=10, visible_rows=30)
+        vt.set_rows(make_rows(50000))
+        assert tree.ops == small_ops
+
+    def test_small_list_shows_all_rows(self):
+        self.vt.set_rows(make_rows(5))
+        children = self.tree.get_children()
+        assert [self.tree.item(iid, "values")[0] for iid in children] == [f"tag{i}" for i in range(5)]
+        self.vt.set_rows(make_rows(2))
+        assert len(self.tree.get_children()) == 2
+
+    def test_scrollbar_moveto(self):
+        self.vt.set_rows(make_rows(1000))
+        self.vt.yview("moveto", "0.5")
+        assert self.vt.offset == 500
+        children = self.tree.get_children()
+        assert len(children) == 50
+        assert self.tree.item(children[0], "values")[0] == "tag490"
+        assert self.tree.moveto == pytest.approx(10 / 50)
+        assert self.scrollbar.position == (0.5, 0.53)
+
+    def test_scroll_units_and_pages(self):
+        self.vt.set_rows(make_rows(1000))
+        self.vt.yview("scroll", "3", "units")
+        assert self.vt.offset == 3
+        self.vt.yview("scroll", "1", "pages")
+        assert self.vt.offset == 32
+        self.vt.yview("scroll", "-100", "units")
+        assert self.vt.offset == 0
+
+    def test_internal_scroll_rebases_window(self):
+        self.vt.set_rows(make_rows(1000))
+        # Treeview内部で3行スクロールした（窓の端に近くないので再描画しない）
+        self.vt._on_tree_yscroll(3 / 40, 33 / 40)
+        assert self.vt.offset == 3
+        assert self.tree.item(self.tree.get_children()[-1], "values")[0] == "tag39"
+        # オーバースキャン領域の端に近づくと窓をずらす
+        self.vt._on_tree_yscroll(12 / 40, 42 / 40)
+        assert self.vt.offset == 12
+        children = self.tree.get_children()
+        assert self.tree.item(children[0], "values")[0] == "tag2"
+        assert self.tree.item(children[-1], "values")[0] == "tag51"
+
+    def test_selection_survives_scroll(self):
+        self.vt.set_rows(make_rows(1000))
+        first = self.tree.get_children()[1]
+        self.tree.selection_set((first,))
+        self.vt._on_select()
+        assert self.vt.selected_keys == {"tag1"}
+
+        self.vt.yview("moveto", "0.5")
+        assert self.tree.selection() == ()
+        assert self.vt.selected_keys == {"tag1"}
+
+        self.vt.yview("moveto", "0")
+        assert [self.tree.item(i, "values")[0] for i in self.tree.selection()] == ["tag1"]
+
+    def test_set_rows_keeps_offset_and_drops_missing_selection(self):
+        self.vt.set_rows(make_rows(1000))
+        self.vt.yview("moveto", "0.2")
+        self.vt.selected_keys = {"tag200", "tag999"}
+        self.vt.set_rows(make_rows(500))
+        assert self.vt.offset == 200
+        assert self.vt.selected_keys == {"tag200"}
+
+    def test_select_key_scrolls_into_view(self):
+        self.vt.set_rows(make_rows(1000))
+        assert self.vt.select_key("tag700")
+        assert self.vt.offset == 685
+        selection = self.tree.selection()
+        assert [self.tree.item(i, "values")[0] for i in selection] == ["tag700"]
+        assert self.tree.focused == selection[0]
+        assert not self.vt.select_key("missing")
+
+    def test_plain_click_clears_offscreen_selection(self):
+        class Event:
+            def __init__(self, state):
+                self.state = state
+
+        self.vt.set_rows(make_rows(1000))
+        self.vt.selected_keys = {"tag1", "tag900"}
+        self.vt.render()
+        slots = self.tree.get_children()
+        # Ctrl+クリックは追加なので画面外の選択を残す
+        self.vt._on_user_select(Event(0x0004))
+        self.tree.selection_set(tuple(self.tree.selection()) + (slots[2],))
+        self.vt._on_select()
+        assert self.vt.selected_keys == {"tag1", "tag2", "tag900"}
+        # 修飾キーなしのクリックは選択の置き換え
+        self.vt._on_user_select(Event(0))
+        self.tree.selection_set((slots[5],))
+        self.vt._on_select()
+        assert self.vt.selected_keys == {"tag5"}
+        # 操作の後の再描画による選択変更では置き換えない
+        for func in self.tree.idle:
+            func()
+        self.vt.selected_keys.add("tag900")
+        self.tree.selection_set(())
+        self.vt._on_select()
+        assert self.vt.selected_keys == {"tag900"}
+
+    def test_get_selected_rows_includes_offscreen(self):
+        self.vt.set_rows(make_rows(1000))
+        self.vt.selected_keys = {"tag3", "tag900"}
+        assert [row[0] for row in self.vt.get_selected_rows()] == ["tag3", "tag900"]
+
+    def test_apply_diff_single_update_is_one_operation(self):
+        rows = make_rows(50000)
+        self.vt.set_rows(rows, version=1)
+        new_rows = list(rows)
+        new_rows[5] = ("tag5", "訳5", "★", "未分類")
+        diff = compute_tree_diff(rows, new_rows)
+        ops = self.tree.ops
+        self.vt.apply_diff(diff, version=2)
+        assert self.tree.ops - ops == 1
+        assert self.tree.item(self.tree.get_children()[5], "values")[2] == "★"
+        assert self.vt.version == 2
+
+    def test_apply_diff_keeps_scroll_and_selection(self):
+        rows = make_rows(1000)
+        self.vt.set_rows(rows)
+        self.vt.yview("moveto", "0.5")
+        self.vt.selected_keys = {"tag505"}
+        # 表示位置より上に行を挿入・削除しても、先頭に見えていた行は動かない
+        new_rows = [("aaa", "", "", "")] + [row for row in rows if row[0] != "tag10"]
+        diff = compute_tree_diff(rows, new_rows)
+        self.vt.apply_diff(diff)
+        assert self.vt.rows == new_rows
+        assert self.vt.rows[self.vt.offset][0] == "tag500"
+        assert [self.tree.item(i, "values")[0] for i in self.tree.selection()] == ["tag505"]
+
+    def test_apply_diff_deleting_selected_row(self):
+        rows = make_rows(10)
+        self.vt.set_rows(rows)
+        self.vt.selected_keys = {"tag2"}
+        self.vt.apply_diff(compute_tree_diff(rows, rows[:2] + rows[3:]))
+        assert self.vt.selected_keys == set()
+        assert len(self.tree.get_children()) == 9
@@ -0,0 +1,87 @@
+"""
+usage_store.pyのテスト
+"""
+import sys
+import os
+import json
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from modules.usage_store import UsageStore, aggregate_usage_events
+from modules.ai_predictor import TagUsageTracker
+
+
+class TestUsageStore:
+    def test_aggregate_usage_events(self):
+        usage, categories, contexts = aggregate_usage_events([
+            ("blue hair", "髪型・髪色", 10.0, ["long"]),
+            ("blue hair", "色彩・照明", 5.0, ["long", "smile"]),
+        ])
+        assert usage == {"blue hair": [2, 10.0]}
+        assert categories == {("blue hair", "髪型・髪色"): 1, ("blue hair", "色彩・照明"): 1}
+        assert contexts == {("blue hair", "long"): 2, ("blue hair", "smile"): 1}
+
+    def test_upsert_increments(self, tmp_path):
+        store = UsageStore(str(tmp_path / "usage.db"))
+        store.apply_events([("blue hair", "髪型・髪色", 1.0, ["long"])])
+        store.apply_events([("blue hair", "髪型・髪色", 2.0, ["long"]),
+                            ("smile", "表情", 3.0, [])])
+        data = store.load_all()
+        assert data["blue hair"] == {
+            "count": 2, "categories": {"髪型・髪色": 2}, "last_used": 2.0, "context_tags": {"long": 2}}
+        assert data["smile"]["count"] == 1
+        store.delete_tags(["smile"])
+        assert "smile" not in store.load_all()
+        store.close()
+
+
+class TestTagUsageTrackerStore:
+    def test_reads_have_no_side_effects(self, tmp_path):
+        tracker = TagUsageTracker(load_existing_data=False, usage_file=str(tmp_path / "usage.json"))
+        assert tracker.get_tag_frequency("unknown") == 0
+        assert tracker.get_most_common_category("unknown") is None
+        assert tracker.get_context_similarity("unknown", "other") == 0.0
+        assert tracker.usage_data == {}
+        assert not tracker.is_dirty()
+
+    def test_batched_writes(self, tmp_path):
+        tracker = TagUsageTracker(load_existing_data=False, usage_file=str(tmp_path / "usage.json"))
+        for _ in range(3):
+            tracker.record_tag_usage("Blue Hair", "髪型・髪色", ["Long", "test tag"])
+        # 保存するまでデータベースには書き込まない
+        assert tracker.is_dirty()
+        assert not os.path.exists(tracker.db_file)
+        assert tracker.save_usage_data()
+        assert not tracker.is_dirty()
+        tracker.record_tag_usage("blue hair", "色彩・照明")
+        tracker.close()
+
+        reloaded = TagUsageTracker(usage_file=str(tmp_path / "usage.json"))
+        assert reloaded.get_tag_frequency("blue hair") == 4
+        assert reloaded.usage_data["blue hair"]["categories"] == {"髪型・髪色": 3, "色彩・照明": 1}
+        assert reloaded.usage_data["blue hair"]["context_tags"] == {"long": 3}
+        reloaded.close()
+
+    def test_legacy_json_is_migrated(self, tmp_path):
+        usage_file = tmp_path / "tag_usage_patterns.json"
+        usage_file.write_text(json.dumps({
+            "blue hair": {"count": 5, "categories": {"髪型・髪色": 5}, "last_used": 1, "context_tags": {"long": 2}}
+        }), encoding="utf-8")
+        tracker = TagUsageTracker(usage_file=str(usage_file))
+        assert tracker.get_tag_frequency("blue hair") == 5
+        tracker.record_tag_usage("blue hair", "髪型・髪色")
+        tracker.close()
+        # 移行後はSQLiteの内容が使われる
+        assert TagUsageTracker(usage_file=str(usage_file)).get_tag_frequency("blue hair") == 6
+
+    def test_import_and_cleanup(self, tmp_path):
+        tracker = TagUsageTracker(load_existing_data=False, usage_file=str(tmp_path / "usage.json"))
+        tracker.record_tag_usage("smile", "表情")
+        tracker.import_usage_data({
+            "smile": {"count": 9, "categories": {"表情": 9}, "last_used": 1, "context_tags": {}},
+            "sample pose": {"count": 1, "categories": {"ポーズ": 1}, "last_used": 1, "context_tags": {}},
+        })
+        assert tracker.cleanup_test_tags() == 1
+        tracker.close()
+        reloaded = TagUsageTracker(usage_file=str(tmp_path / "usage.json"))
+        assert set(reloaded.usage_data) == {"smile"}
+        assert reloaded.get_tag_frequency("smile") == 9